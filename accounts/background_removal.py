@@ -1,8 +1,27 @@
 """Premium character portrait background-removal service."""
 
+import threading
+
+from django.conf import settings
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_background_removal_session():
+    """Return the process-wide rembg session, loading the segmentation model on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from rembg import new_session
+
+                _session = new_session(getattr(settings, "BACKGROUND_REMOVAL_MODEL", "u2net"))
+    return _session
+
 
 def remove_background(image_bytes):
     """Return a PNG image with the detected background made transparent."""
     from rembg import remove
 
-    return remove(image_bytes)
+    return remove(image_bytes, session=get_background_removal_session())
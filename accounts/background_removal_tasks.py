@@ -4,11 +4,13 @@ import io
 import logging
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 from PIL import Image
 
@@ -48,7 +50,13 @@ def fail_stale_background_removal_job(job):
 
 
 def start_background_removal_task(job):
-    """Launch one Fargate task for a persisted job; never run inference in web."""
+    """Launch one Fargate task for a persisted job; never run inference in web.
+
+    With ``BACKGROUND_REMOVAL_DISPATCH = "worker"`` the job is left pending for
+    the long-running ``run_background_removal_worker`` command instead.
+    """
+    if getattr(settings, "BACKGROUND_REMOVAL_DISPATCH", "fargate") == "worker":
+        return
     task_definition = getattr(settings, "BACKGROUND_REMOVAL_TASK_DEFINITION", "")
     container_name = getattr(settings, "BACKGROUND_REMOVAL_CONTAINER_NAME", "background-removal")
     subnets = getattr(settings, "BACKGROUND_REMOVAL_SUBNETS", [])
@@ -93,7 +101,11 @@ def process_background_removal_job(job_id):
             return job
         job.status = BackgroundRemovalJob.Status.RUNNING
         job.save(update_fields=["status", "updated_at"])
+    return run_background_removal_job(job)
+
 
+def run_background_removal_job(job):
+    """Remove the background of a claimed (running) job and persist the outcome."""
     try:
         with job.source_image.open("rb") as source_file:
             transparent_png = remove_background(source_file.read())
@@ -116,3 +128,50 @@ def process_background_removal_job(job_id):
         update_fields.append("source_image")
     job.save(update_fields=update_fields)
     return job
+
+
+def claim_pending_background_removal_jobs(limit):
+    """Mark up to ``limit`` of the oldest pending jobs as running and return them.
+
+    ``skip_locked`` lets several workers claim batches concurrently without
+    waiting on (or double-claiming) rows another worker is claiming.
+    """
+    with transaction.atomic():
+        jobs = list(
+            BackgroundRemovalJob.objects.select_for_update(skip_locked=True)
+            .filter(status=BackgroundRemovalJob.Status.PENDING)
+            .order_by("created_at")[:limit]
+        )
+        if jobs:
+            BackgroundRemovalJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=BackgroundRemovalJob.Status.RUNNING, updated_at=timezone.now()
+            )
+    for job in jobs:
+        job.status = BackgroundRemovalJob.Status.RUNNING
+    return jobs
+
+
+def _run_timed_background_removal_job(job):
+    started = time.perf_counter()
+    try:
+        return run_background_removal_job(job), time.perf_counter() - started
+    finally:
+        # Pool threads open their own connection; don't leave it behind when the pool shuts down.
+        connection.close()
+
+
+def process_background_removal_batch(batch_size=8, max_workers=1):
+    """Claim one batch of pending jobs and process it; returns ``[(job, seconds), ...]``.
+
+    Jobs run on a bounded thread pool sharing the process-wide rembg session;
+    ``max_workers=1`` processes them in order on the calling thread.
+    """
+    jobs = claim_pending_background_removal_jobs(batch_size)
+    if max_workers <= 1 or len(jobs) <= 1:
+        results = []
+        for job in jobs:
+            started = time.perf_counter()
+            results.append((run_background_removal_job(job), time.perf_counter() - started))
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        return list(executor.map(_run_timed_background_removal_job, jobs))
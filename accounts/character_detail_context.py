@@ -3,6 +3,7 @@ import os
 from django.db import models as django_models
 
 from .character_image_utils import get_character_preview_image_url
+from .image_renditions import SHARE_IMAGE_WIDTH
 
 
 def build_character_detail_context(
@@ -30,7 +31,9 @@ def build_character_detail_context(
         versions = character.get_version_history()
 
     if preview_image_url is None:
-        preview_image_url = get_character_preview_image_url(character, request)
+        preview_image_url = get_character_preview_image_url(
+            character, request, width=SHARE_IMAGE_WIDTH, format_key="jpeg"
+        )
 
     character_image_file_names = []
     if can_edit_character:
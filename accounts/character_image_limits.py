@@ -1,5 +1,6 @@
 NORMAL_CHARACTER_IMAGE_LIMIT = 2
 PREMIUM_CHARACTER_IMAGE_LIMIT = 10
+CHARACTER_IMAGE_TOTAL_SIZE_LIMIT = 30 * 1024 * 1024
 
 
 def get_character_image_limit(user):
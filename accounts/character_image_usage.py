@@ -0,0 +1,161 @@
+"""Persisted character image metadata and per-character storage usage.
+
+Image rows record width/height/byte size/format when a file is uploaded, and
+CharacterImageUsage keeps the image count and quota bytes per character sheet.
+Quota and image-limit checks read these rows instead of reopening stored files.
+"""
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from PIL import Image
+
+METADATA_FIELDS = ("width", "height", "file_size", "image_format", "quota_bytes")
+USAGE_REFRESH_BATCH_SIZE = 500
+
+
+def _quota_bytes(file_size, width, height, band_count):
+    # Charge at least a third of the decoded size so highly compressed images still count.
+    return max(file_size, width * height * band_count // 3)
+
+
+def image_metadata_from(opened_image, file_size):
+    """Build metadata from an already opened PIL image."""
+    width, height = opened_image.width, opened_image.height
+    return {
+        "width": width,
+        "height": height,
+        "file_size": file_size,
+        "image_format": opened_image.format or "",
+        "quota_bytes": _quota_bytes(file_size, width, height, len(opened_image.getbands())),
+    }
+
+
+def read_image_metadata(image_file):
+    """Return metadata for an uploaded file, reusing what validate_character_image already read."""
+    metadata = getattr(image_file, "image_metadata", None)
+    if metadata is not None:
+        return metadata
+    file_size = image_file.size
+    try:
+        image_file.seek(0)
+        with Image.open(image_file) as opened_image:
+            metadata = image_metadata_from(opened_image, file_size)
+    except Exception:
+        metadata = {
+            "width": None,
+            "height": None,
+            "file_size": file_size,
+            "image_format": "",
+            "quota_bytes": file_size,
+        }
+    finally:
+        try:
+            image_file.seek(0)
+        except Exception:
+            pass
+    return metadata
+
+
+def _image_models():
+    from .character_models import CharacterImage6th, CharacterImage7th
+
+    return (CharacterImage6th, CharacterImage7th)
+
+
+def _record_stored_file_sizes(image_model, character_sheet_ids):
+    """Record the stored size of rows saved before metadata was kept, without reading the files."""
+    pending = image_model.objects.filter(
+        character_sheet__character_sheet_id__in=character_sheet_ids,
+        quota_bytes__isnull=True,
+        file_size__isnull=True,
+    ).exclude(image="")
+    updated = []
+    for image in pending:
+        try:
+            image.file_size = image.image.size
+        except (OSError, ValueError):
+            continue
+        updated.append(image)
+    image_model.objects.bulk_update(updated, ["file_size"])
+
+
+def _refresh_usage_batch(character_sheet_ids):
+    from .character_models import CharacterImageUsage, CharacterSheet
+
+    totals = {character_sheet_id: (0, 0) for character_sheet_id in character_sheet_ids}
+    for image_model in _image_models():
+        # Rows not yet backfilled by rebuild_character_image_usage count their stored file size.
+        _record_stored_file_sizes(image_model, character_sheet_ids)
+        rows = (
+            image_model.objects.filter(character_sheet__character_sheet_id__in=character_sheet_ids)
+            .values("character_sheet__character_sheet_id")
+            .annotate(image_count=Count("id"), total_bytes=Coalesce(Sum(Coalesce("quota_bytes", "file_size")), 0))
+        )
+        for row in rows:
+            count, total = totals[row["character_sheet__character_sheet_id"]]
+            totals[row["character_sheet__character_sheet_id"]] = (
+                count + row["image_count"],
+                total + row["total_bytes"],
+            )
+
+    existing_ids = set(CharacterSheet.objects.filter(id__in=character_sheet_ids).values_list("id", flat=True))
+    CharacterImageUsage.objects.bulk_create(
+        [
+            CharacterImageUsage(character_sheet_id=character_sheet_id, image_count=count, total_bytes=total)
+            for character_sheet_id, (count, total) in totals.items()
+            if character_sheet_id in existing_ids
+        ],
+        update_conflicts=True,
+        unique_fields=["character_sheet"],
+        update_fields=["image_count", "total_bytes", "updated_at"],
+    )
+
+
+def refresh_character_image_usage(character_sheet_ids):
+    """Recount images and quota bytes for the given CharacterSheet ids from the image rows."""
+    character_sheet_ids = sorted(set(character_sheet_ids) - {None})
+    for start in range(0, len(character_sheet_ids), USAGE_REFRESH_BATCH_SIZE):
+        _refresh_usage_batch(character_sheet_ids[start : start + USAGE_REFRESH_BATCH_SIZE])
+
+
+def get_character_image_usage(character_sheet):
+    """Return the CharacterImageUsage row for a sheet, counting it from the image rows on first use."""
+    from .character_models import CharacterImageUsage
+
+    usage = CharacterImageUsage.objects.filter(character_sheet=character_sheet).first()
+    if usage is None:
+        refresh_character_image_usage([character_sheet.pk])
+        usage = CharacterImageUsage.objects.get(character_sheet=character_sheet)
+    return usage
+
+
+def get_user_image_usage(user):
+    """Sum the per-character usage rows of a user."""
+    from .character_models import CharacterImageUsage
+
+    return CharacterImageUsage.objects.filter(character_sheet__user=user).aggregate(
+        image_count=Coalesce(Sum("image_count"), 0),
+        total_bytes=Coalesce(Sum("total_bytes"), 0),
+    )
+
+
+def backfill_image_metadata(batch_size=200):
+    """Read metadata for image rows stored before it was recorded; returns the updated CharacterSheet ids."""
+    character_sheet_ids = set()
+    for image_model in _image_models():
+        pending = image_model.objects.filter(quota_bytes__isnull=True).select_related("character_sheet")
+        updated = []
+        for image in pending.iterator(chunk_size=batch_size):
+            if not image.image:
+                continue
+            try:
+                with image.image.open("rb") as stored_file:
+                    metadata = read_image_metadata(stored_file)
+            except (OSError, ValueError):
+                continue
+            for name, value in metadata.items():
+                setattr(image, name, value)
+            updated.append(image)
+            character_sheet_ids.add(image.character_sheet.character_sheet_id)
+        image_model.objects.bulk_update(updated, METADATA_FIELDS, batch_size=batch_size)
+    return character_sheet_ids
@@ -1,6 +1,14 @@
 """Helpers for resolving character sheet image URLs."""
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .character_models import CharacterImage6th, CharacterImage7th
+from .image_renditions import rendition_url
+
+PREVIEW_IMAGE_ORDERING = ("-is_main", "order", "uploaded_at", "id")
+PREVIEW_IMAGE_CACHE_ATTR = "_preview_image_field"
 
 
 def _image_url(image_field):
@@ -12,26 +20,32 @@ def _image_url(image_field):
         return ""
 
 
+def _system_data(character):
+    try:
+        return character.system_data
+    except (AttributeError, ValueError, ObjectDoesNotExist):
+        return character
+
+
 def get_character_preview_image_field(character):
-    """Return the image field that should represent a character in previews."""
+    """Return the image field that should represent a character in previews.
+
+    The main image wins, then the first image in display order, then the legacy
+    ``character_image`` field. Uses the value stored by
+    ``resolve_character_preview_images`` when present, otherwise one query.
+    """
     if not character:
         return None
+    if PREVIEW_IMAGE_CACHE_ATTR in character.__dict__:
+        return character.__dict__[PREVIEW_IMAGE_CACHE_ATTR]
 
-    try:
-        detail = character.system_data
-    except (AttributeError, ValueError, ObjectDoesNotExist):
-        detail = character
-
+    detail = _system_data(character)
     image_field = None
     images = getattr(detail, "images", None)
     if images is not None:
-        main_image = images.filter(is_main=True).order_by("order", "uploaded_at", "id").first()
-        if main_image and main_image.image:
-            image_field = main_image.image
-        else:
-            first_image = images.order_by("order", "uploaded_at", "id").first()
-            if first_image and first_image.image:
-                image_field = first_image.image
+        preview_image = images.exclude(image="").order_by(*PREVIEW_IMAGE_ORDERING).first()
+        if preview_image:
+            image_field = preview_image.image
 
     if not image_field:
         image_field = getattr(detail, "character_image", None)
@@ -39,10 +53,54 @@ def get_character_preview_image_field(character):
     return image_field
 
 
-def get_character_preview_image_url(character, request=None):
-    """Return the image URL that should represent a character in previews."""
+def resolve_character_preview_images(characters):
+    """Resolve the preview image of many character sheets with one query per edition.
+
+    The result is stored on each sheet for ``get_character_preview_image_field``.
+    Load ``sixth_edition_data``/``seventh_edition_data`` with select_related so the
+    legacy ``character_image`` fallback needs no extra queries.
+    """
+    characters = [character for character in characters if character is not None and character.pk]
+    for edition, image_model in (("6th", CharacterImage6th), ("7th", CharacterImage7th)):
+        edition_characters = [character for character in characters if character.edition == edition]
+        if not edition_characters:
+            continue
+        preview_images = (
+            image_model.objects.filter(
+                character_sheet__character_sheet_id__in=[character.pk for character in edition_characters]
+            )
+            .exclude(image="")
+            .annotate(
+                character_id=F("character_sheet__character_sheet_id"),
+                preview_rank=Window(
+                    RowNumber(),
+                    partition_by=F("character_sheet_id"),
+                    # PREVIEW_IMAGE_ORDERING
+                    order_by=[F("is_main").desc(), F("order").asc(), F("uploaded_at").asc(), F("id").asc()],
+                ),
+            )
+            .filter(preview_rank=1)
+        )
+        image_fields = {image.character_id: image.image for image in preview_images}
+        for character in edition_characters:
+            image_field = image_fields.get(character.pk)
+            if not image_field:
+                image_field = getattr(_system_data(character), "character_image", None)
+            character.__dict__[PREVIEW_IMAGE_CACHE_ATTR] = image_field
+    return characters
+
+
+def get_character_preview_image_url(character, request=None, width=None, format_key="webp"):
+    """Return the image URL that should represent a character in previews.
+
+    With ``width`` the smallest stored rendition at least that wide is used,
+    falling back to the original upload until renditions are generated.
+    """
     image_field = get_character_preview_image_field(character)
-    url = _image_url(image_field)
+    if width and image_field:
+        url = rendition_url(image_field, getattr(image_field.instance, "renditions", None), width, format_key)
+    else:
+        url = _image_url(image_field)
     if url and request:
         return request.build_absolute_uri(url)
     return url
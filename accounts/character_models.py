@@ -625,6 +625,16 @@ class CharacterSheetSystemData(models.Model):
         """Edition is owned by the registry but read through the detail API."""
         return self.character_sheet.edition
 
+    @property
+    def lineage_root_pk(self):
+        """Primary key of the first version in this record's lineage."""
+        return self.lineage_root_id or self.pk
+
+    def lineage(self):
+        """All versions sharing this record's lineage root, including the root."""
+        root_pk = self.lineage_root_pk
+        return self.__class__.objects.filter(models.Q(pk=root_pk) | models.Q(lineage_root_id=root_pk))
+
     @property
     def abilities(self):
         return {
@@ -658,6 +668,13 @@ class CharacterSheetSystemData(models.Model):
 
     def save(self, *args, **kwargs):
         """Initialize derived values on the edition-specific record itself."""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "parent_data" in update_fields:
+            # Lineage is fixed by the parent chosen when the version is created.
+            parent_data = self.parent_data if self.parent_data_id else None
+            self.lineage_root_id = parent_data.lineage_root_pk if parent_data else None
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "lineage_root"}
         stats = self.calculate_derived_stats()
         if self.hit_points_max is None:
             self.hit_points_max = stats["hit_points_max"]
@@ -689,10 +706,7 @@ class CharacterSheetSystemData(models.Model):
             raise ValidationError({"parent_data": "親バージョンは同じ版でなければなりません。"})
         if self.version <= parent_data.version:
             raise ValidationError({"version": "バージョン番号は親より大きくしてください。"})
-        root = parent_data
-        while root.parent_data_id:
-            root = root.parent_data
-        if self.__class__.objects.filter(parent_data=root, version=self.version).exclude(pk=self.pk).exists():
+        if parent_data.lineage().filter(version=self.version).exclude(pk=self.pk).exists():
             raise ValidationError({"version": "同じ履歴内でバージョン番号は重複できません。"})
         seen = {self.pk} if self.pk else set()
         current = parent_data
@@ -889,6 +903,9 @@ class CharacterSheet6th(CharacterSheetSystemData):
 
     character_sheet = models.OneToOneField(CharacterSheet, on_delete=models.CASCADE, related_name="sixth_edition_data")
     parent_data = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="versions")
+    lineage_root = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, related_name="lineage_versions", editable=False
+    )
 
     # 6版固有フィールド
     mental_disorder = models.TextField(blank=True, verbose_name="精神的障害")
@@ -994,6 +1011,9 @@ class CharacterSheet7th(CharacterSheetSystemData):
         CharacterSheet, on_delete=models.CASCADE, related_name="seventh_edition_data"
     )
     parent_data = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="versions")
+    lineage_root = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, related_name="lineage_versions", editable=False
+    )
     luck_starting = models.IntegerField(default=0)
     luck_current = models.IntegerField(default=0)
     luck_max = models.IntegerField(default=0)
@@ -2409,10 +2429,44 @@ class CharacterImageSystemData(models.Model):
     is_main = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    image_format = models.CharField(max_length=10, blank=True, default="")
+    # Bytes charged against the storage quota; null until metadata is recorded.
+    quota_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    # Resized WebP/JPEG copies; see accounts.image_renditions.
+    renditions = models.JSONField(default=dict, blank=True)
 
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        from .character_image_usage import read_image_metadata, refresh_character_image_usage
+        from .image_renditions import discard_stored_renditions, queue_renditions
+
+        new_upload = bool(self.image) and not self.image._committed
+        if new_upload:
+            for name, value in read_image_metadata(self.image.file).items():
+                setattr(self, name, value)
+            discard_stored_renditions(self)
+            self.renditions = {}
+        adding = self._state.adding
+        result = super().save(*args, **kwargs)
+        if adding or new_upload:
+            refresh_character_image_usage([self.character_sheet.character_sheet_id])
+        if new_upload:
+            queue_renditions(self)
+        return result
+
+    def delete(self, *args, **kwargs):
+        from .character_image_usage import refresh_character_image_usage
+
+        character_sheet_id = self.character_sheet.character_sheet_id
+        result = super().delete(*args, **kwargs)
+        refresh_character_image_usage([character_sheet_id])
+        return result
+
 
 class CharacterImage6th(EditionRelatedDataMixin, CharacterImageSystemData):
     expected_character_sheet_model = CharacterSheet6th
@@ -2440,6 +2494,15 @@ class CharacterImage7th(EditionRelatedDataMixin, CharacterImageSystemData):
         ]
 
 
+class CharacterImageUsage(models.Model):
+    """Image count and quota bytes per character, kept in step with the edition image rows."""
+
+    character_sheet = models.OneToOneField(CharacterSheet, on_delete=models.CASCADE, related_name="image_usage")
+    image_count = models.PositiveIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
 def sync_edition_related_data(instance):
     """Mirror legacy related rows into the edition table during the transition."""
     registry = instance.character_sheet
@@ -2542,35 +2605,24 @@ class CharacterVersionManager:
 
     @staticmethod
     def get_version_history(character):
-        """バージョン履歴を取得"""
-        root_data = character.system_data
-        while root_data.parent_data_id:
-            root_data = root_data.parent_data
-        versions = [root_data.character_sheet]
-
-        # 子バージョンを再帰的に取得
-        def collect_versions(parent_data):
-            children = parent_data.versions.select_related("character_sheet").order_by("version")
-            for child in children:
-                versions.append(child.character_sheet)
-                collect_versions(child)
-
-        collect_versions(root_data)
-        return versions
+        """バージョン履歴を取得（系譜ルートの索引から1クエリで、バージョン番号順）"""
+        lineage = character.system_data.lineage().select_related("character_sheet").order_by("version", "pk")
+        return [data.character_sheet for data in lineage]
 
     @staticmethod
     def get_latest_version(character):
         """最新バージョンを取得"""
-        history = CharacterVersionManager.get_version_history(character)
-        return history[-1] if history else character
+        latest = character.system_data.lineage().select_related("character_sheet").order_by("-version", "-pk").first()
+        return latest.character_sheet if latest else character
 
     @staticmethod
     def get_root_version(character):
         """ルートバージョンを取得"""
-        current = character.system_data
-        while current.parent_data_id:
-            current = current.parent_data
-        return current.character_sheet
+        system_data = character.system_data
+        if not system_data.lineage_root_id:
+            return character
+        root = system_data.__class__.objects.select_related("character_sheet").get(pk=system_data.lineage_root_id)
+        return root.character_sheet
 
     @staticmethod
     def compare_versions(character1, character2):
@@ -16,6 +16,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .statistics_views import GroupStatisticsView, TindalosMetricsView, UserRankingView
+from .utils.statistics import PeriodAggregation
 
 logger = logging.getLogger(__name__)
 
@@ -545,6 +546,16 @@ class StatisticsExportView(APIView):
 
         from schedules.models import TRPGSession
 
+        if not date_filter:
+            # 期間指定なしは事前集計済みのロールアップから取得
+            totals = PeriodAggregation.session_summary(user)
+            return {
+                "total_sessions": totals["session_count"],
+                "total_play_time": totals["total_minutes"],
+                "gm_sessions": totals["gm_count"],
+                "player_sessions": totals["player_count"],
+            }
+
         user_sessions = (
             TRPGSession.objects.filter(Q(participants=user) | Q(gm=user), status="completed")
             .filter(date_filter)
@@ -604,6 +615,9 @@ class StatisticsExportView(APIView):
 
         from schedules.models import TRPGSession
 
+        if not date_filter:
+            return self._collect_session_breakdown_from_rollups(user)
+
         user_sessions = (
             TRPGSession.objects.filter(Q(participants=user) | Q(gm=user), status="completed")
             .filter(date_filter)
@@ -638,6 +652,28 @@ class StatisticsExportView(APIView):
 
         return session_stats
 
+    def _collect_session_breakdown_from_rollups(self, user):
+        """ロールアップ行（ユーザー × 年 × 月 × ゲームシステム）からセッション内訳を組み立てる"""
+        from schedules.models import UserStatsRollup
+
+        session_stats = {"by_year": {}, "by_game_system": {}, "by_month": {}}
+
+        rollups = UserStatsRollup.objects.filter(user=user).values(
+            "year", "month", "game_system", "session_count", "total_minutes"
+        )
+        for rollup in rollups:
+            buckets = [("by_game_system", rollup["game_system"] or "unknown")]
+            if rollup["year"]:
+                buckets.append(("by_year", rollup["year"]))
+                buckets.append(("by_month", f"{rollup['year']:04d}-{rollup['month']:02d}"))
+
+            for section, key in buckets:
+                data = session_stats[section].setdefault(key, {"session_count": 0, "total_minutes": 0})
+                data["session_count"] += rollup["session_count"]
+                data["total_minutes"] += rollup["total_minutes"]
+
+        return session_stats
+
     def _collect_scenario_statistics(self, user, start_date_parsed, end_date_parsed, start_date, end_date):
         """シナリオ関連統計を収集"""
         from datetime import datetime
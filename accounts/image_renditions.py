@@ -0,0 +1,178 @@
+"""Resized WebP/JPEG renditions of uploaded images.
+
+Session, scenario and character image rows keep a ``renditions`` JSON map of
+``{"<width>": {"webp": <storage name>, "jpeg": <storage name>}}``. Files are
+written next to the original under a ``renditions/`` directory by the
+``schedules.tasks.generate_image_renditions`` Celery task; until they exist the
+URL helpers fall back to the original upload. Each row owns its renditions:
+names carry the full original filename and the row's identity, and only the
+names ``storage.save`` returned for that row are ever deleted.
+"""
+
+import io
+import logging
+import os
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 1280)
+THUMBNAIL_WIDTH = 320
+PREVIEW_WIDTH = 640
+SHARE_IMAGE_WIDTH = 1280
+RENDITION_FORMATS = {
+    "webp": ("WEBP", ".webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+RENDITION_MODELS = (
+    "accounts.CharacterImage6th",
+    "accounts.CharacterImage7th",
+    "schedules.SessionImage",
+    "scenarios.ScenarioImage",
+)
+
+
+def rendition_name(image_name, owner, width, format_key):
+    directory, filename = os.path.split(image_name)
+    return os.path.join(directory, "renditions", f"{filename}_{owner}_{width}w{RENDITION_FORMATS[format_key][1]}")
+
+
+def rendition_owner(instance):
+    """Identify the row a rendition belongs to, e.g. ``schedules.sessionimage-12``."""
+    return f"{instance._meta.label_lower}-{instance.pk}"
+
+
+def _encode(image, format_key):
+    pil_format, _, options = RENDITION_FORMATS[format_key]
+    if format_key == "jpeg" and image.mode != "RGB":
+        # JPEG has no alpha channel; flatten transparent images onto white.
+        rgba = image.convert("RGBA")
+        flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+        flattened.paste(rgba, mask=rgba.getchannel("A"))
+        image = flattened
+    elif format_key == "webp" and image.mode not in {"RGB", "RGBA"}:
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in {"LA", "PA"} else "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_renditions(image_field, owner):
+    """Write renditions of an image file narrower than the original; returns the renditions map."""
+    storage = image_field.storage
+    with image_field.open("rb") as source_file, Image.open(source_file) as source:
+        source = ImageOps.exif_transpose(source)
+        renditions = {}
+        for width in RENDITION_WIDTHS:
+            if width >= source.width:
+                break
+            height = max(1, round(source.height * width / source.width))
+            resized = source.resize((width, height), Image.Resampling.LANCZOS)
+            renditions[str(width)] = {
+                format_key: _save_rendition(
+                    storage, rendition_name(image_field.name, owner, width, format_key), _encode(resized, format_key)
+                )
+                for format_key in RENDITION_FORMATS
+            }
+    return renditions
+
+
+def _save_rendition(storage, name, content):
+    # Never overwrite: an existing file may still be referenced, so the storage
+    # picks a free name and the returned name is what the row stores.
+    return storage.save(name, ContentFile(content))
+
+
+def _rendition_names(renditions):
+    return {name for names in (renditions or {}).values() for name in names.values()}
+
+
+def _delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Unable to delete image rendition %s", name, exc_info=True)
+
+
+def delete_renditions(storage, renditions):
+    _delete_files(storage, _rendition_names(renditions))
+
+
+def discard_stored_renditions(instance):
+    """Delete the renditions saved for an image row's previous upload once its replacement commits."""
+    if instance._state.adding:
+        return
+    previous = type(instance)._base_manager.filter(pk=instance.pk).values_list("renditions", flat=True).first()
+    if previous:
+        storage = instance.image.storage
+        transaction.on_commit(lambda: delete_renditions(storage, previous))
+
+
+def generate_renditions(model_label, pk):
+    """Build and store the renditions of one image row; returns the number of widths written."""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return 0
+    try:
+        renditions = build_renditions(instance.image, rendition_owner(instance))
+    except UnidentifiedImageError:
+        logger.warning("Skipping renditions for unreadable image %s:%s", model_label, pk)
+        return 0
+    # update() keeps the model's save() hooks (and another rendition request) out of the way.
+    updated = model.objects.filter(pk=pk, image=instance.image.name).update(renditions=renditions)
+    if not updated:
+        # The image was replaced or deleted while the renditions were being built.
+        delete_renditions(instance.image.storage, renditions)
+        return 0
+    # A regenerated row no longer points to its earlier files.
+    _delete_files(instance.image.storage, _rendition_names(instance.renditions) - _rendition_names(renditions))
+    return len(renditions)
+
+
+def queue_renditions(instance):
+    """Queue rendition generation for a newly uploaded image after the transaction commits."""
+    from schedules.tasks import queue_image_renditions
+
+    model_label = instance._meta.label
+    pk = instance.pk
+    transaction.on_commit(lambda: queue_image_renditions(model_label, pk))
+
+
+def rendition_name_for(renditions, width, format_key="webp"):
+    """Return the storage name of the smallest rendition at least ``width`` wide, if one exists."""
+    for candidate in sorted((renditions or {}), key=int):
+        if int(candidate) >= width and format_key in renditions[candidate]:
+            return renditions[candidate][format_key]
+    return None
+
+
+def rendition_url(image_field, renditions, width=THUMBNAIL_WIDTH, format_key="webp"):
+    """Return the URL of the smallest rendition at least ``width`` wide, or of the original."""
+    if not image_field:
+        return ""
+    name = rendition_name_for(renditions, width, format_key)
+    if name:
+        return image_field.storage.url(name)
+    try:
+        return image_field.url
+    except ValueError:
+        return ""
+
+
+def rendition_urls(image_field, renditions, request=None):
+    """Return ``{"<width>": {"webp": url, "jpeg": url}}`` for serializers."""
+    if not image_field:
+        return {}
+    urls = {}
+    for width, names in (renditions or {}).items():
+        urls[width] = {}
+        for format_key, name in names.items():
+            url = image_field.storage.url(name)
+            urls[width][format_key] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,43 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.image_renditions import RENDITION_MODELS, generate_renditions
+from schedules.tasks import queue_image_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG renditions for session, scenario and character images that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="model_labels",
+            action="append",
+            choices=RENDITION_MODELS,
+            help="Only process the given image model (repeatable).",
+        )
+        parser.add_argument("--all", action="store_true", help="Regenerate renditions for every image.")
+        parser.add_argument("--queue", action="store_true", help="Queue Celery tasks instead of generating inline.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Image ids read per batch.")
+
+    def handle(self, *args, **options):
+        processed = 0
+        generated = 0
+        for model_label in options.get("model_labels") or RENDITION_MODELS:
+            queryset = apps.get_model(model_label).objects.exclude(image="").order_by("pk")
+            if not options["all"]:
+                queryset = queryset.filter(renditions={})
+            for pk in queryset.values_list("pk", flat=True).iterator(chunk_size=options["batch_size"]):
+                processed += 1
+                if options["queue"]:
+                    generated += int(queue_image_renditions(model_label, pk))
+                    continue
+                try:
+                    generated += int(bool(generate_renditions(model_label, pk)))
+                except OSError as exc:
+                    self.stderr.write(f"Skipped {model_label}:{pk}: {exc}")
+                except Exception as exc:
+                    raise CommandError(f"Failed to generate renditions for {model_label}:{pk}: {exc}") from exc
+
+        action = "Queued" if options["queue"] else "Generated"
+        self.stdout.write(self.style.SUCCESS(f"{action} image renditions: images={processed} updated={generated}"))
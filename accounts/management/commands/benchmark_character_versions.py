@@ -0,0 +1,88 @@
+"""
+キャラクターバージョン作成のベンチマークコマンド
+技能を多数持つ6版探索者を一時的に作成し、バージョン作成の所要時間とクエリ数を計測する
+（作成したデータはすべてロールバックする）
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.character_models import CharacterSheet, CharacterSheet6th, CharacterSkill6th
+from accounts.services.character_version_service import CharacterVersionService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "技能数の多い探索者でキャラクターバージョン作成の時間とクエリ数を計測"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--skills", type=int, default=100, help="探索者に持たせる技能数")
+        parser.add_argument("--runs", type=int, default=10, help="バージョン作成の試行回数")
+
+    def handle(self, *args, **options):
+        skill_count = options["skills"]
+        runs = options["runs"]
+
+        with transaction.atomic():
+            user = User.objects.create_user(username="benchmark_character_versions", password=None)
+            character = self._create_investigator(user, skill_count)
+
+            elapsed = []
+            queries = []
+            for _ in range(runs):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    CharacterVersionService.create_version(
+                        source_character=character,
+                        actor=user,
+                        validated_data={"version_note": "benchmark"},
+                        copy_policy={"copy_skills": True, "copy_equipment": True, "copy_images": True},
+                    )
+                    elapsed.append(time.perf_counter() - started)
+                queries.append(len(context.captured_queries))
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"skills={skill_count} runs={runs} "
+            f"avg_ms={sum(elapsed) / runs * 1000:.1f} "
+            f"min_ms={min(elapsed) * 1000:.1f} "
+            f"queries={max(queries)}"
+        )
+
+    def _create_investigator(self, user, skill_count):
+        registry = CharacterSheet.objects.create(user=user, edition="6th")
+        detail = CharacterSheet6th(
+            character_sheet=registry,
+            name="ベンチマーク探索者",
+            age=30,
+            str_value=10,
+            con_value=10,
+            pow_value=10,
+            dex_value=10,
+            app_value=10,
+            siz_value=10,
+            int_value=10,
+            edu_value=10,
+        )
+        stats = detail.calculate_derived_stats()
+        detail.hit_points_max = detail.hit_points_current = stats["hit_points_max"]
+        detail.magic_points_max = detail.magic_points_current = stats["magic_points_max"]
+        detail.sanity_starting = detail.sanity_current = stats["sanity_starting"]
+        detail.sanity_max = stats["sanity_max"]
+        detail.save()
+        CharacterSkill6th.objects.bulk_create(
+            CharacterSkill6th(
+                character_sheet=detail,
+                skill_name=f"技能{index}",
+                base_value=10,
+                interest_points=1,
+                current_value=11,
+            )
+            for index in range(skill_count)
+        )
+        return registry
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.ranking_snapshots import build_ranking_snapshots
+
+
+class Command(BaseCommand):
+    help = "ユーザーランキングのスナップショット（今年・今月・全期間）を再構築します。"
+
+    def handle(self, *args, **options):
+        count = build_ranking_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"ranking_snapshots={count}"))
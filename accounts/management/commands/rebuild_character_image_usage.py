@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.character_image_usage import backfill_image_metadata, refresh_character_image_usage
+from accounts.character_models import CharacterSheet
+
+
+class Command(BaseCommand):
+    help = "Backfill character image metadata and rebuild per-character image usage counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--character",
+            dest="character_ids",
+            action="append",
+            type=int,
+            help="Only rebuild counters for the given character sheet id (repeatable).",
+        )
+        parser.add_argument("--batch-size", type=int, default=200, help="Image rows read per batch.")
+
+    def handle(self, *args, **options):
+        character_ids = options.get("character_ids")
+        try:
+            backfilled_ids = backfill_image_metadata(batch_size=options["batch_size"])
+            if character_ids:
+                target_ids = set(character_ids)
+            else:
+                target_ids = set(CharacterSheet.objects.values_list("id", flat=True))
+            refresh_character_image_usage(target_ids)
+        except Exception as exc:
+            raise CommandError(f"Failed to rebuild character image usage: {exc}") from exc
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt character image usage: characters={len(target_ids)} backfilled={len(backfilled_ids)}"
+            )
+        )
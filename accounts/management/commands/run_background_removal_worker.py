@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.background_removal import get_background_removal_session
+from accounts.background_removal_tasks import process_background_removal_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a long-lived background-removal worker that keeps the rembg model loaded "
+        "and processes pending jobs in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=8, help="Pending jobs claimed per batch.")
+        parser.add_argument("--workers", type=int, default=2, help="Jobs processed concurrently within a batch.")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait when no job is pending.")
+        parser.add_argument("--once", action="store_true", help="Exit once no pending job is left.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+
+        started = time.perf_counter()
+        try:
+            get_background_removal_session()
+        except Exception as exc:
+            raise CommandError(f"Unable to load the background removal model: {exc}") from exc
+        self.stdout.write(f"Background removal model loaded in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+        processed = 0
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                results = process_background_removal_batch(batch_size=batch_size, max_workers=workers)
+                for job, seconds in results:
+                    self.stdout.write(f"job={job.pk} status={job.status} ms={seconds * 1000:.0f}")
+                if results:
+                    processed += len(results)
+                    self.stdout.write(
+                        f"batch jobs={len(results)} ms={(time.perf_counter() - batch_started) * 1000:.0f}"
+                    )
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Background removal worker processed {processed} job(s)."))
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_lineage_roots(apps, schema_editor):
+    for model_name in ("CharacterSheet6th", "CharacterSheet7th"):
+        model = apps.get_model("accounts", model_name)
+        parents = dict(model.objects.values_list("pk", "parent_data_id"))
+        roots = {}
+
+        def root_of(pk):
+            chain = []
+            while pk not in roots and parents.get(pk) is not None and pk not in chain:
+                chain.append(pk)
+                pk = parents[pk]
+            root = roots.get(pk, pk)
+            for member in chain:
+                roots[member] = root
+            return root
+
+        updates = []
+        for pk, parent_id in parents.items():
+            if parent_id is not None:
+                updates.append(model(pk=pk, lineage_root_id=root_of(pk)))
+        model.objects.bulk_update(updates, ["lineage_root"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0061_background_removal_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="charactersheet6th",
+            name="lineage_root",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="lineage_versions",
+                to="accounts.charactersheet6th",
+            ),
+        ),
+        migrations.AddField(
+            model_name="charactersheet7th",
+            name="lineage_root",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="lineage_versions",
+                to="accounts.charactersheet7th",
+            ),
+        ),
+        migrations.RunPython(backfill_lineage_roots, migrations.RunPython.noop),
+    ]
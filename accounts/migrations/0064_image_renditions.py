@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0063_character_image_metadata_usage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="characterimage6th",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="characterimage7th",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def reset_usage_with_legacy_images(apps, schema_editor):
+    # Counters built while rows had no metadata counted those images as 0 bytes.
+    # Dropping them makes get_character_image_usage recount the sheet on next use,
+    # estimating legacy rows from their stored file size without reading the files.
+    CharacterImageUsage = apps.get_model("accounts", "CharacterImageUsage")
+    legacy = Q()
+    for model_name in ("CharacterImage6th", "CharacterImage7th"):
+        image_model = apps.get_model("accounts", model_name)
+        legacy |= Q(
+            character_sheet_id__in=image_model.objects.filter(quota_bytes__isnull=True).values(
+                "character_sheet__character_sheet_id"
+            )
+        )
+    CharacterImageUsage.objects.filter(legacy).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0064_image_renditions"),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_usage_with_legacy_images, migrations.RunPython.noop),
+    ]
@@ -45,6 +45,7 @@ try:
         CharacterExportManager,
         CharacterImage6th,
         CharacterImage7th,
+        CharacterImageUsage,
         CharacterSheet,
         CharacterSheet6th,
         CharacterSheet7th,
@@ -87,6 +88,7 @@ __all__ = [
     "CharacterDiceRollSetting",
     "CharacterImage6th",
     "CharacterImage7th",
+    "CharacterImageUsage",
     "CharacterVersionManager",
     "CharacterExportManager",
     "CharacterSyncManager",
@@ -0,0 +1,127 @@
+"""
+ユーザーランキングのスナップショット（RankingSnapshot）の構築・参照
+
+定期タスクで「全期間」「直近の年」「直近の月」× ゲームシステム × ランキング種別の
+ランキングを事前計算して保存する。直近の年・月はトレンド表示（trends=true）の既定の
+バケットも兼ねる。ランキングAPIはスナップショットが新しければそれを返し、
+閲覧者自身の順位だけをスコア分布（RankingSnapshotScore）のインデックス上の集計で求める。
+
+シナリオ別ランキング（category=scenario / scenario_id 指定）は対象シナリオが
+期間ごとに入れ替わりキーが際限なく増えるため、スナップショットせずに都度集計する。
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from scenarios.models import Scenario
+from schedules.models import RankingSnapshot, RankingSnapshotScore
+
+RANKING_TYPES = ("hours", "sessions", "gm")
+SNAPSHOT_ENTRY_LIMIT = 100
+DEFAULT_MAX_AGE_SECONDS = 3600
+# UserRankingView._build_trends の既定の期間数（月単位 12、年単位 5）に合わせる
+TREND_MONTHS = 12
+TREND_YEARS = 5
+
+
+def get_max_age_seconds():
+    return getattr(settings, "RANKING_SNAPSHOT_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)
+
+
+def period_key(period):
+    """期間からスナップショットのキーを求める（range 期間は対象外で None）"""
+    if period["type"] == "all":
+        return "all"
+    if period["type"] == "year":
+        return f"{period['year']:04d}"
+    if period["type"] == "month":
+        return f"{period['year']:04d}-{period['month']:02d}"
+    return None
+
+
+def get_snapshot(period, game_system, ranking_type):
+    """有効期限内のスナップショットを返す（なければ None）"""
+    key = period_key(period)
+    if key is None:
+        return None
+    fresh_after = timezone.now() - timedelta(seconds=get_max_age_seconds())
+    return RankingSnapshot.objects.filter(
+        period_type=period["type"],
+        period_key=key,
+        game_system=game_system or "",
+        ranking_type=ranking_type,
+        built_at__gte=fresh_after,
+    ).first()
+
+
+def rank_for_score(snapshot, score):
+    """スナップショットのスコア分布から順位（自分より高いスコアの人数 + 1）を求める"""
+    primary, secondary = score
+    higher = snapshot.score_buckets.filter(
+        Q(primary_score__gt=primary) | Q(primary_score=primary, secondary_score__gt=secondary)
+    ).aggregate(count=Coalesce(Sum("user_count"), 0))["count"]
+    return higher + 1
+
+
+def snapshot_periods(view, now):
+    """スナップショットを作る期間（全期間・直近 TREND_YEARS 年・直近 TREND_MONTHS か月）"""
+    periods = [view._resolve_period("all", now.year, now.month)]
+    periods += [view._resolve_period("year", now.year - offset, 1) for offset in range(TREND_YEARS)]
+    for offset in range(TREND_MONTHS):
+        month_index = now.year * 12 + now.month - 1 - offset
+        periods.append(view._resolve_period("month", month_index // 12, month_index % 12 + 1))
+    return periods
+
+
+def build_ranking_snapshots(now=None):
+    """全期間・直近の年・直近の月のスナップショットを再構築し、保存件数を返す"""
+    from .statistics_views import UserRankingView
+
+    view = UserRankingView()
+    now = timezone.localtime(now or timezone.now())
+    periods = snapshot_periods(view, now)
+    game_systems = [""] + [code for code, _ in Scenario.GAME_SYSTEM_CHOICES]
+    built_at = timezone.now()
+
+    saved = 0
+    for period in periods:
+        base_sessions = view._get_completed_sessions(period["start_at"], period["end_at"])
+        for game_system in game_systems:
+            sessions = view._filter_sessions_by_scenario(base_sessions, game_system=game_system or None)
+            user_stats = view._aggregate_user_stats(sessions)
+            for ranking_type in RANKING_TYPES:
+                ranking = view._rank_user_stats(user_stats, ranking_type, limit=SNAPSHOT_ENTRY_LIMIT)
+                scores = Counter(view._ranking_score(data, ranking_type) for data in user_stats.values())
+                with transaction.atomic():
+                    snapshot, _ = RankingSnapshot.objects.update_or_create(
+                        period_type=period["type"],
+                        period_key=period_key(period),
+                        game_system=game_system,
+                        ranking_type=ranking_type,
+                        defaults={
+                            "entries": [{"entry": row, "stats": user_stats[row["user_id"]]} for row in ranking],
+                            "total_users": len(user_stats),
+                            "built_at": built_at,
+                        },
+                    )
+                    snapshot.score_buckets.all().delete()
+                    RankingSnapshotScore.objects.bulk_create(
+                        [
+                            RankingSnapshotScore(
+                                snapshot=snapshot,
+                                primary_score=primary,
+                                secondary_score=secondary,
+                                user_count=user_count,
+                            )
+                            for (primary, secondary), user_count in scores.items()
+                        ],
+                        batch_size=1000,
+                    )
+                saved += 1
+    return saved
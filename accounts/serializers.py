@@ -13,7 +13,13 @@ from scenarios.models import Scenario
 from schedules.duration import effective_duration_expression
 from schedules.models import ParticipantIdentity
 
-from .character_image_limits import character_image_limit_error_message, get_character_image_limit_for_sheet
+from .character_image_limits import (
+    CHARACTER_IMAGE_TOTAL_SIZE_LIMIT,
+    character_image_limit_error_message,
+    get_character_image_limit_for_sheet,
+)
+from .character_image_usage import get_character_image_usage, image_metadata_from, read_image_metadata
+from .character_image_utils import get_character_preview_image_url, resolve_character_preview_images
 from .character_models import (
     CharacterDiceRollSetting,
     CharacterEquipment6th,
@@ -25,6 +31,7 @@ from .character_models import (
     GrowthRecord,
     SkillGrowthRecord,
 )
+from .image_renditions import PREVIEW_WIDTH, rendition_url, rendition_urls
 from .models import CustomUser, Friend, Group, GroupInvitation, GroupMembership
 
 
@@ -70,6 +77,9 @@ def validate_character_image(image):
             if img.width > max_width or img.height > max_height:
                 raise ValidationError(f"画像サイズが大きすぎます。最大{max_width}x{max_height}ピクセルにしてください。")
 
+            # 保存時・容量チェック時にファイルを開き直さないよう、読み取った情報を添付しておく
+            image.image_metadata = image_metadata_from(img, image.size)
+
     except Exception as e:
         if isinstance(e, ValidationError):
             raise
@@ -949,6 +959,15 @@ class CharacterSheetCreateSerializer(serializers.ModelSerializer):
         return CharacterSheetSerializer(instance, context=self.context).data
 
 
+class CharacterSheetPreviewListSerializer(serializers.ListSerializer):
+    """一覧のプレビュー画像をまとめて解決してから各キャラクターをシリアライズする"""
+
+    def to_representation(self, data):
+        iterable = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        resolve_character_preview_images(iterable)
+        return super().to_representation(iterable)
+
+
 class CharacterSheetListSerializer(serializers.ModelSerializer):
     """キャラクターシート一覧表示用シリアライザー"""
 
@@ -976,6 +995,7 @@ class CharacterSheetListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CharacterSheet
+        list_serializer_class = CharacterSheetPreviewListSerializer
         fields = [
             "id",
             "edition",
@@ -1051,41 +1071,18 @@ class CharacterSheetListSerializer(serializers.ModelSerializer):
         system_data = self._system_data(obj)
         if system_data is None:
             return 1
-        root = system_data
-        while root.parent_data_id:
-            root = root.parent_data
-        latest = (
-            system_data.__class__.objects.filter(models.Q(pk=root.pk) | models.Q(parent_data=root))
-            .order_by("-version")
-            .first()
-        )
-        return latest.version if latest else root.version
+        latest = system_data.lineage().order_by("-version").values_list("version", flat=True).first()
+        return latest or system_data.version
 
     def to_representation(self, instance):
-        """シリアライズ時にメイン画像を追加"""
+        """シリアライズ時にメイン画像（なければ最初の画像）を追加"""
         data = self._apply_system_data(super().to_representation(instance), instance)
 
-        # 新しい画像システムのメイン画像を取得
-        try:
-            system_data = self._system_data(instance)
-            images = system_data.images if system_data is not None else None
-            if images is None:
-                return data
-            main_image = images.filter(is_main=True).first()
-            if main_image:
-                request = self.context.get("request")
-                if request:
-                    data["character_image"] = request.build_absolute_uri(main_image.image.url)
-            elif images.exists():
-                # メイン画像が設定されていない場合は最初の画像を使用
-                first_image = images.order_by("order", "created_at").first()
-                if first_image:
-                    request = self.context.get("request")
-                    if request:
-                        data["character_image"] = request.build_absolute_uri(first_image.image.url)
-        except Exception as e:
-            # エラーが発生した場合は元のcharacter_imageフィールドを使用
-            pass
+        request = self.context.get("request")
+        if request and self._system_data(instance) is not None:
+            preview_image_url = get_character_preview_image_url(instance, request, width=PREVIEW_WIDTH)
+            if preview_image_url:
+                data["character_image"] = preview_image_url
 
         return data
 
@@ -1214,7 +1211,9 @@ class CharacterSheetUpdateSerializer(serializers.ModelSerializer):
                 detail.character_image.delete(save=False)
             validated_data["character_image"] = None
         detail_fields = {
-            field.name for field in detail._meta.fields if field.name not in {"id", "character_sheet", "parent_data"}
+            field.name
+            for field in detail._meta.fields
+            if field.name not in {"id", "character_sheet", "parent_data", "lineage_root"}
         }
         old_stats = detail.calculate_derived_stats()
         old_current = {
@@ -1354,7 +1353,7 @@ class CharacterSheetUpdateSerializer(serializers.ModelSerializer):
             detail_fields = {
                 field.name
                 for field in detail_model._meta.fields
-                if field.name not in {"id", "character_sheet", "parent_data"}
+                if field.name not in {"id", "character_sheet", "parent_data", "lineage_root"}
             }
             detail = detail_model.objects.create(
                 character_sheet=updated,
@@ -1366,7 +1365,7 @@ class CharacterSheetUpdateSerializer(serializers.ModelSerializer):
             )
         detail_field_names = {field.name for field in detail._meta.fields}
         for field_name in detail_field_names:
-            if field_name in {"id", "character_sheet", "parent_data"}:
+            if field_name in {"id", "character_sheet", "parent_data", "lineage_root"}:
                 continue
             if hasattr(updated, field_name):
                 setattr(detail, field_name, getattr(updated, field_name))
@@ -1421,11 +1420,35 @@ class CharacterImageSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(error_messages={"invalid_image": "画像ファイルをアップロードしてください。"})
     image_url = serializers.SerializerMethodField()
     thumbnail_url = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = CharacterImage6th
-        fields = ["id", "image", "image_url", "thumbnail_url", "is_main", "order", "uploaded_at"]
-        read_only_fields = ["id", "uploaded_at", "image_url", "thumbnail_url"]
+        fields = [
+            "id",
+            "image",
+            "image_url",
+            "thumbnail_url",
+            "renditions",
+            "is_main",
+            "order",
+            "uploaded_at",
+            "width",
+            "height",
+            "file_size",
+            "image_format",
+        ]
+        read_only_fields = [
+            "id",
+            "uploaded_at",
+            "image_url",
+            "thumbnail_url",
+            "renditions",
+            "width",
+            "height",
+            "file_size",
+            "image_format",
+        ]
 
     @extend_schema_field(OpenApiTypes.URI)
     def get_image_url(self, obj):
@@ -1439,9 +1462,17 @@ class CharacterImageSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.URI)
     def get_thumbnail_url(self, obj):
-        """サムネイルURLを返す（現時点では元画像と同じ）"""
-        # TODO: 実際のサムネイル生成機能を実装
-        return self.get_image_url(obj)
+        """サムネイルURLを返す（リサイズ版が未生成なら元画像）"""
+        url = rendition_url(obj.image, obj.renditions)
+        if not url:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_renditions(self, obj):
+        """幅ごとのリサイズ版URL（{"320": {"webp": ..., "jpeg": ...}}）"""
+        return rendition_urls(obj.image, obj.renditions, self.context.get("request"))
 
     def validate_image(self, value):
         """画像ファイルのバリデーション"""
@@ -1458,7 +1489,8 @@ class CharacterImageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("キャラクターシートが指定されていません。")
 
         # 画像数制限チェック（通常2枚、プレミアム10枚まで）
-        existing_count = character_sheet.system_data.images.count()
+        usage = get_character_image_usage(character_sheet)
+        existing_count = usage.image_count
 
         if self.instance:
             # 更新の場合は現在の画像を除外
@@ -1468,33 +1500,16 @@ class CharacterImageSerializer(serializers.ModelSerializer):
         if existing_count + 1 > limit:
             raise serializers.ValidationError(character_image_limit_error_message(limit))
 
-        # 総容量制限チェック（30MB）
-        def estimate_size(image_file):
-            size = image_file.size
-            try:
-                image_file.seek(0)
-                with Image.open(image_file) as img:
-                    estimated = (img.width * img.height * len(img.getbands())) // 3
-            except Exception:
-                estimated = size
-            finally:
-                try:
-                    image_file.seek(0)
-                except Exception:
-                    pass
-            return max(size, estimated)
-
-        total_size = 0
-        for img in character_sheet.system_data.images.all():
-            if img.image and img != self.instance:
-                total_size += estimate_size(img.image)
+        # 総容量制限チェック（30MB）: 保存済みの集計値を使い、既存画像のファイルは開かない
+        total_size = usage.total_bytes
+        if self.instance:
+            total_size -= self.instance.quota_bytes or self.instance.file_size or 0
 
         new_image = attrs.get("image")
         if new_image:
-            total_size += estimate_size(new_image)
+            total_size += read_image_metadata(new_image)["quota_bytes"]
 
-        max_total_size = 30 * 1024 * 1024  # 30MB
-        if total_size > max_total_size:
+        if total_size > CHARACTER_IMAGE_TOTAL_SIZE_LIMIT:
             raise serializers.ValidationError(f"総容量が30MBを超えています。現在: {total_size / 1024 / 1024:.1f}MB")
 
         # メイン画像の一意性チェック
@@ -0,0 +1,118 @@
+"""Set-based skill writes for edition-specific character records."""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+MYTHOS_SKILL_NAME = "クトゥルフ神話"
+SKILL_POINT_FIELDS = ("base_value", "occupation_points", "interest_points", "bonus_points", "other_points")
+WRITABLE_SKILL_FIELDS = ("category", *SKILL_POINT_FIELDS, "notes")
+BULK_WRITE_BATCH_SIZE = 500
+
+
+class CharacterSkillService:
+    """Apply a batch of skill changes with one load, one validation pass and one write."""
+
+    @classmethod
+    def bulk_write(cls, detail, entries, *, enforce_point_limits=True, update_by_name=True):
+        """Update or create skills on ``detail`` and return ``(updated, created)``.
+
+        Each entry is a mapping of skill fields. Entries with ``id`` update that skill
+        and are skipped when it does not belong to ``detail``. Entries without ``id``
+        update the skill with the same ``skill_name`` (skipped if ``update_by_name`` is
+        false) or create it. Point budgets are checked once against the final state of
+        the whole sheet, so a batch that moves points between skills is accepted.
+        """
+        skill_model = detail.skills.model
+        with transaction.atomic():
+            existing = list(detail.skills.select_for_update())
+            by_id = {str(skill.pk): skill for skill in existing}
+            by_name = {skill.skill_name: skill for skill in existing}
+            updated = {}
+            created = {}
+
+            for entry in entries:
+                skill_id = entry.get("id")
+                skill_name = (entry.get("skill_name") or "").strip()
+                if skill_id:
+                    skill = by_id.get(str(skill_id))
+                elif not skill_name:
+                    continue
+                elif skill_name in by_name:
+                    skill = by_name[skill_name] if update_by_name else None
+                else:
+                    skill = created.get(skill_name) or skill_model(character_sheet=detail, skill_name=skill_name)
+                    created[skill_name] = skill
+                if skill is None:
+                    continue
+                for field in WRITABLE_SKILL_FIELDS:
+                    if field in entry:
+                        setattr(skill, field, entry[field])
+                if skill.pk:
+                    updated[skill.pk] = skill
+
+            written = [*updated.values(), *created.values()]
+            cls._clean_fields(written)
+            for skill in written:
+                skill.current_value = sum(getattr(skill, field) for field in SKILL_POINT_FIELDS)
+            cls._validate_points(detail, [*existing, *created.values()], written, enforce_point_limits)
+
+            if updated:
+                skill_model.objects.bulk_update(
+                    updated.values(), [*WRITABLE_SKILL_FIELDS, "current_value"], batch_size=BULK_WRITE_BATCH_SIZE
+                )
+            if created:
+                skill_model.objects.bulk_create(created.values(), batch_size=BULK_WRITE_BATCH_SIZE)
+                if any(skill.pk is None for skill in created.values()):
+                    cls._load_created_ids(detail, created)
+            if any(skill.skill_name == MYTHOS_SKILL_NAME for skill in written):
+                detail.update_max_sanity()
+        return list(updated.values()), list(created.values())
+
+    @staticmethod
+    def _load_created_ids(detail, created):
+        """Set primary keys on created skills when the backend (MySQL) does not return them."""
+        ids = dict(detail.skills.filter(skill_name__in=created.keys()).values_list("skill_name", "pk"))
+        for skill_name, skill in created.items():
+            skill.pk = ids[skill_name]
+            skill._state.adding = False
+
+    @staticmethod
+    def _clean_fields(skills):
+        # Coerces request values to field types; no per-row queries are issued.
+        errors = {}
+        for skill in skills:
+            try:
+                skill.clean_fields(exclude=["character_sheet", "current_value"])
+            except ValidationError as exc:
+                for field, messages in exc.message_dict.items():
+                    errors.setdefault(field, []).extend(f"{skill.skill_name}: {message}" for message in messages)
+        if errors:
+            raise ValidationError(errors)
+
+    @staticmethod
+    def _validate_points(detail, all_skills, written, enforce_point_limits):
+        occupation_limit = detail.calculate_occupation_points()
+        hobby_limit = detail.calculate_hobby_points()
+        errors = {}
+
+        def add_error(field, message):
+            errors.setdefault(field, []).append(message)
+
+        for skill in written:
+            for field in SKILL_POINT_FIELDS:
+                if getattr(skill, field) < 0:
+                    add_error(field, f"{skill.skill_name}: 0以上で指定してください。")
+            if skill.current_value > 999:
+                add_error("current_value", f"{skill.skill_name}: 技能値の合計は999を超えることはできません。")
+            if enforce_point_limits:
+                if skill.occupation_points > occupation_limit:
+                    add_error("occupation_points", f"{skill.skill_name}: 職業技能ポイントが上限を超えています。")
+                if skill.interest_points > hobby_limit:
+                    add_error("interest_points", f"{skill.skill_name}: 趣味技能ポイントが上限を超えています。")
+
+        if sum(skill.occupation_points for skill in all_skills) > occupation_limit:
+            add_error("occupation_points", "職業技能ポイントの合計が上限を超えています。")
+        if sum(skill.interest_points for skill in all_skills) > hobby_limit:
+            add_error("interest_points", "趣味技能ポイントの合計が上限を超えています。")
+        if errors:
+            raise ValidationError(errors)
@@ -4,12 +4,16 @@ from django.core.exceptions import PermissionDenied, ValidationError
 from django.db import transaction
 from django.forms.models import model_to_dict
 
+from accounts.character_image_usage import refresh_character_image_usage
 from accounts.character_models import (
     CharacterBackground,
     CharacterSheet,
     CharacterSheet6th,
     CharacterSheet7th,
 )
+from accounts.services.character_skill_service import MYTHOS_SKILL_NAME, SKILL_POINT_FIELDS
+
+BULK_COPY_BATCH_SIZE = 500
 
 
 class CharacterVersionService:
@@ -36,11 +40,8 @@ class CharacterVersionService:
             source_character = CharacterSheet.objects.select_for_update().get(pk=source_character.pk)
             source_data = source_character.system_data
             data_model = CharacterSheet6th if source_character.edition == "6th" else CharacterSheet7th
-            locked_data = list(data_model.objects.select_for_update().all())
-            root_data = cls._root_data_for(source_data)
-            latest_version = max(
-                data.version for data in locked_data if cls._belongs_to_data_root(data, root_data.pk, locked_data)
-            )
+            # Lock only the source lineage; other characters can be versioned concurrently.
+            latest_version = max(source_data.lineage().select_for_update().values_list("version", flat=True))
 
             detail_data = cls._system_data(source_data)
             # The registry receives only registry-owned values.  Character
@@ -72,30 +73,28 @@ class CharacterVersionService:
             if policy["copy_background"]:
                 cls._copy_background(source_character, new_sheet)
             if policy["copy_skills"]:
-                cls._copy_related(source_data.skills.all(), source_data.skills.model, target_data)
+                skills = cls._copy_related(source_data.skills.all(), source_data.skills.model, target_data)
+                cls._recalculate_skill_values(skills)
+                cls._bulk_insert(source_data.skills.model, skills)
+                if any(skill.skill_name == MYTHOS_SKILL_NAME for skill in skills):
+                    target_data.update_max_sanity()
             if policy["copy_equipment"]:
-                cls._copy_related(source_data.equipment.all(), source_data.equipment.model, target_data)
+                cls._bulk_insert(
+                    source_data.equipment.model,
+                    cls._copy_related(source_data.equipment.all(), source_data.equipment.model, target_data),
+                )
             if policy["copy_images"]:
-                cls._copy_related(source_data.images.all(), source_data.images.model, target_data)
+                cls._bulk_insert(
+                    source_data.images.model,
+                    cls._copy_related(source_data.images.all(), source_data.images.model, target_data),
+                )
+                # bulk_create bypasses image save(); count the copied rows once.
+                refresh_character_image_usage([new_sheet.pk])
             return new_sheet
 
-    @staticmethod
-    def _root_data_for(data):
-        while data.parent_data_id:
-            data = data.__class__.objects.select_for_update().get(pk=data.parent_data_id)
-        return data
-
-    @staticmethod
-    def _belongs_to_data_root(data, root_id, records):
-        parents = {record.pk: record.parent_data_id for record in records}
-        current_id = data.pk
-        while parents[current_id] is not None:
-            current_id = parents[current_id]
-        return current_id == root_id
-
     @staticmethod
     def _system_data(data):
-        excluded = {"id", "character_sheet", "parent_data"}
+        excluded = {"id", "character_sheet", "parent_data", "lineage_root"}
         return {field.name: getattr(data, field.name) for field in data._meta.fields if field.name not in excluded}
 
     @staticmethod
@@ -113,13 +112,24 @@ class CharacterVersionService:
 
     @staticmethod
     def _copy_related(objects, model, target):
-        for obj in objects:
-            data = {
-                field.name: getattr(obj, field.name)
-                for field in obj._meta.fields
-                if field.name not in {"id", "character_sheet"} and not field.name.startswith("legacy_")
-            }
-            model.objects.create(character_sheet=target, **data)
+        """Build unsaved copies of related rows for the new version."""
+        field_names = [
+            field.name
+            for field in model._meta.concrete_fields
+            if field.name not in {"id", "character_sheet"} and not field.name.startswith("legacy_")
+        ]
+        return [model(character_sheet=target, **{name: getattr(obj, name) for name in field_names}) for obj in objects]
+
+    @staticmethod
+    def _recalculate_skill_values(skills):
+        # Rows were validated on the source version; only the derived total is refreshed.
+        for skill in skills:
+            skill.current_value = sum(getattr(skill, field) for field in SKILL_POINT_FIELDS)
+
+    @staticmethod
+    def _bulk_insert(model, objects):
+        if objects:
+            model.objects.bulk_create(objects, batch_size=BULK_COPY_BATCH_SIZE)
 
 
 def create_character_version(*, source_character, actor, validated_data=None, copy_policy=None, parent_character=None):
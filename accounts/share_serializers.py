@@ -9,6 +9,7 @@ from accounts.character_models import (
     CharacterSheet7th,
     CharacterSkill6th,
 )
+from accounts.image_renditions import PREVIEW_WIDTH
 from accounts.models import ShareLink
 from accounts.skill_edition import incompatible_basic_skill_names
 from scenarios.models import Scenario, ScenarioHandout
@@ -170,7 +171,7 @@ class SharedCharacterSheetSerializer(serializers.ModelSerializer):
 
     def get_character_image_url(self, obj):
         request = self.context.get("request")
-        return get_character_preview_image_url(obj, request) or None
+        return get_character_preview_image_url(obj, request, width=PREVIEW_WIDTH) or None
 
     @staticmethod
     def _system_data(obj):
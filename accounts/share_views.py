@@ -14,6 +14,7 @@ from rest_framework.views import APIView
 from accounts.character_detail_context import build_character_detail_context
 from accounts.character_image_utils import get_character_preview_image_field
 from accounts.character_models import CharacterSheet
+from accounts.image_renditions import SHARE_IMAGE_WIDTH, rendition_name_for
 from accounts.models import ShareLink
 from accounts.serializers import CharacterImageSerializer
 from accounts.share_serializers import (
@@ -514,7 +515,7 @@ class SharedCharacterImagesZipView(APIView):
 
     def get(self, request, token):
         character = _shared_character_or_404(token, request)
-        return build_character_images_zip_response(character)
+        return build_character_images_zip_response(character, request)
 
 
 class SharedCharacterPreviewImageView(APIView):
@@ -526,13 +527,18 @@ class SharedCharacterPreviewImageView(APIView):
         if not image_field:
             raise Http404("Character preview image not found")
 
+        # 生成済みならOGP向けのリサイズ版（JPEG）を返す
+        image_name = (
+            rendition_name_for(getattr(image_field.instance, "renditions", None), SHARE_IMAGE_WIDTH, "jpeg")
+            or image_field.name
+        )
         try:
-            image_file = image_field.open("rb")
+            image_file = image_field.storage.open(image_name, "rb")
         except (FileNotFoundError, ValueError, OSError):
             raise Http404("Character preview image not found")
 
-        content_type = mimetypes.guess_type(image_field.name)[0] or "application/octet-stream"
-        _, extension = os.path.splitext(image_field.name)
+        content_type = mimetypes.guess_type(image_name)[0] or "application/octet-stream"
+        _, extension = os.path.splitext(image_name)
         response = FileResponse(
             image_file,
             as_attachment=False,
@@ -2,7 +2,6 @@ from calendar import monthrange
 from datetime import datetime, timedelta
 
 from django.db.models import Max, Min
-from django.db.models.functions import TruncMonth, TruncYear
 from django.utils.dateparse import parse_date, parse_datetime
 
 from scenarios.models import PlayHistory, Scenario
@@ -10,7 +9,14 @@ from schedules import session_permissions
 from schedules.duration import effective_duration_expression
 from schedules.models import SessionParticipant, SessionParticipantRole, TRPGSession
 
-from .utils.statistics import CharacterStatistics, GroupStatistics, SessionStatistics, TindalosMetrics
+from . import ranking_snapshots
+from .utils.statistics import (
+    CharacterStatistics,
+    GroupStatistics,
+    PeriodAggregation,
+    SessionStatistics,
+    TindalosMetrics,
+)
 from .views.common_imports import *
 
 
@@ -24,22 +30,12 @@ class SimpleTindalosMetricsView(APIView):
         year = request.query_params.get("year")
         game_system = request.query_params.get("game_system")
 
-        # フィルタ条件の構築
-        session_filter = Q(participants=user) | Q(gm=user)
-        if year:
-            session_filter &= Q(date__year=year)
-
-        # セッション統計
-        sessions = TRPGSession.objects.filter(session_filter, status="completed").distinct()
-        session_count = sessions.count()
-
-        # GM/プレイヤーセッション数
-        gm_sessions = sessions.filter(gm=user)
-        gm_session_count = gm_sessions.count()
-        player_session_count = session_count - gm_session_count
-
-        # 総プレイ時間（分単位）
-        total_play_time = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+        # セッション統計（GM/プレイヤー別・総プレイ時間（分単位））
+        totals = PeriodAggregation.session_summary(user, year=int(year) if year else None)
+        session_count = totals["session_count"]
+        gm_session_count = totals["gm_count"]
+        player_session_count = totals["player_count"]
+        total_play_time = totals["total_minutes"]
 
         # シナリオ数
         play_history_filter = Q(user=user)
@@ -84,22 +80,19 @@ class SimpleTindalosMetricsView(APIView):
     def _get_yearly_trends(self, user):
         """複数年度にわたる統計データ"""
         # 最初のセッションから現在までの年度を取得
-        first_session = TRPGSession.objects.filter(Q(participants=user) | Q(gm=user)).order_by("date").first()
-
-        if not first_session:
+        start_year = PeriodAggregation.first_session_year(user)
+        if start_year is None:
             return []
 
-        start_year = first_session.date.year
         end_year = timezone.now().year
+        totals = PeriodAggregation.session_totals(user, unit="year", start_year=start_year, end_year=end_year)
 
         yearly_data = []
         for year in range(start_year, end_year + 1):
-            session_filter = (Q(participants=user) | Q(gm=user)) & Q(date__year=year)
-            sessions = TRPGSession.objects.filter(session_filter, status="completed").distinct()
-
-            session_count = sessions.count()
-            gm_count = sessions.filter(gm=user).count()
-            total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+            year_totals = totals.get(year) or PeriodAggregation.empty_session_totals()
+            session_count = year_totals["session_count"]
+            gm_count = year_totals["gm_count"]
+            total_minutes = year_totals["total_minutes"]
 
             yearly_data.append(
                 {
@@ -116,30 +109,28 @@ class SimpleTindalosMetricsView(APIView):
 
     def _get_monthly_details(self, user, year):
         """月別詳細統計（シナリオ別内訳含む）"""
-        monthly_data = []
+        totals = PeriodAggregation.session_totals(user, unit="month", year=year)
+        scenario_rows = PeriodAggregation.play_history_breakdown(
+            user,
+            group_by=("scenario__id", "scenario__title", "scenario__game_system"),
+            unit="month",
+            year=year,
+            play_count=Count("id"),
+        )
 
+        monthly_data = []
         for month in range(1, 13):
-            # 月別セッション統計
-            session_filter = (Q(participants=user) | Q(gm=user)) & Q(date__year=year) & Q(date__month=month)
-            sessions = TRPGSession.objects.filter(session_filter, status="completed").distinct()
-
-            session_count = sessions.count()
-            total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+            month_totals = totals.get(month) or PeriodAggregation.empty_session_totals()
 
             # 月別シナリオランキング（上位5件）
-            scenarios = (
-                PlayHistory.objects.filter(user=user, played_date__year=year, played_date__month=month)
-                .values("scenario__id", "scenario__title", "scenario__game_system")
-                .annotate(play_count=Count("id"))
-                .order_by("-play_count")[:5]
-            )
+            scenarios = sorted(scenario_rows.get(month, []), key=lambda row: -row["play_count"])[:5]
 
             monthly_data.append(
                 {
                     "month": month,
-                    "session_count": session_count,
-                    "total_hours": round(total_minutes / 60, 1),
-                    "scenarios": list(scenarios),
+                    "session_count": month_totals["session_count"],
+                    "total_hours": round(month_totals["total_minutes"] / 60, 1),
+                    "scenarios": scenarios,
                 }
             )
 
@@ -170,15 +161,17 @@ class SimpleTindalosMetricsView(APIView):
         current_year = timezone.now().year
         start_year = current_year - 2  # 過去3年
 
+        system_rows = PeriodAggregation.play_history_breakdown(
+            user,
+            group_by=("scenario__game_system",),
+            start_year=start_year,
+            end_year=current_year,
+            count=Count("id"),
+        )
+
         trends = {}
         for year in range(start_year, current_year + 1):
-            system_stats = (
-                PlayHistory.objects.filter(user=user, played_date__year=year)
-                .values("scenario__game_system")
-                .annotate(count=Count("id"))
-            )
-
-            for stat in system_stats:
+            for stat in system_rows.get(year, []):
                 system = stat["scenario__game_system"]
                 system_name = dict(Scenario.GAME_SYSTEM_CHOICES).get(system, system)
 
@@ -287,20 +280,18 @@ class TindalosMetricsView(APIView):
 
     def _get_yearly_stats(self, user, year):
         """年間統計データ"""
-        sessions = TRPGSession.objects.filter(
-            (Q(participants=user) | Q(gm=user)), date__year=year, status="completed"
-        ).distinct()
+        totals = PeriodAggregation.session_summary(user, year=year)
 
-        total_sessions = sessions.count()
-        total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+        total_sessions = totals["session_count"]
+        total_minutes = totals["total_minutes"]
         total_hours = round(total_minutes / 60, 1)
 
         # GM/PL別セッション数
-        gm_sessions = sessions.filter(gm=user).count()
-        pl_sessions = total_sessions - gm_sessions
+        gm_sessions = totals["gm_count"]
+        pl_sessions = totals["player_count"]
 
         # 平均セッション時間
-        avg_minutes = sessions.aggregate(avg=Avg(effective_duration_expression()))["avg"] or 0
+        avg_minutes = total_minutes / total_sessions if total_sessions else 0
         avg_hours = round(avg_minutes / 60, 1)
 
         # 参加グループ数
@@ -343,27 +334,19 @@ class TindalosMetricsView(APIView):
 
     def _get_monthly_stats(self, user, year):
         """月別統計データ"""
-        monthly_data = []
+        totals = PeriodAggregation.session_totals(user, unit="month", year=year)
 
+        monthly_data = []
         for month in range(1, 13):
-            sessions = TRPGSession.objects.filter(
-                (Q(participants=user) | Q(gm=user)), date__year=year, date__month=month, status="completed"
-            ).distinct()
-
-            session_count = sessions.count()
-            total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
-            total_hours = round(total_minutes / 60, 1)
-
-            gm_count = sessions.filter(gm=user).count()
-            pl_count = session_count - gm_count
+            month_totals = totals.get(month) or PeriodAggregation.empty_session_totals()
 
             monthly_data.append(
                 {
                     "month": month,
-                    "session_count": session_count,
-                    "total_hours": total_hours,
-                    "gm_count": gm_count,
-                    "pl_count": pl_count,
+                    "session_count": month_totals["session_count"],
+                    "total_hours": round(month_totals["total_minutes"] / 60, 1),
+                    "gm_count": month_totals["gm_count"],
+                    "pl_count": month_totals["player_count"],
                 }
             )
 
@@ -398,20 +381,16 @@ class TindalosMetricsView(APIView):
 
     def _get_role_stats(self, user, year):
         """役割別統計（GM/PL）"""
-        # GM統計
-        gm_sessions = TRPGSession.objects.filter(gm=user, date__year=year, status="completed")
+        totals = PeriodAggregation.session_summary(user, year=year)
 
-        gm_count = gm_sessions.count()
-        gm_minutes = gm_sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+        # GM統計
+        gm_count = totals["gm_count"]
+        gm_minutes = totals["gm_minutes"]
         gm_hours = round(gm_minutes / 60, 1)
 
         # PL統計
-        pl_sessions = TRPGSession.objects.filter(participants=user, date__year=year, status="completed").exclude(
-            gm=user
-        )
-
-        pl_count = pl_sessions.count()
-        pl_minutes = pl_sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+        pl_count = totals["player_count"]
+        pl_minutes = totals["total_minutes"] - gm_minutes
         pl_hours = round(pl_minutes / 60, 1)
 
         return {
@@ -707,8 +686,18 @@ class UserRankingView(APIView):
             else:
                 return Response({"error": "Invalid ranking type"}, status=status.HTTP_400_BAD_REQUEST)
 
-        ranking, user_stats = self._build_ranking(filtered_sessions, ranking_type, limit=limit)
-        users_data = self._build_users_data(ranking, user_stats, request.user)
+        ranking, user_stats, snapshot = self._get_ranking(
+            period,
+            filtered_sessions,
+            ranking_type,
+            limit=limit,
+            game_system=None if scenario_id else game_system,
+            use_snapshot=not scenario_id,
+        )
+        current_rank = self._get_current_user_rank(
+            request.user, filtered_sessions, ranking_type, user_stats, snapshot=snapshot
+        )
+        users_data = self._build_users_data(ranking, user_stats, request.user, current_rank=current_rank)
 
         response_data = {
             "year": period.get("year", timezone.now().year),
@@ -727,6 +716,7 @@ class UserRankingView(APIView):
             response_data["category"] = category
             response_data["category_rankings"] = self._build_category_rankings(
                 base_sessions,
+                period=period,
                 ranking_type=ranking_type,
                 category=category,
                 limit=limit,
@@ -750,6 +740,8 @@ class UserRankingView(APIView):
                 start_at=period["start_at"],
                 end_at=period["end_at"],
                 trend_periods=trend_periods,
+                game_system=None if scenario_id else game_system,
+                use_snapshot=not scenario_id,
             )
 
         return Response(response_data)
@@ -783,6 +775,10 @@ class UserRankingView(APIView):
         if period_type in {None, ""}:
             period_type = "year"
 
+        return self._resolve_period(period_type, year_int, month_int, start_date=start_date, end_date=end_date)
+
+    def _resolve_period(self, period_type, year_int, month_int, start_date=None, end_date=None):
+        """期間種別と年月から集計期間（start_at/end_at）を決定"""
         if period_type == "all":
             return {
                 "type": "all",
@@ -870,18 +866,22 @@ class UserRankingView(APIView):
         session_ids = play_history.values_list("session_id", flat=True).distinct()
         return sessions.filter(id__in=session_ids)
 
-    def _aggregate_user_stats(self, sessions):
-        """セッション集合からユーザー別統計を集計"""
+    def _aggregate_user_stats(self, sessions, user_id=None):
+        """セッション集合からユーザー別統計を集計（user_id 指定時はそのユーザーのみ）"""
         stats = {}
 
-        gm_rows = sessions.values("gm_id").annotate(
+        if user_id is not None:
+            sessions_for_gm = sessions.filter(gm_id=user_id)
+        else:
+            sessions_for_gm = sessions
+
+        gm_rows = sessions_for_gm.values("gm_id").annotate(
             gm_sessions=Count("id"),
             gm_minutes=Sum(effective_duration_expression()),
         )
         for row in gm_rows:
-            user_id = row["gm_id"]
             data = stats.setdefault(
-                user_id,
+                row["gm_id"],
                 {
                     "gm_sessions": 0,
                     "gm_minutes": 0,
@@ -892,22 +892,21 @@ class UserRankingView(APIView):
             data["gm_sessions"] += row["gm_sessions"] or 0
             data["gm_minutes"] += row["gm_minutes"] or 0
 
-        player_rows = (
-            SessionParticipant.objects.filter(
-                session__in=sessions,
-                participant_roles__role=SessionParticipantRole.Role.PLAYER,
-                user_id__isnull=False,
-            )
-            .values("user_id")
-            .annotate(
-                player_sessions=Count("session", distinct=True),
-                player_minutes=Sum(effective_duration_expression("session__")),
-            )
+        participants = SessionParticipant.objects.filter(
+            session__in=sessions,
+            participant_roles__role=SessionParticipantRole.Role.PLAYER,
+            user_id__isnull=False,
+        )
+        if user_id is not None:
+            participants = participants.filter(user_id=user_id)
+
+        player_rows = participants.values("user_id").annotate(
+            player_sessions=Count("session", distinct=True),
+            player_minutes=Sum(effective_duration_expression("session__")),
         )
         for row in player_rows:
-            user_id = row["user_id"]
             data = stats.setdefault(
-                user_id,
+                row["user_id"],
                 {
                     "gm_sessions": 0,
                     "gm_minutes": 0,
@@ -924,10 +923,54 @@ class UserRankingView(APIView):
 
         return stats
 
+    def _get_ranking(self, period, sessions, ranking_type, limit=20, game_system=None, use_snapshot=True):
+        """スナップショットがあればそこから、なければセッション集合からランキングを返す
+
+        戻り値は (ranking, user_stats, snapshot)。スナップショット利用時の user_stats は
+        ランキング掲載ユーザー分のみ。
+        """
+        snapshot = None
+        if use_snapshot:
+            snapshot = ranking_snapshots.get_snapshot(period, game_system, ranking_type)
+        if snapshot is None:
+            ranking, user_stats = self._build_ranking(sessions, ranking_type, limit=limit)
+            return ranking, user_stats, None
+
+        entries = snapshot.entries[:limit]
+        ranking = [item["entry"] for item in entries]
+        user_stats = {item["entry"]["user_id"]: item["stats"] for item in entries}
+        return ranking, user_stats, snapshot
+
+    def _get_current_user_rank(self, current_user, sessions, ranking_type, user_stats, snapshot=None):
+        """閲覧者自身の順位（活動がなければ None）。ランキング外の場合は集計値も user_stats に補完する"""
+        if snapshot is not None and current_user.id not in user_stats:
+            own_stats = self._aggregate_user_stats(sessions, user_id=current_user.id)
+            if current_user.id in own_stats:
+                user_stats[current_user.id] = own_stats[current_user.id]
+
+        stats = user_stats.get(current_user.id)
+        if not stats:
+            return None
+
+        score = self._ranking_score(stats, ranking_type)
+        if snapshot is not None:
+            return ranking_snapshots.rank_for_score(snapshot, score)
+
+        higher = sum(
+            1
+            for user_id, data in user_stats.items()
+            if user_id != current_user.id and self._ranking_score(data, ranking_type) > score
+        )
+        return higher + 1
+
     def _build_ranking(self, sessions, ranking_type, limit=20):
         user_stats = self._aggregate_user_stats(sessions)
+        return self._rank_user_stats(user_stats, ranking_type, limit=limit), user_stats
+
+    def _rank_user_stats(self, user_stats, ranking_type, limit=20):
+        """ユーザー別統計を並べ替えてランキング行に整形（limit=None で全件）"""
         if not user_stats:
-            return [], {}
+            return []
 
         user_ids = list(user_stats.keys())
         users = CustomUser.objects.filter(id__in=user_ids).values("id", "nickname", "username")
@@ -935,58 +978,54 @@ class UserRankingView(APIView):
 
         def sort_key(item):
             user_id, data = item
-            if ranking_type == "hours":
-                primary = data["total_minutes"]
-                secondary = data["session_count"]
-            elif ranking_type == "sessions":
-                primary = data["session_count"]
-                secondary = data["total_minutes"]
-            else:  # gm
-                primary = data["gm_sessions"]
-                secondary = data["gm_minutes"]
+            primary, secondary = self._ranking_score(data, ranking_type)
             return (-primary, -secondary, user_id)
 
         sorted_items = sorted(user_stats.items(), key=sort_key)[:limit]
 
         ranking = []
         for rank, (user_id, data) in enumerate(sorted_items, start=1):
-            nickname = name_map.get(user_id)
-            if ranking_type == "hours":
-                ranking.append(
-                    {
-                        "rank": rank,
-                        "user_id": user_id,
-                        "nickname": nickname,
-                        "total_hours": round((data["total_minutes"] or 0) / 60, 1),
-                        "session_count": data["session_count"],
-                        "gm_count": data["gm_sessions"],
-                    }
-                )
-            elif ranking_type == "sessions":
-                ranking.append(
-                    {
-                        "rank": rank,
-                        "user_id": user_id,
-                        "nickname": nickname,
-                        "session_count": data["session_count"],
-                        "total_hours": round((data["total_minutes"] or 0) / 60, 1),
-                        "gm_count": data["gm_sessions"],
-                    }
-                )
-            else:  # gm
-                ranking.append(
-                    {
-                        "rank": rank,
-                        "user_id": user_id,
-                        "nickname": nickname,
-                        "gm_count": data["gm_sessions"],
-                        "gm_hours": round((data["gm_minutes"] or 0) / 60, 1),
-                    }
-                )
+            ranking.append(self._format_ranking_entry(rank, user_id, name_map.get(user_id), data, ranking_type))
 
-        return ranking, user_stats
+        return ranking
 
-    def _build_users_data(self, ranking, user_stats, current_user):
+    def _ranking_score(self, data, ranking_type):
+        """ランキング種別ごとの (第1キー, 第2キー)"""
+        if ranking_type == "hours":
+            return data["total_minutes"], data["session_count"]
+        if ranking_type == "sessions":
+            return data["session_count"], data["total_minutes"]
+        return data["gm_sessions"], data["gm_minutes"]
+
+    def _format_ranking_entry(self, rank, user_id, nickname, data, ranking_type):
+        """ランキング1行分のレスポンスを組み立てる"""
+        if ranking_type == "hours":
+            return {
+                "rank": rank,
+                "user_id": user_id,
+                "nickname": nickname,
+                "total_hours": round((data["total_minutes"] or 0) / 60, 1),
+                "session_count": data["session_count"],
+                "gm_count": data["gm_sessions"],
+            }
+        if ranking_type == "sessions":
+            return {
+                "rank": rank,
+                "user_id": user_id,
+                "nickname": nickname,
+                "session_count": data["session_count"],
+                "total_hours": round((data["total_minutes"] or 0) / 60, 1),
+                "gm_count": data["gm_sessions"],
+            }
+        return {
+            "rank": rank,
+            "user_id": user_id,
+            "nickname": nickname,
+            "gm_count": data["gm_sessions"],
+            "gm_hours": round((data["gm_minutes"] or 0) / 60, 1),
+        }
+
+    def _build_users_data(self, ranking, user_stats, current_user, current_rank=None):
         ranked_ids = [item["user_id"] for item in ranking]
         users_data = []
 
@@ -1023,6 +1062,7 @@ class UserRankingView(APIView):
                     "total_play_time": stats.get("total_minutes", 0),
                     "session_count": stats.get("session_count", 0),
                     "gm_count": stats.get("gm_sessions", 0),
+                    "rank": current_rank,
                 }
             )
 
@@ -1031,6 +1071,7 @@ class UserRankingView(APIView):
     def _build_category_rankings(
         self,
         base_sessions,
+        period,
         ranking_type,
         category,
         limit,
@@ -1047,7 +1088,7 @@ class UserRankingView(APIView):
             result = []
             for system_code, system_name in systems:
                 sessions = self._filter_sessions_by_scenario(base_sessions, game_system=system_code, scenario_id=None)
-                ranking, _ = self._build_ranking(sessions, ranking_type, limit=limit)
+                ranking, _, _ = self._get_ranking(period, sessions, ranking_type, limit=limit, game_system=system_code)
                 if ranking:
                     result.append(
                         {
@@ -1117,13 +1158,29 @@ class UserRankingView(APIView):
 
         return []
 
-    def _build_trends(self, sessions, ranking_type, trend_unit, limit, start_at, end_at, trend_periods=None):
+    def _build_trends(
+        self,
+        sessions,
+        ranking_type,
+        trend_unit,
+        limit,
+        start_at,
+        end_at,
+        trend_periods=None,
+        game_system=None,
+        use_snapshot=True,
+    ):
+        """期間をバケットに分けたランキングの推移
+
+        暦月・暦年をまるごと覆うバケット（全期間指定時の現在のバケットを含む）は
+        スナップショットから返し、それ以外（range 期間の端など）はその場で集計する。
+        """
+        now = timezone.now()
         if start_at and end_at:
             trend_start = start_at
             trend_end = end_at
         else:
             # 全期間の場合は直近N期間のみ返す（デフォルト: month=12, year=5）
-            now = timezone.now()
             trend_end = now
             if trend_periods is None:
                 trend_periods = 12 if trend_unit == "month" else 5
@@ -1137,7 +1194,15 @@ class UserRankingView(APIView):
         result = []
         for bucket in buckets:
             bucket_sessions = sessions.filter(date__gte=bucket["start_at"], date__lte=bucket["end_at"])
-            ranking, _ = self._build_ranking(bucket_sessions, ranking_type, limit=limit)
+            bucket_period = self._snapshot_period_for_bucket(bucket, trend_unit, now) if use_snapshot else None
+            ranking, _, _ = self._get_ranking(
+                bucket_period,
+                bucket_sessions,
+                ranking_type,
+                limit=limit,
+                game_system=game_system,
+                use_snapshot=bucket_period is not None,
+            )
             result.append(
                 {
                     "label": bucket["label"],
@@ -1149,6 +1214,16 @@ class UserRankingView(APIView):
 
         return result
 
+    def _snapshot_period_for_bucket(self, bucket, trend_unit, now):
+        """バケットが暦月・暦年をまるごと（現在進行中なら現在まで）覆うならその期間を返す"""
+        local_start = timezone.localtime(bucket["start_at"])
+        period = self._resolve_period(trend_unit, local_start.year, local_start.month)
+        if bucket["start_at"] != period["start_at"]:
+            return None
+        if bucket["end_at"] != period["end_at"] and bucket["end_at"] < now:
+            return None
+        return period
+
     def _shift_period(self, dt, unit, offset):
         tz = timezone.get_current_timezone()
         if timezone.is_naive(dt):
@@ -1506,13 +1581,10 @@ class DetailedTindalosMetricsView(APIView):
             year = int(year)
 
         # 基本統計
-        session_filter = Q(participants=user) | Q(gm=user)
-        session_filter &= Q(date__year=year)
-
-        sessions = TRPGSession.objects.filter(session_filter, status="completed").distinct()
-        session_count = sessions.count()
-        gm_count = sessions.filter(gm=user).count()
-        total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+        totals = PeriodAggregation.session_summary(user, year=year)
+        session_count = totals["session_count"]
+        gm_count = totals["gm_count"]
+        total_minutes = totals["total_minutes"]
 
         # シナリオ統計
         play_history = PlayHistory.objects.filter(user=user, played_date__year=year)
@@ -1545,12 +1617,12 @@ class DetailedTindalosMetricsView(APIView):
     def _get_yearly_trends_detailed(self, user, start_year=None, end_year=None):
         """複数年度にわたる詳細統計データ"""
         # 開始年と終了年の決定
-        first_history = PlayHistory.objects.filter(user=user).order_by("played_date").first()
-        if not first_history:
+        first_played = PlayHistory.objects.filter(user=user).aggregate(first=Min("played_date"))["first"]
+        if not first_played:
             return {"years": [], "message": "プレイ履歴がありません"}
 
         if not start_year:
-            start_year = first_history.played_date.year
+            start_year = PeriodAggregation.period_key(first_played, "year")
         else:
             start_year = int(start_year)
 
@@ -1559,31 +1631,33 @@ class DetailedTindalosMetricsView(APIView):
         else:
             end_year = int(end_year)
 
+        # セッション・シナリオ・ゲームシステムの年別集計（それぞれ1クエリ）
+        session_totals = PeriodAggregation.session_totals(user, unit="year", start_year=start_year, end_year=end_year)
+        scenario_counts = PeriodAggregation.play_history_breakdown(
+            user, start_year=start_year, end_year=end_year, scenarios=Count("scenario", distinct=True)
+        )
+        system_rows = PeriodAggregation.play_history_breakdown(
+            user,
+            group_by=("scenario__game_system",),
+            start_year=start_year,
+            end_year=end_year,
+            count=Count("id"),
+        )
+
         yearly_data = []
 
         for year in range(start_year, end_year + 1):
             # セッション統計
-            session_filter = (Q(participants=user) | Q(gm=user)) & Q(date__year=year)
-            sessions = TRPGSession.objects.filter(session_filter, status="completed").distinct()
-
-            session_count = sessions.count()
-            gm_sessions = sessions.filter(gm=user).count()
-            total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+            year_totals = session_totals.get(year) or PeriodAggregation.empty_session_totals()
+            session_count = year_totals["session_count"]
+            gm_sessions = year_totals["gm_count"]
+            total_minutes = year_totals["total_minutes"]
 
             # シナリオ統計
-            scenarios = (
-                PlayHistory.objects.filter(user=user, played_date__year=year).values("scenario").distinct().count()
-            )
-
-            # ゲームシステム別集計
-            system_breakdown = (
-                PlayHistory.objects.filter(user=user, played_date__year=year)
-                .values("scenario__game_system")
-                .annotate(count=Count("id"))
-            )
+            scenarios = sum(row["scenarios"] for row in scenario_counts.get(year, []))
 
             systems = {}
-            for item in system_breakdown:
+            for item in system_rows.get(year, []):
                 system_code = item["scenario__game_system"]
                 system_name = dict(Scenario.GAME_SYSTEM_CHOICES).get(system_code, system_code)
                 systems[system_name] = item["count"]
@@ -1609,26 +1683,26 @@ class DetailedTindalosMetricsView(APIView):
         monthly_data = []
         months = ["1月", "2月", "3月", "4月", "5月", "6月", "7月", "8月", "9月", "10月", "11月", "12月"]
 
+        session_totals = PeriodAggregation.session_totals(user, unit="month", year=year)
+        scenario_rows = PeriodAggregation.play_history_breakdown(
+            user,
+            group_by=("scenario__id", "scenario__title", "scenario__game_system", "scenario__difficulty"),
+            unit="month",
+            year=year,
+            play_count=Count("id"),
+            as_gm=Count("id", filter=Q(role="gm")),
+            as_player=Count("id", filter=Q(role="player")),
+        )
+
         for month in range(1, 13):
             # セッション統計
-            session_filter = (Q(participants=user) | Q(gm=user)) & Q(date__year=year) & Q(date__month=month)
-            sessions = TRPGSession.objects.filter(session_filter, status="completed").distinct()
-
-            session_count = sessions.count()
-            gm_count = sessions.filter(gm=user).count()
-            total_minutes = sessions.aggregate(total=Sum(effective_duration_expression()))["total"] or 0
+            month_totals = session_totals.get(month) or PeriodAggregation.empty_session_totals()
+            session_count = month_totals["session_count"]
+            gm_count = month_totals["gm_count"]
+            total_minutes = month_totals["total_minutes"]
 
             # 月別シナリオランキング
-            scenarios = (
-                PlayHistory.objects.filter(user=user, played_date__year=year, played_date__month=month)
-                .values("scenario__id", "scenario__title", "scenario__game_system", "scenario__difficulty")
-                .annotate(
-                    play_count=Count("id"),
-                    as_gm=Count("id", filter=Q(role="gm")),
-                    as_player=Count("id", filter=Q(role="player")),
-                )
-                .order_by("-play_count")[:5]
-            )
+            scenarios = sorted(scenario_rows.get(month, []), key=lambda row: -row["play_count"])[:5]
 
             # ゲームシステム表示名を追加
             scenario_list = []
@@ -1735,20 +1809,19 @@ class DetailedTindalosMetricsView(APIView):
 
         # 年度別・システム別の集計
         yearly_system_data = {}
+        system_rows = PeriodAggregation.play_history_breakdown(
+            user,
+            group_by=("scenario__game_system",),
+            start_year=start_year,
+            end_year=current_year,
+            count=Count("id"),
+            unique_scenarios=Count("scenario", distinct=True),
+            as_gm=Count("id", filter=Q(role="gm")),
+            as_player=Count("id", filter=Q(role="player")),
+        )
 
         for year in range(start_year, current_year + 1):
-            system_stats = (
-                PlayHistory.objects.filter(user=user, played_date__year=year)
-                .values("scenario__game_system")
-                .annotate(
-                    count=Count("id"),
-                    unique_scenarios=Count("scenario", distinct=True),
-                    as_gm=Count("id", filter=Q(role="gm")),
-                    as_player=Count("id", filter=Q(role="player")),
-                )
-            )
-
-            for stat in system_stats:
+            for stat in system_rows.get(year, []):
                 system_code = stat["scenario__game_system"]
                 system_name = dict(Scenario.GAME_SYSTEM_CHOICES).get(system_code, system_code)
 
@@ -4,10 +4,13 @@
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from .character_models import CharacterSheet, CharacterSheet6th
 from .character_models import CharacterSkill6th as CharacterSkill
+from .services.character_version_service import CharacterVersionService
 
 User = get_user_model()
 
@@ -176,6 +179,83 @@ class CharacterVersioningTestCase(TestCase):
         self.assertIn(branch_a, children)
         self.assertIn(branch_b, children)
 
+    def test_lineage_root_is_persisted_for_every_version(self):
+        """分岐・孫バージョンも系譜ルートを保持する"""
+        branch = self.base_character.create_new_version("ブランチ")
+        grandchild = branch.create_new_version("孫")
+        root_data = self.base_character.system_data
+
+        self.assertIsNone(root_data.lineage_root_id)
+        self.assertEqual(branch.system_data.lineage_root_id, root_data.pk)
+        self.assertEqual(grandchild.system_data.lineage_root_id, root_data.pk)
+        self.assertEqual(grandchild.system_data.version, 3)
+        self.assertEqual(grandchild.get_root_version(), self.base_character)
+
+    def test_lineage_lookups_are_single_queries(self):
+        """履歴・最新版の取得は系譜の深さに関係なく1クエリ"""
+        current = self.base_character
+        for index in range(4):
+            current = current.create_new_version(f"セッション{index + 1}後")
+        current = CharacterSheet.objects.select_related("sixth_edition_data").get(pk=current.pk)
+        current.system_data
+
+        with self.assertNumQueries(1):
+            history = current.get_version_history()
+        with self.assertNumQueries(1):
+            latest = self.base_character.get_latest_version()
+
+        self.assertEqual([sheet.system_data.version for sheet in history], [1, 2, 3, 4, 5])
+        self.assertEqual(latest, current)
+
+    def test_other_lineages_do_not_affect_version_numbers(self):
+        """別キャラクターの系譜はバージョン番号の採番に含まれない"""
+        other = create_6th_character(user=self.user, name="別人", version=7)
+        other.create_new_version("別系譜")
+
+        new_version = self.base_character.create_new_version("セッション1後")
+
+        self.assertEqual(new_version.system_data.version, 2)
+        self.assertEqual(len(other.get_version_history()), 2)
+
+    def _add_skills(self, character, count, start=0):
+        CharacterSkill.objects.bulk_create(
+            CharacterSkill(
+                character_sheet=character.system_data,
+                skill_name=f"技能{index}",
+                base_value=10,
+                interest_points=1,
+                current_value=11,
+            )
+            for index in range(start, start + count)
+        )
+
+    def _count_version_queries(self, character):
+        with CaptureQueriesContext(connection) as context:
+            new_version = CharacterVersionService.create_version(
+                source_character=character,
+                actor=self.user,
+                validated_data={"version_note": "一括コピー"},
+                copy_policy={"copy_skills": True},
+            )
+        return new_version, len(context.captured_queries)
+
+    def test_version_copy_queries_do_not_grow_with_skills(self):
+        """技能のコピーと最大SAN値の再計算は技能数に比例したクエリを発行しない"""
+        CharacterSkill.objects.create(
+            character_sheet=self.base_character.system_data, skill_name="クトゥルフ神話", other_points=5
+        )
+        self._add_skills(self.base_character, 9)
+        _, small = self._count_version_queries(self.base_character)
+
+        self._add_skills(self.base_character, 70, start=9)
+        new_version, large = self._count_version_queries(self.base_character)
+
+        self.assertEqual(small, large)
+        copied = new_version.system_data
+        self.assertEqual(copied.skills.count(), 80)
+        self.assertEqual(copied.skills.get(skill_name="クトゥルフ神話").current_value, 5)
+        self.assertEqual(copied.sanity_max, 94)
+
 
 class CharacterVersionMetadataTestCase(TestCase):
     """キャラクターバージョンメタデータのテストケース"""
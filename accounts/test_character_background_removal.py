@@ -1,16 +1,23 @@
 import io
+import sys
 import tempfile
 from datetime import timedelta
 from unittest.mock import Mock, patch
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from PIL import Image
 from rest_framework.test import APIClient
 
-from accounts.background_removal_tasks import process_background_removal_job, start_background_removal_task
+from accounts import background_removal
+from accounts.background_removal_tasks import (
+    process_background_removal_batch,
+    process_background_removal_job,
+    start_background_removal_task,
+)
 from accounts.character_models import CharacterSheet6th
 from accounts.models import BackgroundRemovalJob, CharacterSheet, CustomUser
 from accounts.serializers import CharacterSheetSerializer
@@ -224,6 +231,62 @@ class CharacterBackgroundRemovalTests(TestCase):
         self.assertNotIn("internal model failure", processed.error_message)
         self.assertFalse(processed.source_image)
 
+    @patch("accounts.background_removal_tasks.remove_background", autospec=True)
+    def test_worker_batch_claims_oldest_pending_jobs(self, remove_background):
+        remove_background.return_value = self.transparent_png()
+        pending = [
+            BackgroundRemovalJob.objects.create(user=self.user, source_image=self.image_upload()) for _ in range(3)
+        ]
+        running = BackgroundRemovalJob.objects.create(
+            user=self.user, status=BackgroundRemovalJob.Status.RUNNING, source_image=self.image_upload()
+        )
+
+        results = process_background_removal_batch(batch_size=2)
+
+        self.assertEqual({job.pk for job, _ in results}, {pending[0].pk, pending[1].pk})
+        self.assertTrue(all(seconds >= 0 for _, seconds in results))
+        statuses = dict(BackgroundRemovalJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[pending[0].pk], BackgroundRemovalJob.Status.COMPLETED)
+        self.assertEqual(statuses[pending[1].pk], BackgroundRemovalJob.Status.COMPLETED)
+        self.assertEqual(statuses[pending[2].pk], BackgroundRemovalJob.Status.PENDING)
+        self.assertEqual(statuses[running.pk], BackgroundRemovalJob.Status.RUNNING)
+
+    @patch("accounts.management.commands.run_background_removal_worker.get_background_removal_session", autospec=True)
+    @patch("accounts.background_removal_tasks.remove_background", autospec=True)
+    def test_worker_command_loads_model_once_and_reports_job_timings(self, remove_background, load_session):
+        remove_background.return_value = self.transparent_png()
+        jobs = [BackgroundRemovalJob.objects.create(user=self.user, source_image=self.image_upload()) for _ in range(3)]
+        output = io.StringIO()
+
+        call_command("run_background_removal_worker", "--once", "--batch-size", "2", "--workers", "1", stdout=output)
+
+        load_session.assert_called_once_with()
+        self.assertEqual(remove_background.call_count, 3)
+        for job in jobs:
+            self.assertIn(f"job={job.pk} status=completed ms=", output.getvalue())
+        self.assertIn("processed 3 job(s)", output.getvalue())
+
+    def test_rembg_session_is_loaded_once_per_process(self):
+        rembg = Mock()
+        rembg.remove.side_effect = lambda image_bytes, session: image_bytes
+        with patch.dict(sys.modules, {"rembg": rembg}), patch.object(background_removal, "_session", None):
+            background_removal.remove_background(b"first")
+            background_removal.remove_background(b"second")
+
+        rembg.new_session.assert_called_once_with("u2net")
+        self.assertEqual(rembg.remove.call_args.kwargs["session"], rembg.new_session.return_value)
+
+    @override_settings(BACKGROUND_REMOVAL_DISPATCH="worker")
+    @patch("boto3.client", autospec=True)
+    def test_worker_dispatch_leaves_job_pending_for_the_worker(self, boto_client):
+        job = BackgroundRemovalJob.objects.create(user=self.user, source_image=self.image_upload())
+
+        start_background_removal_task(job)
+
+        boto_client.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundRemovalJob.Status.PENDING)
+
     @override_settings(
         AWS_S3_REGION_NAME="ap-northeast-1",
         BACKGROUND_REMOVAL_ECS_CLUSTER="tableno-aws-pre",
@@ -1,8 +1,10 @@
 ﻿import io
 import tempfile
 import zipfile
+from unittest.mock import patch
 from urllib.parse import quote
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
@@ -140,7 +142,7 @@ class CharacterImageDownloadZipTest(APITestCase):
         return SimpleUploadedFile(name, content, content_type="image/png")
 
     def archive(self, response):
-        return zipfile.ZipFile(io.BytesIO(response.content))
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
 
     def test_owner_downloads_character_images_zip_in_display_order(self):
         CharacterImage.objects.create(
@@ -169,6 +171,51 @@ class CharacterImageDownloadZipTest(APITestCase):
             self.assertEqual(archive.read("01_main_main.png"), b"main-image")
             self.assertEqual(archive.read("02_second.png"), b"second-image")
 
+    def test_zip_streams_stored_entries_in_bounded_chunks(self):
+        payload = bytes(range(256)) * 40
+        CharacterImage.objects.create(
+            character_sheet=self.detail, image=self.uploaded_file("large.png", payload), is_main=True
+        )
+        CharacterImage.objects.create(
+            character_sheet=self.detail, image=self.uploaded_file("small.png", b"small-image"), order=1
+        )
+
+        self.client.force_authenticate(self.user)
+        with patch("accounts.views.character_image_views.ZIP_READ_CHUNK_SIZE", 1024):
+            response = self.client.get(reverse("character-image-download", kwargs={"character_id": self.sheet.id}))
+            chunks = list(response.streaming_content)
+
+        self.assertTrue(response.streaming)
+        self.assertNotIn("Content-Length", response)
+        self.assertGreater(len(chunks), len(payload) // 1024)
+        self.assertTrue(all(len(chunk) <= 1024 + 512 for chunk in chunks))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual([info.compress_type for info in archive.infolist()], [zipfile.ZIP_STORED] * 2)
+            self.assertEqual(archive.read("01_main_large.png"), payload)
+            self.assertEqual(archive.read("02_small.png"), b"small-image")
+
+    async def test_zip_streams_chunk_by_chunk_under_asgi(self):
+        payload = bytes(range(256)) * 40
+        await sync_to_async(CharacterImage.objects.create)(
+            character_sheet=self.detail, image=self.uploaded_file("asgi.png", payload), is_main=True
+        )
+        await self.async_client.aforce_login(self.user)
+
+        with patch("accounts.views.character_image_views.ZIP_READ_CHUNK_SIZE", 1024):
+            response = await self.async_client.get(
+                reverse("character-image-download", kwargs={"character_id": self.sheet.id})
+            )
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # 同期イテレータだと ASGI ではアーカイブ全体をメモリに溜めてから送信される
+        self.assertTrue(response.is_async)
+        self.assertGreater(len(chunks), len(payload) // 1024)
+        self.assertTrue(all(len(chunk) <= 1024 + 512 for chunk in chunks))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(archive.read("01_main_asgi.png"), payload)
+
     def test_download_uses_legacy_character_image_when_multiple_images_are_absent(self):
         self.detail.character_image = self.uploaded_file("legacy.png", b"legacy-image")
         self.detail.save(update_fields=["character_image"])
@@ -5,19 +5,35 @@ TDDアプローチで実装前にテストを作成
 
 import os
 import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
 
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from accounts.character_image_usage import get_character_image_usage
+from accounts.character_image_utils import (
+    get_character_preview_image_field,
+    get_character_preview_image_url,
+    resolve_character_preview_images,
+)
+from accounts.image_renditions import generate_renditions
 from accounts.models import CharacterImage6th as CharacterImage
-from accounts.models import CharacterSheet
+from accounts.models import CharacterImageUsage, CharacterSheet
 from accounts.test_character_factories import create_6th_character
+from schedules.tasks import generate_image_renditions
 
 User = get_user_model()
 
@@ -214,6 +230,78 @@ class CharacterImageAPITestCase(APITestCase):
                 self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
                 self.assertIn("30MB", str(response.data))
 
+    def test_upload_records_image_metadata_and_usage(self):
+        """アップロード時に画像情報を保存し、キャラクターごとの使用量を更新する"""
+        url = reverse("character-image-list", kwargs={"character_id": self.character.id})
+        response = self.client.post(url, {"image": self.create_test_image(size=(200, 100))}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["width"], response.data["height"]), (200, 100))
+        self.assertEqual(response.data["image_format"], "PNG")
+        image = CharacterImage.objects.get(pk=response.data["id"])
+        usage = CharacterImageUsage.objects.get(character_sheet=self.character)
+        self.assertEqual((usage.image_count, usage.total_bytes), (1, image.quota_bytes))
+        self.assertEqual(image.quota_bytes, max(image.file_size, 200 * 100 * 3 // 3))
+
+        list_response = self.client.get(url)
+        self.assertEqual(list_response.data["usage"]["total_bytes"], image.quota_bytes)
+        self.assertEqual(list_response.data["usage"]["user_total_bytes"], image.quota_bytes)
+
+        self.client.delete(
+            reverse("character-image-detail", kwargs={"character_id": self.character.id, "pk": image.id})
+        )
+        usage.refresh_from_db()
+        self.assertEqual((usage.image_count, usage.total_bytes), (0, 0))
+
+    def test_quota_check_does_not_open_stored_images(self):
+        """容量チェックは保存済みの集計値を使い、既存画像のファイルを読まない"""
+        self.user.is_premium = True
+        self.user.save(update_fields=["is_premium"])
+        for i in range(3):
+            CharacterImage.objects.create(
+                character_sheet=self.character.system_data, image=self.create_test_image(f"test{i}.png"), order=i
+            )
+        url = reverse("character-image-list", kwargs={"character_id": self.character.id})
+
+        with patch.object(Storage, "open", side_effect=AssertionError("stored image was opened")):
+            response = self.client.post(url, {"image": self.create_test_image("new.png")}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CharacterImageUsage.objects.get(character_sheet=self.character).image_count, 4)
+
+    def test_rebuild_command_backfills_legacy_image_metadata(self):
+        """画像情報のない既存行を rebuild_character_image_usage で補完する"""
+        image = CharacterImage.objects.create(
+            character_sheet=self.character.system_data, image=self.create_test_image(size=(300, 200))
+        )
+        CharacterImage.objects.filter(pk=image.pk).update(width=None, height=None, file_size=None, quota_bytes=None)
+        CharacterImageUsage.objects.all().delete()
+
+        call_command("rebuild_character_image_usage", stdout=StringIO())
+
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (300, 200))
+        usage = CharacterImageUsage.objects.get(character_sheet=self.character)
+        self.assertEqual((usage.image_count, usage.total_bytes), (1, image.quota_bytes))
+
+    def test_legacy_images_are_estimated_from_stored_size_until_backfilled(self):
+        """画像情報追加前の行は、ファイルを開かずに保存サイズで見積もり0バイト扱いにしない"""
+        image = CharacterImage.objects.create(
+            character_sheet=self.character.system_data, image=self.create_test_image("legacy.png", size=(300, 200))
+        )
+        stored_size = image.image.size
+        CharacterImage.objects.filter(pk=image.pk).update(width=None, height=None, file_size=None, quota_bytes=None)
+        migration = import_module("accounts.migrations.0065_reset_legacy_character_image_usage")
+
+        migration.reset_usage_with_legacy_images(apps, None)
+
+        self.assertFalse(CharacterImageUsage.objects.filter(character_sheet=self.character).exists())
+        with patch.object(Storage, "open", side_effect=AssertionError("stored image was opened")):
+            usage = get_character_image_usage(self.character)
+        self.assertEqual((usage.image_count, usage.total_bytes), (1, stored_size))
+        image.refresh_from_db()
+        self.assertEqual((image.file_size, image.quota_bytes), (stored_size, None))
+
     def test_invalid_file_format(self):
         """無効なファイル形式のテスト"""
         # テキストファイルをアップロード
@@ -522,3 +610,128 @@ class CharacterImageIntegrationTestCase(TestCase):
         self.assertContains(response, "character-image-drop-zone")
         self.assertContains(response, "character-image-select-btn")
         self.assertContains(response, "character-image-modal-list")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CharacterImageRenditionTestCase(APITestCase):
+    """キャラクター画像のリサイズ版生成のテストケース"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="renditionuser", password="testpass123")
+        self.character, _ = create_6th_character(user=self.user, name="リサイズ確認", edition="6th")
+        self.client.force_authenticate(user=self.user)
+
+    def create_test_image(self, name="large.png", size=(1000, 800), mode="RGB"):
+        file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+        Image.new(mode, size, color="red").save(file, "PNG")
+        file.seek(0)
+        return SimpleUploadedFile(name=name, content=file.read(), content_type="image/png")
+
+    def test_upload_queues_renditions_and_serializers_expose_them(self):
+        """アップロード後にリサイズ版を生成し、サムネイルURLとプレビューURLで返す"""
+        url = reverse("character-image-list", kwargs={"character_id": self.character.id})
+        with patch("schedules.tasks.queue_image_renditions") as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {"image": self.create_test_image()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        queue.assert_called_once_with("accounts.CharacterImage6th", response.data["id"])
+        self.assertTrue(response.data["thumbnail_url"].endswith(".png"))
+
+        generate_image_renditions.apply(args=("accounts.CharacterImage6th", response.data["id"]))
+
+        image = CharacterImage.objects.get(pk=response.data["id"])
+        self.assertEqual(sorted(image.renditions, key=int), ["320", "640"])
+        with image.image.storage.open(image.renditions["320"]["webp"]) as rendition_file:
+            with Image.open(rendition_file) as rendition:
+                self.assertEqual((rendition.format, rendition.size), ("WEBP", (320, 256)))
+
+        results = self.client.get(url).data["results"]
+        self.assertTrue(results[0]["thumbnail_url"].endswith("_320w.webp"))
+        self.assertTrue(results[0]["renditions"]["640"]["jpeg"].endswith("_640w.jpg"))
+        self.assertTrue(get_character_preview_image_url(self.character, width=600).endswith("_640w.webp"))
+        # 元画像より大きい幅を求めた場合は元画像を返す
+        self.assertTrue(get_character_preview_image_url(self.character, width=1280).endswith(".png"))
+
+    def test_transparent_image_jpeg_rendition_is_flattened(self):
+        """透過画像のJPEG版は白背景に合成する"""
+        image = CharacterImage.objects.create(
+            character_sheet=self.character.system_data,
+            image=self.create_test_image(size=(400, 400), mode="RGBA"),
+        )
+        generate_renditions("accounts.CharacterImage6th", image.pk)
+
+        image.refresh_from_db()
+        with image.image.storage.open(image.renditions["320"]["jpeg"]) as rendition_file:
+            with Image.open(rendition_file) as rendition:
+                self.assertEqual(rendition.mode, "RGB")
+
+    def test_backfill_command_generates_missing_renditions(self):
+        """backfill_image_renditions は未生成の画像のリサイズ版を作る"""
+        image = CharacterImage.objects.create(
+            character_sheet=self.character.system_data, image=self.create_test_image()
+        )
+
+        call_command("backfill_image_renditions", "--model", "accounts.CharacterImage6th", stdout=StringIO())
+
+        image.refresh_from_db()
+        self.assertEqual(sorted(image.renditions, key=int), ["320", "640"])
+        self.assertTrue(image.image.storage.exists(image.renditions["640"]["webp"]))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CharacterPreviewImageListTestCase(APITestCase):
+    """キャラクター一覧のプレビュー画像解決のテストケース"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="previewlistuser", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+    def create_characters(self, count):
+        characters = []
+        for index in range(count):
+            character, sheet = create_6th_character(user=self.user, name=f"一覧{index}", edition="6th")
+            CharacterImage.objects.create(
+                character_sheet=sheet, image=SimpleUploadedFile(f"first{index}.png", b"x"), order=0
+            )
+            CharacterImage.objects.create(
+                character_sheet=sheet, image=SimpleUploadedFile(f"main{index}.png", b"x"), order=1, is_main=True
+            )
+            characters.append(character)
+        return characters
+
+    def list_characters(self):
+        response = self.client.get(reverse("character-sheet-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"] if isinstance(response.data, dict) else response.data
+        return {item["id"]: item for item in results}
+
+    @staticmethod
+    def image_queries(context):
+        return sum("accounts_characterimage6th" in query["sql"] for query in context.captured_queries)
+
+    def test_list_resolves_main_images_with_constant_queries(self):
+        """一覧のメイン画像はキャラクター数に関係なく一定のクエリ数で解決する"""
+        self.create_characters(2)
+        with CaptureQueriesContext(connection) as small:
+            self.list_characters()
+        characters = self.create_characters(3)
+        with CaptureQueriesContext(connection) as large:
+            results = self.list_characters()
+
+        self.assertEqual(self.image_queries(small), 1)
+        self.assertEqual(self.image_queries(large), 1)
+        self.assertIn("/main", results[characters[0].id]["character_image"])
+
+    def test_first_image_and_legacy_image_are_fallbacks(self):
+        """メイン画像がなければ表示順で最初の画像、画像がなければ従来のcharacter_imageを使う"""
+        first_only, sheet = create_6th_character(user=self.user, name="最初の画像", edition="6th")
+        CharacterImage.objects.create(character_sheet=sheet, image=SimpleUploadedFile("second.png", b"x"), order=1)
+        CharacterImage.objects.create(character_sheet=sheet, image=SimpleUploadedFile("first.png", b"x"), order=0)
+        legacy, legacy_sheet = create_6th_character(user=self.user, name="従来画像", edition="6th")
+        legacy_sheet.character_image = SimpleUploadedFile("legacy.png", b"x")
+        legacy_sheet.save()
+
+        resolve_character_preview_images([first_only, legacy])
+        with self.assertNumQueries(0):
+            self.assertIn("/first", get_character_preview_image_field(first_only).name)
+            self.assertIn("legacy", get_character_preview_image_field(legacy).name)
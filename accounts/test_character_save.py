@@ -286,6 +286,31 @@ class CharacterSheetSaveTestCase(APITestCase):
             # ページネーションがある場合
             self.assertEqual(len(response.data["results"]), 3)  # 自分のキャラクターのみ
 
+    def test_list_user_characters_with_cursor(self):
+        """正常系: cursor 指定時はキーセット方式で全件を重複なく辿れる"""
+        created = [
+            create_6th_character(user=self.user, name=f"探索者{i}", age=25, str_value=12, edu_value=14)
+            for i in range(5)
+        ]
+        # updated_at が同値でも id で順序が決まる
+        CharacterSheet.objects.filter(user=self.user).update(updated_at=created[0].updated_at)
+
+        seen = []
+        cursor = ""
+        while True:
+            response = self.client.get("/api/accounts/character-sheets/", {"cursor": cursor, "page_size": 2})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            seen.extend(row["id"] for row in response.data["results"])
+            if not response.data["has_next"]:
+                break
+            cursor = response.data["next_cursor"]
+
+        self.assertEqual(seen, sorted((character.id for character in created), reverse=True))
+
+        response = self.client.get("/api/accounts/character-sheets/", {"cursor": "broken", "total": "exact"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_save_character_auto_calculate_derived_stats(self):
         """正常系: 派生ステータスの自動計算"""
         character_data = {
@@ -267,7 +267,7 @@ class CharacterSheetAPITest(APITestCase):
         )
 
         with patch(
-            "accounts.character_models.CharacterSkill6th.objects.create",
+            "accounts.character_models.CharacterSkill6th.objects.bulk_create",
             side_effect=RuntimeError("copy failed"),
         ):
             with self.assertRaises(RuntimeError):
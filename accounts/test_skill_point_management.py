@@ -3,9 +3,13 @@
 クトゥルフ神話TRPG 6版の技能ポイント管理機能をテスト
 """
 
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -243,6 +247,114 @@ class SkillPointManagementAPITestCase(APITestCase):
         self.assertEqual(response.data["remaining_occupation_points"], 1130)  # 1200 - 70
         self.assertEqual(response.data["remaining_hobby_points"], 475)  # 500 - 25
 
+    def _batch_allocate(self, allocations):
+        return self.client.post(
+            f"/accounts/character-sheets/{self.character.character_sheet_id}/batch-allocate-skill-points/",
+            {"allocations": allocations},
+            format="json",
+        )
+
+    def test_batch_allocation_rejects_whole_batch_over_budget(self):
+        """一括割り振りで合計が上限を超えた場合はどの技能も更新しない"""
+        skill1 = CharacterSkill.objects.create(character_sheet=self.character, skill_name="図書館", base_value=25)
+        skill2 = CharacterSkill.objects.create(character_sheet=self.character, skill_name="目星", base_value=25)
+
+        response = self._batch_allocate(
+            [
+                {"skill_id": skill1.id, "occupation_points": 700},
+                {"skill_id": skill2.id, "occupation_points": 600},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("職業技能ポイントの合計が上限を超えています", response.data["error"])
+        skill1.refresh_from_db()
+        self.assertEqual(skill1.occupation_points, 0)
+        self.assertEqual(skill1.current_value, 25)
+
+    def test_batch_allocation_validates_final_totals(self):
+        """ポイントを技能間で付け替える一括割り振りは最終状態で検証される"""
+        skill1 = CharacterSkill.objects.create(
+            character_sheet=self.character, skill_name="図書館", base_value=25, occupation_points=900
+        )
+        skill2 = CharacterSkill.objects.create(character_sheet=self.character, skill_name="目星", base_value=25)
+
+        response = self._batch_allocate(
+            [
+                {"skill_id": skill2.id, "occupation_points": 900},
+                {"skill_id": skill1.id, "occupation_points": 100},
+                {"skill_name": "回避", "base_value": 20, "interest_points": 30},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated_count"], 3)
+        self.assertEqual(response.data["remaining_occupation_points"], 200)
+        self.assertEqual(CharacterSkill.objects.get(pk=skill2.pk).current_value, 925)
+        self.assertEqual(self.character.skills.get(skill_name="回避").current_value, 50)
+
+    def test_batch_allocation_query_count_does_not_grow_with_skills(self):
+        """一括割り振りのクエリ数は技能数に依存しない"""
+        skills = CharacterSkill.objects.bulk_create(
+            CharacterSkill(character_sheet=self.character, skill_name=f"技能{index}", base_value=10)
+            for index in range(40)
+        )
+
+        def count_queries(targets):
+            with CaptureQueriesContext(connection) as context:
+                response = self._batch_allocate(
+                    [{"skill_id": skill.id, "occupation_points": 10, "interest_points": 5} for skill in targets]
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["updated_count"], len(targets))
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(skills[:5]), count_queries(skills))
+
+    def test_bulk_update_recalculates_max_sanity_once(self):
+        """技能の一括更新でクトゥルフ神話が変わると最大SAN値を再計算する"""
+        mythos = CharacterSkill.objects.create(character_sheet=self.character, skill_name="クトゥルフ神話")
+        library = CharacterSkill.objects.create(character_sheet=self.character, skill_name="図書館", base_value=25)
+
+        response = self.client.patch(
+            f"/api/accounts/character-sheets/{self.character.character_sheet_id}/skills/bulk_update/",
+            {
+                "skills": [
+                    {"id": mythos.id, "other_points": 12},
+                    {"id": library.id, "occupation_points": 40},
+                    {"skill_name": "芸術（絵画）", "occupation_points": 20},
+                    {"skill_name": "図書館", "occupation_points": 99},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([skill["skill_name"] for skill in response.data], ["クトゥルフ神話", "図書館", "芸術（絵画）"])
+        self.character.refresh_from_db()
+        self.assertEqual(self.character.sanity_max, 87)
+        library.refresh_from_db()
+        self.assertEqual(library.current_value, 65)
+        custom = self.character.skills.get(skill_name="芸術（絵画）")
+        self.assertEqual((custom.current_value, custom.category, custom.notes), (25, "特殊・その他", ""))
+
+    def test_bulk_update_returns_ids_when_bulk_insert_returns_no_primary_keys(self):
+        """主キーを返さないDB（MySQL）でも作成した技能のIDを返す"""
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", new_callable=mock.PropertyMock
+        ) as can_return_rows:
+            can_return_rows.return_value = False
+            response = self.client.patch(
+                f"/api/accounts/character-sheets/{self.character.character_sheet_id}/skills/bulk_update/",
+                {"skills": [{"skill_name": "芸術（絵画）"}, {"skill_name": "運転（自動車）"}]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = dict(self.character.skills.values_list("skill_name", "id"))
+        self.assertEqual({skill["skill_name"]: skill["id"] for skill in response.data}, expected)
+        self.assertNotIn(None, expected.values())
+
     def test_skill_points_validation_on_allocation(self):
         """技能ポイント割り振り時のバリデーションテスト"""
         skill = CharacterSkill.objects.create(character_sheet=self.character, skill_name="図書館", base_value=25)
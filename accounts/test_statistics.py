@@ -1,6 +1,8 @@
 from datetime import timedelta
+from io import StringIO
 
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 from django.utils import timezone
 from rest_framework import status
@@ -8,9 +10,10 @@ from rest_framework.test import APITestCase
 
 from scenarios.models import PlayHistory, Scenario
 from schedules import session_permissions
-from schedules.models import SessionParticipant, TRPGSession
+from schedules.models import RankingSnapshot, SessionParticipant, TRPGSession
 
 from .models import CustomUser, Group, GroupMembership
+from .ranking_snapshots import build_ranking_snapshots, rank_for_score
 
 User = get_user_model()
 
@@ -372,3 +375,124 @@ class StatisticsViewsTestCase(APITestCase):
         self.assertEqual(data["yearly_stats"]["total_sessions"], 0)
         self.assertEqual(data["yearly_stats"]["total_hours"], 0)
         self.assertEqual(len(data["recent_sessions"]), 0)
+
+
+class RankingSnapshotTestCase(APITestCase):
+    """ランキングスナップショットのテスト"""
+
+    def setUp(self):
+        self.gm = User.objects.create_user(username="snapshot-gm", password="pass123", nickname="Snapshot GM")
+        self.player = User.objects.create_user(
+            username="snapshot-player", password="pass123", nickname="Snapshot Player"
+        )
+        self.group = Group.objects.create(name="Snapshot Group", created_by=self.gm)
+        for i in range(3):
+            session = TRPGSession.objects.create(
+                title=f"Snapshot Session {i+1}",
+                date=timezone.now() - timedelta(days=i + 1),
+                gm=self.gm,
+                group=self.group,
+                duration_minutes=180,
+                status="completed",
+            )
+            if i == 0:
+                session_permissions.create_participant(session=session, user=self.player, role="player")
+
+    def _get_ranking(self, user, query="period=all&type=hours"):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(f"/api/accounts/statistics/ranking/?{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_build_command_creates_snapshots_for_each_period(self):
+        """再構築コマンドで全期間・直近5年・直近12か月 × システム × 種別のスナップショットが作られる"""
+        output = StringIO()
+        call_command("build_ranking_snapshots", stdout=output)
+
+        self.assertIn("ranking_snapshots=162", output.getvalue())
+        snapshot = RankingSnapshot.objects.get(period_type="all", game_system="", ranking_type="hours")
+        self.assertEqual(snapshot.total_users, 2)
+        self.assertEqual(snapshot.entries[0]["entry"]["user_id"], self.gm.id)
+
+    def test_ranking_served_from_fresh_snapshot(self):
+        """新しいスナップショットがあれば、その時点のランキングを返す"""
+        build_ranking_snapshots()
+        TRPGSession.objects.create(
+            title="After Snapshot",
+            date=timezone.now() - timedelta(hours=1),
+            gm=self.player,
+            group=self.group,
+            duration_minutes=600,
+            status="completed",
+        )
+
+        data = self._get_ranking(self.gm)
+
+        self.assertEqual([row["user_id"] for row in data["ranking"]], [self.gm.id, self.player.id])
+        self.assertEqual(data["ranking"][1]["total_hours"], 3.0)
+
+    def test_trend_buckets_served_from_fresh_snapshot(self):
+        """暦月をまるごと覆うトレンドのバケットはスナップショットから返す"""
+        build_ranking_snapshots()
+        TRPGSession.objects.create(
+            title="After Snapshot",
+            date=timezone.now(),
+            gm=self.player,
+            group=self.group,
+            duration_minutes=600,
+            status="completed",
+        )
+
+        data = self._get_ranking(self.gm, query="period=all&type=hours&trends=true&trend_unit=month")
+
+        self.assertEqual(len(data["trends"]), 12)
+        current_month = {row["user_id"]: row for row in data["trends"][-1]["ranking"]}
+        self.assertLess(current_month.get(self.player.id, {}).get("total_hours", 0), 10)
+
+    def test_snapshot_rank_is_counted_from_score_buckets(self):
+        """閲覧者の順位は同じスコアをまとめた分布から数える"""
+        other = User.objects.create_user(username="snapshot-other", password="pass123")
+        session = TRPGSession.objects.filter(title="Snapshot Session 1").get()
+        session_permissions.create_participant(session=session, user=other, role="player")
+        build_ranking_snapshots()
+        snapshot = RankingSnapshot.objects.get(period_type="all", game_system="", ranking_type="hours")
+
+        self.assertEqual(
+            sorted(snapshot.score_buckets.values_list("primary_score", "secondary_score", "user_count")),
+            [(180, 1, 2), (540, 3, 1)],
+        )
+        self.assertEqual(rank_for_score(snapshot, (180, 1)), 2)
+        self.assertEqual(rank_for_score(snapshot, (180, 0)), 4)
+        self.assertEqual(rank_for_score(snapshot, (600, 0)), 1)
+
+    def test_stale_snapshot_falls_back_to_live_ranking(self):
+        """有効期限切れのスナップショットは使わずにその場で集計する"""
+        build_ranking_snapshots()
+        RankingSnapshot.objects.update(built_at=timezone.now() - timedelta(days=1))
+        TRPGSession.objects.create(
+            title="After Snapshot",
+            date=timezone.now() - timedelta(hours=1),
+            gm=self.player,
+            group=self.group,
+            duration_minutes=600,
+            status="completed",
+        )
+
+        data = self._get_ranking(self.gm)
+
+        self.assertEqual(data["ranking"][0]["user_id"], self.player.id)
+        self.assertEqual(data["ranking"][0]["total_hours"], 13.0)
+
+    def test_current_user_rank_outside_limit(self):
+        """ランキング外の閲覧者にも自分の順位と集計値を返す"""
+        for use_snapshot in (False, True):
+            with self.subTest(use_snapshot=use_snapshot):
+                if use_snapshot:
+                    build_ranking_snapshots()
+                data = self._get_ranking(self.player, query="period=all&type=sessions&limit=1")
+
+                self.assertEqual([row["user_id"] for row in data["ranking"]], [self.gm.id])
+                own = data["users"][-1]
+                self.assertEqual(own["user"]["id"], self.player.id)
+                self.assertEqual(own["rank"], 2)
+                self.assertEqual(own["session_count"], 1)
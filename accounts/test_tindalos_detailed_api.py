@@ -6,7 +6,9 @@ Tindalos統計API詳細機能のテストスイート
 from datetime import datetime, timedelta
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -554,3 +556,88 @@ class TindalosMetricsFilterTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["total_years"], 3)
         self.assertEqual(len(response.data["years"]), 3)
+
+
+class TindalosMetricsQueryCountTestCase(APITestCase):
+    """年度・月別集計のクエリ数が履歴の長さに依存しないことを確認するテストケース"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass123", email="test@example.com")
+        self.client.force_authenticate(user=self.user)
+
+        self.group = Group.objects.create(
+            name="Test Group", description="Test group", visibility="private", created_by=self.user
+        )
+        self.group.members.add(self.user)
+
+        self.scenario = Scenario.objects.create(
+            title="Query Count Scenario",
+            author="Test Author",
+            created_by=self.user,
+            game_system="coc",
+            difficulty="intermediate",
+            estimated_time=180,
+        )
+
+    def _create_history(self, years):
+        current_year = timezone.now().year
+        for year_offset in range(years):
+            year = current_year - year_offset
+            for month in [2, 7]:
+                date = timezone.make_aware(datetime(year, month, 15, 19, 0))
+                session = TRPGSession.objects.create(
+                    title=f"Session {year}-{month}",
+                    group=self.group,
+                    gm=self.user if month == 2 else None,
+                    date=date,
+                    duration_minutes=180,
+                    status="completed",
+                )
+                session.participants.add(self.user)
+                PlayHistory.objects.create(
+                    scenario=self.scenario, user=self.user, session=session, played_date=date, role="gm"
+                )
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_simple_detailed_metrics_query_count_is_constant(self):
+        """detailed=true の集計クエリ数が年数に比例しないこと"""
+        year = timezone.now().year
+        url = f"/api/accounts/statistics/simple/?detailed=true&year={year}"
+
+        self._create_history(years=2)
+        short_count, short_response = self._count_queries(url)
+        self.assertEqual(len(short_response.data["yearly_trends"]), 2)
+
+        self._create_history(years=10)
+        long_count, long_response = self._count_queries(url)
+        yearly_trends = long_response.data["yearly_trends"]
+        self.assertEqual(len(yearly_trends), 10)
+
+        self.assertEqual(short_count, long_count)
+        latest = yearly_trends[-1]
+        self.assertEqual(latest["session_count"], 4)
+        self.assertEqual(latest["gm_session_count"], 2)
+        self.assertEqual(latest["player_session_count"], 2)
+        self.assertEqual(latest["total_hours"], 12.0)
+
+    def test_detailed_yearly_trends_query_count_is_constant(self):
+        """type=yearly_trends の集計クエリ数が年数に比例しないこと"""
+        url = "/api/accounts/statistics/tindalos/detailed/?type=yearly_trends"
+
+        self._create_history(years=2)
+        short_count, _ = self._count_queries(url)
+
+        self._create_history(years=10)
+        long_count, response = self._count_queries(url)
+
+        self.assertEqual(short_count, long_count)
+        self.assertEqual(response.data["total_years"], 10)
+        oldest = response.data["years"][0]
+        self.assertEqual(oldest["sessions"]["total"], 2)
+        self.assertEqual(oldest["sessions"]["as_gm"], 1)
+        self.assertEqual(oldest["scenarios"], 1)
@@ -5,7 +5,8 @@ from schedules.duration import effective_duration_expression
 """
 from datetime import datetime, timedelta
 
-from django.db.models import Avg, Count, Q, Sum
+from django.db.models import Avg, Count, Min, Q, Sum
+from django.db.models.functions import TruncMonth, TruncYear
 from django.utils import timezone
 
 
@@ -75,6 +76,138 @@ class SessionStatistics:
         }
 
 
+class PeriodAggregation:
+    """年・月単位のグループ集計ユーティリティ
+
+    セッション集計は UserStatsRollup を、プレイ履歴は TruncYear/TruncMonth と
+    条件付き Count/Sum を使い、期間数に関係なく1クエリで期間別の集計結果を返す。
+    unit="month" は year 指定と組み合わせて使う。
+    """
+
+    TRUNC_FUNCTIONS = {"year": TruncYear, "month": TruncMonth}
+    SESSION_TOTAL_KEYS = ("session_count", "gm_count", "player_count", "total_minutes", "gm_minutes")
+
+    @staticmethod
+    def user_session_filter(user):
+        """GMまたは参加者として関わったセッションの条件（JOIN による重複行を作らない）"""
+        from schedules.models import SessionParticipant
+
+        return Q(gm=user) | Q(id__in=SessionParticipant.objects.filter(user=user).values("session_id"))
+
+    @staticmethod
+    def period_filter(field, year=None, start_year=None, end_year=None):
+        """年指定・年範囲指定のフィルタ条件を構築"""
+        filters = Q()
+        if year is not None:
+            filters &= Q(**{f"{field}__year": year})
+        if start_year is not None:
+            filters &= Q(**{f"{field}__year__gte": start_year})
+        if end_year is not None:
+            filters &= Q(**{f"{field}__year__lte": end_year})
+        return filters
+
+    @staticmethod
+    def period_key(value, unit):
+        """Trunc 結果を年（int）または月（int）のキーに変換"""
+        if value is None:
+            return None
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.year if unit == "year" else value.month
+
+    @staticmethod
+    def first_session_year(user):
+        """ユーザーが関わった最初のセッションの年（ステータス問わず）"""
+        from schedules.models import TRPGSession
+
+        first_date = TRPGSession.objects.filter(PeriodAggregation.user_session_filter(user)).aggregate(
+            first=Min("date")
+        )["first"]
+        return PeriodAggregation.period_key(first_date, "year")
+
+    @staticmethod
+    def session_totals(user, unit="year", year=None, start_year=None, end_year=None, game_system=None):
+        """完了セッションの期間別集計 {期間: {session_count, gm_count, player_count, total_minutes, gm_minutes}}
+
+        UserStatsRollup（ユーザー × 年 × 月 × ゲームシステム）を合算するため、
+        コストは履歴全体ではなく対象月数に比例する。
+        """
+        from schedules.models import UserStatsRollup
+
+        rollups = UserStatsRollup.objects.filter(user=user, year__gt=0)
+        if year is not None:
+            rollups = rollups.filter(year=year)
+        if start_year is not None:
+            rollups = rollups.filter(year__gte=start_year)
+        if end_year is not None:
+            rollups = rollups.filter(year__lte=end_year)
+        if game_system is not None:
+            rollups = rollups.filter(game_system=game_system)
+
+        rows = (
+            rollups.values(unit)
+            .annotate(
+                session_count=Sum("session_count"),
+                gm_count=Sum("gm_session_count"),
+                player_count=Sum("player_session_count"),
+                total_minutes=Sum("total_minutes"),
+                gm_minutes=Sum("gm_minutes"),
+            )
+            .order_by(unit)
+        )
+        return {row[unit]: {key: row[key] or 0 for key in PeriodAggregation.SESSION_TOTAL_KEYS} for row in rows}
+
+    @staticmethod
+    def session_summary(user, year=None):
+        """完了セッションの合計（year 未指定時は日付未定のセッションも含む全期間）"""
+        from schedules.models import UserStatsRollup
+
+        rollups = UserStatsRollup.objects.filter(user=user)
+        if year is not None:
+            rollups = rollups.filter(year=year)
+
+        totals = rollups.aggregate(
+            session_count=Sum("session_count"),
+            gm_count=Sum("gm_session_count"),
+            player_count=Sum("player_session_count"),
+            total_minutes=Sum("total_minutes"),
+            gm_minutes=Sum("gm_minutes"),
+        )
+        return {key: totals[key] or 0 for key in PeriodAggregation.SESSION_TOTAL_KEYS}
+
+    @staticmethod
+    def empty_session_totals():
+        """集計対象がない期間用の初期値"""
+        return dict.fromkeys(PeriodAggregation.SESSION_TOTAL_KEYS, 0)
+
+    @staticmethod
+    def play_history_breakdown(user, group_by=(), unit="year", year=None, start_year=None, end_year=None, **aggregates):
+        """プレイ履歴の期間別内訳
+
+        group_by で指定したフィールドと期間の組み合わせごとに aggregates を集計し、
+        {期間: [row, ...]} の形で返す。
+        """
+        from scenarios.models import PlayHistory
+
+        trunc = PeriodAggregation.TRUNC_FUNCTIONS[unit]
+        rows = (
+            PlayHistory.objects.filter(
+                PeriodAggregation.period_filter("played_date", year=year, start_year=start_year, end_year=end_year),
+                user=user,
+            )
+            .annotate(period=trunc("played_date"))
+            .values("period", *group_by)
+            .annotate(**aggregates)
+            .order_by("period", *group_by)
+        )
+
+        breakdown = {}
+        for row in rows:
+            key = PeriodAggregation.period_key(row.pop("period"), unit)
+            breakdown.setdefault(key, []).append(row)
+        return breakdown
+
+
 class CharacterStatistics:
     """キャラクター統計計算のユーティリティクラス"""
 
@@ -7,13 +7,16 @@ import io
 import logging
 import os
 import re
+import time
 import warnings
 import zipfile
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.http.response import content_disposition_header
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
@@ -30,6 +33,9 @@ from accounts.background_removal_tasks import (
     fail_stale_background_removal_job,
     start_background_removal_task,
 )
+from accounts.character_image_limits import CHARACTER_IMAGE_TOTAL_SIZE_LIMIT
+from accounts.character_image_usage import get_character_image_usage, get_user_image_usage
+from accounts.image_renditions import delete_renditions
 from accounts.models import BackgroundRemovalJob, CharacterSheet
 from accounts.serializers import CharacterImageSerializer
 from accounts.views.mixins import CharacterSheetAccessMixin
@@ -38,6 +44,7 @@ logger = logging.getLogger(__name__)
 
 ZIP_IMAGE_ORDERING = ("order", "uploaded_at", "id")
 ZIP_CONTENT_TYPE = "application/zip"
+ZIP_READ_CHUNK_SIZE = 256 * 1024
 BACKGROUND_REMOVAL_MAX_DIMENSION = 4096
 BACKGROUND_REMOVAL_MAX_PIXELS = 16_000_000
 BACKGROUND_REMOVAL_ALLOWED_FORMATS = {"JPEG", "PNG", "GIF"}
@@ -216,13 +223,12 @@ def _collect_zip_entries(character_sheet):
     return []
 
 
-def _read_storage_file(field_file):
+def _open_storage_file(field_file):
     if not field_file or not getattr(field_file, "name", ""):
         return None
 
     try:
-        with field_file.storage.open(field_file.name, "rb") as image_file:
-            return image_file.read()
+        return field_file.storage.open(field_file.name, "rb")
     except Exception:
         logger.warning(
             "Failed to add character image to ZIP: %s",
@@ -232,42 +238,99 @@ def _read_storage_file(field_file):
         return None
 
 
-def _write_zip_entries(archive, zip_entries):
+def _zip_member_names(zip_entries):
     used_names = set()
-    written_count = 0
-
-    for prefix, field_file in zip_entries:
-        content = _read_storage_file(field_file)
-        if content is None:
-            continue
-
-        member_name = _unique_zip_name(
-            f"{prefix}{_safe_original_filename(field_file)}",
-            used_names,
-        )
-        archive.writestr(member_name, content)
-        written_count += 1
+    return [
+        (_unique_zip_name(f"{prefix}{_safe_original_filename(field_file)}", used_names), field_file)
+        for prefix, field_file in zip_entries
+    ]
+
+
+class _ZipStreamBuffer:
+    """Write-only file object that hands the bytes written so far to the response generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _stream_zip_entries(first_file, members):
+    """Yield a ZIP archive chunk by chunk; only one read chunk is held in memory at a time.
+
+    Images are already compressed, so entries are STORED.  ``first_file`` is the
+    already opened file of the first member (opened before the response started
+    so that a missing archive can still become a 404).
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for index, (member_name, field_file) in enumerate(members):
+            source = first_file if index == 0 else _open_storage_file(field_file)
+            if source is None:
+                continue
+            member = zipfile.ZipInfo(member_name, date_time=time.localtime()[:6])
+            member.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(member, "w") as target:
+                try:
+                    while chunk := source.read(ZIP_READ_CHUNK_SIZE):
+                        target.write(chunk)
+                        yield buffer.drain()
+                except OSError:
+                    # 送信を始めた後なので、途中まで書いた項目のまま次の画像へ進む
+                    logger.warning("Failed to read character image for ZIP: %s", field_file.name, exc_info=True)
+            yield buffer.drain()
+    yield buffer.drain()
 
-    return written_count
 
+_STREAM_END = object()
 
-def build_character_images_zip_response(character_sheet):
-    zip_entries = _collect_zip_entries(character_sheet)
-    output = io.BytesIO()
 
-    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
-        written_count = _write_zip_entries(archive, zip_entries)
+async def _astream_zip_entries(first_file, members):
+    """Async variant of ``_stream_zip_entries`` for ASGI servers.
 
-    if written_count == 0:
+    Django consumes a sync iterator under ASGI with ``sync_to_async(list)``, which
+    would build the whole archive in memory before sending it. Each storage read
+    and ZIP write runs in a worker thread here instead, one chunk at a time.
+    """
+    chunks = _stream_zip_entries(first_file, members)
+    # Only storage I/O happens in the generator, so it need not run on the request's sync thread.
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await next_chunk(chunks, _STREAM_END)) is not _STREAM_END:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=False)()
+
+
+def build_character_images_zip_response(character_sheet, request=None):
+    members = _zip_member_names(_collect_zip_entries(character_sheet))
+    # 最初に読める画像を開いてからレスポンスを始める（1枚も読めなければ404）
+    while members:
+        first_file = _open_storage_file(members[0][1])
+        if first_file is not None:
+            break
+        members = members[1:]
+    else:
         raise Http404("Character images not found")
 
-    payload = output.getvalue()
     filename_root = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', "_", character_sheet.system_data.name or "character")
     filename_root = filename_root.strip(" ._") or "character"
     filename = f"{filename_root}.zip"
-    response = HttpResponse(payload, content_type=ZIP_CONTENT_TYPE)
+    # DRF の Request は元の HttpRequest を _request に持つ
+    is_asgi = isinstance(getattr(request, "_request", request), ASGIRequest)
+    stream = _astream_zip_entries if is_asgi else _stream_zip_entries
+    response = StreamingHttpResponse(stream(first_file, members), content_type=ZIP_CONTENT_TYPE)
     response["Content-Disposition"] = content_disposition_header("attachment", filename=filename)
-    response["Content-Length"] = str(len(payload))
     return response
 
 
@@ -321,7 +384,7 @@ class CharacterImageViewSet(viewsets.ModelViewSet):
         image = serializer.save()
 
         # 最初の画像は自動でメインに設定
-        if character.system_data.images.count() == 1:
+        if get_character_image_usage(character).image_count == 1:
             image.is_main = True
             image.save()
 
@@ -334,14 +397,25 @@ class CharacterImageViewSet(viewsets.ModelViewSet):
         """画像一覧の取得"""
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
+        data = {"count": queryset.count(), "results": serializer.data}
 
-        return Response({"count": queryset.count(), "results": serializer.data})
+        # 所有者には保存済みの集計値から容量の使用状況を返す
+        character = self._get_character_sheet(require_owner=False)
+        if character.user_id == request.user.id:
+            usage = get_character_image_usage(character)
+            data["usage"] = {
+                "image_count": usage.image_count,
+                "total_bytes": usage.total_bytes,
+                "limit_bytes": CHARACTER_IMAGE_TOTAL_SIZE_LIMIT,
+                "user_total_bytes": get_user_image_usage(request.user)["total_bytes"],
+            }
+        return Response(data)
 
     @action(detail=False, methods=["get"], url_path="download")
     def download(self, request, **kwargs):
         """Download all readable character images as a ZIP archive."""
         character = self._get_character_sheet(require_owner=False)
-        return build_character_images_zip_response(character)
+        return build_character_images_zip_response(character, request)
 
     def destroy(self, request, *args, **kwargs):
         """画像の削除"""
@@ -359,6 +433,7 @@ class CharacterImageViewSet(viewsets.ModelViewSet):
                 other.save(update_fields=["is_main"])
 
         if instance.image:
+            delete_renditions(instance.image.storage, instance.renditions)
             instance.image.delete()
 
         instance.delete()
@@ -28,10 +28,12 @@ from ..character_image_limits import (
 )
 from ..character_models import CharacterEquipment6th, CharacterSkill6th, GrowthRecord
 from ..serializers import CharacterSheetSerializer, CharacterVersionCreateSerializer, GrowthRecordSerializer
+from ..services.character_skill_service import CharacterSkillService
 from ..services.character_version_service import CharacterVersionService
 from .base_views import BaseViewSet, PermissionMixin
 from .common_imports import *
 from .mixins import CharacterNestedResourceMixin, CharacterSheetAccessMixin, ErrorHandlerMixin
+from .pagination import OptionalKeysetPaginationMixin
 
 logger = logging.getLogger(__name__)
 
@@ -157,8 +159,9 @@ class CharacterSheetViewSet(CharacterSheetAccessMixin, PermissionMixin, viewsets
     permission_classes = [IsAuthenticated]
     lookup_value_regex = r"\d+"
 
-    class OptionalPagination(PageNumberPagination):
+    class OptionalPagination(OptionalKeysetPaginationMixin, PageNumberPagination):
         page_size = None
+        keyset_ordering = ("-updated_at", "-id")
         page_size_query_param = "page_size"
         max_page_size = 100
 
@@ -204,7 +207,7 @@ class CharacterSheetViewSet(CharacterSheetAccessMixin, PermissionMixin, viewsets
             return Response({"error": "edition parameter is required (6th or 7th)"}, status=status.HTTP_400_BAD_REQUEST)
 
         queryset = self.get_queryset().filter(edition=edition)
-        serializer = CharacterSheetListSerializer(queryset, many=True)
+        serializer = CharacterSheetListSerializer(queryset, many=True, context={"request": request})
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
@@ -213,7 +216,7 @@ class CharacterSheetViewSet(CharacterSheetAccessMixin, PermissionMixin, viewsets
         queryset = self.get_queryset().filter(
             Q(sixth_edition_data__is_active=True) | Q(seventh_edition_data__is_active=True)
         )
-        serializer = CharacterSheetListSerializer(queryset, many=True)
+        serializer = CharacterSheetListSerializer(queryset, many=True, context={"request": request})
         return Response(serializer.data)
 
     @action(detail=True, methods=["post"])
@@ -235,25 +238,12 @@ class CharacterSheetViewSet(CharacterSheetAccessMixin, PermissionMixin, viewsets
         """Get character sheet version history"""
         sheet = self.get_object()
 
-        detail = sheet.system_data
-        root = detail
-        while root.parent_data_id:
-            root = root.parent_data
-
-        def belongs_to_root(candidate):
-            while candidate.parent_data_id:
-                candidate = candidate.parent_data
-            return candidate.pk == root.pk
-
         all_versions = [
             candidate.character_sheet
-            for candidate in detail.__class__.objects.select_related("character_sheet", "parent_data").order_by(
-                "version"
-            )
-            if belongs_to_root(candidate)
+            for candidate in sheet.system_data.lineage().select_related("character_sheet").order_by("version", "pk")
         ]
 
-        serializer = CharacterSheetListSerializer(all_versions, many=True)
+        serializer = CharacterSheetListSerializer(all_versions, many=True, context={"request": request})
         return Response(serializer.data)
 
     @action(detail=True, methods=["post"])
@@ -1607,11 +1597,6 @@ class CharacterSheetViewSet(CharacterSheetAccessMixin, PermissionMixin, viewsets
         if not allocations:
             return Response({"error": "allocations or skills are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        updated_count = 0
-        total_occupation_used = 0
-        total_hobby_used = 0
-        errors = []
-
         def coerce_int(value, field_name):
             if value in [None, "", "null", "None"]:
                 return 0
@@ -1623,60 +1608,39 @@ class CharacterSheetViewSet(CharacterSheetAccessMixin, PermissionMixin, viewsets
                 except (TypeError, ValueError):
                     raise DRFValidationError({field_name: "有効な数値を指定してください"})
 
+        entries = []
         for allocation in allocations:
             skill_id = allocation.get("skill_id")
             skill_name = allocation.get("skill_name")
-            base_value_present = "base_value" in allocation
-            base_value = allocation.get("base_value", 0)
-            occupation_points = allocation.get("occupation_points", 0)
-            interest_points = allocation.get("interest_points", 0)
-            other_points = allocation.get("other_points", 0)
+            if not skill_id and not skill_name:
+                continue
 
             try:
-                base_value = coerce_int(base_value, "base_value")
-                occupation_points = coerce_int(occupation_points, "occupation_points")
-                interest_points = coerce_int(interest_points, "interest_points")
-                other_points = coerce_int(other_points, "other_points")
+                entry = {
+                    field: coerce_int(allocation.get(field, 0), field)
+                    for field in ("occupation_points", "interest_points", "other_points")
+                }
+                if "base_value" in allocation:
+                    entry["base_value"] = coerce_int(allocation["base_value"], "base_value")
             except DRFValidationError as exc:
                 return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
 
             if skip_point_validation:
-                interest_points = (interest_points // 10) * 10
-
-            if not skill_id and not skill_name:
-                continue
-
+                entry["interest_points"] = (entry["interest_points"] // 10) * 10
             if skill_id:
-                try:
-                    skill = sheet.system_data.skills.get(id=skill_id)
-                except sheet.system_data.skills.model.DoesNotExist:
-                    continue
+                entry["id"] = skill_id
             else:
-                skill, _ = self._get_or_create_skill_with_retry(
-                    sheet=sheet,
-                    skill_name=skill_name,
-                    base_value=base_value if base_value_present else 0,
-                    skip_point_validation=skip_point_validation,
-                )
-
-            if base_value_present:
-                skill.base_value = base_value
-
-            skill.occupation_points = occupation_points
-            skill.interest_points = interest_points
-            skill.other_points = other_points
-            try:
-                self._save_skill_with_retry(skill, skip_point_validation=skip_point_validation)
-            except ValidationError as exc:
-                errors.append(str(exc))
-                break
-
-            updated_count += 1
-            total_occupation_used += occupation_points
-            total_hobby_used += interest_points
+                entry["skill_name"] = skill_name
+            entries.append(entry)
 
-        if errors:
-            return Response({"error": errors[0]}, status=status.HTTP_400_BAD_REQUEST)
+        # 対象技能の読み込み・ポイント検証・書き込みをそれぞれ一括で行う
+        try:
+            updated, created = CharacterSkillService.bulk_write(
+                sheet.system_data, entries, enforce_point_limits=not skip_point_validation
+            )
+        except ValidationError as exc:
+            return Response({"error": exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        updated_count = len(updated) + len(created)
 
         # 残りポイントを計算
         remaining_occupation = sheet.system_data.calculate_remaining_occupation_points()
@@ -2348,55 +2312,36 @@ class CharacterSkillViewSet(CharacterNestedResourceMixin, ErrorHandlerMixin, vie
 
         detail = character_sheet.system_data
         skill_model = detail.skills.model
+        updatable_fields = ["base_value", "occupation_points", "interest_points", "bonus_points", "other_points"]
 
-        updated_skills = []
-        created_skills = []
-
+        entries = []
         for skill_data in skills_data:
             skill_id = skill_data.get("id")
-
             if skill_id:
-                # Update existing skill
-                try:
-                    skill = skill_model.objects.get(id=skill_id, character_sheet=detail)
-
-                    # Process updatable fields only
-                    updatable_fields = [
-                        "base_value",
-                        "occupation_points",
-                        "interest_points",
-                        "bonus_points",
-                        "other_points",
-                    ]
-
-                    for field in updatable_fields:
-                        if field in skill_data:
-                            setattr(skill, field, skill_data[field])
+                # Update existing skill (updatable fields only)
+                entries.append({"id": skill_id, **{f: skill_data[f] for f in updatable_fields if f in skill_data}})
+                continue
 
-                    skill.save()
-                    updated_skills.append(skill)
+            # Create new custom skill
+            skill_name = (skill_data.get("skill_name") or "").strip()
+            if skill_name:
+                entries.append(
+                    {
+                        "skill_name": skill_name,
+                        "category": skill_data.get("category", "特殊・その他"),
+                        "base_value": skill_data.get("base_value", 5),
+                        "occupation_points": skill_data.get("occupation_points", 0),
+                        "interest_points": skill_data.get("interest_points", 0),
+                        "bonus_points": skill_data.get("bonus_points", 0),
+                        "other_points": skill_data.get("other_points", 0),
+                        "notes": skill_data.get("notes", ""),
+                    }
+                )
 
-                except skill_model.DoesNotExist:
-                    continue
-            else:
-                # Create new custom skill
-                skill_name = skill_data.get("skill_name")
-                if skill_name and skill_name.strip():
-                    try:
-                        skill = skill_model.create_custom_skill(
-                            character_sheet=detail,
-                            skill_name=skill_name,
-                            category=skill_data.get("category", "特殊・その他"),
-                            base_value=skill_data.get("base_value", 5),
-                            occupation_points=skill_data.get("occupation_points", 0),
-                            interest_points=skill_data.get("interest_points", 0),
-                            bonus_points=skill_data.get("bonus_points", 0),
-                            other_points=skill_data.get("other_points", 0),
-                            notes=skill_data.get("notes", ""),
-                        )
-                        created_skills.append(skill)
-                    except Exception:
-                        continue
+        try:
+            updated_skills, created_skills = CharacterSkillService.bulk_write(detail, entries, update_by_name=False)
+        except ValidationError as exc:
+            return self.handle_validation_error(details=exc.message_dict)
 
         all_skills = updated_skills + created_skills
         serializer = CharacterSkillSerializer(all_skills, many=True)
@@ -0,0 +1,181 @@
+"""
+キーセット（カーソル）方式のページネーション
+
+OFFSET を使わず「前ページ最終行のソートキーより後ろ」を条件に取得するため、
+深いページでも取得コストが一定になる。既存の limit/offset・page 方式との互換のため、
+リクエストに cursor パラメータがあるときだけ有効になる（空の cursor は先頭ページ）。
+
+総件数は既定では返さない（total=approximate で上限付きの件数、total=exact で COUNT(*)）。
+"""
+
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def _cursor_value(value):
+    # DjangoJSONEncoder はマイクロ秒を丸めるため、日時は isoformat をそのまま使う
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class KeysetPagination(BasePagination):
+    """(ソートキー..., id) の順序で次ページを取得するカーソル型ページネーション
+
+    ordering は "-date" のような order_by 形式で、最後は一意な列（id）にする。
+    NULL はどちらの向きでも末尾に並べ、カーソル値が NULL の列は同値（IS NULL）として扱う。
+    ビューに get_keyset_ordering() があればそちらの並び順を使う。
+    """
+
+    cursor_query_param = "cursor"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    total_query_param = "total"
+    approximate_total_limit = 1000
+    ordering = ("-id",)
+    invalid_cursor_message = "カーソルが不正です"
+
+    def __init__(self, *, ordering=None, page_size=None, page_size_query_param=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        if page_size is not None:
+            self.page_size = page_size
+        if page_size_query_param is not None:
+            self.page_size_query_param = page_size_query_param
+
+    @classmethod
+    def is_requested(cls, request):
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None, row_filter=None):
+        """1ページ分の行を返す。cursor パラメータが無い場合は None（ページネーションしない）
+
+        row_filter を渡すと取得した行をさらに絞り込み、ページが埋まるまで続きを取得する。
+        """
+        if not self.is_requested(request):
+            return None
+
+        if view is not None and hasattr(view, "get_keyset_ordering"):
+            self.ordering = tuple(view.get_keyset_ordering())
+        self.request = request
+        self.limit = self._get_page_size(request)
+        self.total = self._get_total(queryset, request)
+
+        ordered = queryset.order_by(*(self._order_expression(field) for field in self.ordering))
+        position = self._decode_cursor(request.query_params.get(self.cursor_query_param))
+        rows = []
+        while True:
+            chunk = list(self._after(ordered, position)[: self.limit + 1])
+            if not chunk:
+                break
+            rows.extend(row_filter(chunk) if row_filter else chunk)
+            if len(rows) > self.limit or len(chunk) <= self.limit:
+                break
+            position = self._position(chunk[-1])
+
+        self.has_next = len(rows) > self.limit
+        page = rows[: self.limit]
+        self.next_cursor = self._encode_cursor(self._position(page[-1])) if self.has_next else None
+        return page
+
+    def get_paginated_data(self, data):
+        payload = {"results": data, "next_cursor": self.next_cursor, "has_next": self.has_next}
+        if self.total is not None:
+            payload.update(self.total)
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def _get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size < 1:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def _get_total(self, queryset, request):
+        mode = request.query_params.get(self.total_query_param, "")
+        if mode == "exact":
+            return {"count": queryset.count(), "count_is_estimate": False}
+        if mode == "approximate":
+            # 上限までしか数えない（上限に達した場合は「以上」の意味で返す）
+            limit = self.approximate_total_limit
+            count = queryset.order_by()[: limit + 1].count()
+            return {"count": min(count, limit), "count_is_estimate": count > limit}
+        return None
+
+    @staticmethod
+    def _order_expression(field):
+        if field.startswith("-"):
+            return F(field[1:]).desc(nulls_last=True)
+        return F(field).asc(nulls_last=True)
+
+    def _position(self, row):
+        return [getattr(row, field.lstrip("-")) for field in self.ordering]
+
+    def _after(self, queryset, position):
+        """ソートキーが position より後ろの行に絞り込む"""
+        if position is None:
+            return queryset
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            if value is not None:
+                lookup = "lt" if field.startswith("-") else "gt"
+                # NULL は末尾に並ぶため、非NULLのカーソルより後ろに含める
+                condition |= equal & (Q(**{f"{name}__{lookup}": value}) | Q(**{f"{name}__isnull": True}))
+                equal &= Q(**{name: value})
+            else:
+                equal &= Q(**{f"{name}__isnull": True})
+        try:
+            return queryset.filter(condition)
+        except (TypeError, ValueError, ValidationError):
+            # 改ざんされたカーソルの値が列の型に合わない
+            raise NotFound(self.invalid_cursor_message)
+
+    def _encode_cursor(self, position):
+        raw = json.dumps(position, default=_cursor_value, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def _decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            position = json.loads(raw)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class OptionalKeysetPaginationMixin:
+    """cursor パラメータがあるときだけキーセット方式に切り替える（PageNumberPagination と組み合わせる）"""
+
+    keyset_ordering = ("-id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.is_requested(request):
+            self.keyset = KeysetPagination(ordering=self.keyset_ordering, page_size=self.page_size or None)
+            self.keyset.max_page_size = self.max_page_size or KeysetPagination.max_page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scenarios", "0010_scenario_share_token"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scenarioimage",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, help_text="リサイズ版（WebP/JPEG）の保存先"),
+        ),
+    ]
@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 from django.utils import timezone
 
+from accounts.image_renditions import delete_renditions, discard_stored_renditions, queue_renditions
 from accounts.models import CustomUser
 
 SKILL_LEVEL_CHOICES = [
@@ -234,6 +235,7 @@ class ScenarioImage(models.Model):
         null=True,
         related_name="uploaded_scenario_images",
     )
+    renditions = models.JSONField(default=dict, blank=True, help_text="リサイズ版（WebP/JPEG）の保存先")
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -255,7 +257,14 @@ class ScenarioImage(models.Model):
                 max_order=models.Max("order"),
             )["max_order"]
             self.order = (max_order or 0) + 1
+        # 新しい画像ファイルのときはリサイズ版を作り直す
+        new_upload = bool(self.image) and not self.image._committed
+        if new_upload:
+            discard_stored_renditions(self)
+            self.renditions = {}
         super().save(*args, **kwargs)
+        if new_upload:
+            queue_renditions(self)
 
     def delete(self, *args, **kwargs):
         """削除時に画像ファイルも削除"""
@@ -265,6 +274,7 @@ class ScenarioImage(models.Model):
                     self.image.delete(save=False)
             except Exception:
                 pass
+            delete_renditions(self.image.storage, self.renditions)
         super().delete(*args, **kwargs)
 
 
@@ -2,6 +2,7 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from accounts.image_renditions import rendition_url, rendition_urls
 from accounts.serializers import UserSerializer, validate_character_image
 from schedules.duration import effective_duration_expression
 
@@ -21,6 +22,8 @@ class ScenarioImageSerializer(serializers.ModelSerializer):
 
     uploaded_by_detail = UserSerializer(source="uploaded_by", read_only=True)
     image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = ScenarioImage
@@ -28,6 +31,8 @@ class ScenarioImageSerializer(serializers.ModelSerializer):
             "id",
             "image",
             "image_url",
+            "thumbnail_url",
+            "renditions",
             "title",
             "description",
             "order",
@@ -47,6 +52,18 @@ class ScenarioImageSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    @extend_schema_field(OpenApiTypes.URI)
+    def get_thumbnail_url(self, obj):
+        url = rendition_url(obj.image, obj.renditions)
+        if not url:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_renditions(self, obj):
+        return rendition_urls(obj.image, obj.renditions, self.context.get("request"))
+
     def validate_image(self, value):
         return validate_character_image(value)
 
@@ -0,0 +1,299 @@
+"""
+セッション分析ダッシュボードの集計とグループ月別パーシャル（GroupAnalyticsMonth）の更新
+
+日程数・時間・月別推移・時間帯・GM負荷・参加回数・同卓回数を「パーシャル」として集計し、
+ダッシュボードは期間内のパーシャルを足し合わせて表示する。
+
+グループ指定時は (グループ, 月) 単位で、締まった月（当月より前）のパーシャルだけを保存する。
+当月と期間の端で一部だけ含まれる月はその場で集計する。
+セッション・日程・参加者の変更時は該当する (グループ, 月) のパーシャルを削除し、次回の表示で再集計する。
+"""
+
+import heapq
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import reduce
+from itertools import combinations
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, TruncMonth
+from django.utils import timezone
+
+from .duration import effective_duration_expression
+from .models import GroupAnalyticsMonth, SessionOccurrence, SessionParticipant, TRPGSession
+from .stats_rollups import period_of
+
+# 参加者の読み込みを区切るセッション数（IN 句のパラメータ数の上限対策も兼ねる）
+ANALYTICS_SESSION_BATCH_SIZE = 500
+ANALYTICS_SESSION_FIELDS = frozenset(
+    {"group", "group_id", "gm", "gm_id", "duration_minutes", "actual_duration_minutes"}
+)
+
+
+@dataclass
+class AnalyticsTotals:
+    """パーシャルを足し合わせた集計値"""
+
+    occurrences: int = 0
+    total_minutes: int = 0
+    participant_total: int = 0
+    session_ids: set = field(default_factory=set)
+    months: dict = field(default_factory=dict)
+    hours: Counter = field(default_factory=Counter)
+    gm_load: dict = field(default_factory=dict)
+    user_counts: Counter = field(default_factory=Counter)
+    pair_counts: Counter = field(default_factory=Counter)
+
+    def add(self, partial):
+        self.occurrences += partial["occurrences"]
+        self.total_minutes += partial["total_minutes"]
+        self.participant_total += partial["participant_total"]
+        self.session_ids.update(partial["sessions"])
+        for month, occurrences, minutes in partial["months"]:
+            totals = self.months.setdefault(month, [0, 0])
+            totals[0] += occurrences
+            totals[1] += minutes
+        for hour, occurrences in partial["hours"]:
+            self.hours[hour] += occurrences
+        for gm_id, occurrences, minutes in partial["gm_load"]:
+            totals = self.gm_load.setdefault(gm_id, [0, 0])
+            totals[0] += occurrences
+            totals[1] += minutes
+        for user_id, occurrences in partial["users"]:
+            self.user_counts[user_id] += occurrences
+        for user1_id, user2_id, occurrences in partial["pairs"]:
+            self.pair_counts[(user1_id, user2_id)] += occurrences
+        return self
+
+    def top_pairs(self, limit):
+        return heapq.nsmallest(limit, self.pair_counts.items(), key=lambda item: (-item[1], item[0][0], item[0][1]))
+
+
+def _session_members(session_ids):
+    """GMと参加ユーザー（ゲストを除く）のIDをセッションごとに集める"""
+    members = {session_id: set() for session_id in session_ids}
+    gm_rows = TRPGSession.objects.filter(id__in=session_ids, gm_id__isnull=False).values_list("id", "gm_id")
+    participant_rows = SessionParticipant.objects.filter(session_id__in=session_ids, user_id__isnull=False).values_list(
+        "session_id", "user_id"
+    )
+    for session_id, user_id in (*gm_rows, *participant_rows):
+        members[session_id].add(user_id)
+    return members
+
+
+def _co_play_counts(session_weights):
+    """参加回数・同卓ペア数をセッション単位で集計し、日程数で重み付けする
+
+    モデルを組み立てずIDだけを一定件数ずつ読み込むため、メモリ使用量は
+    バッチサイズとユーザー・ペア数に比例する。
+    """
+    participant_total = 0
+    user_counts = Counter()
+    pair_counts = Counter()
+    session_ids = sorted(session_weights)
+    for start in range(0, len(session_ids), ANALYTICS_SESSION_BATCH_SIZE):
+        members = _session_members(session_ids[start : start + ANALYTICS_SESSION_BATCH_SIZE])
+        for session_id, user_ids in members.items():
+            weight = session_weights[session_id]
+            user_ids = sorted(user_ids)
+            participant_total += len(user_ids) * weight
+            for user_id in user_ids:
+                user_counts[user_id] += weight
+            for pair in combinations(user_ids, 2):
+                pair_counts[pair] += weight
+    return participant_total, user_counts, pair_counts
+
+
+def _empty_partial():
+    return {
+        "occurrences": 0,
+        "total_minutes": 0,
+        "participant_total": 0,
+        "sessions": [],
+        "months": [],
+        "hours": [],
+        "gm_load": [],
+        "users": [],
+        "pairs": [],
+    }
+
+
+def compute_partial(occurrences):
+    """日程のクエリセットからパーシャル（JSONに保存できる dict）を集計する"""
+    occurrences = occurrences.order_by()
+    session_weights = {
+        row["session_id"]: row["occurrences"]
+        for row in occurrences.values("session_id").annotate(occurrences=Count("id"))
+    }
+    if not session_weights:
+        return _empty_partial()
+
+    months = [
+        [row["month"].strftime("%Y-%m"), row["occurrences"], int(row["minutes"] or 0)]
+        for row in occurrences.annotate(month=TruncMonth("start_at"))
+        .values("month")
+        .annotate(occurrences=Count("id"), minutes=Sum(effective_duration_expression("session__")))
+    ]
+    hours = [
+        [row["hour"], row["occurrences"]]
+        for row in occurrences.annotate(hour=ExtractHour("start_at", tzinfo=timezone.get_current_timezone()))
+        .values("hour")
+        .annotate(occurrences=Count("id"))
+    ]
+    gm_load = [
+        [row["session__gm_id"], row["occurrences"], int(row["minutes"] or 0)]
+        for row in occurrences.values("session__gm_id").annotate(
+            occurrences=Count("id"), minutes=Sum(effective_duration_expression("session__"))
+        )
+    ]
+    participant_total, user_counts, pair_counts = _co_play_counts(session_weights)
+    return {
+        "occurrences": sum(session_weights.values()),
+        "total_minutes": sum(minutes for _, _, minutes in months),
+        "participant_total": participant_total,
+        "sessions": sorted(session_weights),
+        "months": months,
+        "hours": hours,
+        "gm_load": gm_load,
+        "users": [[user_id, count] for user_id, count in user_counts.items()],
+        "pairs": [[user1_id, user2_id, count] for (user1_id, user2_id), count in pair_counts.items()],
+    }
+
+
+def _month_start(value):
+    value = timezone.localtime(value)
+    return timezone.make_aware(datetime(value.year, value.month, 1), timezone.get_current_timezone())
+
+
+def _next_month(month_start):
+    year, month = month_start.year, month_start.month
+    return timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1), timezone.get_current_timezone())
+
+
+def _occurrences_between(start, end_exclusive):
+    return SessionOccurrence.objects.filter(start_at__gte=start, start_at__lt=end_exclusive)
+
+
+def _group_occurrences(group_id, start, end_exclusive):
+    return _occurrences_between(start, end_exclusive).filter(session__group_id=group_id)
+
+
+def group_totals(group_id, start, end_exclusive, now=None):
+    """グループの期間集計を、保存済みの月別パーシャルとその場で集計した端の月から作る"""
+    current_month = _month_start(now or timezone.now())
+    closed_months = []
+    live_ranges = []
+    month = _month_start(start)
+    while month < end_exclusive:
+        next_month = _next_month(month)
+        segment_start, segment_end = max(start, month), min(end_exclusive, next_month)
+        if (segment_start, segment_end) == (month, next_month) and next_month <= current_month:
+            closed_months.append(month)
+        elif live_ranges and live_ranges[-1][1] == segment_start:
+            # 当月以降が続く場合は1区間にまとめて集計する
+            live_ranges[-1] = (live_ranges[-1][0], segment_end)
+        else:
+            live_ranges.append((segment_start, segment_end))
+        month = next_month
+
+    totals = AnalyticsTotals()
+    stored = {}
+    if closed_months:
+        rows = GroupAnalyticsMonth.objects.filter(
+            reduce(or_, (Q(year=month.year, month=month.month) for month in closed_months)),
+            group_id=group_id,
+        ).values_list("year", "month", "data")
+        stored = {(year, month): data for year, month, data in rows}
+
+    missing = []
+    for month in closed_months:
+        partial = stored.get((month.year, month.month))
+        if partial is None:
+            partial = compute_partial(_group_occurrences(group_id, month, _next_month(month)))
+            missing.append(GroupAnalyticsMonth(group_id=group_id, year=month.year, month=month.month, data=partial))
+        totals.add(partial)
+    if missing:
+        GroupAnalyticsMonth.objects.bulk_create(missing, ignore_conflicts=True)
+
+    for segment_start, segment_end in live_ranges:
+        totals.add(compute_partial(_group_occurrences(group_id, segment_start, segment_end)))
+    return totals
+
+
+def _delete_partials(group_periods):
+    if not group_periods:
+        return
+    condition = reduce(
+        or_,
+        (
+            Q(group_id=group_id, year=year, month=month)
+            for group_id, periods in group_periods.items()
+            for year, month in periods
+        ),
+    )
+    GroupAnalyticsMonth.objects.filter(condition).delete()
+
+
+def invalidate(group_periods):
+    """{group_id: {(year, month), ...}} のパーシャルを削除する
+
+    変更中のトランザクションと並行して古い状態が保存される場合に備え、コミット時にも削除する。
+    """
+    group_periods = {group_id: set(periods) for group_id, periods in group_periods.items() if group_id and periods}
+    if not group_periods:
+        return
+    _delete_partials(group_periods)
+    transaction.on_commit(lambda: _delete_partials(group_periods))
+
+
+def invalidate_for_sessions(session_ids, extra_group_ids=()):
+    """セッションの日程がある月のパーシャルを削除する（extra_group_ids は変更前のグループなど）"""
+    group_periods = {}
+    rows = SessionOccurrence.objects.filter(session_id__in=session_ids).values_list("session__group_id", "start_at")
+    periods = set()
+    for group_id, start_at in rows:
+        period = period_of(start_at)
+        periods.add(period)
+        group_periods.setdefault(group_id, set()).add(period)
+    for group_id in extra_group_ids:
+        group_periods.setdefault(group_id, set()).update(periods)
+    invalidate(group_periods)
+
+
+def invalidate_for_occurrence(occurrence, previous=None):
+    """日程の追加・変更・削除で影響する (グループ, 月) のパーシャルを削除する"""
+    states = [{"session_id": occurrence.session_id, "start_at": occurrence.start_at}]
+    if previous:
+        states.append(previous)
+    session_groups = dict(
+        TRPGSession.objects.filter(pk__in={state["session_id"] for state in states}).values_list("id", "group_id")
+    )
+    group_periods = {}
+    for state in states:
+        group_id = session_groups.get(state["session_id"])
+        group_periods.setdefault(group_id, set()).add(period_of(state["start_at"]))
+    invalidate(group_periods)
+
+
+def rebuild_group_partials(group_ids=None, months=12, now=None):
+    """直近 months か月分の締まった月のパーシャルを再集計する（group_ids 未指定時は日程のある全グループ）"""
+    current_month = _month_start(now or timezone.now())
+    start = current_month
+    for _ in range(months):
+        start = _month_start(start - timedelta(days=1))
+    if group_ids is None:
+        group_ids = set(
+            _occurrences_between(start, current_month)
+            .filter(session__group_id__isnull=False)
+            .values_list("session__group_id", flat=True)
+            .distinct()
+        )
+
+    with transaction.atomic():
+        GroupAnalyticsMonth.objects.filter(group_id__in=group_ids).delete()
+        for group_id in group_ids:
+            group_totals(group_id, start, current_month, now=now)
+    return GroupAnalyticsMonth.objects.filter(group_id__in=group_ids).count()
@@ -1,23 +1,22 @@
 from __future__ import annotations
 
-from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
-from typing import Any
 
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounts.models import Group
-from schedules.duration import effective_duration_expression
+from accounts.models import CustomUser, Group
 
+from . import analytics_partials
 from .models import SessionOccurrence
+from .response_cache import cache_schedule_response
 from .views import _visible_sessions_for
 
+TOP_PAIRS_LIMIT = 30
+
 
 def _display_name(user) -> str:
     return user.nickname or user.username
@@ -64,6 +63,7 @@ def _parse_date_range(params) -> _DateRange:
 class SessionAnalyticsDashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_schedule_response("session-analytics")
     def get(self, request):
         user = request.user
 
@@ -84,67 +84,28 @@ class SessionAnalyticsDashboardView(APIView):
             if not group.members.filter(id=user.id).exists():
                 return Response({"error": "Permission denied"}, status=403)
 
-        visible_sessions = _visible_sessions_for(user)
         if group is not None:
-            visible_sessions = visible_sessions.filter(group_id=group.id)
-
-        occurrences_qs = (
-            SessionOccurrence.objects.filter(
-                session__in=visible_sessions,
+            # グループメンバーはグループの全セッションを閲覧できるため、ユーザーに依存しない月別パーシャルを使う
+            totals = analytics_partials.group_totals(group.id, date_range.start, date_range.end_exclusive)
+        else:
+            occurrences_qs = SessionOccurrence.objects.filter(
+                session__in=_visible_sessions_for(user),
                 start_at__gte=date_range.start,
                 start_at__lt=date_range.end_exclusive,
             )
-            .select_related("session", "session__gm", "session__group")
-            .prefetch_related("session__sessionparticipant_set__user")
-            .order_by("start_at", "id")
-        )
-
-        occurrences_count = occurrences_qs.count()
-        sessions_count = occurrences_qs.values("session_id").distinct().count()
+            totals = analytics_partials.AnalyticsTotals().add(analytics_partials.compute_partial(occurrences_qs))
 
-        aggregates = occurrences_qs.aggregate(
-            total_minutes=Sum(effective_duration_expression("session__")),
-        )
-        total_minutes = int(aggregates["total_minutes"] or 0)
+        occurrences_count = totals.occurrences
+        sessions_count = len(totals.session_ids)
+        total_minutes = totals.total_minutes
         total_hours = round(total_minutes / 60, 1) if total_minutes else 0.0
 
         group_member_count = group.members.count() if group is not None else None
 
-        hour_buckets: dict[int, int] = defaultdict(int)
-        user_occurrence_counts: dict[int, int] = defaultdict(int)
-        user_meta: dict[int, Any] = {}
-        pair_counts: dict[tuple[int, int], int] = defaultdict(int)
-        participant_total = 0
-        participation_rate_total = 0.0
-
-        occurrences = list(occurrences_qs)
-        for occurrence in occurrences:
-            session = occurrence.session
-            participants = [p.user for p in session.sessionparticipant_set.all() if p.user_id is not None]
-            users = [session.gm] + participants
-
-            unique_users = {}
-            for u in users:
-                unique_users[u.id] = u
-
-            user_ids = sorted(unique_users.keys())
-            participant_count = len(user_ids)
-            participant_total += participant_count
-
-            if group_member_count:
-                participation_rate_total += participant_count / max(group_member_count, 1)
-
-            local_hour = timezone.localtime(occurrence.start_at).hour
-            hour_buckets[local_hour] += 1
-
-            for user_id in user_ids:
-                user_occurrence_counts[user_id] += 1
-                if user_id not in user_meta:
-                    user_meta[user_id] = unique_users[user_id]
-
-            for i, a in enumerate(user_ids):
-                for b in user_ids[i + 1 :]:
-                    pair_counts[(a, b)] += 1
+        participant_total = totals.participant_total
+        participation_rate_total = participant_total / max(group_member_count, 1) if group_member_count else 0.0
+        user_ids = set(totals.user_counts) | {gm_id for gm_id in totals.gm_load if gm_id is not None}
+        user_meta = CustomUser.objects.only("id", "username", "nickname").in_bulk(list(user_ids))
 
         avg_participants = round(participant_total / occurrences_count, 1) if occurrences_count else 0.0
         avg_participation_rate = (
@@ -154,54 +115,34 @@ class SessionAnalyticsDashboardView(APIView):
         )
         avg_duration_minutes = round(total_minutes / occurrences_count, 1) if occurrences_count else 0.0
 
-        popular_hours = [{"hour": hour, "count": hour_buckets[hour]} for hour in sorted(hour_buckets.keys())]
+        popular_hours = [{"hour": hour, "count": totals.hours[hour]} for hour in sorted(totals.hours.keys())]
 
-        monthly_trend_qs = (
-            occurrences_qs.annotate(month=TruncMonth("start_at"))
-            .values("month")
-            .annotate(
-                occurrences=Count("id"),
-                total_minutes=Sum(effective_duration_expression("session__")),
-            )
-            .order_by("month")
-        )
         monthly_trend = []
-        for row in monthly_trend_qs:
-            month = row["month"]
-            month_key = month.strftime("%Y-%m") if month else None
-            minutes = int(row["total_minutes"] or 0)
+        for month_key, (occurrences, minutes) in sorted(totals.months.items()):
             monthly_trend.append(
                 {
                     "month": month_key,
-                    "occurrences": int(row["occurrences"] or 0),
+                    "occurrences": occurrences,
                     "total_hours": round(minutes / 60, 1) if minutes else 0.0,
                 }
             )
 
-        gm_load_qs = (
-            occurrences_qs.values("session__gm_id", "session__gm__username", "session__gm__nickname")
-            .annotate(
-                occurrences=Count("id"),
-                total_minutes=Sum(effective_duration_expression("session__")),
-            )
-            .order_by("-total_minutes", "-occurrences")
-        )
         gm_load = []
-        for row in gm_load_qs:
-            gm_id = row["session__gm_id"]
-            gm_name = row["session__gm__nickname"] or row["session__gm__username"]
-            minutes = int(row["total_minutes"] or 0)
+        for gm_id, (occurrences, minutes) in sorted(
+            totals.gm_load.items(), key=lambda item: (-item[1][1], -item[1][0], item[0] or 0)
+        ):
+            gm = user_meta.get(gm_id)
             gm_load.append(
                 {
                     "gm_id": gm_id,
-                    "gm_name": gm_name,
-                    "occurrences": int(row["occurrences"] or 0),
+                    "gm_name": _display_name(gm) if gm else None,
+                    "occurrences": occurrences,
                     "total_hours": round(minutes / 60, 1) if minutes else 0.0,
                 }
             )
 
         top_pairs = []
-        for (a, b), count in sorted(pair_counts.items(), key=lambda item: (-item[1], item[0][0], item[0][1]))[:30]:
+        for (a, b), count in totals.top_pairs(TOP_PAIRS_LIMIT):
             user_a = user_meta.get(a)
             user_b = user_meta.get(b)
             top_pairs.append(
@@ -215,7 +156,7 @@ class SessionAnalyticsDashboardView(APIView):
             )
 
         member_participation = []
-        for user_id, count in sorted(user_occurrence_counts.items(), key=lambda item: (-item[1], item[0])):
+        for user_id, count in sorted(totals.user_counts.items(), key=lambda item: (-item[1], item[0])):
             member_participation.append(
                 {
                     "user_id": user_id,
@@ -1,5 +1,8 @@
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
+from .notification_counters import get_unread_count
+
 
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
@@ -19,6 +22,12 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         if group:
             await self.channel_layer.group_discard(group, self.channel_name)
 
+    async def receive_json(self, content, **kwargs):
+        # クライアントからの再同期要求（再接続時など）には未読数カウンターの値を返す
+        if content.get("type") == "notification.unread_count":
+            unread_count = await database_sync_to_async(get_unread_count)(self.scope["user"].pk)
+            await self.send_json({"type": "notification.unread_count", "unread_count": unread_count})
+
     async def notification_created(self, event):
         await self.send_json(
             {
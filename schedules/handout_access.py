@@ -1,20 +1,97 @@
+from dataclasses import dataclass
+
 from schedules import session_permissions
-from schedules.models import HandoutInfo, SessionParticipant, TRPGSession
+from schedules.models import HandoutInfo, SessionParticipantRole, TRPGSession
 
+# 変更されると閲覧できるユーザーが変わるハンドアウトの列
+HANDOUT_VISIBILITY_FIELDS = frozenset(
+    {"session", "session_id", "participant", "participant_id", "is_secret", "assigned_player_slot"}
+)
 
-def can_view_handout(handout: HandoutInfo, user) -> bool:
-    if not user or not user.is_authenticated:
+
+@dataclass(frozen=True)
+class HandoutViewer:
+    """セッション内でのユーザーの立場（ハンドアウトの閲覧判定をメモリ上で行うための事前解決結果）"""
+
+    can_view_secret: bool = False
+    participant_ids: frozenset = frozenset()
+    player_slots: frozenset = frozenset()
+
+    def can_view(self, handout: HandoutInfo) -> bool:
+        if self.can_view_secret:
+            return True
+        if handout.participant_id in self.participant_ids:
+            return True
+        if not handout.is_secret:
+            return bool(self.participant_ids)
+        if handout.assigned_player_slot:
+            return handout.assigned_player_slot in self.player_slots
         return False
-    if session_permissions.can_view_secret_content(user, handout.session):
-        return True
-    if handout.participant and handout.participant.user_id == user.id:
-        return True
-    if not handout.is_secret:
-        return SessionParticipant.objects.filter(session_id=handout.session_id, user_id=user.id).exists()
-    if handout.assigned_player_slot:
-        return SessionParticipant.objects.filter(
-            session_id=handout.session_id,
-            user_id=user.id,
-            player_slot=handout.assigned_player_slot,
-        ).exists()
-    return False
+
+
+def resolve_handout_viewer(session: TRPGSession, user) -> HandoutViewer:
+    """ユーザーの参加者行とロールからハンドアウトの閲覧条件を解決する
+
+    秘匿情報を閲覧できるのは session_permissions.can_view_secret_content と同じくGM（レガシーGM含む）。
+    sessionparticipant_set（participant_roles 込み）がプリフェッチ済みならクエリを発行しない。
+    それ以外は session_permissions で判定する（リクエスト中は権限キャッシュから答える）。
+    """
+    if not user or not user.is_authenticated:
+        return HandoutViewer()
+    participants = getattr(session, "_prefetched_objects_cache", {}).get("sessionparticipant_set")
+    if participants is None:
+        participant = session_permissions.get_user_participant(user, session)
+        return HandoutViewer(
+            can_view_secret=session_permissions.can_view_secret_content(user, session),
+            participant_ids=frozenset([participant.id]) if participant else frozenset(),
+            player_slots=(
+                frozenset([participant.player_slot]) if participant and participant.player_slot else frozenset()
+            ),
+        )
+    return _viewer_from_participants(session, participants, user.id)
+
+
+def _viewer_from_participants(session: TRPGSession, participants, user_id) -> HandoutViewer:
+    own_participants = [participant for participant in participants if participant.user_id == user_id]
+    is_gm = session.gm_id == user_id or any(
+        role.role == SessionParticipantRole.Role.GM
+        for participant in own_participants
+        for role in participant.participant_roles.all()
+    )
+    return HandoutViewer(
+        can_view_secret=is_gm,
+        participant_ids=frozenset(participant.id for participant in own_participants),
+        player_slots=frozenset(participant.player_slot for participant in own_participants if participant.player_slot),
+    )
+
+
+def can_view_handout(handout: HandoutInfo, user) -> bool:
+    return resolve_handout_viewer(handout.session, user).can_view(handout)
+
+
+def visible_handout_pairs(pairs) -> set:
+    """(user_id, handout_id) の組のうち、ユーザーがハンドアウトを閲覧できる組の集合
+
+    ハンドアウトとセッションの参加者・ロールをまとめて読み、判定はメモリ上で行う（組の数によらず3クエリ）。
+    """
+    pairs = {(user_id, handout_id) for user_id, handout_id in pairs if user_id and handout_id}
+    if not pairs:
+        return set()
+    handouts = (
+        HandoutInfo.objects.select_related("session")
+        .prefetch_related("session__sessionparticipant_set__participant_roles")
+        .in_bulk({handout_id for _, handout_id in pairs})
+    )
+    viewers = {}
+    visible = set()
+    for user_id, handout_id in pairs:
+        handout = handouts.get(handout_id)
+        if handout is None:
+            continue
+        key = (handout.session_id, user_id)
+        if key not in viewers:
+            participants = handout.session.sessionparticipant_set.all()
+            viewers[key] = _viewer_from_participants(handout.session, participants, user_id)
+        if viewers[key].can_view(handout):
+            visible.add((user_id, handout_id))
+    return visible
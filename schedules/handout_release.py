@@ -1,8 +1,15 @@
+import logging
+from collections import defaultdict
+
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 
-from .models import HandoutInfo, HandoutView, SessionParticipantRole
+from .models import HandoutInfo, HandoutReleaseDependency, HandoutView, SessionParticipantRole
+
+logger = logging.getLogger(__name__)
 
 LEAF_TYPES = {
     "datetime_reached",
@@ -11,6 +18,9 @@ LEAF_TYPES = {
     "participant_role",
     "player_slot",
 }
+# 即時評価のために依存インデックスへ登録する条件（値が一致した時にだけ真になる）
+INDEXED_CONDITION_TYPES = frozenset({"session_status", "handout_viewed"})
+DEPENDENCY_HANDOUT_FIELDS = frozenset({"release_conditions", "release_status", "session", "session_id"})
 
 
 def walk_conditions(node):
@@ -89,7 +99,38 @@ def get_next_evaluation_at(conditions):
     return min(values) if values else None
 
 
-def evaluate_release_conditions(handout, now=None):
+def build_release_context(handouts):
+    """評価対象ハンドアウトの役割・閲覧状況をまとめて取得する
+
+    evaluate_release_conditions に渡すと、葉ごとの exists() クエリの代わりに使われる。
+    """
+    participant_ids = set()
+    user_ids = set()
+    viewed_handout_ids = set()
+    for handout in handouts:
+        participant_ids.add(handout.participant_id)
+        if handout.participant.user_id:
+            user_ids.add(handout.participant.user_id)
+        for leaf in walk_conditions(handout.release_conditions):
+            if leaf["type"] == "handout_viewed":
+                viewed_handout_ids.add(int(leaf["value"]))
+
+    roles = defaultdict(set)
+    for participant_id, role in SessionParticipantRole.objects.filter(participant_id__in=participant_ids).values_list(
+        "participant_id", "role"
+    ):
+        roles[participant_id].add(role)
+    views = set()
+    if user_ids and viewed_handout_ids:
+        views = set(
+            HandoutView.objects.filter(user_id__in=user_ids, handout_id__in=viewed_handout_ids).values_list(
+                "user_id", "handout_id"
+            )
+        )
+    return {"roles": roles, "views": views}
+
+
+def evaluate_release_conditions(handout, now=None, context=None):
     now = now or timezone.now()
 
     def evaluate(node):
@@ -106,19 +147,24 @@ def evaluate_release_conditions(handout, now=None):
         if condition_type == "session_status":
             return handout.session.status == value
         if condition_type == "participant_role":
+            role = SessionParticipantRole.Role(value)
+            if context is not None:
+                return role in context["roles"][handout.participant_id]
             return handout.participant.participant_roles.filter(
-                role=SessionParticipantRole.Role(value),
+                role=role,
             ).exists()
         if condition_type == "player_slot":
             return handout.participant.player_slot == int(value)
         if condition_type == "handout_viewed":
-            return (
-                bool(handout.participant.user_id)
-                and HandoutView.objects.filter(
-                    handout_id=value,
-                    user_id=handout.participant.user_id,
-                ).exists()
-            )
+            user_id = handout.participant.user_id
+            if not user_id:
+                return False
+            if context is not None:
+                return (user_id, int(value)) in context["views"]
+            return HandoutView.objects.filter(
+                handout_id=value,
+                user_id=user_id,
+            ).exists()
         return False
 
     return bool(handout.release_conditions) and evaluate(handout.release_conditions)
@@ -153,3 +199,120 @@ def publish_handout(handout):
             f"handout-released:{handout.pk}:{handout.released_at.isoformat()}",
         )
     return True
+
+
+def mark_handouts_for_evaluation(**filters):
+    """公開条件に関わる変更があった待機中ハンドアウトを、次回の定期評価の対象にする"""
+    return HandoutInfo.objects.filter(
+        release_status=HandoutInfo.ReleaseStatus.WAITING,
+        needs_release_evaluation=False,
+        **filters,
+    ).update(needs_release_evaluation=True)
+
+
+def pending_release_handouts(now=None):
+    """評価時刻を過ぎたか、再評価が必要とマークされた待機中ハンドアウト"""
+    now = now or timezone.now()
+    return HandoutInfo.objects.filter(
+        Q(needs_release_evaluation=True) | Q(next_evaluation_at__lte=now),
+        release_status=HandoutInfo.ReleaseStatus.WAITING,
+    )
+
+
+def release_pending_handouts(now=None, handout_ids=None):
+    """対象のハンドアウトだけを評価して公開し、{"evaluated": 件数, "published": 件数} を返す
+
+    handout_ids を渡すと、その中で評価対象になっているものだけを評価する。
+    """
+    now = now or timezone.now()
+    handouts = pending_release_handouts(now)
+    if handout_ids is not None:
+        handouts = handouts.filter(pk__in=handout_ids)
+    handouts = list(handouts.select_related("session", "participant"))
+    if not handouts:
+        return {"evaluated": 0, "published": 0}
+
+    # 評価前にマークを外す（評価中に起きた変更は再びマークされ、次回に評価される）
+    HandoutInfo.objects.filter(pk__in=[handout.pk for handout in handouts]).update(needs_release_evaluation=False)
+    published = 0
+    index = 0
+    try:
+        context = build_release_context(handouts)
+        for index, handout in enumerate(handouts):
+            handout.needs_release_evaluation = False
+            if evaluate_release_conditions(handout, now=now, context=context):
+                published += int(publish_handout(handout))
+                continue
+            next_run = get_next_evaluation_at(handout.release_conditions)
+            if next_run != handout.next_evaluation_at:
+                handout.next_evaluation_at = next_run
+                handout.save(update_fields=["next_evaluation_at", "updated_at"])
+    except Exception:
+        # 未評価の分は次回の定期評価に回す
+        HandoutInfo.objects.filter(pk__in=[item.pk for item in handouts[index:]]).update(needs_release_evaluation=True)
+        raise
+    return {"evaluated": len(handouts), "published": published}
+
+
+def sync_release_dependencies(handout):
+    """待機中ハンドアウトの条件依存インデックスを公開条件に合わせて作り直す"""
+    expected = set()
+    if handout.release_status == HandoutInfo.ReleaseStatus.WAITING and handout.release_conditions:
+        try:
+            leaves = list(walk_conditions(handout.release_conditions))
+        except ValidationError:
+            leaves = []
+        expected = {
+            (handout.session_id, leaf["type"], str(leaf["value"]))
+            for leaf in leaves
+            if leaf["type"] in INDEXED_CONDITION_TYPES
+        }
+
+    current = {
+        (session_id, condition_type, value): row_id
+        for row_id, session_id, condition_type, value in HandoutReleaseDependency.objects.filter(
+            handout_id=handout.pk
+        ).values_list("id", "session_id", "condition_type", "value")
+    }
+    stale_ids = [row_id for key, row_id in current.items() if key not in expected]
+    if stale_ids:
+        HandoutReleaseDependency.objects.filter(id__in=stale_ids).delete()
+    missing = expected - current.keys()
+    if missing:
+        HandoutReleaseDependency.objects.bulk_create(
+            [
+                HandoutReleaseDependency(
+                    handout_id=handout.pk, session_id=session_id, condition_type=condition_type, value=value
+                )
+                for session_id, condition_type, value in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def _release_now(handout_ids):
+    try:
+        release_pending_handouts(handout_ids=handout_ids)
+    except Exception:
+        logger.exception("Unable to evaluate dependent handouts; they are left for the periodic release task.")
+
+
+def release_dependent_handouts(session_id, condition_type, value, **filters):
+    """(セッション, 条件種別, 値) に依存する待機中ハンドアウトを、コミット後に即時評価する
+
+    評価前にマークしておくため、即時評価が失敗しても定期評価で拾われる。
+    """
+    handout_ids = list(
+        HandoutInfo.objects.filter(
+            release_status=HandoutInfo.ReleaseStatus.WAITING,
+            release_dependencies__session_id=session_id,
+            release_dependencies__condition_type=condition_type,
+            release_dependencies__value=str(value),
+            **filters,
+        ).values_list("id", flat=True)
+    )
+    if not handout_ids:
+        return []
+    HandoutInfo.objects.filter(pk__in=handout_ids, needs_release_evaluation=False).update(needs_release_evaluation=True)
+    transaction.on_commit(lambda: _release_now(handout_ids))
+    return handout_ids
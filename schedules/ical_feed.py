@@ -0,0 +1,57 @@
+"""
+iCalendar フィードの配信ヘルパー
+
+iCalエクスポートとカレンダー購読で共通して使う:
+- 対象セッション/日程の (id, updated_at, 表示名など) だけを先に取得して ETag を決める
+- If-None-Match が一致すれば本文を生成せず 304 を返す
+- 一致しなければ行ジェネレータをそのままストリーミングする
+
+Last-Modified は送らない。行の削除・閲覧権限の喪失・期間外への移動では残りの行の
+更新日時の最大値が動かず、If-Modified-Since だけを送るクライアントに誤った 304 を
+返してしまうため、行集合全体のハッシュである ETag だけで判定する。
+
+UID と DTSTAMP はセッション/日程の ID と更新日時から決めるため、
+内容が変わらない限りカレンダーアプリ側で再取り込みが発生しない。
+"""
+
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+
+ICAL_CONTENT_TYPE = "text/calendar; charset=utf-8"
+
+
+def ical_utc(value):
+    """aware datetime を iCal の UTC 表記（YYYYMMDDTHHMMSSZ）にする"""
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def feed_validator(rows, *extra):
+    """行と追加要素のハッシュから ETag を求める（件数の増減や期間外への移動も検知できる）
+
+    rows にはフィードに描画する値（更新日時・GM名・グループ名など）をすべて含める。
+    """
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(repr(row).encode("utf-8"))
+    for value in extra:
+        digest.update(repr(value).encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _encode_lines(lines):
+    for line in lines:
+        yield f"{line}\r\n".encode("utf-8")
+
+
+def conditional_ical_response(request, lines, *, etag, headers=None):
+    """条件付きGETなら 304、それ以外は lines をストリーミングする iCal レスポンス"""
+    not_modified = get_conditional_response(request, etag=etag)
+    response = not_modified or StreamingHttpResponse(_encode_lines(lines), content_type=ICAL_CONTENT_TYPE)
+
+    response["ETag"] = etag
+    for key, value in (headers or {}).items():
+        response[key] = value
+    return response
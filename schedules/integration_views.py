@@ -6,7 +6,7 @@ import requests
 from allauth.socialaccount.models import SocialAccount, SocialToken
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from django.http import Http404, HttpResponse
+from django.http import Http404
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -16,6 +16,7 @@ from rest_framework.views import APIView
 
 from accounts.models import CharacterSheet, GroupMembership
 
+from . import ical_feed
 from .google_tokens import get_google_access_token
 from .models import (
     AsyncJob,
@@ -78,57 +79,49 @@ def _gm_role_session_ids_for(user):
     )
 
 
-def _build_ical(user):
+def _subscription_sessions(user):
     now = timezone.now()
     end = now + timedelta(days=90)
-    sessions = (
-        _visible_user_sessions(user)
-        .filter(Q(date__range=(now, end)) | Q(date__isnull=True))
-        .select_related("gm", "group")
-        .order_by("date", "id")
-    )
-    lines = [
+    return _visible_user_sessions(user).filter(Q(date__range=(now, end)) | Q(date__isnull=True)).order_by("date", "id")
+
+
+def _iter_ical_lines(user, sessions, gm_role_session_ids):
+    yield from (
         "BEGIN:VCALENDAR",
         "VERSION:2.0",
         "PRODID:-//Tableno//Subscription Calendar//JP",
         "CALSCALE:GREGORIAN",
         "METHOD:PUBLISH",
         f"X-WR-CALNAME:Tableno - {_escape_ical(user.nickname or user.username)}",
-    ]
-    stamp = now.strftime("%Y%m%dT%H%M%SZ")
-    gm_role_session_ids = _gm_role_session_ids_for(user)
-    for session in sessions:
+    )
+    for session in sessions.select_related("gm", "group").iterator(chunk_size=200):
         role = "GM" if session.id in gm_role_session_ids else "Player"
+        stamp = ical_feed.ical_utc(session.updated_at)
         if session.date is None:
-            lines.extend(
-                [
-                    "BEGIN:VTODO",
-                    f"UID:session-{session.pk}@tableno",
-                    f"DTSTAMP:{stamp}",
-                    f"SUMMARY:[{role}] {_escape_ical(session.title)}",
-                    "STATUS:NEEDS-ACTION",
-                    f"DESCRIPTION:{_escape_ical(session.description)}",
-                    "END:VTODO",
-                ]
-            )
-            continue
-        end_at = session.date + timedelta(minutes=session.duration_minutes or 180)
-        lines.extend(
-            [
-                "BEGIN:VEVENT",
+            yield from (
+                "BEGIN:VTODO",
                 f"UID:session-{session.pk}@tableno",
                 f"DTSTAMP:{stamp}",
-                f'DTSTART:{session.date.strftime("%Y%m%dT%H%M%SZ")}',
-                f'DTEND:{end_at.strftime("%Y%m%dT%H%M%SZ")}',
                 f"SUMMARY:[{role}] {_escape_ical(session.title)}",
+                "STATUS:NEEDS-ACTION",
                 f"DESCRIPTION:{_escape_ical(session.description)}",
-                f"LOCATION:{_escape_ical(session.location)}",
-                "STATUS:CANCELLED" if session.status == "cancelled" else "STATUS:CONFIRMED",
-                "END:VEVENT",
-            ]
+                "END:VTODO",
+            )
+            continue
+        end_at = session.date + timedelta(minutes=session.duration_minutes or 180)
+        yield from (
+            "BEGIN:VEVENT",
+            f"UID:session-{session.pk}@tableno",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{ical_feed.ical_utc(session.date)}",
+            f"DTEND:{ical_feed.ical_utc(end_at)}",
+            f"SUMMARY:[{role}] {_escape_ical(session.title)}",
+            f"DESCRIPTION:{_escape_ical(session.description)}",
+            f"LOCATION:{_escape_ical(session.location)}",
+            "STATUS:CANCELLED" if session.status == "cancelled" else "STATUS:CONFIRMED",
+            "END:VEVENT",
         )
-    lines.append("END:VCALENDAR")
-    return "\r\n".join(lines) + "\r\n"
+    yield "END:VCALENDAR"
 
 
 class CalendarSubscriptionRotateView(APIView):
@@ -154,13 +147,25 @@ class CalendarSubscriptionView(APIView):
         subscription = CalendarSubscription.objects.select_related("user").filter(token_digest=digest).first()
         if not subscription:
             raise Http404
-        response = HttpResponse(
-            _build_ical(subscription.user),
-            content_type="text/calendar; charset=utf-8",
+        user = subscription.user
+        sessions = _subscription_sessions(user)
+        gm_role_session_ids = _gm_role_session_ids_for(user)
+        # 定期ポーリングの大半は 304 で済むよう、本文生成前に (id, updated_at) だけで ETag を決める
+        etag = ical_feed.feed_validator(
+            sessions.values_list("id", "updated_at"),
+            subscription.token_digest,
+            user.nickname or user.username,
+            sorted(gm_role_session_ids),
+        )
+        return ical_feed.conditional_ical_response(
+            request,
+            _iter_ical_lines(user, sessions, gm_role_session_ids),
+            etag=etag,
+            headers={
+                "Content-Disposition": 'inline; filename="tableno.ics"',
+                "Cache-Control": "private, no-cache",
+            },
         )
-        response["Content-Disposition"] = 'inline; filename="tableno.ics"'
-        response["Cache-Control"] = "private, no-store"
-        return response
 
 
 def _authorized_google_scopes(user):
@@ -0,0 +1,87 @@
+"""
+推奨技能比較（build_recommended_skill_comparison）のベンチマークコマンド
+DBを使わずに、指定人数・指定技能数の探索者で比較表の作成時間を計測する
+"""
+
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from schedules import recommended_skill_comparison
+from schedules.recommended_skill_comparison import COC6_INITIAL_SKILL_VALUES, build_recommended_skill_comparison
+
+RECOMMENDED_SKILLS = "目星、聞き耳、図書館、心理学、オカルト、ほかの言語（英語）"
+SEMI_RECOMMENDED_SKILLS = "応急手当、説得、言いくるめ、芸術（絵画）、歴史、回避、母国語、拳銃"
+SPECIALIZED_SKILLS = [
+    "他の言語（英語）",
+    "他の言語（ラテン語）",
+    "芸術（絵画）",
+    "芸術（音楽）",
+    "製作（料理）",
+    "運転（自動車）",
+]
+
+
+class Command(BaseCommand):
+    help = "推奨技能比較の作成時間を計測"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=6, help="参加者数")
+        parser.add_argument("--skills", type=int, default=80, help="探索者1人あたりの技能数")
+        parser.add_argument("--runs", type=int, default=200, help="試行回数")
+
+    def handle(self, *args, **options):
+        players = options["players"]
+        skill_count = options["skills"]
+        runs = options["runs"]
+
+        scenario = SimpleNamespace(
+            game_system="coc6",
+            recommended_skills=RECOMMENDED_SKILLS,
+            semi_recommended_skills=SEMI_RECOMMENDED_SKILLS,
+        )
+        participants = [self._participant(index, skill_count) for index in range(players)]
+
+        self._clear_caches()
+        started = time.perf_counter()
+        comparison = build_recommended_skill_comparison(scenario, participants)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            build_recommended_skill_comparison(scenario, participants)
+        warm_ms = (time.perf_counter() - started) * 1000 / runs
+
+        self.stdout.write(
+            f"players={players} skills={skill_count} rows={len(comparison['rows'])} runs={runs} "
+            f"cold_ms={cold_ms:.2f} avg_ms={warm_ms:.2f}"
+        )
+
+    def _participant(self, index, skill_count):
+        names = [*SPECIALIZED_SKILLS, *COC6_INITIAL_SKILL_VALUES]
+        names += [f"独自技能{number}" for number in range(max(skill_count - len(names), 0))]
+        skills = [
+            SimpleNamespace(id=number, skill_name=name, current_value=40 + number % 50)
+            for number, name in enumerate(names[:skill_count], start=1)
+        ]
+        character = SimpleNamespace(
+            name=f"探索者{index + 1}",
+            edition="6th",
+            dex_value=12,
+            edu_value=14,
+            _prefetched_objects_cache={"skills": skills},
+        )
+        return SimpleNamespace(
+            id=index + 1,
+            display_name=f"PL{index + 1}",
+            character_sheet_id=index + 1,
+            character_sheet=SimpleNamespace(system_data=character),
+        )
+
+    @staticmethod
+    def _clear_caches():
+        for name in ("_match_key", "_skill_parts", "_canonical_skill_name", "_canonical_keys"):
+            function = getattr(recommended_skill_comparison, name, None)
+            if hasattr(function, "cache_clear"):
+                function.cache_clear()
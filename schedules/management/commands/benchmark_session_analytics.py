@@ -0,0 +1,110 @@
+"""
+セッション分析ダッシュボード（SessionAnalyticsDashboardView）のベンチマークコマンド
+グループ・日程・参加者を一時的に作成し、集計の所要時間とクエリ数を計測する
+（作成したデータはすべてロールバックする）
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import Group, GroupMembership
+from schedules import response_cache
+from schedules.analytics_views import SessionAnalyticsDashboardView
+from schedules.models import SessionParticipant, TRPGSession
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "日程数・参加者数の多いグループでセッション分析ダッシュボードの時間とクエリ数を計測"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--occurrences", type=int, default=500, help="期間内の日程数（1セッション1日程）")
+        parser.add_argument("--participants", type=int, default=8, help="1日程あたりの参加人数（GMを含む）")
+        parser.add_argument("--members", type=int, default=24, help="グループのメンバー数")
+        parser.add_argument("--runs", type=int, default=5, help="試行回数")
+
+    def handle(self, *args, **options):
+        occurrences = options["occurrences"]
+        participants = options["participants"]
+        members = max(options["members"], participants)
+        runs = options["runs"]
+
+        with transaction.atomic():
+            users, group = self._create_group(members)
+            self._create_sessions(users, group, occurrences, participants)
+
+            request_factory = APIRequestFactory()
+            view = SessionAnalyticsDashboardView.as_view()
+
+            def request_dashboard():
+                request = request_factory.get("/api/schedules/analytics/dashboard/", {"group_id": group.id})
+                force_authenticate(request, user=users[0])
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = view(request)
+                    elapsed = time.perf_counter() - started
+                return response, elapsed, len(context.captured_queries)
+
+            elapsed = []
+            queries = []
+            with override_settings(SCHEDULE_RESPONSE_CACHE_TIMEOUT=0):
+                # 初回は締まった月のパーシャルを集計・保存するため、2回目以降と分けて計測する
+                _, cold_seconds, cold_queries = request_dashboard()
+                for _ in range(runs):
+                    response, seconds, query_count = request_dashboard()
+                    elapsed.append(seconds)
+                    queries.append(query_count)
+
+            with override_settings(SCHEDULE_RESPONSE_CACHE_TIMEOUT=300):
+                request_dashboard()
+                _, cached_seconds, cached_queries = request_dashboard()
+            transaction.set_rollback(True)
+        # ロールバックしたデータの集計結果を参照させない
+        response_cache.invalidate_all()
+
+        summary = response.data["summary"]
+        self.stdout.write(
+            f"occurrences={summary['occurrences_count']} participants={participants} members={members} "
+            f"pairs={len(response.data['top_pairs'])} runs={runs} "
+            f"cold_ms={cold_seconds * 1000:.1f} cold_queries={cold_queries} "
+            f"avg_ms={sum(elapsed) / runs * 1000:.1f} "
+            f"min_ms={min(elapsed) * 1000:.1f} "
+            f"queries={max(queries)} "
+            f"cached_ms={cached_seconds * 1000:.1f} cached_queries={cached_queries}"
+        )
+
+    def _create_group(self, member_count):
+        users = [
+            User.objects.create_user(username=f"benchmark_analytics_{index}", password=None, nickname=f"PL{index}")
+            for index in range(member_count)
+        ]
+        group = Group.objects.create(name="ベンチマークグループ", created_by=users[0])
+        GroupMembership.objects.bulk_create(
+            GroupMembership(user=user, group=group, role="admin" if index == 0 else "member")
+            for index, user in enumerate(users)
+        )
+        return users, group
+
+    def _create_sessions(self, users, group, occurrences, participants):
+        now = timezone.now()
+        rows = []
+        for index in range(occurrences):
+            # 参加者をずらして、多様な同卓ペアができるようにする
+            table = [users[(index + offset) % len(users)] for offset in range(participants)]
+            session = TRPGSession.objects.create(
+                title=f"ベンチマークセッション{index}",
+                date=now - timedelta(days=1, hours=index * 17 % (300 * 24)),
+                gm=table[0],
+                group=group,
+                duration_minutes=180,
+            )
+            rows.extend(SessionParticipant(session=session, user=user) for user in table[1:])
+        SessionParticipant.objects.bulk_create(rows)
@@ -8,8 +8,12 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         try:
-            published_count = publish_scheduled_handouts()
+            result = publish_scheduled_handouts()
         except Exception as exc:
             raise CommandError(f"Failed to publish scheduled handouts: {exc}") from exc
 
-        self.stdout.write(self.style.SUCCESS(f"Published scheduled handouts: published={published_count}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published scheduled handouts: evaluated={result['evaluated']} published={result['published']}"
+            )
+        )
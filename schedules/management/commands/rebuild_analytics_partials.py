@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from schedules.analytics_partials import rebuild_group_partials
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-group monthly session analytics partials for closed months."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--group",
+            dest="group_ids",
+            action="append",
+            type=int,
+            help="Only rebuild partials for the given group id (repeatable).",
+        )
+        parser.add_argument("--months", type=int, default=12, help="Number of closed months to rebuild.")
+
+    def handle(self, *args, **options):
+        group_ids = options.get("group_ids")
+        try:
+            partial_count = rebuild_group_partials(
+                group_ids=set(group_ids) if group_ids else None,
+                months=options["months"],
+            )
+        except Exception as exc:
+            raise CommandError(f"Failed to rebuild analytics partials: {exc}") from exc
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt analytics partials: rows={partial_count}"))
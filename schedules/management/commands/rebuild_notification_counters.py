@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from schedules.notification_counters import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Recount unread notifications into the per-user unread notification counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="user_ids",
+            action="append",
+            type=int,
+            help="Only rebuild the counter for the given user id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options.get("user_ids")
+        try:
+            row_count = rebuild_unread_counts(user_ids=set(user_ids) if user_ids else None)
+        except Exception as exc:
+            raise CommandError(f"Failed to rebuild notification counters: {exc}") from exc
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt notification counters: rows={row_count}"))
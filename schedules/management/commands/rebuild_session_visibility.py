@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from schedules.session_visibility import refresh_visibility
+
+
+class Command(BaseCommand):
+    help = "Rebuild the session visibility index from groups, participants and group link shares."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="user_ids",
+            action="append",
+            type=int,
+            help="Only rebuild entries for the given user id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options.get("user_ids")
+        try:
+            row_count = refresh_visibility(user_ids=set(user_ids) if user_ids else None)
+        except Exception as exc:
+            raise CommandError(f"Failed to rebuild session visibility: {exc}") from exc
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt session visibility: rows={row_count}"))
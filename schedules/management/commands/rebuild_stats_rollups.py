@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from schedules.stats_rollups import rebuild_stats_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-user session statistics rollups from completed sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="user_ids",
+            action="append",
+            type=int,
+            help="Only rebuild rollups for the given user id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options.get("user_ids")
+        try:
+            rollup_count = rebuild_stats_rollups(user_ids=set(user_ids) if user_ids else None)
+        except Exception as exc:
+            raise CommandError(f"Failed to rebuild stats rollups: {exc}") from exc
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats rollups: rows={rollup_count}"))
@@ -0,0 +1,12 @@
+from . import session_permissions
+
+
+class SessionPermissionContextMiddleware:
+    """リクエストごとに session_permissions の権限キャッシュ（SessionPermissionContext）を有効にする"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with session_permissions.permission_context():
+            return self.get_response(request)
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    TRPGSession = apps.get_model("schedules", "TRPGSession")
+    SessionParticipant = apps.get_model("schedules", "SessionParticipant")
+    UserStatsRollup = apps.get_model("schedules", "UserStatsRollup")
+
+    counters = ("session_count", "gm_session_count", "player_session_count", "total_minutes", "gm_minutes")
+    buckets = {}
+    sessions = TRPGSession.objects.filter(status="completed").select_related("scenario")
+    for session in sessions.iterator():
+        if session.date:
+            local_date = timezone.localtime(session.date)
+            year, month = local_date.year, local_date.month
+        else:
+            year, month = 0, 0
+        game_system = session.scenario.game_system if session.scenario_id else ""
+        minutes = (
+            session.actual_duration_minutes
+            if session.actual_duration_minutes is not None
+            else session.duration_minutes or 0
+        )
+
+        user_ids = set(
+            SessionParticipant.objects.filter(session_id=session.id, user_id__isnull=False).values_list(
+                "user_id", flat=True
+            )
+        )
+        if session.gm_id:
+            user_ids.add(session.gm_id)
+
+        for user_id in user_ids:
+            data = buckets.setdefault((user_id, year, month, game_system), dict.fromkeys(counters, 0))
+            data["session_count"] += 1
+            data["total_minutes"] += minutes
+            if user_id == session.gm_id:
+                data["gm_session_count"] += 1
+                data["gm_minutes"] += minutes
+            else:
+                data["player_session_count"] += 1
+
+    UserStatsRollup.objects.bulk_create(
+        [
+            UserStatsRollup(user_id=user_id, year=year, month=month, game_system=game_system, **data)
+            for (user_id, year, month, game_system), data in buckets.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0054_sessionrecruitmentlink_sessionrecruitmentlinkuse_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStatsRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                (
+                    "game_system",
+                    models.CharField(blank=True, default="", help_text="シナリオ未設定時は空文字", max_length=10),
+                ),
+                ("session_count", models.PositiveIntegerField(default=0)),
+                ("gm_session_count", models.PositiveIntegerField(default=0)),
+                ("player_session_count", models.PositiveIntegerField(default=0)),
+                ("total_minutes", models.PositiveIntegerField(default=0)),
+                ("gm_minutes", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["user", "year", "month", "game_system"],
+                "indexes": [models.Index(fields=["user", "year", "month"], name="user_stats_rollup_period_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "year", "month", "game_system"), name="uniq_user_stats_rollup_bucket"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0055_user_stats_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RankingSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("period_type", models.CharField(help_text="year / month / all", max_length=10)),
+                ("period_key", models.CharField(help_text="例: 2025, 2025-03, all", max_length=10)),
+                (
+                    "game_system",
+                    models.CharField(blank=True, default="", help_text="空文字は全システム", max_length=10),
+                ),
+                ("ranking_type", models.CharField(help_text="hours / sessions / gm", max_length=10)),
+                ("entries", models.JSONField(blank=True, default=list, help_text="上位ユーザーのランキング行と集計値")),
+                (
+                    "scores",
+                    models.JSONField(
+                        blank=True, default=list, help_text="全ユーザーの [第1キー, 第2キー] スコア（昇順）"
+                    ),
+                ),
+                ("total_users", models.PositiveIntegerField(default=0)),
+                ("built_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("period_type", "period_key", "game_system", "ranking_type"),
+                        name="uniq_ranking_snapshot_key",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_session_visibility(apps, schema_editor):
+    TRPGSession = apps.get_model("schedules", "TRPGSession")
+    SessionParticipant = apps.get_model("schedules", "SessionParticipant")
+    SessionVisibility = apps.get_model("schedules", "SessionVisibility")
+    GroupMembership = apps.get_model("accounts", "GroupMembership")
+    GroupLinkShare = apps.get_model("accounts", "GroupLinkShare")
+
+    rows = set()
+    for session_id, created_by_id, group_id, owner_id in TRPGSession.objects.values_list(
+        "id", "created_by_id", "group_id", "group__created_by_id"
+    ):
+        if created_by_id:
+            rows.add((created_by_id, session_id, "creator"))
+        if owner_id:
+            rows.add((owner_id, session_id, "group_owner"))
+
+    members_by_group = {}
+    for user_id, group_id in GroupMembership.objects.values_list("user_id", "group_id"):
+        members_by_group.setdefault(group_id, set()).add(user_id)
+    for session_id, group_id in TRPGSession.objects.filter(group_id__isnull=False).values_list("id", "group_id"):
+        for user_id in members_by_group.get(group_id, ()):
+            rows.add((user_id, session_id, "group_member"))
+
+    for user_id, session_id in SessionParticipant.objects.filter(user_id__isnull=False).values_list(
+        "user_id", "session_id"
+    ):
+        rows.add((user_id, session_id, "participant"))
+
+    session_ids = set(TRPGSession.objects.values_list("id", flat=True))
+    shares = GroupLinkShare.objects.filter(resource_type="session", link__status="accepted").values_list(
+        "object_id", "owner_group_id", "link__source_group_id", "link__target_group_id"
+    )
+    for session_id, owner_group_id, source_group_id, target_group_id in shares:
+        if session_id not in session_ids:
+            continue
+        if owner_group_id == source_group_id:
+            viewer_group_id = target_group_id
+        elif owner_group_id == target_group_id:
+            viewer_group_id = source_group_id
+        else:
+            continue
+        for user_id in members_by_group.get(viewer_group_id, ()):
+            rows.add((user_id, session_id, "group_link"))
+
+    SessionVisibility.objects.bulk_create(
+        [
+            SessionVisibility(user_id=user_id, session_id=session_id, reason=reason)
+            for user_id, session_id, reason in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0046_alter_grouplinkshare_resource_type"),
+        ("schedules", "0056_ranking_snapshot"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionVisibility",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("creator", "作成者"),
+                            ("group_member", "グループメンバー"),
+                            ("group_owner", "グループ作成者"),
+                            ("participant", "参加者"),
+                            ("group_link", "グループ連携共有"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="visibility_entries",
+                        to="schedules.trpgsession",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="session_visibilities",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["session", "user"], name="session_visibility_sess_idx")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("user", "session", "reason"), name="uniq_session_visibility_reason")
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_session_visibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0061_background_removal_jobs"),
+        ("schedules", "0057_session_visibility"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadNotificationCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="unread_notification_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("unread_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
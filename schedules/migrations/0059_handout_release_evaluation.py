@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0058_unread_notification_counter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="handoutinfo",
+            name="needs_release_evaluation",
+            field=models.BooleanField(
+                default=True, help_text="公開条件に関わる変更があり、次回の定期評価で再評価が必要か"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="handoutinfo",
+            index=models.Index(
+                fields=["release_status", "needs_release_evaluation"], name="handout_release_pending_idx"
+            ),
+        ),
+    ]
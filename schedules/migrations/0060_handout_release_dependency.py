@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDEXED_CONDITION_TYPES = {"session_status", "handout_viewed"}
+
+
+def _leaves(node):
+    if not isinstance(node, dict) or not node:
+        return
+    if node.get("operator"):
+        for child in node.get("conditions") or []:
+            yield from _leaves(child)
+        return
+    yield node
+
+
+def backfill_release_dependencies(apps, schema_editor):
+    HandoutInfo = apps.get_model("schedules", "HandoutInfo")
+    HandoutReleaseDependency = apps.get_model("schedules", "HandoutReleaseDependency")
+
+    rows = {}
+    waiting = HandoutInfo.objects.filter(release_status="waiting").only("id", "session_id", "release_conditions")
+    for handout in waiting.iterator():
+        for leaf in _leaves(handout.release_conditions):
+            if leaf.get("type") in INDEXED_CONDITION_TYPES and "value" in leaf:
+                key = (handout.pk, leaf["type"], str(leaf["value"]))
+                rows[key] = HandoutReleaseDependency(
+                    handout_id=handout.pk,
+                    session_id=handout.session_id,
+                    condition_type=leaf["type"],
+                    value=str(leaf["value"]),
+                )
+    HandoutReleaseDependency.objects.bulk_create(rows.values(), batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0059_handout_release_evaluation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HandoutReleaseDependency",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("condition_type", models.CharField(max_length=32)),
+                ("value", models.CharField(max_length=64)),
+                (
+                    "handout",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="release_dependencies",
+                        to="schedules.handoutinfo",
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="handout_release_dependencies",
+                        to="schedules.trpgsession",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["session", "condition_type", "value"], name="handout_release_dep_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("handout", "condition_type", "value"), name="uniq_handout_release_dependency"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_release_dependencies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0062_character_version_lineage_root"),
+        ("schedules", "0060_handout_release_dependency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GroupAnalyticsMonth",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("year", models.PositiveSmallIntegerField()),
+                ("month", models.PositiveSmallIntegerField()),
+                ("data", models.JSONField(blank=True, default=dict)),
+                ("computed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "group",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analytics_months",
+                        to="accounts.group",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["group", "year", "month"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("group", "year", "month"), name="uniq_group_analytics_month")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0061_group_analytics_month"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sessionimage",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, help_text="リサイズ版（WebP/JPEG）の保存先"),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_snapshots(apps, schema_editor):
+    # 既存のスナップショットにはスコア分布がないため、次回の定期構築まで都度集計に戻す
+    apps.get_model("schedules", "RankingSnapshot").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0062_image_renditions"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_snapshots, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="rankingsnapshot",
+            name="scores",
+        ),
+        migrations.CreateModel(
+            name="RankingSnapshotScore",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("primary_score", models.PositiveBigIntegerField(help_text="第1キー（時間・回数など）")),
+                ("secondary_score", models.PositiveBigIntegerField(help_text="第2キー")),
+                ("user_count", models.PositiveIntegerField(default=0)),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="score_buckets",
+                        to="schedules.rankingsnapshot",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["snapshot", "primary_score", "secondary_score"], name="ranking_score_lookup_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -11,6 +11,7 @@ from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 
+from accounts.image_renditions import delete_renditions, discard_stored_renditions, queue_renditions, rendition_url
 from accounts.models import CustomUser, Group, GroupMembership
 
 
@@ -571,7 +572,13 @@ class TRPGSession(models.Model):
 
     @property
     def youtube_total_duration(self):
-        """YouTube動画の合計時間（秒）"""
+        """YouTube動画の合計時間（秒）。一覧用アノテーション（youtube_total_seconds）かプリフェッチ済みの動画があれば使う"""
+        annotated_value = getattr(self, "youtube_total_seconds", None)
+        if annotated_value is not None:
+            return annotated_value
+        prefetched_links = getattr(self, "_prefetched_objects_cache", {}).get("youtube_links")
+        if prefetched_links is not None:
+            return sum(link.duration_seconds or 0 for link in prefetched_links)
         return SessionYouTubeLink.get_session_total_duration(self)
 
     @property
@@ -581,7 +588,10 @@ class TRPGSession(models.Model):
 
     @property
     def youtube_video_count(self):
-        """YouTube動画の本数"""
+        """YouTube動画の本数。一覧用アノテーション（youtube_link_count）があれば使う"""
+        annotated_value = getattr(self, "youtube_link_count", None)
+        if annotated_value is not None:
+            return annotated_value
         return self.youtube_links.count()
 
     class Meta:
@@ -974,6 +984,9 @@ class HandoutInfo(models.Model):
         default=ReleaseStatus.MANUAL,
     )
     next_evaluation_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    needs_release_evaluation = models.BooleanField(
+        default=True, help_text="公開条件に関わる変更があり、次回の定期評価で再評価が必要か"
+    )
     released_at = models.DateTimeField(null=True, blank=True)
     order = models.PositiveIntegerField(default=0)
 
@@ -998,6 +1011,7 @@ class HandoutInfo(models.Model):
         indexes = [
             models.Index(fields=["session", "order"]),
             models.Index(fields=["session", "code"]),
+            models.Index(fields=["release_status", "needs_release_evaluation"], name="handout_release_pending_idx"),
         ]
 
 
@@ -1015,6 +1029,34 @@ class HandoutView(models.Model):
         ]
 
 
+class HandoutReleaseDependency(models.Model):
+    """公開待ちハンドアウトの条件依存インデックス
+
+    (セッション, 条件種別, 値) から、その変化で公開されうる待機中ハンドアウトを引く。
+    セッション状態の変更やハンドアウト閲覧の記録時に、該当ハンドアウトだけを即時評価するために使う
+    （schedules/handout_release.py）。
+    """
+
+    handout = models.ForeignKey(HandoutInfo, on_delete=models.CASCADE, related_name="release_dependencies")
+    session = models.ForeignKey(TRPGSession, on_delete=models.CASCADE, related_name="handout_release_dependencies")
+    condition_type = models.CharField(max_length=32)
+    value = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["handout", "condition_type", "value"],
+                name="uniq_handout_release_dependency",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["session", "condition_type", "value"], name="handout_release_dep_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id}:{self.condition_type}={self.value} -> {self.handout_id}"
+
+
 class HandoutNotification(models.Model):
     """ハンドアウト配布通知モデル"""
 
@@ -1048,11 +1090,21 @@ class HandoutNotification(models.Model):
         return f"{self.get_notification_type_display()} → {self.recipient.nickname}"
 
     def mark_as_read(self):
-        """通知を既読にマーク"""
-        if not self.is_read:
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save()
+        """通知を既読にマーク（同時に既読化されても未読数を二重に減らさない）"""
+        if self.is_read:
+            return False
+        from .notification_counters import adjust_unread_counts, count_recipients
+
+        # 閲覧できないハンドアウトの通知はカウンターに含まれていないので減らさない
+        deltas = count_recipients([self], sign=-1)
+        self.is_read = True
+        self.read_at = timezone.now()
+        updated = HandoutNotification.objects.filter(pk=self.pk, is_read=False).update(
+            is_read=True, read_at=self.read_at
+        )
+        if updated:
+            adjust_unread_counts(deltas)
+        return bool(updated)
 
     class Meta:
         ordering = ["-created_at"]
@@ -1094,6 +1146,35 @@ class UserNotificationPreferences(models.Model):
         )
         return preferences
 
+    @classmethod
+    def for_users(cls, users):
+        """複数ユーザーの通知設定を {user_id: 設定} で返す（未作成のユーザー分はまとめて作成）"""
+        user_ids = {user.pk for user in users if user is not None}
+        preferences = {item.user_id: item for item in cls.objects.filter(user_id__in=user_ids)}
+        missing = [cls(user_id=user_id) for user_id in user_ids - preferences.keys()]
+        if missing:
+            # フィールドの既定値は get_or_create_for_user の defaults と同じ
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            preferences.update({item.user_id: item for item in missing})
+        return preferences
+
+
+class UnreadNotificationCounter(models.Model):
+    """ユーザーごとの未読通知数（閲覧できるハンドアウトの通知だけを数える）
+
+    通知の作成・既読化・削除時に F() で加減算する（schedules/notification_counters.py）。
+    行が無いユーザー（閲覧可否の変更で行を消したユーザーを含む）は次回参照時に件数を数えて作成する。
+    """
+
+    user = models.OneToOneField(
+        CustomUser, on_delete=models.CASCADE, primary_key=True, related_name="unread_notification_counter"
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count}"
+
 
 class SessionImage(models.Model):
     """セッション添付画像モデル"""
@@ -1106,6 +1187,7 @@ class SessionImage(models.Model):
     uploaded_by = models.ForeignKey(
         CustomUser, on_delete=models.SET_NULL, null=True, related_name="uploaded_session_images"
     )
+    renditions = models.JSONField(default=dict, blank=True, help_text="リサイズ版（WebP/JPEG）の保存先")
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -1125,11 +1207,18 @@ class SessionImage(models.Model):
                 max_order=models.Max("order")
             )["max_order"]
             self.order = (max_order or 0) + 1
+        # 新しい画像ファイルのときはリサイズ版を作り直す
+        new_upload = bool(self.image) and not self.image._committed
+        if new_upload:
+            discard_stored_renditions(self)
+            self.renditions = {}
         super().save(*args, **kwargs)
+        if new_upload:
+            queue_renditions(self)
 
     def get_thumbnail_url(self):
-        """サムネイルURL取得（将来的な実装用）"""
-        return self.image.url if self.image else None
+        """サムネイルURL取得（リサイズ版が未生成なら元画像）"""
+        return rendition_url(self.image, self.renditions) or None
 
     def delete(self, *args, **kwargs):
         """削除時に画像ファイルも削除"""
@@ -1139,6 +1228,7 @@ class SessionImage(models.Model):
                     self.image.delete(save=False)
             except Exception:
                 pass
+            delete_renditions(self.image.storage, self.renditions)
         super().delete(*args, **kwargs)
 
 
@@ -1839,3 +1929,143 @@ class DatePollComment(models.Model):
     def __str__(self):
         user_display = self.user.nickname or self.user.username
         return f"{self.poll.title}: {user_display}"
+
+
+class UserStatsRollup(models.Model):
+    """ユーザー × 年 × 月 × ゲームシステム単位のセッション統計ロールアップ
+
+    完了セッションの件数・時間を事前集計して保持する。日付未定のセッションは
+    year=0 / month=0 に集計する。更新は schedules.stats_rollups が担当する。
+    """
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="stats_rollups")
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    game_system = models.CharField(max_length=10, blank=True, default="", help_text="シナリオ未設定時は空文字")
+
+    session_count = models.PositiveIntegerField(default=0)
+    gm_session_count = models.PositiveIntegerField(default=0)
+    player_session_count = models.PositiveIntegerField(default=0)
+    total_minutes = models.PositiveIntegerField(default=0)
+    gm_minutes = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["user", "year", "month", "game_system"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "year", "month", "game_system"],
+                name="uniq_user_stats_rollup_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "year", "month"], name="user_stats_rollup_period_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.year}-{self.month:02d} {self.game_system or '-'}: {self.session_count}"
+
+
+class GroupAnalyticsMonth(models.Model):
+    """グループ × 年 × 月 単位のセッション分析ダッシュボード集計（パーシャル）
+
+    締まった月（当月より前）の日程数・時間・時間帯・GM負荷・参加回数・同卓回数を保持する。
+    該当月のセッション・日程・参加者が変わると削除され、次の表示時に再集計される。
+    更新は schedules.analytics_partials が担当する。
+    """
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="analytics_months")
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    data = models.JSONField(default=dict, blank=True)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["group", "year", "month"]
+        constraints = [
+            models.UniqueConstraint(fields=["group", "year", "month"], name="uniq_group_analytics_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.group_id} {self.year}-{self.month:02d}"
+
+
+class RankingSnapshot(models.Model):
+    """ユーザーランキングの定期スナップショット
+
+    期間 × ゲームシステム × ランキング種別ごとに上位エントリを保持し、スコア分布は
+    RankingSnapshotScore に分けて持つ。ランキングAPIは閲覧者自身の順位だけをその場で計算する。
+    """
+
+    period_type = models.CharField(max_length=10, help_text="year / month / all")
+    period_key = models.CharField(max_length=10, help_text="例: 2025, 2025-03, all")
+    game_system = models.CharField(max_length=10, blank=True, default="", help_text="空文字は全システム")
+    ranking_type = models.CharField(max_length=10, help_text="hours / sessions / gm")
+
+    entries = models.JSONField(default=list, blank=True, help_text="上位ユーザーのランキング行と集計値")
+    total_users = models.PositiveIntegerField(default=0)
+
+    built_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period_type", "period_key", "game_system", "ranking_type"],
+                name="uniq_ranking_snapshot_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period_type}:{self.period_key} {self.game_system or 'all'} {self.ranking_type}"
+
+
+class RankingSnapshotScore(models.Model):
+    """ランキングスナップショットのスコア分布（同じスコアのユーザー数）
+
+    閲覧者の順位は「自分より高いスコアの人数 + 1」をインデックス上の集計で求める。
+    """
+
+    snapshot = models.ForeignKey(RankingSnapshot, on_delete=models.CASCADE, related_name="score_buckets")
+    primary_score = models.PositiveBigIntegerField(help_text="第1キー（時間・回数など）")
+    secondary_score = models.PositiveBigIntegerField(help_text="第2キー")
+    user_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["snapshot", "primary_score", "secondary_score"], name="ranking_score_lookup_idx"),
+        ]
+
+
+class SessionVisibility(models.Model):
+    """セッション閲覧権限のインデックス
+
+    公開セッション以外で、ユーザーがセッションを閲覧できる理由ごとに1行を持つ。
+    作成者・グループ所属・グループ所有・参加者・グループ連携共有の変更時に
+    シグナルから該当範囲だけを再計算する（schedules/session_visibility.py）。
+    """
+
+    class Reason(models.TextChoices):
+        CREATOR = "creator", "作成者"
+        GROUP_MEMBER = "group_member", "グループメンバー"
+        GROUP_OWNER = "group_owner", "グループ作成者"
+        PARTICIPANT = "participant", "参加者"
+        GROUP_LINK = "group_link", "グループ連携共有"
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="session_visibilities")
+    session = models.ForeignKey(TRPGSession, on_delete=models.CASCADE, related_name="visibility_entries")
+    reason = models.CharField(max_length=20, choices=Reason.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "session", "reason"],
+                name="uniq_session_visibility_reason",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["session", "user"], name="session_visibility_sess_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.session_id} ({self.reason})"
@@ -0,0 +1,116 @@
+"""
+未読通知数カウンター（UnreadNotificationCounter）の参照・更新
+
+WebSocket配信・未読数API・通知サマリーは COUNT の代わりにこのカウンターを参照する。
+数えるのは受信者が閲覧できる未読通知だけで、閲覧できないハンドアウトの通知は含めない。
+- 作成: 通知作成シグナル / 一括作成後に加算
+- 既読化: HandoutNotification.mark_as_read / 一括既読で減算
+- 削除: 通知削除シグナルで未読分を減算
+- 閲覧可否の変化: ハンドアウト・参加者・ロール・GMの変更で関係する受信者のカウンター行を消す
+
+カウンター行が無いユーザーは参照時に件数を数えて作成する（加減算は行がある場合のみ）。
+ずれた場合は rebuild_notification_counters コマンドで再集計できる。
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .handout_access import visible_handout_pairs
+from .models import HandoutInfo, HandoutNotification, UnreadNotificationCounter
+
+
+def _count_unread(user_ids=None):
+    """{user_id: 閲覧できる未読通知数}（None は全ユーザー）"""
+    notifications = HandoutNotification.objects.filter(is_read=False)
+    if user_ids is not None:
+        notifications = notifications.filter(recipient_id__in=user_ids)
+    rows = list(notifications.values_list("recipient_id", "handout_id").annotate(count=Count("id")).order_by())
+    visible = visible_handout_pairs((user_id, handout_id) for user_id, handout_id, _ in rows)
+    counts = defaultdict(int)
+    for user_id, handout_id, count in rows:
+        if not handout_id or (user_id, handout_id) in visible:
+            counts[user_id] += count
+    return counts
+
+
+def adjust_unread_counts(deltas):
+    """{user_id: 増減数} をカウンターへ反映する（増減数ごとに1クエリ）"""
+    user_ids_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if user_id and delta:
+            user_ids_by_delta[delta].append(user_id)
+    for delta, user_ids in user_ids_by_delta.items():
+        UnreadNotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread_count=Greatest(F("unread_count") + delta, 0)
+        )
+
+
+def count_recipients(notifications, sign=1, unread_only=True):
+    """通知の一覧から {recipient_id: 閲覧できる未読件数 × sign} を作る
+
+    unread_only=False は既読/未読の切り替え時に、既読になった通知も数えるために使う。
+    """
+    notifications = [notification for notification in notifications if not (unread_only and notification.is_read)]
+    visible = visible_handout_pairs(
+        (notification.recipient_id, notification.handout_id) for notification in notifications
+    )
+    deltas = defaultdict(int)
+    for notification in notifications:
+        if not notification.handout_id or (notification.recipient_id, notification.handout_id) in visible:
+            deltas[notification.recipient_id] += sign
+    return deltas
+
+
+def reset_unread_counts(notifications):
+    """閲覧可否が変わりうる未読通知の受信者のカウンター行を消し、次の参照時に数え直させる"""
+    UnreadNotificationCounter.objects.filter(
+        user_id__in=notifications.filter(is_read=False).values("recipient_id")
+    ).delete()
+
+
+def reset_session_unread_counts(session_ids):
+    """セッションのハンドアウトに紐づく未読通知の受信者のカウンターを作り直させる"""
+    reset_unread_counts(
+        HandoutNotification.objects.filter(
+            handout_id__in=HandoutInfo.objects.filter(session_id__in=session_ids).values("id")
+        )
+    )
+
+
+def get_unread_counts(user_ids):
+    """複数ユーザーの未読数を {user_id: 件数} で返す"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    counts = dict(UnreadNotificationCounter.objects.filter(user_id__in=user_ids).values_list("user_id", "unread_count"))
+    missing = user_ids - counts.keys()
+    if missing:
+        recounted = _count_unread(missing)
+        UnreadNotificationCounter.objects.bulk_create(
+            [UnreadNotificationCounter(user_id=user_id, unread_count=recounted.get(user_id, 0)) for user_id in missing],
+            ignore_conflicts=True,
+        )
+        counts.update({user_id: recounted.get(user_id, 0) for user_id in missing})
+    return counts
+
+
+def get_unread_count(user_id):
+    return get_unread_counts([user_id]).get(user_id, 0)
+
+
+def rebuild_unread_counts(user_ids=None):
+    """未読数を通知テーブルから数え直す（None は全件）"""
+    counters = UnreadNotificationCounter.objects.all()
+    if user_ids is not None:
+        counters = counters.filter(user_id__in=user_ids)
+
+    counts = _count_unread(user_ids)
+    targets = counts.keys() | set(counters.values_list("user_id", flat=True))
+    UnreadNotificationCounter.objects.bulk_create(
+        [UnreadNotificationCounter(user_id=user_id, unread_count=counts.get(user_id, 0)) for user_id in targets],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["unread_count", "updated_at"],
+    )
+    return len(targets)
@@ -10,6 +10,7 @@ from accounts.models import CustomUser
 from schedules.handout_access import can_view_handout
 
 from .models import HandoutInfo, HandoutNotification, UserNotificationPreferences
+from .notification_counters import get_unread_count
 
 
 class UserBasicSerializer(serializers.ModelSerializer):
@@ -175,7 +176,7 @@ class NotificationSummarySerializer(serializers.Serializer):
 
         data = {
             "total_notifications": notifications.count(),
-            "unread_notifications": notifications.filter(is_read=False).count(),
+            "unread_notifications": get_unread_count(user.pk),
             "handout_created_count": notifications.filter(notification_type="handout_created").count(),
             "handout_published_count": notifications.filter(notification_type="handout_published").count(),
             "handout_updated_count": notifications.filter(notification_type="handout_updated").count(),
@@ -6,14 +6,18 @@ TRPGセッション管理システム - ハンドアウト通知API
 
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .handout_access import can_view_handout
+from accounts.views.pagination import KeysetPagination
+
+from .handout_access import can_view_handout, resolve_handout_viewer
 from .models import HandoutInfo, HandoutNotification, UserNotificationPreferences
+from .notification_counters import adjust_unread_counts, get_unread_count
 from .notifications import HandoutNotificationService
 from .serializers import HandoutNotificationSerializer, UserNotificationPreferencesSerializer
 
@@ -53,8 +57,35 @@ class HandoutNotificationViewSet(viewsets.ReadOnlyModelViewSet):
             return False
         return can_view_handout(handout, self.request.user)
 
+    def _visible_handout_ids(self, handout_ids, user):
+        """閲覧できるハンドアウトIDの集合（ハンドアウトはまとめて1クエリで取得）"""
+        handout_ids = set(handout_ids) - {0}
+        if not handout_ids:
+            return set()
+        handouts = HandoutInfo.objects.select_related(
+            "session",
+            "session__gm",
+            "session__group",
+            "participant",
+            "participant__user",
+        ).in_bulk(handout_ids)
+        # 閲覧条件はセッションごとに1回だけ解決する
+        viewers = {}
+        for handout in handouts.values():
+            if handout.session_id not in viewers:
+                viewers[handout.session_id] = resolve_handout_viewer(handout.session, user)
+        return {handout_id for handout_id, handout in handouts.items() if viewers[handout.session_id].can_view(handout)}
+
     def _visible_notifications(self, queryset):
-        return [notification for notification in queryset if self._can_show_notification(notification)]
+        notifications = list(queryset)
+        visible = self._visible_handout_ids(
+            (notification.handout_id for notification in notifications), self.request.user
+        )
+        return [
+            notification
+            for notification in notifications
+            if notification.handout_id == 0 or notification.handout_id in visible
+        ]
 
     def get_object(self):
         notification = get_object_or_404(
@@ -76,6 +107,12 @@ class HandoutNotificationViewSet(viewsets.ReadOnlyModelViewSet):
         if unread_only:
             queryset = queryset.filter(is_read=False)
 
+        # cursor 指定時はキーセット方式（閲覧可否の判定は取得したページ分だけ行う）
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination(ordering=("-created_at", "-id"))
+            page = paginator.paginate_queryset(queryset, request, row_filter=self._visible_notifications)
+            return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
         visible_notifications = self._visible_notifications(queryset)
         page = self.paginate_queryset(visible_notifications)
         if page is not None:
@@ -106,7 +143,10 @@ class HandoutNotificationViewSet(viewsets.ReadOnlyModelViewSet):
                 )
             )
         ]
-        updated_count = HandoutNotification.objects.filter(id__in=visible_ids).update(is_read=True)
+        updated_count = HandoutNotification.objects.filter(id__in=visible_ids, is_read=False).update(
+            is_read=True, read_at=timezone.now()
+        )
+        adjust_unread_counts({request.user.id: -updated_count})
 
         return Response(
             {
@@ -118,17 +158,8 @@ class HandoutNotificationViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=["get"])
     def unread_count(self, request):
-        """未読通知数を取得"""
-        count = len(
-            self._visible_notifications(
-                HandoutNotification.objects.filter(
-                    recipient=request.user,
-                    is_read=False,
-                )
-            )
-        )
-
-        return Response({"unread_count": count})
+        """未読通知数を取得（閲覧できる未読通知だけを数えた未読数カウンターから）"""
+        return Response({"unread_count": get_unread_count(request.user.id)})
 
 
 class UserNotificationPreferencesViewSet(viewsets.ModelViewSet):
@@ -4,13 +4,17 @@ TRPGセッション管理システム - ハンドアウト通知サービス
 ハンドアウトの作成、公開、更新時の通知機能を提供します。
 """
 
+import asyncio
 import logging
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.utils import timezone
 
 from .models import HandoutNotification, UserNotificationPreferences
+from .notification_counters import adjust_unread_counts, count_recipients, get_unread_counts
 
 logger = logging.getLogger(__name__)
 
@@ -29,9 +33,121 @@ def _notification_sender(session, fallback_user=None):
     return session.gm or session.created_by or fallback_user
 
 
+def notification_payload(notification):
+    return {
+        "id": notification.pk,
+        "notification_type": notification.notification_type,
+        "message": notification.message,
+        "created_at": notification.created_at.isoformat(),
+        "is_read": notification.is_read,
+    }
+
+
+async def _group_send_all(channel_layer, messages):
+    await asyncio.gather(*(channel_layer.group_send(group, message) for group, message in messages))
+
+
+def broadcast_notifications(notifications):
+    """通知をWebSocketへまとめて配信する（未読数は未読数カウンターから取得）"""
+    notifications = [notification for notification in notifications if notification.pk]
+    if not notifications:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    unread_counts = get_unread_counts({notification.recipient_id for notification in notifications})
+    messages = [
+        (
+            f"notifications_user_{notification.recipient_id}",
+            {
+                "type": "notification_created",
+                "notification": notification_payload(notification),
+                "unread_count": unread_counts.get(notification.recipient_id, 0),
+            },
+        )
+        for notification in notifications
+    ]
+    try:
+        async_to_sync(_group_send_all)(channel_layer, messages)
+    except Exception:
+        logger.exception("Unable to broadcast notification over Channels.")
+
+
+def _notification_email(notification, connection=None):
+    return EmailMessage(
+        subject=f"[タブレノ] {notification.get_notification_type_display()}",
+        body=notification.message,
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@tableno.jp"),
+        to=[notification.recipient.email],
+        connection=connection,
+    )
+
+
+def send_notification_emails(notification_ids):
+    """通知メールを1つのSMTPコネクションでまとめて送信し、送信件数を返す"""
+    notifications = HandoutNotification.objects.filter(id__in=notification_ids).select_related("recipient")
+    connection = get_connection(fail_silently=False)
+    messages = [
+        _notification_email(notification, connection) for notification in notifications if notification.recipient.email
+    ]
+    if not messages:
+        return 0
+    sent = connection.send_messages(messages) or 0
+    logger.info(f"メール通知一括送信完了: 送信数={sent}")
+    return sent
+
+
 class HandoutNotificationService:
     """ハンドアウト通知サービスクラス"""
 
+    def _deliver_notifications(self, notifications, preferences):
+        """
+        通知をまとめて作成し、WebSocket配信とメール送信をまとめて行う
+
+        Args:
+            notifications (list[HandoutNotification]): 未保存の通知
+            preferences (dict): UserNotificationPreferences.for_users の戻り値
+
+        Returns:
+            list[HandoutNotification]: 作成した通知
+        """
+        if not notifications:
+            return []
+        # 同じ作成日時をバッチの目印にし、主キーを返さないDB（MySQL）では作成行を読み直す
+        batch_created_at = timezone.now()
+        for notification in notifications:
+            notification.created_at = batch_created_at
+        created = HandoutNotification.objects.bulk_create(notifications)
+        if any(notification.pk is None for notification in created):
+            created = self._reload_created_notifications(created, batch_created_at)
+        # bulk_create は post_save を送らないため、未読数の加算と配信をここで行う
+        adjust_unread_counts(count_recipients(created))
+        broadcast_notifications(created)
+
+        email_notification_ids = [
+            notification.pk
+            for notification in created
+            if preferences[notification.recipient_id].email_notifications_enabled
+        ]
+        if email_notification_ids:
+            from .tasks import queue_notification_emails
+
+            queue_notification_emails(email_notification_ids)
+        return created
+
+    @staticmethod
+    def _reload_created_notifications(notifications, batch_created_at):
+        """bulk_create で主キーが設定されなかった通知を、作成日時と宛先・送信者・種別で読み直す"""
+        return list(
+            HandoutNotification.objects.filter(
+                created_at=batch_created_at,
+                recipient_id__in={notification.recipient_id for notification in notifications},
+                sender_id__in={notification.sender_id for notification in notifications},
+                notification_type__in={notification.notification_type for notification in notifications},
+            ).order_by("id")
+        )
+
     def send_handout_created_notification(self, handout):
         """
         ハンドアウト作成通知を送信
@@ -103,21 +219,13 @@ class HandoutNotificationService:
             sender = _notification_sender(handout.session)
             if sender is None:
                 return False
-            notification_count = 0
-
-            for recipient in recipients:
-                if recipient is None:
-                    continue
-                # 通知設定を確認
-                preferences = UserNotificationPreferences.get_or_create_for_user(recipient)
-                if not preferences.handout_notifications_enabled:
-                    continue
-
-                # 通知メッセージ作成
-                message = self._create_handout_published_message(handout)
 
-                # 通知レコード作成
-                notification = HandoutNotification.objects.create(
+            # 通知設定をまとめて確認
+            recipients = [recipient for recipient in recipients if recipient is not None]
+            preferences = UserNotificationPreferences.for_users(recipients)
+            message = self._create_handout_published_message(handout)
+            notifications = [
+                HandoutNotification(
                     handout_id=handout.id,
                     recipient=recipient,
                     sender=sender,
@@ -125,12 +233,10 @@ class HandoutNotificationService:
                     message=message,
                     is_read=False,
                 )
-
-                # メール通知（設定が有効な場合）
-                if preferences.email_notifications_enabled:
-                    self._send_email_notification(notification)
-
-                notification_count += 1
+                for recipient in recipients
+                if preferences[recipient.pk].handout_notifications_enabled
+            ]
+            notification_count = len(self._deliver_notifications(notifications, preferences))
 
             logger.info(f"ハンドアウト公開通知送信完了: handout={handout.id}, 通知数={notification_count}")
             return notification_count > 0
@@ -291,38 +397,31 @@ class SessionNotificationService(HandoutNotificationService):
         """
         try:
             # 通知設定を確認
-            preferences = UserNotificationPreferences.get_or_create_for_user(invitee)
-            if not preferences.session_notifications_enabled:
+            preferences = UserNotificationPreferences.for_users([invitee])
+            if not preferences[invitee.pk].session_notifications_enabled:
                 logger.info(f"通知設定により送信をスキップ: user={invitee.id}")
                 return False
 
             # 通知メッセージ作成
             message = self._create_session_invitation_message(session, inviter)
 
-            # 通知レコード作成
-            notification = HandoutNotification.objects.create(
+            # 通知レコード作成・配信
+            notification = HandoutNotification(
                 handout_id=0,  # セッション通知なのでhandout_idは0
                 recipient=invitee,
                 sender=inviter,
                 notification_type="session_invitation",
                 message=message,
                 is_read=False,
-            )
-
-            # metadataは後から設定
-            if hasattr(notification, "metadata"):
-                notification.metadata = {
+                metadata={
                     "session_invitation_id": invitation_id,
                     "session_id": session.id,
                     "session_title": session.title,
                     "session_date": session.date.isoformat() if session.date else None,
                     "inviter_name": inviter.nickname or inviter.username,
-                }
-                notification.save()
-
-            # メール通知（設定が有効な場合）
-            if preferences.email_notifications_enabled:
-                self._send_email_notification(notification)
+                },
+            )
+            self._deliver_notifications([notification], preferences)
 
             logger.info(f"セッション招待通知送信完了: session={session.id}, invitee={invitee.id}")
             return True
@@ -351,43 +450,32 @@ class SessionNotificationService(HandoutNotificationService):
             sender = _notification_sender(session)
             if sender is None:
                 return 0
-            notification_count = 0
-
-            for participant in participants:
-                # 通知設定を確認
-                preferences = UserNotificationPreferences.get_or_create_for_user(participant)
-                if not preferences.session_notifications_enabled:
-                    continue
-
-                # 通知メッセージ作成
-                message = self._create_schedule_change_message(session, old_date, new_date)
 
-                # 通知レコード作成
-                notification = HandoutNotification.objects.create(
+            # 通知設定をまとめて確認
+            participants = list(participants)
+            preferences = UserNotificationPreferences.for_users(participants)
+            message = self._create_schedule_change_message(session, old_date, new_date)
+            metadata = {
+                "session_id": session.id,
+                "session_title": session.title,
+                "old_date": old_date.isoformat() if old_date else None,
+                "new_date": new_date.isoformat() if new_date else None,
+                "gm_name": _session_gm_name(session),
+            }
+            notifications = [
+                HandoutNotification(
                     handout_id=0,  # セッション通知なのでhandout_idは0
                     recipient=participant,
                     sender=sender,
                     notification_type="schedule_change",
                     message=message,
                     is_read=False,
+                    metadata=metadata,
                 )
-
-                # metadataは後から設定
-                if hasattr(notification, "metadata"):
-                    notification.metadata = {
-                        "session_id": session.id,
-                        "session_title": session.title,
-                        "old_date": old_date.isoformat() if old_date else None,
-                        "new_date": new_date.isoformat() if new_date else None,
-                        "gm_name": _session_gm_name(session),
-                    }
-                    notification.save()
-
-                # メール通知（設定が有効な場合）
-                if preferences.email_notifications_enabled:
-                    self._send_email_notification(notification)
-
-                notification_count += 1
+                for participant in participants
+                if preferences[participant.pk].session_notifications_enabled
+            ]
+            notification_count = len(self._deliver_notifications(notifications, preferences))
 
             logger.info(f"スケジュール変更通知送信完了: session={session.id}, 通知数={notification_count}")
             return notification_count
@@ -415,39 +503,32 @@ class SessionNotificationService(HandoutNotificationService):
             sender = _notification_sender(session)
             if sender is None:
                 return 0
-            notification_count = 0
-
-            for participant in participants:
-                # 通知設定を確認
-                preferences = UserNotificationPreferences.get_or_create_for_user(participant)
-                if not preferences.session_notifications_enabled:
-                    continue
-
-                # 通知メッセージ作成
-                message = self._create_session_cancelled_message(session, reason)
 
-                # 通知レコード作成
-                notification = HandoutNotification.objects.create(
+            # 通知設定をまとめて確認
+            participants = list(participants)
+            preferences = UserNotificationPreferences.for_users(participants)
+            message = self._create_session_cancelled_message(session, reason)
+            metadata = {
+                "session_id": session.id,
+                "session_title": session.title,
+                "session_date": session.date.isoformat() if session.date else None,
+                "gm_name": _session_gm_name(session),
+                "cancel_reason": reason or "",
+            }
+            notifications = [
+                HandoutNotification(
                     handout_id=0,  # セッション通知なのでhandout_idは0
                     recipient=participant,
                     sender=sender,
                     notification_type="session_cancelled",
                     message=message,
                     is_read=False,
-                    metadata={
-                        "session_id": session.id,
-                        "session_title": session.title,
-                        "session_date": session.date.isoformat() if session.date else None,
-                        "gm_name": _session_gm_name(session),
-                        "cancel_reason": reason or "",
-                    },
+                    metadata=metadata,
                 )
-
-                # メール通知（設定が有効な場合）
-                if preferences.email_notifications_enabled:
-                    self._send_email_notification(notification)
-
-                notification_count += 1
+                for participant in participants
+                if preferences[participant.pk].session_notifications_enabled
+            ]
+            notification_count = len(self._deliver_notifications(notifications, preferences))
 
             logger.info(f"セッションキャンセル通知送信完了: session={session.id}, 通知数={notification_count}")
             return notification_count
@@ -476,39 +557,30 @@ class SessionNotificationService(HandoutNotificationService):
             if sender is None:
                 return 0
 
-            notification_count = 0
-
-            for participant in participants:
-                # 通知設定を確認
-                preferences = UserNotificationPreferences.get_or_create_for_user(participant)
-                if not preferences.session_notifications_enabled:
-                    continue
-
-                # 通知メッセージ作成
-                message = self._create_session_reminder_message(session, hours_before)
-
-                # 通知レコード作成
-                notification = HandoutNotification.objects.create(
+            # 通知設定をまとめて確認
+            preferences = UserNotificationPreferences.for_users(participants)
+            message = self._create_session_reminder_message(session, hours_before)
+            metadata = {
+                "session_id": session.id,
+                "session_title": session.title,
+                "session_date": session.date.isoformat() if session.date else None,
+                "hours_before": hours_before,
+                "gm_name": _session_gm_name(session),
+            }
+            notifications = [
+                HandoutNotification(
                     handout_id=0,  # セッション通知なのでhandout_idは0
                     recipient=participant,
                     sender=sender,
                     notification_type="session_reminder",
                     message=message,
                     is_read=False,
-                    metadata={
-                        "session_id": session.id,
-                        "session_title": session.title,
-                        "session_date": session.date.isoformat() if session.date else None,
-                        "hours_before": hours_before,
-                        "gm_name": _session_gm_name(session),
-                    },
+                    metadata=metadata,
                 )
-
-                # メール通知（設定が有効な場合）
-                if preferences.email_notifications_enabled:
-                    self._send_email_notification(notification)
-
-                notification_count += 1
+                for participant in participants
+                if preferences[participant.pk].session_notifications_enabled
+            ]
+            notification_count = len(self._deliver_notifications(notifications, preferences))
 
             logger.info(f"セッションリマインダー通知送信完了: session={session.id}, 通知数={notification_count}")
             return notification_count
@@ -1,8 +1,12 @@
 import re
 import unicodedata
+from collections import defaultdict
+from functools import lru_cache
 
 SKILL_DELIMITER_RE = re.compile(r"[\r\n,、，]+")
 SPECIALIZED_SKILL_RE = re.compile(r"^(?P<base>.*?)[(（](?P<specialization>.*?)[)）]\s*$")
+# 技能名の正規化結果はシナリオ・探索者をまたいで再利用する（技能名の種類は限られる）
+CANONICAL_CACHE_SIZE = 4096
 
 GENERAL_SKILL_ALIASES = {
     "他国語": "他の言語",
@@ -154,14 +158,22 @@ def _clean_display_name(value):
     return " ".join(str(value or "").replace("\u3000", " ").split()).strip()
 
 
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
 def _match_key(value):
     return unicodedata.normalize("NFKC", _clean_display_name(value)).casefold()
 
 
 COC6_INITIAL_SKILL_VALUE_KEYS = {_match_key(name): value for name, value in COC6_INITIAL_SKILL_VALUES.items()}
 COC7_INITIAL_SKILL_VALUE_KEYS = {_match_key(name): value for name, value in COC7_INITIAL_SKILL_VALUES.items()}
+GENERAL_SKILL_ALIAS_KEYS = {_match_key(source): target for source, target in GENERAL_SKILL_ALIASES.items()}
+SEVENTH_EDITION_SKILL_ALIAS_KEYS = {
+    _match_key(source): target for source, target in SEVENTH_EDITION_SKILL_ALIASES.items()
+}
+DODGE_KEY = _match_key("回避")
+NATIVE_LANGUAGE_KEY = _match_key("母国語")
 
 
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
 def _skill_parts(value):
     normalized = unicodedata.normalize("NFKC", _clean_display_name(value))
     match = SPECIALIZED_SKILL_RE.match(normalized)
@@ -170,31 +182,31 @@ def _skill_parts(value):
     return match.group("base").strip(), match.group("specialization").strip() or None
 
 
-def _alias_lookup(mapping, value):
-    aliases = {_match_key(source): target for source, target in mapping.items()}
-    return aliases.get(_match_key(value))
+def _alias_lookup(alias_keys, value):
+    return alias_keys.get(_match_key(value))
 
 
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
 def _canonical_skill_name(value, edition):
     cleaned = _clean_display_name(value)
     if not cleaned:
         return ""
 
-    alias = _alias_lookup(GENERAL_SKILL_ALIASES, cleaned)
+    alias = _alias_lookup(GENERAL_SKILL_ALIAS_KEYS, cleaned)
     if alias:
         cleaned = alias
 
     if edition == "7th":
-        alias = _alias_lookup(SEVENTH_EDITION_SKILL_ALIASES, cleaned)
+        alias = _alias_lookup(SEVENTH_EDITION_SKILL_ALIAS_KEYS, cleaned)
         if alias:
             return alias
 
     base_name, specialization = _skill_parts(cleaned)
-    base_alias = _alias_lookup(GENERAL_SKILL_ALIASES, base_name)
+    base_alias = _alias_lookup(GENERAL_SKILL_ALIAS_KEYS, base_name)
     if base_alias:
         base_name = base_alias
     if edition == "7th" and specialization:
-        base_alias = _alias_lookup(SEVENTH_EDITION_SKILL_ALIASES, base_name)
+        base_alias = _alias_lookup(SEVENTH_EDITION_SKILL_ALIAS_KEYS, base_name)
         if base_alias:
             aliased_base, aliased_specialization = _skill_parts(base_alias)
             if not aliased_specialization:
@@ -205,6 +217,14 @@ def _canonical_skill_name(value, edition):
     return base_name
 
 
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def _canonical_keys(value, edition):
+    """技能名から (正規化名, 照合キー, 基本技能の照合キー, 専門分野) を返す"""
+    canonical = _canonical_skill_name(value, edition)
+    base_name, specialization = _skill_parts(canonical)
+    return canonical, _match_key(canonical), _match_key(base_name), specialization
+
+
 def _scenario_skill_rows(scenario):
     edition = "7th" if scenario.game_system == "coc7" else "6th"
     rows = []
@@ -238,52 +258,49 @@ def _character_skills(character):
     return list(character.skills.order_by("id"))
 
 
-def _stored_skill_matches(character, requested_name):
+def _character_skill_index(character):
+    """保持技能を照合キーごとにまとめた索引（基本技能キー / 専門分野込みキー）"""
     edition = character.edition or "6th"
-    requested_canonical = _canonical_skill_name(requested_name, edition)
-    requested_base, requested_specialization = _skill_parts(requested_canonical)
-    requested_key = _match_key(requested_canonical)
-    requested_base_key = _match_key(requested_base)
-
-    matches = []
+    by_base_key = defaultdict(list)
+    by_key = defaultdict(list)
     for skill in _character_skills(character):
-        stored_canonical = _canonical_skill_name(skill.skill_name, edition)
-        stored_base, _ = _skill_parts(stored_canonical)
-        if requested_specialization:
-            is_match = _match_key(stored_canonical) == requested_key
-        else:
-            is_match = _match_key(stored_base) == requested_base_key
-        if is_match:
-            matches.append(
-                {
-                    "name": skill.skill_name,
-                    "value": skill.current_value,
-                    "is_initial": False,
-                }
-            )
-    return matches
+        _, key, base_key, _ = _canonical_keys(skill.skill_name, edition)
+        match = {"name": skill.skill_name, "value": skill.current_value, "is_initial": False}
+        by_base_key[base_key].append(match)
+        by_key[key].append(match)
+    return {"by_base_key": by_base_key, "by_key": by_key}
+
+
+def _stored_skill_matches(character, requested_name, skill_index=None):
+    if skill_index is None:
+        skill_index = _character_skill_index(character)
+    _, requested_key, requested_base_key, requested_specialization = _canonical_keys(
+        requested_name, character.edition or "6th"
+    )
+    if requested_specialization:
+        matches = skill_index["by_key"].get(requested_key, [])
+    else:
+        matches = skill_index["by_base_key"].get(requested_base_key, [])
+    return [dict(match) for match in matches]
 
 
 def _initial_skill_match(character, requested_name):
     edition = character.edition or "6th"
-    canonical = _canonical_skill_name(requested_name, edition)
-    base_name, _ = _skill_parts(canonical)
-    canonical_key = _match_key(canonical)
-    base_key = _match_key(base_name)
+    _, canonical_key, base_key, _ = _canonical_keys(requested_name, edition)
 
     if edition == "7th":
-        if base_key == _match_key("回避"):
+        if base_key == DODGE_KEY:
             value = character.dex_value // 2
-        elif base_key == _match_key("母国語"):
+        elif base_key == NATIVE_LANGUAGE_KEY:
             value = character.edu_value
         else:
             value = COC7_INITIAL_SKILL_VALUE_KEYS.get(canonical_key)
             if value is None:
                 value = COC7_INITIAL_SKILL_VALUE_KEYS.get(base_key)
     else:
-        if base_key == _match_key("回避"):
+        if base_key == DODGE_KEY:
             value = character.dex_value * 2
-        elif base_key == _match_key("母国語"):
+        elif base_key == NATIVE_LANGUAGE_KEY:
             value = character.edu_value * 5
         else:
             value = COC6_INITIAL_SKILL_VALUE_KEYS.get(canonical_key)
@@ -306,10 +323,9 @@ def _should_show_match_names(character, requested_name, matches):
     if not matches or matches[0]["is_initial"]:
         return False
 
-    requested_canonical = _canonical_skill_name(requested_name, character.edition or "6th")
-    _, requested_specialization = _skill_parts(requested_canonical)
-    matched_canonical = _canonical_skill_name(matches[0]["name"], character.edition or "6th")
-    _, matched_specialization = _skill_parts(matched_canonical)
+    edition = character.edition or "6th"
+    _, _, _, requested_specialization = _canonical_keys(requested_name, edition)
+    _, _, _, matched_specialization = _canonical_keys(matches[0]["name"], edition)
     return requested_specialization is None and matched_specialization is not None
 
 
@@ -332,11 +348,14 @@ def build_recommended_skill_comparison(scenario, participants):
         for participant in eligible_participants
     ]
 
+    # 参加者ごとに技能索引を1回だけ作り、各行は辞書引きで照合する
+    sheets = [participant.character_sheet.system_data for participant in eligible_participants]
+    skill_indexes = [_character_skill_index(character) for character in sheets]
+
     for row in rows:
         cells = []
-        for participant in eligible_participants:
-            character = participant.character_sheet.system_data
-            matches = _stored_skill_matches(character, row["name"])
+        for character, skill_index in zip(sheets, skill_indexes):
+            matches = _stored_skill_matches(character, row["name"], skill_index)
             if not matches:
                 initial_match = _initial_skill_match(character, row["name"])
                 if initial_match:
@@ -0,0 +1,149 @@
+"""
+スケジュール系 読み取りAPIのレスポンスキャッシュ
+
+カレンダー・月別イベント・直近セッション・予定集約のレスポンスを
+(ビュー, ユーザー, 世代トークン, クエリ) 単位でキャッシュする。
+
+世代トークンは2種類:
+- 全体世代: 公開セッション（変更前後のどちらかが公開）の変更など、
+  誰のレスポンスにも影響しうる変更で更新する
+- ユーザー世代: 非公開セッション・日程・参加者・グループ・グループ連携の変更や
+  グループ所属の変更で、そのセッションを閲覧できるユーザーだけを更新する
+
+トークンを差し替えるだけで古いキャッシュは参照されなくなり、TTLで自然に消える。
+"""
+
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+CACHE_PREFIX = "schedules:response"
+GLOBAL_GENERATION_KEY = "schedules:response:generation"
+USER_GENERATION_KEY = "schedules:response:generation:user:{user_id}"
+DEFAULT_TIMEOUT = 300
+
+
+def get_timeout(max_timeout=None):
+    timeout = getattr(settings, "SCHEDULE_RESPONSE_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+    if max_timeout is not None:
+        timeout = min(timeout, max_timeout)
+    return timeout
+
+
+def _generation(key):
+    token = cache.get(key)
+    if token is None:
+        token = uuid.uuid4().hex
+        if not cache.add(key, token, None):
+            token = cache.get(key) or token
+    return token
+
+
+def _rotate(keys):
+    # 連番ではなく乱数トークンにして、キャッシュ退避後に古い世代が復活しないようにする
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def _rotate_now_and_on_commit(keys):
+    # トランザクション中に別リクエストが変更前の状態をキャッシュした場合に備え、コミット時にも更新する
+    keys = list(keys)
+    if not keys:
+        return
+    _rotate(keys)
+    transaction.on_commit(lambda: _rotate(keys))
+
+
+def invalidate_all():
+    """全ユーザーのキャッシュを無効化する"""
+    _rotate_now_and_on_commit([GLOBAL_GENERATION_KEY])
+
+
+def invalidate_users(user_ids):
+    """指定ユーザーのキャッシュだけを無効化する"""
+    _rotate_now_and_on_commit(USER_GENERATION_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id)
+
+
+def indexed_viewer_ids(session_ids):
+    """閲覧権限インデックス（SessionVisibility）上でセッションを閲覧できるユーザーIDの集合"""
+    from .models import SessionVisibility
+
+    return set(
+        SessionVisibility.objects.filter(session_id__in=session_ids).values_list("user_id", flat=True).distinct()
+    )
+
+
+def session_audience(session_ids):
+    """セッションを閲覧できるユーザーIDの集合と、公開セッションを含むかを返す
+
+    閲覧者は閲覧権限インデックスから読む。インデックスは同じ変更のシグナルで
+    更新前・更新後のどちらでもありうるため、呼び出し側は変更で閲覧範囲に
+    出入りするユーザーを user_ids で明示的に渡す。
+    """
+    from .models import TRPGSession
+
+    session_ids = {session_id for session_id in session_ids if session_id}
+    if not session_ids:
+        return set(), False
+    user_ids = indexed_viewer_ids(session_ids)
+    has_public = False
+    for gm_id, visibility in TRPGSession.objects.filter(id__in=session_ids).values_list("gm_id", "visibility"):
+        user_ids.add(gm_id)
+        has_public = has_public or visibility == "public"
+    user_ids.discard(None)
+    return user_ids, has_public
+
+
+def invalidate_audience(audience, user_ids=()):
+    """session_audience の結果（+ 追加ユーザー）のキャッシュを無効化する"""
+    audience_user_ids, has_public = audience
+    if has_public:
+        invalidate_all()
+    else:
+        invalidate_users(audience_user_ids | set(user_ids))
+
+
+def invalidate_sessions(session_ids, user_ids=()):
+    """指定セッションを閲覧できるユーザー（公開セッションを含む場合は全員）のキャッシュを無効化する"""
+    invalidate_audience(session_audience(session_ids), user_ids)
+
+
+def response_cache_key(view_name, user_id, query_params):
+    generation_keys = [GLOBAL_GENERATION_KEY, USER_GENERATION_KEY.format(user_id=user_id)]
+    tokens = cache.get_many(generation_keys)
+    generations = [tokens.get(key) or _generation(key) for key in generation_keys]
+    query = "&".join(f"{key}={value}" for key, values in sorted(query_params.lists()) for value in values)
+    query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+    return f"{CACHE_PREFIX}:{view_name}:{user_id}:{generations[0]}:{generations[1]}:{query_hash}"
+
+
+def cache_schedule_response(view_name, max_timeout=None):
+    """APIView.get をユーザー単位でキャッシュするデコレータ（200応答のみ保存）
+
+    max_timeout は「今日」「直近」など現在時刻に依存するビューのTTL上限。
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            timeout = get_timeout(max_timeout)
+            if timeout <= 0 or not request.user.is_authenticated:
+                return method(self, request, *args, **kwargs)
+
+            key = response_cache_key(view_name, request.user.pk, request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            return response
+
+        return wrapper
+
+    return decorator
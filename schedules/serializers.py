@@ -2,17 +2,20 @@ from datetime import datetime
 from datetime import time as time_cls
 
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from accounts.image_renditions import rendition_url, rendition_urls
 from accounts.models import CustomUser, Group
 from accounts.serializers import PublicUserSerializer, validate_character_image
 from scenarios.access import can_view_scenario
 from scenarios.models import Scenario
-from schedules.handout_access import can_view_handout
+from schedules.handout_access import can_view_handout, resolve_handout_viewer
 
 
 def build_internal_character_url(request, character_sheet):
@@ -56,6 +59,8 @@ class SessionImageSerializer(serializers.ModelSerializer):
 
     uploaded_by_detail = PublicUserSerializer(source="uploaded_by", read_only=True)
     image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = SessionImage
@@ -63,6 +68,8 @@ class SessionImageSerializer(serializers.ModelSerializer):
             "id",
             "image",
             "image_url",
+            "thumbnail_url",
+            "renditions",
             "title",
             "description",
             "order",
@@ -82,6 +89,18 @@ class SessionImageSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    @extend_schema_field(OpenApiTypes.URI)
+    def get_thumbnail_url(self, obj):
+        url = rendition_url(obj.image, obj.renditions)
+        if not url:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_renditions(self, obj):
+        return rendition_urls(obj.image, obj.renditions, self.context.get("request"))
+
     def validate_image(self, value):
         return validate_character_image(value)
 
@@ -171,6 +190,8 @@ class SessionParticipantSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.ListField(child=serializers.CharField()))
     def get_roles(self, obj):
+        if "participant_roles" in getattr(obj, "_prefetched_objects_cache", {}):
+            return [role.role for role in obj.participant_roles.all()]
         return list(obj.participant_roles.values_list("role", flat=True))
 
     def validate(self, attrs):
@@ -327,6 +348,7 @@ class HandoutInfoSerializer(serializers.ModelSerializer):
         if instance.release_conditions and instance.is_secret:
             instance.release_status = HandoutInfo.ReleaseStatus.WAITING
             instance.next_evaluation_at = get_next_evaluation_at(instance.release_conditions)
+            instance.needs_release_evaluation = True
             instance.released_at = None
         elif not instance.is_secret:
             instance.release_status = HandoutInfo.ReleaseStatus.RELEASED
@@ -340,6 +362,7 @@ class HandoutInfoSerializer(serializers.ModelSerializer):
             update_fields=[
                 "release_status",
                 "next_evaluation_at",
+                "needs_release_evaluation",
                 "released_at",
                 "updated_at",
             ]
@@ -414,7 +437,7 @@ class TRPGSessionSerializer(serializers.ModelSerializer):
     scenario_detail = serializers.SerializerMethodField()
     participants = serializers.SerializerMethodField()
     participants_detail = SessionParticipantSerializer(source="sessionparticipant_set", many=True, read_only=True)
-    handouts_detail = HandoutInfoSerializer(source="handouts", many=True, read_only=True)
+    handouts_detail = serializers.SerializerMethodField()
     images_detail = SessionImageSerializer(source="images", many=True, read_only=True)
     youtube_links_detail = SessionYouTubeLinkSerializer(source="youtube_links", many=True, read_only=True)
     participant_count = serializers.SerializerMethodField()
@@ -466,28 +489,23 @@ class TRPGSessionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "gm", "created_by", "created_at", "updated_at"]
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
+    @extend_schema_field(HandoutInfoSerializer(many=True))
+    def get_handouts_detail(self, obj):
         request = self.context.get("request")
-        user = getattr(request, "user", None)
-        visible_handouts = [
-            handout
-            for handout in instance.handouts.select_related(
-                "participant",
-                "participant__user",
-            )
-            if can_view_handout(handout, user)
-        ]
-        data["handouts_detail"] = HandoutInfoSerializer(
-            visible_handouts,
+        # 閲覧条件はセッションごとに1回だけ解決し、各ハンドアウトはメモリ上で判定する
+        viewer = resolve_handout_viewer(obj, getattr(request, "user", None))
+        handouts = obj.handouts.all()
+        if "handouts" not in getattr(obj, "_prefetched_objects_cache", {}):
+            handouts = handouts.select_related("participant", "participant__user")
+        return HandoutInfoSerializer(
+            [handout for handout in handouts if viewer.can_view(handout)],
             many=True,
             context=self.context,
         ).data
-        return data
 
     @extend_schema_field(OpenApiTypes.INT)
     def get_participant_count(self, obj):
-        return obj.participants.count()
+        return _annotated_participant_count(obj)
 
     @extend_schema_field(OpenApiTypes.INT)
     def get_guest_count(self, obj):
@@ -517,7 +535,7 @@ class TRPGSessionSerializer(serializers.ModelSerializer):
                     "description": skill.description,
                     "order": skill.order,
                 }
-                for skill in obj.scenario.recommended_skill_items.order_by("order", "id")
+                for skill in obj.scenario.recommended_skill_items.all()
             ],
         }
 
@@ -639,6 +657,75 @@ class CalendarEventSerializer(serializers.ModelSerializer):
         return obj.gm.nickname or obj.gm.username if obj.gm_id else None
 
 
+def _per_session(queryset, aggregate):
+    """セッションごとの集計値を相関サブクエリで返す（行が無い場合は0）"""
+    values = (
+        queryset.filter(session=OuterRef("pk")).order_by().values("session").annotate(value=aggregate).values("value")
+    )
+    return Coalesce(Subquery(values[:1]), 0)
+
+
+def annotate_session_list_counts(queryset):
+    """一覧表示用の件数を付与する
+
+    participant_count（ユーザー参加者数）/ guest_count（ゲスト数）/
+    youtube_link_count（YouTube動画数）/ youtube_total_seconds（動画合計秒数）。
+    JOIN ではなくサブクエリで数えるため distinct() 済みのクエリセットにも重ねられる。
+    SessionListSerializer・UpcomingSessionSerializer と TRPGSession の YouTube 系プロパティが参照する。
+    """
+    participants = SessionParticipant.objects.all()
+    youtube_links = SessionYouTubeLink.objects.all()
+    return queryset.annotate(
+        participant_count=_per_session(participants.filter(user__isnull=False), Count("pk")),
+        guest_count=_per_session(participants.filter(user__isnull=True), Count("pk")),
+        youtube_link_count=_per_session(youtube_links, Count("pk")),
+        youtube_total_seconds=_per_session(youtube_links, Sum("duration_seconds")),
+    )
+
+
+SESSION_DETAIL_SELECT_RELATED = ("gm", "created_by", "group", "scenario")
+
+
+def session_detail_prefetches():
+    """TRPGSessionSerializer が参照する関連の Prefetch 一覧
+
+    参加者（ロール・キャラクターシート・版別データ込み）、ハンドアウト（宛先の参加者込み）、
+    シナリオの推奨技能、画像、YouTube動画を読み込み、セッション数によらずクエリ数を一定にする。
+    取得済みのセッションには prefetch_related_objects で適用する。
+    """
+    character_sheet_related = ("character_sheet__sixth_edition_data", "character_sheet__seventh_edition_data")
+    participants = SessionParticipant.objects.select_related(
+        "user", "participant_identity", *character_sheet_related
+    ).prefetch_related("participant_roles")
+    handouts = HandoutInfo.objects.select_related(
+        "participant__user",
+        "participant__participant_identity",
+        *(f"participant__{related}" for related in character_sheet_related),
+    ).prefetch_related("participant__participant_roles")
+    return [
+        Prefetch("sessionparticipant_set", queryset=participants),
+        Prefetch("handouts", queryset=handouts),
+        "scenario__recommended_skill_items",
+        Prefetch("images", queryset=SessionImage.objects.select_related("uploaded_by")),
+        Prefetch("youtube_links", queryset=SessionYouTubeLink.objects.select_related("added_by")),
+    ]
+
+
+def prefetch_session_detail(queryset):
+    """TRPGSessionSerializer で表示するセッションのクエリセットに関連の読み込みを付与する"""
+    return queryset.select_related(*SESSION_DETAIL_SELECT_RELATED).prefetch_related(*session_detail_prefetches())
+
+
+def _annotated_participant_count(obj):
+    annotated_value = getattr(obj, "participant_count", None)
+    if isinstance(annotated_value, int):
+        return annotated_value
+    prefetched_participants = getattr(obj, "_prefetched_objects_cache", {}).get("sessionparticipant_set")
+    if prefetched_participants is not None:
+        return sum(1 for p in prefetched_participants if p.user_id is not None)
+    return obj.participants.count()
+
+
 class SessionListSerializer(serializers.ModelSerializer):
     """セッション一覧表示用の見やすいシリアライザー"""
 
@@ -680,7 +767,7 @@ class SessionListSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.INT)
     def get_participant_count(self, obj):
-        return obj.participants.count()
+        return _annotated_participant_count(obj)
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_gm_name(self, obj):
@@ -745,7 +832,7 @@ class UpcomingSessionSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.INT)
     def get_participant_count(self, obj):
-        return obj.participants.count()
+        return _annotated_participant_count(obj)
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_gm_name(self, obj):
@@ -803,14 +890,19 @@ class UpcomingSessionSerializer(serializers.ModelSerializer):
     @extend_schema_field(OpenApiTypes.STR)
     def get_participants_summary(self, obj):
         """参加者の簡易表示"""
-        participants = obj.sessionparticipant_set.select_related("user").all()
+        participants = getattr(obj, "_prefetched_objects_cache", {}).get("sessionparticipant_set")
+        if participants is None:
+            participants = obj.sessionparticipant_set.select_related("user").prefetch_related("participant_roles")
+        participants = list(participants)
 
         if not participants:
             return "参加者なし"
 
-        # GMを除く参加者
+        # GMを除く参加者（participant_roles はプリフェッチ済みならそれを使う）
         players = [
-            p for p in participants if not p.participant_roles.filter(role=SessionParticipantRole.Role.GM).exists()
+            p
+            for p in participants
+            if not any(role.role == SessionParticipantRole.Role.GM for role in p.participant_roles.all())
         ]
 
         if len(players) == 0:
@@ -855,7 +947,7 @@ class HandoutBasicSerializer(serializers.ModelSerializer):
     """ハンドアウト基本情報シリアライザー"""
 
     session_title = serializers.CharField(source="session.title", read_only=True)
-    session_id = serializers.IntegerField(source="session_id", read_only=True)
+    session_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = HandoutInfo
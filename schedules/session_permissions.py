@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
 
 from accounts.models import GroupMembership
 
@@ -18,6 +22,72 @@ VISIBLE_ASSIGNABLE_ROLES = (
 )
 
 
+class SessionPermissionContext:
+    """1リクエスト内の権限判定で使う、ユーザーの参加者行・ロールとグループ内ロールのキャッシュ
+
+    (ユーザー, セッション) ごとの参加者行（ロール付き）と (ユーザー, グループ) ごとのメンバーシップを
+    最初の判定時に1クエリずつ読み込み、以降の can_* 判定はメモリ上で答える。
+    参加者・ロール・メンバーシップが変更されるとシグナルから clear() される。
+    """
+
+    def __init__(self):
+        self._participants = {}
+        self._group_roles = {}
+
+    def participant(self, user, session: TRPGSession) -> SessionParticipant | None:
+        key = (user.id, session.pk)
+        if key not in self._participants:
+            role = SessionParticipantRole.objects.filter(participant=OuterRef("pk")).values("role")[:1]
+            self._participants[key] = (
+                SessionParticipant.objects.filter(session=session, user=user)
+                .annotate(cached_role=Subquery(role))
+                .first()
+            )
+        return self._participants[key]
+
+    def participant_role(self, user, session: TRPGSession) -> str | None:
+        participant = self.participant(user, session)
+        return participant.cached_role if participant else None
+
+    def group_role(self, user, group_id) -> str | None:
+        key = (user.id, group_id)
+        if key not in self._group_roles:
+            self._group_roles[key] = (
+                GroupMembership.objects.filter(group_id=group_id, user=user).values_list("role", flat=True).first()
+            )
+        return self._group_roles[key]
+
+    def clear(self) -> None:
+        self._participants.clear()
+        self._group_roles.clear()
+
+
+_permission_context: ContextVar[SessionPermissionContext | None] = ContextVar(
+    "session_permission_context", default=None
+)
+
+
+@contextmanager
+def permission_context():
+    """ブロック内の権限判定を SessionPermissionContext にキャッシュする（入れ子の場合は外側を使い続ける）"""
+    context = _permission_context.get()
+    if context is not None:
+        yield context
+        return
+    context = SessionPermissionContext()
+    token = _permission_context.set(context)
+    try:
+        yield context
+    finally:
+        _permission_context.reset(token)
+
+
+def clear_permission_context() -> None:
+    context = _permission_context.get()
+    if context is not None:
+        context.clear()
+
+
 def _is_authenticated(user) -> bool:
     return bool(user and getattr(user, "is_authenticated", False))
 
@@ -26,9 +96,12 @@ def _role_value(role) -> str:
     return role.value if hasattr(role, "value") else str(role)
 
 
-def _user_participant(user, session: TRPGSession) -> SessionParticipant | None:
+def get_user_participant(user, session: TRPGSession) -> SessionParticipant | None:
     if not _is_authenticated(user):
         return None
+    context = _permission_context.get()
+    if context is not None:
+        return context.participant(user, session)
     return SessionParticipant.objects.filter(session=session, user=user).first()
 
 
@@ -70,6 +143,9 @@ def has_participant_role(user, session: TRPGSession, role: str) -> bool:
     role = _role_value(role)
     if not _is_authenticated(user):
         return False
+    context = _permission_context.get()
+    if context is not None:
+        return context.participant_role(user, session) == role
     return SessionParticipantRole.objects.filter(
         participant__session=session,
         participant__user=user,
@@ -151,6 +227,9 @@ def is_group_admin(user, session: TRPGSession) -> bool:
         return False
     if session.group.created_by_id == user.id:
         return True
+    context = _permission_context.get()
+    if context is not None:
+        return context.group_role(user, session.group_id) == "admin"
     return GroupMembership.objects.filter(
         group_id=session.group_id,
         user=user,
@@ -161,6 +240,9 @@ def is_group_admin(user, session: TRPGSession) -> bool:
 def is_group_member(user, session: TRPGSession) -> bool:
     if not _is_authenticated(user) or not session.group_id:
         return False
+    context = _permission_context.get()
+    if context is not None:
+        return context.group_role(user, session.group_id) is not None
     return GroupMembership.objects.filter(group_id=session.group_id, user=user).exists()
 
 
@@ -236,7 +318,11 @@ def can_view_session_basic(user, session: TRPGSession) -> bool:
         return True
     if not _is_authenticated(user):
         return False
-    if SessionParticipant.objects.filter(session=session, user=user).exists():
+    context = _permission_context.get()
+    if context is not None:
+        if context.participant(user, session) is not None:
+            return True
+    elif SessionParticipant.objects.filter(session=session, user=user).exists():
         return True
     return is_group_member(user, session) or is_group_admin(user, session)
 
@@ -244,6 +330,9 @@ def can_view_session_basic(user, session: TRPGSession) -> bool:
 def _has_management_role(user, session: TRPGSession) -> bool:
     if not _is_authenticated(user):
         return False
+    context = _permission_context.get()
+    if context is not None:
+        return context.participant_role(user, session) in MANAGEMENT_ROLES
     return SessionParticipantRole.objects.filter(
         participant__session=session,
         participant__user=user,
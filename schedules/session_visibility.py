@@ -0,0 +1,161 @@
+"""
+セッション閲覧権限インデックス（SessionVisibility）の計算・更新
+
+公開セッションは visibility 列で判定し、それ以外の閲覧理由
+（作成者・グループメンバー・グループ作成者・参加者・グループ連携共有）を
+(ユーザー, セッション, 理由) の行として保持する。
+
+変更時は影響する (ユーザー集合 × セッション集合) の範囲だけを再計算して差し替え、
+全件の再構築は rebuild_session_visibility コマンドから行う。
+"""
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from accounts.models import GroupLink, GroupLinkShare, GroupMembership
+
+from .models import SessionParticipant, SessionVisibility, TRPGSession
+
+Reason = SessionVisibility.Reason
+VISIBILITY_SESSION_FIELDS = frozenset({"created_by", "created_by_id", "group", "group_id"})
+
+
+def visible_sessions_for(user):
+    """ユーザーが閲覧できるセッション（公開セッション + インデックス上の閲覧可能セッション）"""
+    indexed_session_ids = SessionVisibility.objects.filter(user=user).values("session_id")
+    return TRPGSession.objects.filter(Q(visibility="public") | Q(id__in=indexed_session_ids))
+
+
+def _linked_share_rows(user_ids=None, session_ids=None):
+    shares = GroupLinkShare.objects.filter(
+        resource_type=GroupLinkShare.ResourceType.SESSION,
+        link__status=GroupLink.Status.ACCEPTED,
+    )
+    if session_ids is not None:
+        shares = shares.filter(object_id__in=session_ids)
+    if user_ids is not None:
+        # 対象ユーザーが所属するグループが閲覧側（共有元の反対側）になっている共有だけを読む
+        group_ids = GroupMembership.objects.filter(user_id__in=user_ids).values("group_id")
+        shares = shares.filter(
+            Q(link__source_group_id__in=group_ids, owner_group_id=F("link__target_group_id"))
+            | Q(link__target_group_id__in=group_ids, owner_group_id=F("link__source_group_id"))
+        )
+
+    # 共有元グループの反対側のグループメンバーが閲覧できる
+    viewer_groups = {}
+    for session_id, owner_group_id, source_group_id, target_group_id in shares.values_list(
+        "object_id", "owner_group_id", "link__source_group_id", "link__target_group_id"
+    ):
+        if owner_group_id == source_group_id:
+            viewer_groups.setdefault(target_group_id, set()).add(session_id)
+        elif owner_group_id == target_group_id:
+            viewer_groups.setdefault(source_group_id, set()).add(session_id)
+    if not viewer_groups:
+        return set()
+
+    memberships = GroupMembership.objects.filter(group_id__in=viewer_groups)
+    if user_ids is not None:
+        memberships = memberships.filter(user_id__in=user_ids)
+    shared_ids = set().union(*viewer_groups.values())
+    existing_ids = set(TRPGSession.objects.filter(id__in=shared_ids).values_list("id", flat=True))
+
+    rows = set()
+    for user_id, group_id in memberships.values_list("user_id", "group_id"):
+        for session_id in viewer_groups[group_id] & existing_ids:
+            rows.add((user_id, session_id, Reason.GROUP_LINK.value))
+    return rows
+
+
+def compute_visibility_rows(user_ids=None, session_ids=None):
+    """指定範囲の (user_id, session_id, reason) を生データから求める"""
+    sessions = TRPGSession.objects.all()
+    participants = SessionParticipant.objects.filter(user_id__isnull=False)
+    if session_ids is not None:
+        sessions = sessions.filter(id__in=session_ids)
+        participants = participants.filter(session_id__in=session_ids)
+
+    creators = sessions.filter(created_by_id__isnull=False)
+    owners = sessions.filter(group__created_by_id__isnull=False)
+    members = sessions.filter(group__groupmembership__user_id__isnull=False)
+    if user_ids is not None:
+        creators = creators.filter(created_by_id__in=user_ids)
+        owners = owners.filter(group__created_by_id__in=user_ids)
+        members = members.filter(group__groupmembership__user_id__in=user_ids)
+        participants = participants.filter(user_id__in=user_ids)
+
+    rows = set()
+    sources = (
+        (creators.values_list("created_by_id", "id"), Reason.CREATOR),
+        (owners.values_list("group__created_by_id", "id"), Reason.GROUP_OWNER),
+        (members.values_list("group__groupmembership__user_id", "id"), Reason.GROUP_MEMBER),
+        (participants.values_list("user_id", "session_id").distinct(), Reason.PARTICIPANT),
+    )
+    for pairs, reason in sources:
+        rows.update((user_id, session_id, reason.value) for user_id, session_id in pairs)
+    rows.update(_linked_share_rows(user_ids=user_ids, session_ids=session_ids))
+    return rows
+
+
+def refresh_visibility(user_ids=None, session_ids=None):
+    """指定ユーザー × 指定セッションの範囲を再計算して差し替える（None は全件）"""
+    if user_ids is not None:
+        user_ids = {user_id for user_id in user_ids if user_id}
+        if not user_ids:
+            return 0
+    if session_ids is not None:
+        session_ids = {session_id for session_id in session_ids if session_id}
+        if not session_ids:
+            return 0
+
+    expected = compute_visibility_rows(user_ids=user_ids, session_ids=session_ids)
+    existing = SessionVisibility.objects.all()
+    if user_ids is not None:
+        existing = existing.filter(user_id__in=user_ids)
+    if session_ids is not None:
+        existing = existing.filter(session_id__in=session_ids)
+
+    with transaction.atomic():
+        current = {(row["user_id"], row["session_id"], row["reason"]): row["id"] for row in existing.values()}
+        stale_ids = [row_id for key, row_id in current.items() if key not in expected]
+        if stale_ids:
+            SessionVisibility.objects.filter(id__in=stale_ids).delete()
+        SessionVisibility.objects.bulk_create(
+            [
+                SessionVisibility(user_id=user_id, session_id=session_id, reason=reason)
+                for user_id, session_id, reason in expected - current.keys()
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    return len(expected)
+
+
+def group_related_session_ids(group_id):
+    """グループのセッションと、グループ連携でグループに関わる共有セッションのID"""
+    session_ids = set(TRPGSession.objects.filter(group_id=group_id).values_list("id", flat=True))
+    session_ids.update(
+        GroupLinkShare.objects.filter(
+            Q(link__source_group_id=group_id) | Q(link__target_group_id=group_id),
+            resource_type=GroupLinkShare.ResourceType.SESSION,
+        ).values_list("object_id", flat=True)
+    )
+    return session_ids
+
+
+def refresh_for_group(group_id):
+    """グループ作成者・メンバー・連携共有が変わった場合の再計算"""
+    return refresh_visibility(session_ids=group_related_session_ids(group_id))
+
+
+def group_session_ids(group_id):
+    """グループ削除前に、影響するセッションIDを控える"""
+    return set(TRPGSession.objects.filter(group_id=group_id).values_list("id", flat=True))
+
+
+def link_session_ids(link):
+    """グループ連携の削除・状態変更で影響するセッションID"""
+    return set(
+        GroupLinkShare.objects.filter(link_id=link.pk, resource_type=GroupLinkShare.ResourceType.SESSION).values_list(
+            "object_id", flat=True
+        )
+    )
@@ -1,41 +1,607 @@
-import logging
-
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import HandoutNotification
+from accounts.models import Group, GroupLink, GroupLinkShare, GroupMembership
+
+from . import (
+    analytics_partials,
+    handout_access,
+    handout_release,
+    notifications,
+    response_cache,
+    session_permissions,
+    session_visibility,
+    stats_rollups,
+)
+from .models import (
+    HandoutInfo,
+    HandoutNotification,
+    HandoutView,
+    SessionOccurrence,
+    SessionParticipant,
+    SessionParticipantRole,
+    TRPGSession,
+)
+from .notification_counters import (
+    adjust_unread_counts,
+    count_recipients,
+    reset_session_unread_counts,
+    reset_unread_counts,
+)
+
 
-logger = logging.getLogger(__name__)
+@receiver(pre_save, sender=HandoutNotification)
+def remember_notification_read_state(sender, instance, raw=False, **kwargs):
+    instance._was_unread = None
+    if raw or instance.pk is None or instance._state.adding:
+        return
+    instance._was_unread = HandoutNotification.objects.filter(pk=instance.pk, is_read=False).exists()
 
 
 @receiver(post_save, sender=HandoutNotification)
-def broadcast_notification(sender, instance, created, **kwargs):
+def broadcast_notification(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
     if not created:
+        # save() 経由で既読/未読が切り替わった場合も未読数を合わせる
+        was_unread = getattr(instance, "_was_unread", None)
+        if was_unread is not None and was_unread == instance.is_read:
+            adjust_unread_counts(count_recipients([instance], sign=-1 if instance.is_read else 1, unread_only=False))
+        return
+    adjust_unread_counts(count_recipients([instance]))
+    notifications.broadcast_notifications([instance])
+
+
+@receiver(post_delete, sender=HandoutNotification)
+def release_notification_unread_count(sender, instance, **kwargs):
+    adjust_unread_counts(count_recipients([instance], sign=-1))
+
+
+# 変更前の値を参照する機能（統計ロールアップ・ハンドアウト公開・グループ分析・閲覧権限インデックス）が
+# 使う列。pre_save で1回だけ読み、各機能の post_save はこのスナップショットを参照する
+PREVIOUS_SESSION_STATE_FIELDS = (
+    "status",
+    "date",
+    "gm_id",
+    "group_id",
+    "created_by_id",
+    "duration_minutes",
+    "actual_duration_minutes",
+    "visibility",
+)
+RESPONSE_CACHE_AUDIENCE_FIELDS = session_visibility.VISIBILITY_SESSION_FIELDS | {"gm", "gm_id", "visibility"}
+PREVIOUS_SESSION_STATE_UPDATE_FIELDS = (
+    stats_rollups.ROLLUP_SESSION_FIELDS | analytics_partials.ANALYTICS_SESSION_FIELDS | RESPONSE_CACHE_AUDIENCE_FIELDS
+)
+
+
+@receiver(pre_save, sender=TRPGSession)
+def remember_previous_session_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_state = None
+    if raw or instance.pk is None:
         return
-    channel_layer = get_channel_layer()
-    if channel_layer is None:
+    if update_fields is not None and not PREVIOUS_SESSION_STATE_UPDATE_FIELDS.intersection(update_fields):
         return
-    payload = {
-        "id": instance.pk,
-        "notification_type": instance.notification_type,
-        "message": instance.message,
-        "created_at": instance.created_at.isoformat(),
-        "is_read": instance.is_read,
-    }
-    unread_count = HandoutNotification.objects.filter(
-        recipient=instance.recipient,
-        is_read=False,
-    ).count()
-    try:
-        async_to_sync(channel_layer.group_send)(
-            f"notifications_user_{instance.recipient_id}",
-            {
-                "type": "notification_created",
-                "notification": payload,
-                "unread_count": unread_count,
-            },
+    instance._previous_state = TRPGSession.objects.filter(pk=instance.pk).values(*PREVIOUS_SESSION_STATE_FIELDS).first()
+
+
+def _previous_session_state(instance, update_fields, tracked_fields):
+    """変更前のセッション行（この保存が tracked_fields を更新しない場合は None）"""
+    if update_fields is not None and not tracked_fields.intersection(update_fields):
+        return None
+    return getattr(instance, "_previous_state", None)
+
+
+def _touches_rollup_fields(update_fields):
+    return update_fields is None or bool(stats_rollups.ROLLUP_SESSION_FIELDS.intersection(update_fields))
+
+
+@receiver(post_save, sender=TRPGSession)
+def refresh_session_stats_rollups(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches_rollup_fields(update_fields):
+        return
+    stats_rollups.refresh_for_session(
+        instance,
+        previous=_previous_session_state(instance, update_fields, stats_rollups.ROLLUP_SESSION_FIELDS),
+        user_ids=set() if created else None,
+    )
+
+
+@receiver(post_save, sender=TRPGSession)
+def release_status_dependent_handouts(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    previous = _previous_session_state(instance, update_fields, frozenset({"status"}))
+    if raw or created or previous is None or previous["status"] == instance.status:
+        return
+    handout_release.release_dependent_handouts(instance.pk, "session_status", instance.status)
+
+
+# 未読数カウンターは閲覧できる通知だけを数えるため、閲覧可否が変わりうる変更では
+# 関係する受信者のカウンター行を消して次の参照時に数え直させる
+def _touches_handout_visibility_fields(update_fields):
+    return update_fields is None or bool(handout_access.HANDOUT_VISIBILITY_FIELDS.intersection(update_fields))
+
+
+@receiver(post_save, sender=HandoutInfo)
+@receiver(post_delete, sender=HandoutInfo)
+def reset_handout_unread_counts(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created or not _touches_handout_visibility_fields(update_fields):
+        return
+    reset_unread_counts(HandoutNotification.objects.filter(handout_id=instance.pk))
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_delete, sender=SessionParticipant)
+def reset_participant_unread_counts(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_session_delete(origin):
+        return
+    reset_session_unread_counts([instance.session_id])
+
+
+@receiver(post_save, sender=SessionParticipantRole)
+@receiver(post_delete, sender=SessionParticipantRole)
+def reset_participant_role_unread_counts(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_cascade_from(origin, TRPGSession, SessionParticipant):
+        return
+    reset_session_unread_counts(SessionParticipant.objects.filter(pk=instance.participant_id).values("session_id"))
+
+
+@receiver(m2m_changed, sender=TRPGSession.participants.through)
+def reset_m2m_participant_unread_counts(sender, instance, action, reverse, **kwargs):
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if reverse:
+        reset_unread_counts(HandoutNotification.objects.filter(recipient_id=instance.pk))
+    else:
+        reset_session_unread_counts([instance.pk])
+
+
+@receiver(post_save, sender=TRPGSession)
+def reset_gm_unread_counts(sender, instance, raw=False, update_fields=None, **kwargs):
+    previous = _previous_session_state(instance, update_fields, frozenset({"gm", "gm_id"}))
+    if raw or previous is None or previous["gm_id"] == instance.gm_id:
+        return
+    reset_session_unread_counts([instance.pk])
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_save, sender=SessionParticipantRole)
+@receiver(post_delete, sender=SessionParticipantRole)
+def mark_participant_dependent_handouts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    participant_id = instance.pk if sender is SessionParticipant else instance.participant_id
+    handout_release.mark_handouts_for_evaluation(participant_id=participant_id)
+
+
+@receiver(post_save, sender=HandoutView)
+def release_view_dependent_handouts(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    # 閲覧条件は「割り当て先の参加者が閲覧したか」なので、閲覧者に割り当てられたハンドアウトだけが対象
+    handout_release.release_dependent_handouts(
+        instance.handout.session_id,
+        "handout_viewed",
+        instance.handout_id,
+        participant__user_id=instance.user_id,
+    )
+
+
+def _touches_release_dependency_fields(update_fields):
+    return update_fields is None or bool(handout_release.DEPENDENCY_HANDOUT_FIELDS.intersection(update_fields))
+
+
+@receiver(post_save, sender=HandoutInfo)
+def sync_handout_release_dependencies(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches_release_dependency_fields(update_fields):
+        return
+    handout_release.sync_release_dependencies(instance)
+
+
+@receiver(pre_delete, sender=TRPGSession)
+def remember_deleted_session_rollup_users(sender, instance, **kwargs):
+    instance._stats_rollup_user_ids = set(
+        SessionParticipant.objects.filter(session_id=instance.pk, user_id__isnull=False).values_list(
+            "user_id", flat=True
         )
-    except Exception:
-        logger.exception("Unable to broadcast notification over Channels.")
+    )
+
+
+@receiver(post_delete, sender=TRPGSession)
+def refresh_deleted_session_stats_rollups(sender, instance, **kwargs):
+    stats_rollups.refresh_for_session(instance, user_ids=getattr(instance, "_stats_rollup_user_ids", set()))
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_delete, sender=SessionParticipant)
+def refresh_participant_stats_rollups(sender, instance, raw=False, **kwargs):
+    if raw or not instance.user_id:
+        return
+    stats_rollups.refresh_for_participants({instance.session_id}, {instance.user_id})
+
+
+@receiver(m2m_changed, sender=TRPGSession.participants.through)
+def refresh_m2m_participant_stats_rollups(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        if reverse:
+            instance._stats_rollup_cleared = set(
+                SessionParticipant.objects.filter(user_id=instance.pk).values_list("session_id", flat=True)
+            )
+        else:
+            instance._stats_rollup_cleared = set(
+                SessionParticipant.objects.filter(session_id=instance.pk, user_id__isnull=False).values_list(
+                    "user_id", flat=True
+                )
+            )
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_stats_rollup_cleared", set())
+    elif action not in {"post_add", "post_remove"}:
+        return
+    if not pk_set:
+        return
+    if reverse:
+        stats_rollups.refresh_for_participants(pk_set, {instance.pk})
+    else:
+        stats_rollups.refresh_for_participants({instance.pk}, pk_set)
+
+
+@receiver(post_save, sender=TRPGSession)
+def invalidate_session_analytics_partials(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # 新規作成時の日程は SessionOccurrence のシグナルで扱う
+    previous = _previous_session_state(instance, update_fields, analytics_partials.ANALYTICS_SESSION_FIELDS)
+    if raw or created or previous is None:
+        return
+    current = {
+        "group_id": instance.group_id,
+        "gm_id": instance.gm_id,
+        "duration_minutes": instance.duration_minutes,
+        "actual_duration_minutes": instance.actual_duration_minutes,
+    }
+    if any(previous[key] != value for key, value in current.items()):
+        analytics_partials.invalidate_for_sessions([instance.pk], extra_group_ids=[previous["group_id"]])
+
+
+@receiver(pre_delete, sender=TRPGSession)
+def invalidate_deleted_session_analytics_partials(sender, instance, **kwargs):
+    # 削除後は日程から月を求められないため、削除前に無効化する（コミット時にも再度削除される）
+    analytics_partials.invalidate_for_sessions([instance.pk])
+
+
+@receiver(pre_save, sender=SessionOccurrence)
+def remember_occurrence_analytics_state(sender, instance, raw=False, **kwargs):
+    instance._analytics_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._analytics_previous = (
+        SessionOccurrence.objects.filter(pk=instance.pk).values("session_id", "start_at").first()
+    )
+
+
+@receiver(post_save, sender=SessionOccurrence)
+@receiver(post_delete, sender=SessionOccurrence)
+def invalidate_occurrence_analytics_partials(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    analytics_partials.invalidate_for_occurrence(instance, previous=getattr(instance, "_analytics_previous", None))
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_delete, sender=SessionParticipant)
+def invalidate_participant_analytics_partials(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_session_delete(origin):
+        return
+    analytics_partials.invalidate_for_sessions([instance.session_id])
+
+
+@receiver(m2m_changed, sender=TRPGSession.participants.through)
+def invalidate_m2m_participant_analytics_partials(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if reverse:
+        # ユーザー側からの clear は、統計ロールアップの pre_clear で控えた参加セッションを使う
+        session_ids = pk_set or getattr(instance, "_stats_rollup_cleared", set())
+    else:
+        session_ids = [instance.pk]
+    if session_ids:
+        analytics_partials.invalidate_for_sessions(session_ids)
+
+
+def _is_cascade_from(origin, *models):
+    return any(isinstance(origin, model) or getattr(origin, "model", None) is model for model in models)
+
+
+def _group_member_ids(group_ids):
+    group_ids = [group_id for group_id in group_ids if group_id]
+    user_ids = set(GroupMembership.objects.filter(group_id__in=group_ids).values_list("user_id", flat=True))
+    user_ids.update(Group.objects.filter(id__in=group_ids).values_list("created_by_id", flat=True))
+    return user_ids
+
+
+@receiver(post_save, sender=TRPGSession)
+def invalidate_session_response_cache(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # 閲覧者は閲覧権限インデックスから読み、閲覧範囲が変わる保存では
+    # インデックスの更新前後どちらでも漏れないよう変更前後の関係者を明示的に加える
+    user_ids = response_cache.indexed_viewer_ids([instance.pk]) | {instance.gm_id}
+    has_public = instance.visibility == "public"
+    previous = _previous_session_state(instance, update_fields, RESPONSE_CACHE_AUDIENCE_FIELDS)
+    if previous is not None:
+        has_public = has_public or previous["visibility"] == "public"
+    current = (instance.created_by_id, instance.group_id, instance.gm_id)
+    if created or (
+        previous is not None and (previous["created_by_id"], previous["group_id"], previous["gm_id"]) != current
+    ):
+        group_ids = [instance.group_id]
+        user_ids |= {instance.created_by_id}
+        if previous is not None:
+            group_ids.append(previous["group_id"])
+            user_ids |= {previous["created_by_id"], previous["gm_id"]}
+        user_ids |= _group_member_ids(group_ids)
+    response_cache.invalidate_audience((user_ids - {None}, has_public))
+
+
+@receiver(pre_delete, sender=TRPGSession)
+def remember_deleted_session_response_cache_audience(sender, instance, **kwargs):
+    instance._response_cache_audience = response_cache.session_audience([instance.pk])
+
+
+@receiver(post_delete, sender=TRPGSession)
+def invalidate_deleted_session_response_cache(sender, instance, **kwargs):
+    response_cache.invalidate_audience(getattr(instance, "_response_cache_audience", None) or (set(), False))
+
+
+@receiver(post_save, sender=SessionOccurrence)
+@receiver(post_delete, sender=SessionOccurrence)
+def invalidate_occurrence_response_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_session_delete(origin):
+        return
+    response_cache.invalidate_sessions([instance.session_id])
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_delete, sender=SessionParticipant)
+def invalidate_participant_response_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_session_delete(origin):
+        return
+    response_cache.invalidate_sessions([instance.session_id], user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=SessionParticipantRole)
+@receiver(post_delete, sender=SessionParticipantRole)
+def invalidate_participant_role_response_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_cascade_from(origin, TRPGSession, SessionParticipant):
+        return
+    participant = SessionParticipant.objects.filter(pk=instance.participant_id).values("session_id", "user_id").first()
+    if participant:
+        response_cache.invalidate_sessions([participant["session_id"]], user_ids=[participant["user_id"]])
+
+
+@receiver(m2m_changed, sender=TRPGSession.participants.through)
+def invalidate_schedule_response_cache_for_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        related = instance.sessions if reverse else instance.participants
+        instance._response_cache_cleared_ids = set(related.values_list("id", flat=True))
+        return
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    related_ids = getattr(instance, "_response_cache_cleared_ids", set()) if action == "post_clear" else pk_set or set()
+    if reverse:
+        response_cache.invalidate_sessions(related_ids, user_ids=[instance.pk])
+    else:
+        response_cache.invalidate_sessions([instance.pk], user_ids=related_ids)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_response_cache_owner(sender, instance, raw=False, **kwargs):
+    instance._response_cache_previous_owner_id = None
+    if raw or instance.pk is None:
+        return
+    instance._response_cache_previous_owner_id = (
+        Group.objects.filter(pk=instance.pk).values_list("created_by_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_response_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # グループ名はカレンダー等に表示されるため、グループに関わるセッションの閲覧者を無効化する
+    response_cache.invalidate_sessions(
+        session_visibility.group_related_session_ids(instance.pk),
+        user_ids=_group_member_ids([instance.pk]) | {getattr(instance, "_response_cache_previous_owner_id", None)},
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_deleted_group_response_cache_audience(sender, instance, **kwargs):
+    audience_user_ids, has_public = response_cache.session_audience(
+        session_visibility.group_related_session_ids(instance.pk)
+    )
+    instance._response_cache_audience = (audience_user_ids | _group_member_ids([instance.pk]), has_public)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_response_cache(sender, instance, **kwargs):
+    response_cache.invalidate_audience(getattr(instance, "_response_cache_audience", None) or (set(), False))
+
+
+@receiver(pre_delete, sender=GroupLink)
+def remember_deleted_group_link_response_cache_sessions(sender, instance, **kwargs):
+    instance._response_cache_session_ids = session_visibility.link_session_ids(instance)
+
+
+@receiver(post_save, sender=GroupLink)
+@receiver(post_delete, sender=GroupLink)
+def invalidate_group_link_response_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_cascade_from(origin, Group):
+        return
+    session_ids = getattr(instance, "_response_cache_session_ids", None)
+    if session_ids is None:
+        session_ids = session_visibility.link_session_ids(instance)
+    # 連携で閲覧できるのは両グループのメンバーなので、連携解除後もそのメンバーを無効化する
+    response_cache.invalidate_sessions(
+        session_ids, user_ids=_group_member_ids([instance.source_group_id, instance.target_group_id])
+    )
+
+
+@receiver(post_save, sender=GroupLinkShare)
+@receiver(post_delete, sender=GroupLinkShare)
+def invalidate_group_link_share_response_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or instance.resource_type != GroupLinkShare.ResourceType.SESSION:
+        return
+    if _is_cascade_from(origin, Group, GroupLink, TRPGSession):
+        return
+    group_ids = GroupLink.objects.filter(pk=instance.link_id).values_list("source_group_id", "target_group_id").first()
+    response_cache.invalidate_sessions([instance.object_id], user_ids=_group_member_ids(group_ids or []))
+
+
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def invalidate_member_schedule_response_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    response_cache.invalidate_users([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def invalidate_member_schedule_response_cache_for_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "pre_clear"}:
+        return
+    if reverse:
+        response_cache.invalidate_users([instance.pk])
+    elif action == "pre_clear":
+        response_cache.invalidate_users(instance.members.values_list("id", flat=True))
+    else:
+        response_cache.invalidate_users(pk_set or [])
+
+
+@receiver(post_save, sender=TRPGSession)
+def refresh_session_visibility(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    previous = _previous_session_state(instance, update_fields, session_visibility.VISIBILITY_SESSION_FIELDS)
+    if not created and (
+        previous is None
+        or (previous["created_by_id"], previous["group_id"]) == (instance.created_by_id, instance.group_id)
+    ):
+        return
+    session_visibility.refresh_visibility(session_ids=[instance.pk])
+
+
+def _is_session_delete(origin):
+    # セッション削除に伴う参加者の連鎖削除では、削除されるセッションの閲覧行を作り直さない
+    return isinstance(origin, TRPGSession) or getattr(origin, "model", None) is TRPGSession
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_delete, sender=SessionParticipant)
+def refresh_participant_session_visibility(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _is_session_delete(origin):
+        return
+    # ゲスト枠の本登録などでユーザーが差し替わる場合もあるため、セッション単位で再計算する
+    session_visibility.refresh_visibility(session_ids=[instance.session_id])
+
+
+@receiver(m2m_changed, sender=TRPGSession.participants.through)
+def refresh_m2m_participant_session_visibility(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if reverse:
+        session_visibility.refresh_visibility(user_ids=[instance.pk])
+    else:
+        session_visibility.refresh_visibility(session_ids=[instance.pk])
+
+
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def refresh_member_session_visibility(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    session_visibility.refresh_visibility(user_ids=[instance.user_id])
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def refresh_m2m_member_session_visibility(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and not reverse:
+        instance._visibility_cleared_user_ids = set(instance.members.values_list("id", flat=True))
+        return
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if reverse:
+        session_visibility.refresh_visibility(user_ids=[instance.pk])
+    elif action == "post_clear":
+        session_visibility.refresh_visibility(user_ids=getattr(instance, "_visibility_cleared_user_ids", set()))
+    else:
+        session_visibility.refresh_visibility(user_ids=pk_set or [])
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_owner(sender, instance, raw=False, **kwargs):
+    instance._visibility_previous_owner_id = None
+    if raw or instance.pk is None:
+        return
+    instance._visibility_previous_owner_id = (
+        Group.objects.filter(pk=instance.pk).values_list("created_by_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Group)
+def refresh_group_owner_session_visibility(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    if getattr(instance, "_visibility_previous_owner_id", None) != instance.created_by_id:
+        session_visibility.refresh_for_group(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_deleted_group_sessions(sender, instance, **kwargs):
+    instance._visibility_session_ids = session_visibility.group_session_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def refresh_deleted_group_session_visibility(sender, instance, **kwargs):
+    session_visibility.refresh_visibility(session_ids=getattr(instance, "_visibility_session_ids", set()))
+
+
+@receiver(post_save, sender=GroupLink)
+def refresh_group_link_session_visibility(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    session_visibility.refresh_visibility(session_ids=session_visibility.link_session_ids(instance))
+
+
+@receiver(pre_delete, sender=GroupLink)
+def remember_deleted_group_link_sessions(sender, instance, **kwargs):
+    instance._visibility_session_ids = session_visibility.link_session_ids(instance)
+
+
+@receiver(post_delete, sender=GroupLink)
+def refresh_deleted_group_link_session_visibility(sender, instance, **kwargs):
+    session_visibility.refresh_visibility(session_ids=getattr(instance, "_visibility_session_ids", set()))
+
+
+@receiver(post_save, sender=GroupLinkShare)
+@receiver(post_delete, sender=GroupLinkShare)
+def refresh_shared_session_visibility(sender, instance, raw=False, **kwargs):
+    if raw or instance.resource_type != GroupLinkShare.ResourceType.SESSION:
+        return
+    session_visibility.refresh_visibility(session_ids=[instance.object_id])
+
+
+@receiver(post_save, sender=SessionParticipant)
+@receiver(post_delete, sender=SessionParticipant)
+@receiver(post_save, sender=SessionParticipantRole)
+@receiver(post_delete, sender=SessionParticipantRole)
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def clear_session_permission_context(sender, **kwargs):
+    # 同じリクエスト内で参加者・ロール・メンバーシップを変更した後の判定を古いキャッシュで答えない
+    session_permissions.clear_permission_context()
+
+
+@receiver(m2m_changed, sender=TRPGSession.participants.through)
+@receiver(m2m_changed, sender=Group.members.through)
+def clear_session_permission_context_for_m2m(sender, action, **kwargs):
+    if action in {"post_add", "post_remove", "post_clear"}:
+        session_permissions.clear_permission_context()
@@ -0,0 +1,180 @@
+"""
+ユーザー統計ロールアップ（UserStatsRollup）の集計・更新
+
+完了セッションを (ユーザー, 年, 月, ゲームシステム) 単位で事前集計する。
+セッション・参加者の変更時は影響する (ユーザー, 月) だけを再集計し、
+全件の再構築は rebuild_stats_rollups コマンドから行う。
+"""
+
+import logging
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .duration import effective_duration_expression
+from .models import SessionParticipant, TRPGSession, UserStatsRollup
+
+logger = logging.getLogger(__name__)
+
+UNDATED_PERIOD = (0, 0)
+ROLLUP_SESSION_FIELDS = frozenset(
+    {
+        "status",
+        "date",
+        "gm",
+        "gm_id",
+        "scenario",
+        "scenario_id",
+        "duration_minutes",
+        "actual_duration_minutes",
+    }
+)
+ROLLUP_COUNTERS = ("session_count", "gm_session_count", "player_session_count", "total_minutes", "gm_minutes")
+
+
+def period_of(value):
+    """セッション日時からロールアップの (year, month) を求める（ローカルタイムゾーン基準）"""
+    if value is None:
+        return UNDATED_PERIOD
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.year, value.month
+
+
+def _session_period_filter(periods, prefix=""):
+    tz = timezone.get_current_timezone()
+    conditions = []
+    for year, month in periods:
+        if (year, month) == UNDATED_PERIOD:
+            conditions.append(Q(**{f"{prefix}date__isnull": True}))
+            continue
+        start_at = timezone.make_aware(datetime(year, month, 1), tz)
+        end_at = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1), tz)
+        conditions.append(Q(**{f"{prefix}date__gte": start_at, f"{prefix}date__lt": end_at}))
+    return reduce(or_, conditions)
+
+
+def _rollup_period_filter(periods):
+    return reduce(or_, (Q(year=year, month=month) for year, month in periods))
+
+
+def collect_rollup_buckets(user_ids=None, periods=None):
+    """GM側・参加者側の2クエリから (user_id, year, month, game_system) 単位の集計を作る"""
+    buckets = {}
+
+    def bucket(user_id, year, month, game_system):
+        key = (user_id, year or 0, month or 0, game_system or "")
+        return buckets.setdefault(key, dict.fromkeys(ROLLUP_COUNTERS, 0))
+
+    sessions = TRPGSession.objects.filter(status="completed", gm_id__isnull=False)
+    participants = SessionParticipant.objects.filter(session__status="completed", user_id__isnull=False).exclude(
+        session__gm_id=F("user_id")
+    )
+    if user_ids is not None:
+        sessions = sessions.filter(gm_id__in=user_ids)
+        participants = participants.filter(user_id__in=user_ids)
+    if periods is not None:
+        sessions = sessions.filter(_session_period_filter(periods))
+        participants = participants.filter(_session_period_filter(periods, prefix="session__"))
+
+    gm_rows = (
+        sessions.annotate(period_year=ExtractYear("date"), period_month=ExtractMonth("date"))
+        .values("gm_id", "period_year", "period_month", "scenario__game_system")
+        .annotate(count=Count("id"), minutes=Sum(effective_duration_expression()))
+        .order_by()
+    )
+    for row in gm_rows:
+        data = bucket(row["gm_id"], row["period_year"], row["period_month"], row["scenario__game_system"])
+        data["session_count"] += row["count"]
+        data["gm_session_count"] += row["count"]
+        data["total_minutes"] += row["minutes"] or 0
+        data["gm_minutes"] += row["minutes"] or 0
+
+    player_rows = (
+        participants.annotate(
+            period_year=ExtractYear("session__date"),
+            period_month=ExtractMonth("session__date"),
+        )
+        .values("user_id", "period_year", "period_month", "session__scenario__game_system")
+        .annotate(count=Count("session", distinct=True), minutes=Sum(effective_duration_expression("session__")))
+        .order_by()
+    )
+    for row in player_rows:
+        data = bucket(row["user_id"], row["period_year"], row["period_month"], row["session__scenario__game_system"])
+        data["session_count"] += row["count"]
+        data["player_session_count"] += row["count"]
+        data["total_minutes"] += row["minutes"] or 0
+
+    return buckets
+
+
+def _build_rollups(buckets):
+    return [
+        UserStatsRollup(user_id=user_id, year=year, month=month, game_system=game_system, **counters)
+        for (user_id, year, month, game_system), counters in buckets.items()
+        if counters["session_count"]
+    ]
+
+
+def refresh_user_stats(user_ids, periods):
+    """指定ユーザー × 指定月のロールアップだけを再集計する"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    periods = set(periods)
+    if not user_ids or not periods:
+        return 0
+
+    rollups = _build_rollups(collect_rollup_buckets(user_ids=user_ids, periods=periods))
+    with transaction.atomic():
+        UserStatsRollup.objects.filter(_rollup_period_filter(periods), user_id__in=user_ids).delete()
+        UserStatsRollup.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def rebuild_stats_rollups(user_ids=None, batch_size=1000):
+    """ロールアップを生データから再構築する（user_ids 未指定時は全ユーザー）"""
+    rollups = _build_rollups(collect_rollup_buckets(user_ids=user_ids))
+    with transaction.atomic():
+        stale = UserStatsRollup.objects.all()
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        UserStatsRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
+
+
+def session_rollup_state(session):
+    """ロールアップ再集計の判定に使うセッションの状態"""
+    return {"status": session.status, "date": session.date, "gm_id": session.gm_id}
+
+
+def refresh_for_session(session, previous=None, user_ids=None):
+    """セッションの変更前後で影響する (ユーザー, 月) を再集計する"""
+    states = [session_rollup_state(session)]
+    if previous:
+        states.append(previous)
+    if all(state["status"] != "completed" for state in states):
+        return 0
+
+    if user_ids is None:
+        user_ids = set(
+            SessionParticipant.objects.filter(session_id=session.pk, user_id__isnull=False).values_list(
+                "user_id", flat=True
+            )
+        )
+    user_ids = set(user_ids) | {state["gm_id"] for state in states}
+    periods = {period_of(state["date"]) for state in states}
+    return refresh_user_stats(user_ids, periods)
+
+
+def refresh_for_participants(session_ids, user_ids):
+    """参加者の追加・削除で影響する (ユーザー, 月) を再集計する"""
+    dates = TRPGSession.objects.filter(pk__in=session_ids, status="completed").values_list("date", flat=True).distinct()
+    periods = {period_of(value) for value in dates}
+    if not periods:
+        return 0
+    return refresh_user_stats(user_ids, periods)
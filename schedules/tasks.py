@@ -6,14 +6,15 @@ from urllib.parse import urlparse
 import requests
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from accounts.models import DiscordDelivery, GroupDiscordSettings
 
 from .google_tokens import get_google_access_token
-from .handout_release import evaluate_release_conditions, publish_handout
+from .handout_release import release_pending_handouts
 from .holiday_sync import sync_japanese_holidays as run_japanese_holiday_sync
-from .models import AsyncJob, GoogleCalendarSync, GoogleIntegration, HandoutInfo
+from .models import AsyncJob, GoogleCalendarSync, GoogleIntegration
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +86,52 @@ def queue_google_sheet_export(job_id, user_id, spreadsheet_id, range_name, value
         return False
 
 
+def queue_image_renditions(model_label, pk):
+    """画像のリサイズ版の生成をCeleryへ渡す（ブローカーが無い場合は元画像のまま。backfill コマンドで後から生成できる）"""
+    if not getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False) and not _broker_available():
+        logger.warning("Image renditions were not queued because the broker is unavailable.")
+        return False
+    try:
+        generate_image_renditions.delay(model_label, pk)
+        return True
+    except Exception:
+        logger.exception("Unable to enqueue image renditions.")
+        return False
+
+
+def _send_notification_emails_now(notification_ids):
+    from .notifications import send_notification_emails as run_notification_email_send
+
+    try:
+        return run_notification_email_send(notification_ids)
+    except Exception:
+        logger.exception("Unable to send notification emails.")
+        return 0
+
+
+def queue_notification_emails(notification_ids):
+    """通知メールをバッチ単位でCeleryへ渡す（ブローカーが無い場合はその場で送信）"""
+    notification_ids = list(notification_ids)
+    batch_size = getattr(settings, "NOTIFICATION_EMAIL_BATCH_SIZE", 100)
+    batches = [notification_ids[i : i + batch_size] for i in range(0, len(notification_ids), batch_size)]
+    if getattr(settings, "CELERY_TASK_ALWAYS_EAGER", False) or not _broker_available():
+        for batch in batches:
+            _send_notification_emails_now(batch)
+        return False
+
+    def enqueue():
+        for batch in batches:
+            try:
+                send_notification_emails.delay(batch)
+            except Exception:
+                logger.exception("Unable to enqueue notification emails.")
+                _send_notification_emails_now(batch)
+
+    # 通知レコードのコミット前にワーカーが読みに行かないようにする
+    transaction.on_commit(enqueue)
+    return True
+
+
 def schedule_session_google_syncs(session):
     user_ids = set(session.participants.values_list("id", flat=True))
     user_ids.add(session.gm_id)
@@ -127,23 +174,33 @@ def expire_premium_access():
     return expire_promo_subscriptions()
 
 
+@shared_task(name="schedules.tasks.build_ranking_snapshots")
+def build_ranking_snapshots():
+    from accounts.ranking_snapshots import build_ranking_snapshots as run_ranking_snapshot_build
+
+    return run_ranking_snapshot_build()
+
+
+@shared_task(name="schedules.tasks.send_notification_emails")
+def send_notification_emails(notification_ids):
+    from .notifications import send_notification_emails as run_notification_email_send
+
+    return run_notification_email_send(notification_ids)
+
+
+@shared_task(bind=True, max_retries=3, name="schedules.tasks.generate_image_renditions")
+def generate_image_renditions(self, model_label, pk):
+    from accounts.image_renditions import generate_renditions
+
+    try:
+        return generate_renditions(model_label, pk)
+    except OSError as exc:
+        raise self.retry(exc=exc, countdown=60)
+
+
 @shared_task(name="schedules.tasks.publish_scheduled_handouts")
 def publish_scheduled_handouts():
-    published = 0
-    handouts = HandoutInfo.objects.filter(
-        release_status=HandoutInfo.ReleaseStatus.WAITING,
-    ).select_related("session", "participant")
-    for handout in handouts:
-        if evaluate_release_conditions(handout):
-            published += int(publish_handout(handout))
-        else:
-            from .handout_release import get_next_evaluation_at
-
-            next_run = get_next_evaluation_at(handout.release_conditions)
-            if next_run != handout.next_evaluation_at:
-                handout.next_evaluation_at = next_run
-                handout.save(update_fields=["next_evaluation_at", "updated_at"])
-    return published
+    return release_pending_handouts()
 
 
 @shared_task(bind=True, max_retries=3, name="schedules.tasks.sync_japanese_holidays")
@@ -1,6 +1,10 @@
 from datetime import timedelta
+from io import StringIO
 
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -8,7 +12,8 @@ from rest_framework.test import APITestCase
 from accounts.models import Group, GroupMembership
 from schedules import session_permissions
 
-from .models import SessionParticipant, TRPGSession
+from .models import GroupAnalyticsMonth, SessionOccurrence, SessionParticipant, TRPGSession
+from .stats_rollups import period_of
 
 User = get_user_model()
 
@@ -115,3 +120,87 @@ class SessionAnalyticsDashboardApiTestCase(APITestCase):
 
         response = self.client.get(f"/api/schedules/analytics/dashboard/?group_id={self.group.id}")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def dashboard(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/schedules/analytics/dashboard/", {"group_id": self.group.id, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), len(context.captured_queries)
+
+    def test_co_play_counts_weight_sessions_by_occurrences(self):
+        self.client.force_authenticate(user=self.gm)
+        self.dashboard()
+
+        # 同じセッションの追加日程は、参加回数・同卓回数にも日程数分加算される
+        for days in (3, 5):
+            SessionOccurrence.objects.create(
+                session=self.session2,
+                start_at=(timezone.now() - timedelta(days=days)).replace(hour=21, minute=0, second=0, microsecond=0),
+            )
+        TRPGSession.objects.create(
+            title="No GM",
+            date=timezone.now() - timedelta(days=2),
+            gm=None,
+            group=self.group,
+        )
+        data, _ = self.dashboard()
+
+        self.assertEqual(data["summary"]["occurrences_count"], 5)
+        self.assertEqual(data["summary"]["sessions_count"], 3)
+        pairs = {(row["user1_id"], row["user2_id"]): row["occurrences_together"] for row in data["top_pairs"]}
+        self.assertEqual(pairs[(self.gm.id, self.player1.id)], 4)
+        self.assertEqual(pairs[(self.player1.id, self.player2.id)], 3)
+        member_counts = {row["user_id"]: row["occurrences"] for row in data["member_participation"]}
+        self.assertEqual(member_counts, {self.gm.id: 4, self.player1.id: 4, self.player2.id: 3})
+        hours = {row["hour"]: row["count"] for row in data["popular_hours"]}
+        self.assertEqual(hours[timezone.localtime(self.session2.date).hour], 3)
+
+    def test_closed_month_partials_are_reused_and_invalidated(self):
+        self.client.force_authenticate(user=self.gm)
+        closed_period = period_of(self.session2.date)
+
+        cold, cold_queries = self.dashboard()
+        self.assertTrue(
+            GroupAnalyticsMonth.objects.filter(group=self.group, year=closed_period[0], month=closed_period[1]).exists()
+        )
+        warm, warm_queries = self.dashboard()
+        self.assertEqual(warm, cold)
+        self.assertLess(warm_queries, cold_queries)
+
+        # 締まった月のセッションに参加者が増えると、その月のパーシャルだけが削除される
+        player3 = User.objects.create_user(username="player3", email="player3@example.com", password="pass123")
+        GroupMembership.objects.create(user=player3, group=self.group, role="member")
+        stored_months = GroupAnalyticsMonth.objects.filter(group=self.group).count()
+        session_permissions.create_participant(session=self.session2, user=player3, role="player")
+        self.assertFalse(
+            GroupAnalyticsMonth.objects.filter(group=self.group, year=closed_period[0], month=closed_period[1]).exists()
+        )
+        self.assertEqual(GroupAnalyticsMonth.objects.filter(group=self.group).count(), stored_months - 1)
+
+        data, _ = self.dashboard()
+        member_counts = {row["user_id"]: row["occurrences"] for row in data["member_participation"]}
+        self.assertEqual(member_counts[player3.id], 1)
+
+        # 日程を当月へ動かすと、移動元の月も再集計される
+        occurrence = self.session2.occurrences.get()
+        occurrence.start_at = timezone.now()
+        occurrence.save()
+        self.assertFalse(
+            GroupAnalyticsMonth.objects.filter(group=self.group, year=closed_period[0], month=closed_period[1]).exists()
+        )
+        data, _ = self.dashboard(end_date=timezone.localdate().isoformat())
+        self.assertEqual(data["summary"]["occurrences_count"], 2)
+        self.assertNotIn(f"{closed_period[0]}-{closed_period[1]:02d}", {row["month"] for row in data["monthly_trend"]})
+
+    def test_rebuild_command_matches_lazily_stored_partials(self):
+        self.client.force_authenticate(user=self.gm)
+        self.dashboard()
+        expected = {(row.year, row.month): row.data for row in GroupAnalyticsMonth.objects.filter(group=self.group)}
+
+        output = StringIO()
+        call_command("rebuild_analytics_partials", "--group", str(self.group.id), stdout=output)
+
+        # 既定では直近12か月分の締まった月を作り直す
+        self.assertIn("rows=12", output.getvalue())
+        rebuilt = {(row.year, row.month): row.data for row in GroupAnalyticsMonth.objects.filter(group=self.group)}
+        self.assertEqual({period: rebuilt[period] for period in expected}, expected)
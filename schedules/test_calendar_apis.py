@@ -3,16 +3,20 @@
 """
 
 import json
+import time
 from datetime import datetime, timedelta
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from accounts.models import CustomUser, Group
-from schedules import session_permissions
+from schedules import session_permissions, session_visibility
 from schedules.models import SessionParticipant, TRPGSession
 
 
@@ -322,6 +326,139 @@ class SessionAggregationViewTestCase(APITestCase):
         self.assertNotIn(role_session.id, player_session_ids)
 
 
+@override_settings(SCHEDULE_RESPONSE_CACHE_TIMEOUT=300)
+class ScheduleResponseCacheTestCase(APITestCase):
+    """カレンダー系APIのレスポンスキャッシュのテストケース"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="cacheuser", password="testpass123")
+        self.outsider = CustomUser.objects.create_user(username="cacheoutsider", password="testpass123")
+        self.group = Group.objects.create(name="Cache Group", created_by=self.user)
+        self.group.members.add(self.user)
+        self.month_start = timezone.now().replace(day=1, hour=12, minute=0, second=0, microsecond=0)
+        self.month = self.month_start.strftime("%Y-%m")
+        TRPGSession.objects.create(
+            title="Cached Session",
+            date=self.month_start + timedelta(days=9),
+            gm=self.user,
+            group=self.group,
+            status="planned",
+            visibility="group",
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def _monthly_titles(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse("monthly_events"), {"month": self.month})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(event["title"] for day in response.data["dates"] for event in day["events"])
+
+    def test_repeated_request_is_served_from_cache(self):
+        """同じユーザー・同じクエリの2回目はDBを参照しない"""
+        first = self._monthly_titles(self.user)
+
+        with self.assertNumQueries(0):
+            second = self._monthly_titles(self.user)
+
+        self.assertEqual(first, ["Cached Session"])
+        self.assertEqual(second, first)
+
+    def test_session_change_invalidates_cache(self):
+        """セッションの追加でキャッシュが無効化される"""
+        self.assertEqual(self._monthly_titles(self.user), ["Cached Session"])
+
+        TRPGSession.objects.create(
+            title="New Session",
+            date=self.month_start + timedelta(days=12),
+            gm=self.user,
+            group=self.group,
+            status="planned",
+            visibility="group",
+        )
+
+        self.assertEqual(self._monthly_titles(self.user), ["Cached Session", "New Session"])
+
+    def test_group_membership_change_invalidates_only_member_cache(self):
+        """グループ所属の変更は対象ユーザーのキャッシュだけを無効化する"""
+        self.assertEqual(self._monthly_titles(self.outsider), [])
+        self._monthly_titles(self.user)
+
+        self.group.members.add(self.outsider)
+
+        self.assertEqual(self._monthly_titles(self.outsider), ["Cached Session"])
+        with self.assertNumQueries(0):
+            self._monthly_titles(self.user)
+
+    def test_private_session_change_keeps_unrelated_user_cache(self):
+        """非公開セッションの変更は閲覧できないユーザーのキャッシュを無効化しない"""
+        self.assertEqual(self._monthly_titles(self.outsider), [])
+
+        TRPGSession.objects.filter(title="Cached Session").get().save()
+
+        with self.assertNumQueries(0):
+            self._monthly_titles(self.outsider)
+
+    def test_public_session_change_invalidates_everyone(self):
+        """公開セッションの変更は全ユーザーのキャッシュを無効化する"""
+        self.assertEqual(self._monthly_titles(self.outsider), [])
+
+        session = TRPGSession.objects.get(title="Cached Session")
+        session.visibility = "public"
+        session.save()
+
+        self.assertEqual(self._monthly_titles(self.outsider), ["Cached Session"])
+
+    def test_session_leaving_group_invalidates_previous_viewers(self):
+        """グループから外れたセッションは、変更前に閲覧できたメンバーのキャッシュも無効化する"""
+        member = CustomUser.objects.create_user(username="cachemember", password="testpass123")
+        self.group.members.add(member)
+        self.assertEqual(self._monthly_titles(member), ["Cached Session"])
+
+        session = TRPGSession.objects.get(title="Cached Session")
+        session.group = Group.objects.create(name="Other Cache Group", created_by=self.user)
+        session.save()
+
+        self.assertEqual(self._monthly_titles(member), [])
+
+    def test_session_save_reads_audience_from_visibility_index(self):
+        """閲覧範囲が変わらない保存では、閲覧権限を生データから計算し直さない"""
+        session = TRPGSession.objects.get(title="Cached Session")
+        session.title = "Renamed Session"
+
+        with mock.patch(
+            "schedules.session_visibility.compute_visibility_rows",
+            wraps=session_visibility.compute_visibility_rows,
+        ) as compute:
+            session.save()
+
+        compute.assert_not_called()
+        self.assertEqual(self._monthly_titles(self.user), ["Renamed Session"])
+
+    def test_creator_change_invalidates_new_creator_cache(self):
+        """作成者の変更は新しく閲覧できるようになったユーザーのキャッシュも無効化する"""
+        self.assertEqual(self._monthly_titles(self.outsider), [])
+
+        session = TRPGSession.objects.get(title="Cached Session")
+        session.created_by = self.outsider
+        session.save()
+
+        self.assertEqual(self._monthly_titles(self.outsider), ["Cached Session"])
+
+    def test_error_response_is_not_cached(self):
+        """エラー応答はキャッシュしない"""
+        self.client.force_authenticate(user=self.user)
+        url = reverse("calendar")
+
+        self.assertEqual(self.client.get(url, {"month": "invalid"}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"month": self.month})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event["title"] for event in response.data["events"]], ["Cached Session"])
+
+
 class ICalExportViewTestCase(APITestCase):
     """iCal形式エクスポートAPIのテストケース"""
 
@@ -361,7 +498,7 @@ class ICalExportViewTestCase(APITestCase):
         self.assertIn(".ics", response["Content-Disposition"])
 
         # iCal形式の確認
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
         self.assertIn("BEGIN:VCALENDAR", content)
         self.assertIn("END:VCALENDAR", content)
         self.assertIn("VERSION:2.0", content)
@@ -391,7 +528,7 @@ class ICalExportViewTestCase(APITestCase):
         session_permissions.create_participant(session=role_session, user=self.user, role="gm")
 
         response = self.client.get(reverse("ical_export"))
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("SUMMARY:[GM] Role GM iCal Session", content)
@@ -411,13 +548,13 @@ class ICalExportViewTestCase(APITestCase):
 
         # デフォルト90日
         response = self.client.get(url)
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
         self.assertIn("Test Session for iCal", content)
         self.assertNotIn("Far Future Session", content)
 
         # 120日指定
         response = self.client.get(url, {"days": 120})
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
         self.assertIn("Test Session for iCal", content)
         self.assertIn("Far Future Session", content)
 
@@ -434,7 +571,7 @@ class ICalExportViewTestCase(APITestCase):
 
         url = reverse("ical_export")
         response = self.client.get(url)
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
 
         # キャンセルステータスの確認
         self.assertIn("STATUS:CANCELLED", content)
@@ -444,3 +581,47 @@ class ICalExportViewTestCase(APITestCase):
         for event in events:
             if "Cancelled Session" in event:
                 self.assertNotIn("BEGIN:VALARM", event)
+
+    def test_ical_export_uses_stable_uid_and_etag(self):
+        """UID・DTSTAMP・ETag はリクエストごとに変わらず、一致すれば304を返す"""
+        url = reverse("ical_export")
+
+        first = self.client.get(url)
+        first_content = b"".join(first.streaming_content).decode("utf-8")
+        second = self.client.get(url)
+
+        self.assertEqual(first_content, b"".join(second.streaming_content).decode("utf-8"))
+        occurrence_id = self.session.occurrences.get().id
+        self.assertIn(f"UID:session-{self.session.id}-occurrence-{occurrence_id}@tableno.jp", first_content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.session.title = "Renamed Session for iCal"
+        self.session.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Renamed Session for iCal", b"".join(response.streaming_content).decode("utf-8"))
+
+    def test_ical_export_etag_tracks_rendered_names_and_removed_events(self):
+        """GM名・グループ名の変更やイベントの削除でも304を返さない"""
+        url = reverse("ical_export")
+        first = self.client.get(url)
+        self.assertNotIn("Last-Modified", first)
+
+        self.user.nickname = "Renamed GM"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("GM: Renamed GM", b"".join(response.streaming_content).decode("utf-8"))
+
+        self.group.name = "Renamed Group"
+        self.group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.session.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("BEGIN:VEVENT", b"".join(response.streaming_content).decode("utf-8"))
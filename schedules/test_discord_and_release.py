@@ -2,13 +2,15 @@ from datetime import timedelta
 from unittest.mock import Mock, patch
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from accounts.models import DiscordDelivery, Group, GroupDiscordSettings, GroupMembership
 from schedules import session_permissions
-from schedules.handout_release import evaluate_release_conditions
+from schedules.handout_release import evaluate_release_conditions, release_pending_handouts
 from schedules.models import HandoutInfo, HandoutView, SessionParticipant, TRPGSession
 from schedules.serializers import HandoutInfoSerializer
 from schedules.tasks import publish_scheduled_handouts, send_discord_webhook
@@ -298,9 +300,9 @@ class HandoutReleaseTestCase(APITestCase):
         )
 
     def create_handout(self, title="Handout", **kwargs):
+        kwargs.setdefault("participant", self.participant)
         return HandoutInfo.objects.create(
             session=self.session,
-            participant=self.participant,
             title=title,
             content="content",
             **kwargs,
@@ -378,7 +380,7 @@ class HandoutReleaseTestCase(APITestCase):
             },
         )
 
-        self.assertEqual(publish_scheduled_handouts(), 1)
+        self.assertEqual(publish_scheduled_handouts(), {"evaluated": 1, "published": 1})
         handout.refresh_from_db()
         self.assertFalse(handout.is_secret)
         self.assertEqual(
@@ -387,3 +389,179 @@ class HandoutReleaseTestCase(APITestCase):
         )
         notify.assert_called_once()
         queue.assert_called_once()
+
+    def create_waiting_handout(self, title, release_conditions, **kwargs):
+        return self.create_handout(
+            title,
+            release_status=HandoutInfo.ReleaseStatus.WAITING,
+            release_conditions=release_conditions,
+            **kwargs,
+        )
+
+    @patch("schedules.notifications.HandoutNotificationService.send_handout_published_notification")
+    def test_periodic_task_skips_handouts_without_changes(self, notify):
+        handout = self.create_waiting_handout("Status", {"type": "session_status", "value": "ongoing"})
+
+        self.assertEqual(publish_scheduled_handouts(), {"evaluated": 1, "published": 0})
+        handout.refresh_from_db()
+        self.assertFalse(handout.needs_release_evaluation)
+        self.assertEqual(publish_scheduled_handouts(), {"evaluated": 0, "published": 0})
+
+        self.session.status = "ongoing"
+        self.session.save(update_fields=["status"])
+        handout.refresh_from_db()
+        self.assertTrue(handout.needs_release_evaluation)
+        self.assertEqual(publish_scheduled_handouts(), {"evaluated": 1, "published": 1})
+        notify.assert_called_once()
+
+    def test_failed_context_build_keeps_batch_flagged(self):
+        handouts = [
+            self.create_waiting_handout(title, {"type": "session_status", "value": "ongoing"})
+            for title in ("First", "Second")
+        ]
+
+        with patch("schedules.handout_release.build_release_context", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                release_pending_handouts()
+
+        self.assertEqual(
+            set(HandoutInfo.objects.filter(needs_release_evaluation=True).values_list("pk", flat=True)),
+            {handout.pk for handout in handouts},
+        )
+
+    def test_status_release_follows_only_status_updates(self):
+        handout = self.create_waiting_handout("Status", {"type": "session_status", "value": "ongoing"})
+        HandoutInfo.objects.filter(pk=handout.pk).update(needs_release_evaluation=False)
+
+        # 変更前の行は読み込まれるが、状態を保存しない更新では公開を評価しない
+        self.session.title = "Renamed"
+        self.session.status = "ongoing"
+        self.session.save(update_fields=["title", "date"])
+        handout.refresh_from_db()
+        self.assertFalse(handout.needs_release_evaluation)
+
+        self.session.save(update_fields=["status"])
+        handout.refresh_from_db()
+        self.assertTrue(handout.needs_release_evaluation)
+
+    @patch("schedules.notifications.HandoutNotificationService.send_handout_published_notification")
+    def test_periodic_task_evaluates_due_datetime_conditions(self, notify):
+        due_at = timezone.now() + timedelta(hours=1)
+        handout = self.create_waiting_handout("Timer", {"type": "datetime_reached", "value": due_at.isoformat()})
+
+        self.assertEqual(publish_scheduled_handouts(), {"evaluated": 1, "published": 0})
+        handout.refresh_from_db()
+        self.assertEqual(handout.next_evaluation_at, due_at)
+
+        HandoutInfo.objects.filter(pk=handout.pk).update(next_evaluation_at=timezone.now() - timedelta(seconds=1))
+        with patch("schedules.handout_release.timezone.now", return_value=due_at):
+            self.assertEqual(publish_scheduled_handouts(), {"evaluated": 1, "published": 1})
+
+    @patch("schedules.notifications.HandoutNotificationService.send_handout_published_notification")
+    def test_view_and_role_changes_mark_dependent_handouts(self, notify):
+        prerequisite = self.create_handout("Prerequisite")
+        viewed = self.create_waiting_handout("Viewed", {"type": "handout_viewed", "value": prerequisite.pk})
+        role = self.create_waiting_handout("Role", {"type": "participant_role", "value": "gm"})
+        publish_scheduled_handouts()
+
+        HandoutView.objects.create(handout=prerequisite, user=self.player)
+        viewed.refresh_from_db()
+        self.assertTrue(viewed.needs_release_evaluation)
+        self.assertEqual(publish_scheduled_handouts()["published"], 1)
+        viewed.refresh_from_db()
+        self.assertEqual(viewed.release_status, HandoutInfo.ReleaseStatus.RELEASED)
+
+        session_permissions.assign_participant_role(self.participant, "gm")
+        role.refresh_from_db()
+        self.assertTrue(role.needs_release_evaluation)
+        self.assertEqual(publish_scheduled_handouts(), {"evaluated": 1, "published": 1})
+        role.refresh_from_db()
+        self.assertEqual(role.release_status, HandoutInfo.ReleaseStatus.RELEASED)
+
+    @patch("schedules.notifications.HandoutNotificationService.send_handout_published_notification")
+    def test_evaluation_queries_do_not_grow_with_handouts(self, notify):
+        prerequisite = self.create_handout("Prerequisite")
+        conditions = {
+            "operator": "any",
+            "conditions": [
+                {"type": "handout_viewed", "value": prerequisite.pk},
+                {"type": "participant_role", "value": "gm"},
+            ],
+        }
+
+        def count_queries(handout_count):
+            for index in range(handout_count):
+                self.create_waiting_handout(f"Pending {index}", conditions)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(publish_scheduled_handouts()["evaluated"], handout_count)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(2), count_queries(8))
+
+    def test_release_dependency_index_follows_conditions(self):
+        prerequisite = self.create_handout("Prerequisite")
+        handout = self.create_waiting_handout(
+            "Indexed",
+            {
+                "operator": "all",
+                "conditions": [
+                    {"type": "session_status", "value": "ongoing"},
+                    {"type": "handout_viewed", "value": prerequisite.pk},
+                    {"type": "player_slot", "value": 1},
+                ],
+            },
+        )
+        self.assertEqual(
+            set(handout.release_dependencies.values_list("session_id", "condition_type", "value")),
+            {(self.session.pk, "session_status", "ongoing"), (self.session.pk, "handout_viewed", str(prerequisite.pk))},
+        )
+
+        handout.release_conditions = {"type": "session_status", "value": "completed"}
+        handout.save(update_fields=["release_conditions"])
+        self.assertEqual(
+            list(handout.release_dependencies.values_list("condition_type", "value")),
+            [("session_status", "completed")],
+        )
+
+        handout.release_status = HandoutInfo.ReleaseStatus.MANUAL
+        handout.save(update_fields=["release_status"])
+        self.assertFalse(handout.release_dependencies.exists())
+
+    @patch("schedules.notifications.HandoutNotificationService.send_handout_published_notification")
+    def test_session_status_change_releases_dependent_handouts_on_commit(self, notify):
+        dependent = self.create_waiting_handout("Ongoing", {"type": "session_status", "value": "ongoing"})
+        other = self.create_waiting_handout("Completed", {"type": "session_status", "value": "completed"})
+        publish_scheduled_handouts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.status = "ongoing"
+            self.session.save(update_fields=["status"])
+
+        dependent.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(dependent.release_status, HandoutInfo.ReleaseStatus.RELEASED)
+        self.assertFalse(dependent.release_dependencies.exists())
+        self.assertEqual(other.release_status, HandoutInfo.ReleaseStatus.WAITING)
+        self.assertFalse(other.needs_release_evaluation)
+        notify.assert_called_once()
+
+    @patch("schedules.notifications.HandoutNotificationService.send_handout_published_notification")
+    def test_handout_view_releases_only_the_viewers_dependent_handout(self, notify):
+        other_player = get_user_model().objects.create_user(username="release-other", password="pass123")
+        other_participant = session_permissions.create_participant(
+            session=self.session, user=other_player, role="player", player_slot=2
+        )
+        prerequisite = self.create_handout("Prerequisite")
+        conditions = {"type": "handout_viewed", "value": prerequisite.pk}
+        mine = self.create_waiting_handout("Mine", conditions)
+        theirs = self.create_waiting_handout("Theirs", conditions, participant=other_participant)
+        publish_scheduled_handouts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HandoutView.objects.create(handout=prerequisite, user=self.player)
+
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.release_status, HandoutInfo.ReleaseStatus.RELEASED)
+        self.assertEqual(theirs.release_status, HandoutInfo.ReleaseStatus.WAITING)
+        self.assertFalse(theirs.needs_release_evaluation)
@@ -65,7 +65,7 @@ class CalendarSubscriptionTestCase(APITestCase):
         self.assertEqual(subscription.token_digest, CalendarSubscription.digest(token))
 
         feed = self.client.get(f"/calendar/subscribe/{token}.ics")
-        content = feed.content.decode("utf-8")
+        content = b"".join(feed.streaming_content).decode("utf-8")
         self.assertEqual(feed.status_code, status.HTTP_200_OK)
         self.assertIn("Owned Future Session", content)
         self.assertIn("Owned Undated Session", content)
@@ -96,11 +96,34 @@ class CalendarSubscriptionTestCase(APITestCase):
 
         token = self.client.post("/api/calendar/subscription-token/rotate/").data["token"]
         feed = self.client.get(f"/calendar/subscribe/{token}.ics")
-        content = feed.content.decode("utf-8")
+        content = b"".join(feed.streaming_content).decode("utf-8")
 
         self.assertEqual(feed.status_code, status.HTTP_200_OK)
         self.assertIn("SUMMARY:[GM] Role GM Subscription Session", content)
 
+    def test_subscription_feed_is_stable_and_supports_conditional_get(self):
+        token = self.client.post("/api/calendar/subscription-token/rotate/").data["token"]
+        url = f"/calendar/subscribe/{token}.ics"
+
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertEqual(first["ETag"], second["ETag"])
+        # 行の削除では更新日時の最大値が動かないため、Last-Modified は送らず ETag だけで判定する
+        self.assertNotIn("Last-Modified", first)
+        self.assertEqual(
+            b"".join(first.streaming_content),
+            b"".join(second.streaming_content),
+        )
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], first["ETag"])
+
+        TRPGSession.objects.filter(title="Owned Future Session").first().save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+
 
 class GoogleIntegrationTestCase(APITestCase):
     def setUp(self):
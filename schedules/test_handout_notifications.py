@@ -300,6 +300,50 @@ class HandoutNotificationAPITest(TestCase):
         self.assertIn("friend_notifications_enabled", updated["data"])
         self.assertFalse(updated["data"]["friend_notifications_enabled"])
 
+    def test_notification_list_cursor_skips_hidden_handouts(self):
+        """cursor 指定時も閲覧できないハンドアウトの通知を除いてページを埋める"""
+        from django.test import Client
+
+        from schedules.models import HandoutNotification
+
+        player2 = CustomUser.objects.create_user(username="player2", email="player2@example.com")
+        self.group.members.add(self.player1, player2)
+        own = session_permissions.create_participant(session=self.session, user=self.player1, role="player")
+        other = session_permissions.create_participant(session=self.session, user=player2, role="player")
+
+        expected = []
+        for index in range(6):
+            participant = own if index % 2 == 0 else other
+            handout = HandoutInfo.objects.create(
+                session=self.session,
+                participant=participant,
+                title=f"HO{index}",
+                content="秘匿",
+                is_secret=True,
+            )
+            notification = HandoutNotification.objects.create(
+                handout_id=handout.id,
+                recipient=self.player1,
+                sender=self.gm_user,
+                notification_type="handout_created",
+                message=f"HO{index}",
+            )
+            if participant == own:
+                expected.append(notification.id)
+
+        client = Client()
+        client.force_login(self.player1)
+        seen = []
+        cursor = ""
+        while True:
+            data = client.get("/api/schedules/notifications/", {"cursor": cursor, "page_size": 2}).json()
+            seen.extend(row["id"] for row in data["results"])
+            if not data["has_next"]:
+                break
+            cursor = data["next_cursor"]
+
+        self.assertEqual(seen, sorted(expected, reverse=True))
+
 
 @unittest.skip("Integration test - will be implemented after basic functionality")
 class HandoutNotificationIntegrationTest(TestCase):
@@ -30,10 +30,11 @@ class RecommendedSkillComparisonServiceTests(TestCase):
             scenario=self.scenario,
         )
 
-    def create_character(self, *, edition="6th", name="比較探索者", dex_value=None, edu_value=None):
+    def create_character(self, *, edition="6th", name="比較探索者", dex_value=None, edu_value=None, user=None):
         is_seventh = edition == "7th"
+        user = user or self.player
         character, _ = create_character_with_system_data(
-            user=self.player,
+            user=user,
             edition=edition,
             name=name,
             str_value=50 if is_seventh else 10,
@@ -54,7 +55,7 @@ class RecommendedSkillComparisonServiceTests(TestCase):
         )
         participant = session_permissions.create_participant(
             session=self.session,
-            user=self.player,
+            user=user,
             role="player",
             character_sheet=character,
         )
@@ -245,6 +246,39 @@ class RecommendedSkillComparisonServiceTests(TestCase):
         self.assertEqual(_canonical_skill_name("他国語", "6th"), "他の言語")
         self.assertEqual(_canonical_skill_name("他国語（英語）", "6th"), "他の言語（英語）")
 
+    def test_comparison_uses_prefetched_skills_without_queries(self):
+        self.scenario.recommended_skills = "他国語、目星"
+        self.scenario.save()
+        first, first_participant = self.create_character(name="探索者A")
+        other_player = User.objects.create_user(username="comparison-player-2", password="pass123")
+        second, second_participant = self.create_character(name="探索者B", user=other_player)
+        first.system_data.skills.model.objects.create(
+            character_sheet=first.system_data, skill_name="他の言語（英語）", base_value=1, interest_points=40
+        )
+        second.system_data.skills.model.objects.create(
+            character_sheet=second.system_data, skill_name="目星", base_value=25, interest_points=30
+        )
+        participants = list(
+            type(first_participant)
+            .objects.filter(pk__in=[first_participant.pk, second_participant.pk])
+            .select_related("user", "character_sheet__sixth_edition_data")
+            .prefetch_related("character_sheet__sixth_edition_data__skills")
+            .order_by("pk")
+        )
+
+        with self.assertNumQueries(0):
+            comparison = build_recommended_skill_comparison(self.scenario, participants)
+
+        language, observation = comparison["rows"]
+        self.assertEqual(
+            [cell["matches"] for cell in language["cells"]],
+            [
+                [{"name": "他の言語（英語）", "value": 41, "is_initial": False}],
+                [{"name": "他国語", "value": 1, "is_initial": True}],
+            ],
+        )
+        self.assertEqual([cell["matches"][0]["value"] for cell in observation["cells"]], [25, 55])
+
     def test_comparison_without_scenario_returns_none(self):
         self.assertIsNone(build_recommended_skill_comparison(None, []))
 
@@ -3,16 +3,18 @@
 """
 
 import io
+import tempfile
 from datetime import timedelta
 
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from accounts.image_renditions import generate_renditions
 from accounts.models import CustomUser, Group
 from schedules import session_permissions
 from schedules.models import SessionImage, SessionParticipant, TRPGSession
@@ -408,6 +410,67 @@ class SessionImageTestCase(APITestCase):
             self.assertEqual(image_data["title"], f"セッション画像{i+1}")
             self.assertIsNotNone(image_data["image_url"])
 
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_image_renditions_are_exposed_and_deleted_with_image(self):
+        """リサイズ版を生成するとサムネイルURLに使われ、画像削除時に一緒に削除される"""
+        file = io.BytesIO()
+        Image.new("RGB", (800, 600), color="blue").save(file, "PNG")
+        image = SessionImage.objects.create(
+            session=self.session,
+            image=SimpleUploadedFile("map.png", file.getvalue(), content_type="image/png"),
+            uploaded_by=self.gm,
+        )
+        self.assertTrue(image.get_thumbnail_url().endswith(".png"))
+
+        generate_renditions("schedules.SessionImage", image.pk)
+        image.refresh_from_db()
+        self.assertEqual(sorted(image.renditions, key=int), ["320", "640"])
+        self.assertTrue(image.get_thumbnail_url().endswith("_320w.webp"))
+
+        self.client.force_authenticate(user=self.gm)
+        response = self.client.get(reverse("session-image-detail", kwargs={"pk": image.id}))
+        self.assertTrue(response.data["thumbnail_url"].endswith("_320w.webp"))
+        self.assertEqual(set(response.data["renditions"]["640"]), {"webp", "jpeg"})
+
+        rendition_names = [name for names in image.renditions.values() for name in names.values()]
+        response = self.client.delete(reverse("session-image-detail", kwargs={"pk": image.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(any(image.image.storage.exists(name) for name in rendition_names))
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_renditions_belong_to_their_row(self):
+        """同じ名前の画像でもリサイズ版は行ごとに分かれ、差し替え時は自分の古いリサイズ版だけ消える"""
+
+        def upload(name, color, image_format):
+            file = io.BytesIO()
+            Image.new("RGB", (800, 600), color=color).save(file, image_format)
+            return SimpleUploadedFile(name, file.getvalue(), content_type=f"image/{image_format.lower()}")
+
+        first = SessionImage.objects.create(session=self.session, image=upload("scene.png", "red", "PNG"))
+        second = SessionImage.objects.create(session=self.session, image=upload("scene.jpg", "green", "JPEG"))
+        generate_renditions("schedules.SessionImage", first.pk)
+        generate_renditions("schedules.SessionImage", second.pk)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        storage = first.image.storage
+        first_names = {name for names in first.renditions.values() for name in names.values()}
+        second_names = {name for names in second.renditions.values() for name in names.values()}
+        self.assertFalse(first_names & second_names)
+        self.assertTrue(all(storage.exists(name) for name in first_names | second_names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.image = upload("scene.png", "blue", "PNG")
+            first.save()
+        self.assertEqual(first.renditions, {})
+        self.assertFalse(any(storage.exists(name) for name in first_names))
+        self.assertTrue(all(storage.exists(name) for name in second_names))
+
+        generate_renditions("schedules.SessionImage", second.pk)
+        second.refresh_from_db()
+        regenerated = {name for names in second.renditions.values() for name in names.values()}
+        self.assertTrue(all(storage.exists(name) for name in regenerated))
+        self.assertFalse(any(storage.exists(name) for name in second_names - regenerated))
+
 
 if __name__ == "__main__":
     import django
@@ -425,7 +425,7 @@ class SessionManagementIntegrationTestCase(APITestCase):
         response = self.client.get(ical_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        content = response.content.decode("utf-8")
+        content = b"".join(response.streaming_content).decode("utf-8")
         self.assertIn("統合テストセッション", content)
         self.assertIn("[Player]", content)  # プレイヤーとして参加
 
@@ -643,7 +643,7 @@ class CalendarExportIntegrationTestCase(APITestCase):
         response = self.client.get(ical_url, {"days": 60})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        ical_content = response.content.decode("utf-8")
+        ical_content = b"".join(response.streaming_content).decode("utf-8")
 
         # 全セッションが含まれているか確認
         for session in self.sessions:
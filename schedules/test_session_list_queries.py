@@ -0,0 +1,241 @@
+"""
+セッション一覧系APIのクエリ数回帰テスト
+
+参加者数・ゲスト数・YouTube動画数/合計時間はアノテーションから読み、
+表示件数が増えてもクエリ数が変わらないことを確認する。
+詳細表示（TRPGSessionSerializer）は参加者・ハンドアウト等をプリフェッチし、
+ハンドアウトの閲覧可否もメモリ上で判定する。
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts.models import CharacterSheet, CharacterSheet7th
+from accounts.models import Group as CustomGroup
+
+from . import session_permissions
+from .models import HandoutInfo, SessionParticipant, SessionSeries, SessionYouTubeLink, TRPGSession
+
+User = get_user_model()
+
+# 20件のページを返す SessionsListView (JSON) のクエリ数（総件数 + ページ本体）
+SESSIONS_LIST_PAGE_QUERIES = 2
+
+
+class SessionListQueryCountTestCase(APITestCase):
+    def setUp(self):
+        self.gm = User.objects.create_user(username="list-gm", password="pass123", nickname="GM")
+        self.players = [
+            User.objects.create_user(username=f"list-player-{index}", password="pass123") for index in range(2)
+        ]
+        self.group = CustomGroup.objects.create(name="List Group", created_by=self.gm)
+        self.group.members.add(self.gm, *self.players)
+        self.series = SessionSeries.objects.create(
+            title="List Series", gm=self.gm, group=self.group, start_date=timezone.now().date()
+        )
+        self.client.force_authenticate(user=self.gm)
+
+    def create_sessions(self, count):
+        for index in range(count):
+            session = TRPGSession.objects.create(
+                title=f"List Session {index}",
+                date=timezone.now() + timedelta(days=index + 1),
+                gm=self.gm,
+                created_by=self.gm,
+                group=self.group,
+                series=self.series,
+            )
+            session_permissions.create_participant(session=session, user=self.gm, role="gm")
+            for player in self.players:
+                session_permissions.create_participant(session=session, user=player, role="player")
+            session_permissions.create_participant(session=session, user=None, guest_name="ゲスト", role="player")
+            for number in range(2):
+                SessionYouTubeLink.objects.create(
+                    session=session,
+                    youtube_url=f"https://youtube.com/watch?v=s{session.id}v{number}",
+                    video_id=f"s{session.id}v{number}",
+                    title=f"Video {number}",
+                    duration_seconds=1800,
+                    added_by=self.gm,
+                )
+
+    def count_queries(self, url, **extra):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def assert_constant_queries(self, url, **extra):
+        self.create_sessions(2)
+        small, _ = self.count_queries(url, **extra)
+        self.create_sessions(6)
+        large, response = self.count_queries(url, **extra)
+        self.assertEqual(small, large)
+        return response
+
+    def test_sessions_list_json_reads_annotated_counts(self):
+        self.create_sessions(20)
+
+        with self.assertNumQueries(SESSIONS_LIST_PAGE_QUERIES):
+            response = self.client.get("/api/schedules/sessions/view/", HTTP_ACCEPT="application/json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 20)
+        self.assertEqual(
+            {(row["participant_count"], row["guest_count"], row["youtube_video_count"]) for row in results},
+            {(3, 1, 2)},
+        )
+        self.assertEqual(
+            results[0]["youtube_total_duration_display"],
+            SessionYouTubeLink.format_duration(3600),
+        )
+
+    def test_sessions_list_html_queries_do_not_grow(self):
+        response = self.assert_constant_queries("/api/schedules/sessions/view/", HTTP_ACCEPT="text/html")
+        self.assertContains(response, "3人")
+
+    def test_upcoming_sessions_queries_do_not_grow(self):
+        response = self.assert_constant_queries("/api/schedules/sessions/upcoming/")
+        self.assertTrue(all(row["participant_count"] == 3 for row in response.json()))
+        self.assertTrue(all(row["guest_count"] == 1 for row in response.json()))
+
+    def test_series_sessions_queries_do_not_grow(self):
+        response = self.assert_constant_queries(f"/api/schedules/session-series/{self.series.id}/sessions/")
+        self.assertEqual(len(response.json()), 8)
+        self.assertEqual({row["youtube_video_count"] for row in response.json()}, {2})
+
+    def walk_cursor_pages(self, url, **params):
+        """cursor を辿って全ページの id と各ページのクエリ数を返す"""
+        ids, query_counts = [], []
+        cursor = ""
+        while True:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, {**params, "cursor": cursor}, HTTP_ACCEPT="application/json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            query_counts.append(len(context.captured_queries))
+            ids.extend(row["id"] for row in response.json()["results"])
+            if not response.json()["has_next"]:
+                return ids, query_counts, response
+            cursor = response.json()["next_cursor"]
+
+    def test_sessions_list_cursor_pages_match_offset_order(self):
+        # 同じ日時のセッションを含めて、offset 方式と同じ並び順を重複なく辿れる
+        self.create_sessions(4)
+        self.create_sessions(4)
+        TRPGSession.objects.create(
+            title="Past Session", date=timezone.now() - timedelta(days=1), gm=self.gm, group=self.group
+        )
+        url = "/api/schedules/sessions/view/"
+
+        for period in ("future", "all", "past"):
+            expected = [
+                row["id"]
+                for row in self.client.get(url, {"period": period, "limit": 50}, HTTP_ACCEPT="application/json").json()[
+                    "results"
+                ]
+            ]
+            ids, query_counts, response = self.walk_cursor_pages(url, period=period, limit=3)
+            self.assertEqual(sorted(ids), sorted(expected))
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(response.json()["period"], period)
+            self.assertNotIn("count", response.json())
+            # 総件数を数えないため、深いページでも1クエリで済む
+            self.assertEqual(set(query_counts), {1})
+
+        _, query_counts, response = self.walk_cursor_pages(url, period="all", limit=3, total="exact")
+        self.assertEqual(response.json()["count"], 9)
+        self.assertEqual(set(query_counts), {2})
+
+    def test_session_viewset_cursor_is_opt_in(self):
+        self.create_sessions(5)
+        url = "/api/schedules/sessions/"
+
+        self.assertIsInstance(self.client.get(url).json(), list)
+
+        ids, query_counts, response = self.walk_cursor_pages(url, page_size=2, total="approximate")
+        self.assertEqual(ids, list(TRPGSession.objects.order_by("date", "id").values_list("id", flat=True)))
+        self.assertEqual(response.json()["count"], 5)
+        self.assertFalse(response.json()["count_is_estimate"])
+        self.assertEqual(len(set(query_counts[:-1])), 1)
+
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for position in (["2026-01-01T00:00:00+00:00", "abc"], ["not-a-date", 1], [{"date": 1}, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def add_handouts_and_characters(self):
+        """ハンドアウト未作成のPLに、秘匿ハンドアウト・公開ハンドアウトと探索者を追加する"""
+        participants = SessionParticipant.objects.filter(user__in=self.players, handouts__isnull=True)
+        for participant in participants:
+            character = CharacterSheet.objects.create(user=participant.user, edition="7th")
+            CharacterSheet7th.objects.create(character_sheet=character, name=f"探索者{participant.id}", age=30)
+            participant.character_sheet = character
+            participant.save(update_fields=["character_sheet"])
+            HandoutInfo.objects.create(
+                session=participant.session, participant=participant, title="秘匿HO", content="secret"
+            )
+            HandoutInfo.objects.create(
+                session=participant.session,
+                participant=participant,
+                title="公開HO",
+                content="public",
+                is_secret=False,
+            )
+
+    def test_session_viewset_detail_queries_do_not_grow(self):
+        url = "/api/schedules/sessions/"
+        self.client.force_authenticate(user=self.players[0])
+        self.create_sessions(2)
+        self.add_handouts_and_characters()
+        small, _ = self.count_queries(url)
+        self.create_sessions(6)
+        self.add_handouts_and_characters()
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.json()), 8)
+        for row in response.json():
+            # 自分の秘匿HOと全員の公開HOだけが見える
+            self.assertEqual(
+                sorted(handout["title"] for handout in row["handouts_detail"]), ["公開HO", "公開HO", "秘匿HO"]
+            )
+            self.assertEqual(row["participant_count"], 3)
+            self.assertEqual(row["youtube_total_duration"], 3600)
+            sheets = [participant["character_sheet_detail"] for participant in row["participants_detail"]]
+            self.assertEqual(sum(1 for sheet in sheets if sheet), 2)
+            self.assertIn(["gm"], [participant["roles"] for participant in row["participants_detail"]])
+
+    def test_session_detail_queries_do_not_grow_with_participants(self):
+        self.create_sessions(1)
+        self.add_handouts_and_characters()
+        session = TRPGSession.objects.get()
+        requests = [
+            (f"/api/schedules/sessions/{session.id}/", {}),
+            (f"/api/schedules/sessions/{session.id}/detail/", {"HTTP_ACCEPT": "application/json"}),
+        ]
+        before = [self.count_queries(url, **extra)[0] for url, extra in requests]
+
+        for index in range(2):
+            player = User.objects.create_user(username=f"list-extra-player-{index}", password="pass123")
+            self.group.members.add(player)
+            self.players.append(player)
+            session_permissions.create_participant(session=session, user=player, role="player")
+        self.add_handouts_and_characters()
+
+        for (url, extra), expected in zip(requests, before):
+            queries, response = self.count_queries(url, **extra)
+            self.assertEqual(queries, expected)
+            # GMはすべてのハンドアウトを閲覧できる
+            self.assertEqual(len(response.json()["handouts_detail"]), 8)
@@ -4,8 +4,14 @@
 
 import json
 from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -13,7 +19,15 @@ from rest_framework.test import APITestCase
 
 from accounts.models import CustomUser, Group
 from schedules import session_permissions
-from schedules.models import HandoutNotification, SessionParticipant, TRPGSession, UserNotificationPreferences
+from schedules.models import (
+    HandoutInfo,
+    HandoutNotification,
+    SessionParticipant,
+    TRPGSession,
+    UnreadNotificationCounter,
+    UserNotificationPreferences,
+)
+from schedules.notification_counters import get_unread_count
 from schedules.notifications import SessionNotificationService
 
 
@@ -159,6 +173,234 @@ class SessionNotificationServiceTestCase(TestCase):
             self.assertEqual(notification.metadata["hours_before"], 24)
 
 
+class SessionNotificationFanOutTestCase(TestCase):
+    """参加者が多いセッションへの一括通知のテスト"""
+
+    def setUp(self):
+        self.gm = CustomUser.objects.create_user(
+            username="fanout_gm", email="fanout_gm@example.com", password="pass123"
+        )
+        self.session = TRPGSession.objects.create(
+            title="大人数セッション",
+            date=timezone.now() + timedelta(days=7),
+            gm=self.gm,
+            group=Group.objects.create(name="Fan-out Group", created_by=self.gm),
+        )
+        self.notification_service = SessionNotificationService()
+
+    def _add_players(self, count, start=0):
+        players = []
+        for index in range(start, start + count):
+            player = CustomUser.objects.create_user(
+                username=f"fanout_player{index}", email=f"fanout{index}@example.com", password="pass123"
+            )
+            session_permissions.create_participant(session=self.session, user=player, role="player")
+            players.append(player)
+        return players
+
+    def _count_reminder_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            self.notification_service.send_session_reminder_notification(self.session, hours_before=24)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_participants(self):
+        """通知設定の取得・通知作成・未読数集計が参加者数に比例しない（GMを含む）"""
+        self._add_players(2)
+        small = self._count_reminder_queries()
+        self._add_players(10, start=2)
+        large = self._count_reminder_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(HandoutNotification.objects.filter(notification_type="session_reminder").count(), 16)
+
+    def test_preferences_are_respected_and_created(self):
+        """設定が無いユーザーの設定はまとめて作成され、無効ユーザーには送らない"""
+        muted, active = self._add_players(2)
+        UserNotificationPreferences.objects.create(user=muted, session_notifications_enabled=False)
+
+        count = self.notification_service.send_session_cancelled_notification(self.session, reason="延期")
+
+        self.assertEqual(count, 1)
+        self.assertTrue(UserNotificationPreferences.objects.filter(user=active).exists())
+        self.assertFalse(HandoutNotification.objects.filter(recipient=muted).exists())
+
+    def test_emails_are_sent_in_one_batch(self):
+        """メール通知が有効な参加者にだけメールを送る"""
+        players = self._add_players(3)
+        for player in players[:2]:
+            UserNotificationPreferences.objects.create(user=player, email_notifications_enabled=True)
+
+        self.notification_service.send_session_cancelled_notification(self.session)
+
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox), ["fanout0@example.com", "fanout1@example.com"]
+        )
+
+    def test_broadcast_includes_unread_counts(self):
+        """WebSocket配信は受信者ごとの未読数を含めて一度にまとめて送る"""
+        first, second = self._add_players(2)
+        HandoutNotification.objects.create(
+            handout_id=0, recipient=first, sender=self.gm, notification_type="session_reminder", message="既存"
+        )
+        channel_layer = mock.Mock()
+        channel_layer.group_send = mock.AsyncMock()
+
+        with mock.patch("schedules.notifications.get_channel_layer", return_value=channel_layer):
+            self.notification_service.send_session_cancelled_notification(self.session)
+
+        sent = {call.args[0]: call.args[1] for call in channel_layer.group_send.await_args_list}
+        self.assertEqual(sent[f"notifications_user_{first.id}"]["unread_count"], 2)
+        self.assertEqual(sent[f"notifications_user_{second.id}"]["unread_count"], 1)
+        self.assertEqual(
+            sent[f"notifications_user_{second.id}"]["notification"]["notification_type"], "session_cancelled"
+        )
+
+    def test_rows_are_reloaded_when_bulk_insert_returns_no_primary_keys(self):
+        """主キーを返さないDB（MySQL）でも、作成した通知をWebSocket配信とメール送信に回す"""
+        players = self._add_players(2)
+        UserNotificationPreferences.objects.create(user=players[0], email_notifications_enabled=True)
+        channel_layer = mock.Mock()
+        channel_layer.group_send = mock.AsyncMock()
+
+        with (
+            mock.patch.object(
+                type(connection.features), "can_return_rows_from_bulk_insert", new_callable=mock.PropertyMock
+            ) as can_return_rows,
+            mock.patch("schedules.notifications.get_channel_layer", return_value=channel_layer),
+        ):
+            can_return_rows.return_value = False
+            count = self.notification_service.send_session_cancelled_notification(self.session)
+
+        self.assertEqual(count, 2)
+        sent = {call.args[0]: call.args[1] for call in channel_layer.group_send.await_args_list}
+        for player in players:
+            notification = HandoutNotification.objects.get(recipient=player, notification_type="session_cancelled")
+            self.assertEqual(sent[f"notifications_user_{player.id}"]["notification"]["id"], notification.pk)
+        self.assertEqual([message.to[0] for message in mail.outbox], ["fanout0@example.com"])
+
+
+class UnreadNotificationCounterTestCase(APITestCase):
+    """未読通知数カウンターのテスト"""
+
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(username="counter_gm", password="pass123")
+        self.user = CustomUser.objects.create_user(username="counter_user", password="pass123")
+        self.client.force_authenticate(user=self.user)
+
+    def _notify(self, **kwargs):
+        return HandoutNotification.objects.create(
+            handout_id=0,
+            recipient=self.user,
+            sender=self.sender,
+            notification_type="session_reminder",
+            message="通知",
+            **kwargs,
+        )
+
+    def _counter(self):
+        return UnreadNotificationCounter.objects.get(user=self.user).unread_count
+
+    def test_counter_follows_create_read_and_delete(self):
+        """作成・既読・一括既読・削除でカウンターが実件数と一致する"""
+        first = self._notify()
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        second = self._notify()
+        self._notify()
+        self._notify(is_read=True)
+        self.assertEqual(self._counter(), 3)
+
+        first.mark_as_read()
+        first.mark_as_read()
+        self.assertEqual(self._counter(), 2)
+
+        second.delete()
+        self.assertEqual(self._counter(), 1)
+
+        response = self.client.patch("/api/schedules/notifications/mark_all_read/")
+        self.assertEqual(response.data["updated_count"], 1)
+        self.assertEqual(self._counter(), 0)
+        self.assertEqual(
+            self._counter(), HandoutNotification.objects.filter(recipient=self.user, is_read=False).count()
+        )
+
+    def test_counter_follows_is_read_changes_through_save(self):
+        """save() で既読/未読を切り替えた場合もカウンターを合わせる"""
+        notification = self._notify()
+        get_unread_count(self.user.id)
+
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(self._counter(), 0)
+
+        notification.is_read = False
+        notification.save()
+        self.assertEqual(self._counter(), 1)
+
+    def test_unread_count_api_does_not_recount(self):
+        """未読数APIは通知件数に比例したクエリを発行しない"""
+        for _ in range(5):
+            self._notify()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/schedules/notifications/unread_count/")
+
+        self.assertEqual(response.data["unread_count"], 5)
+        self.assertFalse(any("COUNT(" in query["sql"].upper() for query in context.captured_queries))
+
+    def test_counter_excludes_notifications_the_user_cannot_see(self):
+        """閲覧できないハンドアウトの通知はカウンターに含めず、見えなくなった通知もAPIは再計算せずに除く"""
+        session = TRPGSession.objects.create(
+            title="Counter Session", date=timezone.now() + timedelta(days=1), gm=self.sender, visibility="private"
+        )
+        own = session_permissions.create_participant(session=session, user=self.user, role="player", player_slot=1)
+        other_user = CustomUser.objects.create_user(username="counter_other", password="pass123")
+        other = session_permissions.create_participant(session=session, user=other_user, role="player", player_slot=2)
+        own_handout = HandoutInfo.objects.create(session=session, participant=own, title="Own", content="x")
+        other_handout = HandoutInfo.objects.create(session=session, participant=other, title="Other", content="x")
+
+        self._notify()
+        get_unread_count(self.user.id)
+        HandoutNotification.objects.create(
+            handout_id=own_handout.id,
+            recipient=self.user,
+            sender=self.sender,
+            notification_type="handout_created",
+            message="通知",
+        )
+        hidden = HandoutNotification.objects.create(
+            handout_id=other_handout.id,
+            recipient=self.user,
+            sender=self.sender,
+            notification_type="handout_created",
+            message="通知",
+        )
+        self.assertEqual(self._counter(), 2)
+        hidden.mark_as_read()
+        self.assertEqual(self._counter(), 2)
+
+        own_handout.participant = other
+        own_handout.save()
+        self.assertEqual(self.client.get("/api/schedules/notifications/unread_count/").data["unread_count"], 1)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/schedules/notifications/unread_count/")
+        self.assertEqual(response.data["unread_count"], 1)
+        self.assertFalse(any("schedules_handout" in query["sql"] for query in context.captured_queries))
+
+    def test_rebuild_command_repairs_drift(self):
+        """rebuild_notification_counters で実件数に戻せる"""
+        self._notify()
+        self._notify()
+        UnreadNotificationCounter.objects.update_or_create(user=self.user, defaults={"unread_count": 10})
+
+        out = StringIO()
+        call_command("rebuild_notification_counters", "--user", str(self.user.id), stdout=out)
+
+        self.assertIn("rows=1", out.getvalue())
+        self.assertEqual(self._counter(), 2)
+
+
 class SessionInviteAPITestCase(APITestCase):
     """セッション招待APIのテストケース"""
 
@@ -1,10 +1,12 @@
 from datetime import timedelta
 
 from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import connection
 from django.db.migrations.executor import MigrationExecutor
-from django.test import TestCase, TransactionTestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -141,6 +143,73 @@ class SessionRoleServiceTestCase(TestCase):
         self.assertTrue(session_permissions.is_session_gm(self.owner, session))
         self.assertTrue(session_permissions.can_view_secret_content(self.owner, session))
 
+    def test_permission_context_answers_checks_from_memory(self):
+        session_permissions.create_participant(session=self.session, user=self.gm, role=SessionParticipantRole.Role.GM)
+        session_permissions.create_participant(
+            session=self.session, user=self.manager, role=SessionParticipantRole.Role.MANAGER
+        )
+        session_permissions.create_participant(
+            session=self.session, user=self.player, role=SessionParticipantRole.Role.PLAYER
+        )
+        checks = [
+            session_permissions.is_session_gm,
+            session_permissions.can_edit_session_basic,
+            session_permissions.can_manage_permissions,
+            session_permissions.can_view_session_basic,
+            session_permissions.can_view_secret_content,
+            session_permissions.is_group_admin,
+            session_permissions.is_group_member,
+        ]
+        users = [self.owner, self.gm, self.manager, self.player, self.group_admin, self.group_member]
+        expected = [[check(user, self.session) for check in checks] for user in users]
+
+        with session_permissions.permission_context():
+            self.assertEqual([[check(user, self.session) for check in checks] for user in users], expected)
+            # 2回目以降は (ユーザー, セッション) ごとに読み込んだ参加者行・メンバーシップから答える
+            with self.assertNumQueries(0):
+                self.assertEqual([[check(user, self.session) for check in checks] for user in users], expected)
+                self.assertEqual(
+                    session_permissions.get_user_participant(self.gm, self.session).cached_role,
+                    SessionParticipantRole.Role.GM,
+                )
+
+    def test_permission_context_is_cleared_when_roles_or_memberships_change(self):
+        participant = session_permissions.create_participant(
+            session=self.session, user=self.player, role=SessionParticipantRole.Role.PLAYER
+        )
+
+        with session_permissions.permission_context():
+            self.assertFalse(session_permissions.can_view_secret_content(self.player, self.session))
+            session_permissions.set_participant_roles(participant, [SessionParticipantRole.Role.GM])
+            self.assertTrue(session_permissions.can_view_secret_content(self.player, self.session))
+
+            self.assertTrue(session_permissions.is_group_member(self.group_member, self.session))
+            self.group.members.remove(self.group_member)
+            self.assertFalse(session_permissions.is_group_member(self.group_member, self.session))
+
+            participant.delete()
+            self.assertFalse(session_permissions.can_view_secret_content(self.player, self.session))
+
+    def test_request_reuses_permission_context_across_checks(self):
+        session_permissions.create_participant(session=self.session, user=self.gm, role=SessionParticipantRole.Role.GM)
+        self.client.force_login(self.gm)
+        url = reverse("session_detail", kwargs={"pk": self.session.id})
+        without_context = [
+            middleware
+            for middleware in settings.MIDDLEWARE
+            if middleware != "schedules.middleware.SessionPermissionContextMiddleware"
+        ]
+
+        with override_settings(MIDDLEWARE=without_context), CaptureQueriesContext(connection) as uncached:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        # テストクライアントはミドルウェアを初回リクエスト時に組み立てるため、別のクライアントで比較する
+        client = self.client_class()
+        client.force_login(self.gm)
+        with CaptureQueriesContext(connection) as cached:
+            self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+
+        self.assertLess(len(cached), len(uncached))
+
 
 class SessionRoleApiTestCase(APITestCase):
     def setUp(self):
@@ -455,7 +524,8 @@ class SessionRoleDataMigrationTestCase(TransactionTestCase):
 
     def tearDown(self):
         self.executor.loader.build_graph()
-        self.executor.migrate(self._targets_for(self.migrate_to))
+        # 後続のテストが最新のスキーマを使えるよう、すべてのマイグレーションを適用し直す
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
         super().tearDown()
 
     def test_legacy_permissions_and_observer_roles_are_unified(self):
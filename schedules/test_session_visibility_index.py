@@ -0,0 +1,167 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Group, GroupLink, GroupLinkShare, GroupMembership
+from schedules import session_permissions
+from schedules.models import SessionVisibility, TRPGSession
+from schedules.session_visibility import _linked_share_rows, visible_sessions_for
+
+User = get_user_model()
+
+
+class SessionVisibilityIndexTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="visibility-owner")
+        self.member = User.objects.create_user(username="visibility-member")
+        self.outsider = User.objects.create_user(username="visibility-outsider")
+        self.group = Group.objects.create(name="Visibility Group", created_by=self.owner)
+        GroupMembership.objects.create(user=self.owner, group=self.group, role="admin")
+        self.session = TRPGSession.objects.create(
+            title="Group Session",
+            date=timezone.now(),
+            gm=self.owner,
+            group=self.group,
+            created_by=self.owner,
+            visibility="group",
+        )
+
+    def _visible_ids(self, user):
+        return set(visible_sessions_for(user).values_list("id", flat=True))
+
+    def _reasons(self, user):
+        return set(SessionVisibility.objects.filter(user=user, session=self.session).values_list("reason", flat=True))
+
+    def test_creator_and_group_owner_are_indexed(self):
+        self.assertEqual(self._reasons(self.owner), {"creator", "group_owner", "group_member"})
+        self.assertEqual(self._visible_ids(self.outsider), set())
+
+    def test_group_membership_changes_update_index(self):
+        membership = GroupMembership.objects.create(user=self.member, group=self.group, role="member")
+        self.assertEqual(self._visible_ids(self.member), {self.session.id})
+
+        membership.delete()
+        self.assertEqual(self._visible_ids(self.member), set())
+
+        self.group.members.add(self.member)
+        self.assertEqual(self._reasons(self.member), {"group_member"})
+
+    def test_participant_changes_update_index(self):
+        participant = session_permissions.create_participant(session=self.session, user=self.outsider, role="player")
+        self.assertEqual(self._reasons(self.outsider), {"participant"})
+
+        participant.delete()
+        self.assertEqual(self._visible_ids(self.outsider), set())
+
+    def test_session_delete_does_not_recreate_participant_visibility(self):
+        session_permissions.create_participant(session=self.session, user=self.outsider, role="player")
+        session_id = self.session.id
+
+        self.session.delete()
+
+        self.assertFalse(SessionVisibility.objects.filter(session_id=session_id).exists())
+
+    def test_session_group_change_moves_member_visibility(self):
+        GroupMembership.objects.create(user=self.member, group=self.group, role="member")
+        other_group = Group.objects.create(name="Other Group", created_by=self.outsider)
+
+        self.session.group = other_group
+        self.session.save()
+
+        self.assertEqual(self._visible_ids(self.member), set())
+        self.assertEqual(self._reasons(self.outsider), {"group_owner"})
+
+    def test_session_save_reads_previous_row_once(self):
+        # 変更前の値を使う各機能は、pre_save で1回だけ読んだ行を共有する
+        previous_row_filter = f'FROM "schedules_trpgsession" WHERE "schedules_trpgsession"."id" = {self.session.pk} '
+        self.session.status = "completed"
+        self.session.duration_minutes = 240
+
+        with CaptureQueriesContext(connection) as context:
+            self.session.save()
+
+        self.assertEqual(
+            len(
+                [
+                    query
+                    for query in context.captured_queries
+                    if previous_row_filter in query["sql"] and '"schedules_trpgsession"."status"' in query["sql"]
+                ]
+            ),
+            1,
+        )
+
+    def test_public_sessions_use_visibility_column(self):
+        self.session.visibility = "public"
+        self.session.save(update_fields=["visibility"])
+
+        self.assertEqual(self._visible_ids(self.outsider), {self.session.id})
+        self.assertFalse(SessionVisibility.objects.filter(user=self.outsider).exists())
+
+    def test_accepted_group_link_share_grants_target_members(self):
+        target = Group.objects.create(name="Target Group", created_by=self.member)
+        GroupMembership.objects.create(user=self.outsider, group=target, role="member")
+        link = GroupLink.objects.create(source_group=self.group, target_group=target, requested_by=self.owner)
+        GroupLinkShare.objects.create(
+            link=link,
+            owner_group=self.group,
+            resource_type=GroupLinkShare.ResourceType.SESSION,
+            object_id=self.session.id,
+            created_by=self.owner,
+        )
+        self.assertEqual(self._visible_ids(self.outsider), set())
+
+        link.status = GroupLink.Status.ACCEPTED
+        link.save()
+        self.assertEqual(self._reasons(self.outsider), {"group_link"})
+
+        link.delete()
+        self.assertEqual(self._visible_ids(self.outsider), set())
+
+    def test_linked_share_rows_for_users_read_only_their_groups_shares(self):
+        target = Group.objects.create(name="Target Group", created_by=self.member)
+        GroupMembership.objects.create(user=self.outsider, group=target, role="member")
+        link = GroupLink.objects.create(
+            source_group=self.group, target_group=target, requested_by=self.owner, status=GroupLink.Status.ACCEPTED
+        )
+        GroupLinkShare.objects.create(
+            link=link,
+            owner_group=self.group,
+            resource_type=GroupLinkShare.ResourceType.SESSION,
+            object_id=self.session.id,
+            created_by=self.owner,
+        )
+
+        # 共有に関係するグループに所属しないユーザーは共有行の読み込みだけで終わる
+        with self.assertNumQueries(1):
+            self.assertEqual(_linked_share_rows(user_ids=[self.member.id]), set())
+        # 共有元グループのメンバーは閲覧側ではない
+        self.assertEqual(_linked_share_rows(user_ids=[self.owner.id]), set())
+        self.assertEqual(
+            _linked_share_rows(user_ids=[self.outsider.id]), {(self.outsider.id, self.session.id, "group_link")}
+        )
+
+    def test_group_delete_removes_member_visibility(self):
+        GroupMembership.objects.create(user=self.member, group=self.group, role="member")
+
+        self.group.delete()
+
+        self.assertEqual(self._visible_ids(self.member), set())
+        self.assertEqual(self._reasons(self.owner), {"creator"})
+
+    def test_rebuild_command_matches_incremental_index(self):
+        GroupMembership.objects.create(user=self.member, group=self.group, role="member")
+        session_permissions.create_participant(session=self.session, user=self.outsider, role="player")
+        expected = set(SessionVisibility.objects.values_list("user_id", "session_id", "reason"))
+
+        SessionVisibility.objects.all().delete()
+        output = StringIO()
+        call_command("rebuild_session_visibility", stdout=output)
+
+        self.assertIn(f"rows={len(expected)}", output.getvalue())
+        self.assertEqual(set(SessionVisibility.objects.values_list("user_id", "session_id", "reason")), expected)
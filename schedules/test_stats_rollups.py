@@ -0,0 +1,108 @@
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Group
+from scenarios.models import Scenario
+from schedules import session_permissions
+from schedules.models import SessionParticipant, TRPGSession, UserStatsRollup
+
+User = get_user_model()
+
+
+class UserStatsRollupTests(TestCase):
+    def setUp(self):
+        self.gm = User.objects.create_user(username="rollup-gm")
+        self.player = User.objects.create_user(username="rollup-player")
+        self.group = Group.objects.create(name="Rollup Group", created_by=self.gm)
+        self.scenario = Scenario.objects.create(title="Rollup Scenario", game_system="coc7", created_by=self.gm)
+
+    def _create_session(self, **kwargs):
+        defaults = {
+            "title": "Rollup Session",
+            "date": timezone.make_aware(datetime(2025, 3, 10, 20, 0)),
+            "gm": self.gm,
+            "group": self.group,
+            "scenario": self.scenario,
+            "duration_minutes": 180,
+            "status": "completed",
+        }
+        defaults.update(kwargs)
+        return TRPGSession.objects.create(**defaults)
+
+    def _rollups(self, user):
+        return {
+            (row.year, row.month, row.game_system): (
+                row.session_count,
+                row.gm_session_count,
+                row.player_session_count,
+                row.total_minutes,
+                row.gm_minutes,
+            )
+            for row in UserStatsRollup.objects.filter(user=user)
+        }
+
+    def test_completed_session_updates_gm_and_participant_rollups(self):
+        session = self._create_session()
+        session_permissions.create_participant(session=session, user=self.player, role="player")
+
+        self.assertEqual(self._rollups(self.gm), {(2025, 3, "coc7"): (1, 1, 0, 180, 180)})
+        self.assertEqual(self._rollups(self.player), {(2025, 3, "coc7"): (1, 0, 1, 180, 0)})
+
+    def test_m2m_participant_add_and_remove_update_rollups(self):
+        session = self._create_session()
+        session.participants.add(self.player)
+        self.assertEqual(self._rollups(self.player), {(2025, 3, "coc7"): (1, 0, 1, 180, 0)})
+
+        session.participants.remove(self.player)
+        self.assertEqual(self._rollups(self.player), {})
+
+    def test_status_and_date_changes_move_rollups(self):
+        session = self._create_session(status="planned")
+        session.participants.add(self.player)
+        self.assertFalse(UserStatsRollup.objects.exists())
+
+        session.status = "completed"
+        session.actual_duration_minutes = 240
+        session.save()
+        self.assertEqual(self._rollups(self.player), {(2025, 3, "coc7"): (1, 0, 1, 240, 0)})
+
+        session.date = timezone.make_aware(datetime(2025, 4, 1, 0, 30))
+        session.save()
+        self.assertEqual(self._rollups(self.gm), {(2025, 4, "coc7"): (1, 1, 0, 240, 240)})
+
+        session.status = "cancelled"
+        session.save(update_fields=["status", "updated_at"])
+        self.assertFalse(UserStatsRollup.objects.exists())
+
+    def test_session_delete_clears_rollups(self):
+        session = self._create_session()
+        session.participants.add(self.player)
+
+        session.delete()
+
+        self.assertFalse(UserStatsRollup.objects.exists())
+
+    def test_undated_session_and_missing_scenario_use_placeholder_bucket(self):
+        self._create_session(date=None, scenario=None, duration_minutes=60)
+
+        self.assertEqual(self._rollups(self.gm), {(0, 0, ""): (1, 1, 0, 60, 60)})
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        first = self._create_session()
+        first.participants.add(self.player)
+        second = self._create_session(gm=self.player, date=timezone.make_aware(datetime(2024, 12, 31, 23, 30)))
+        SessionParticipant.objects.create(session=second, user=self.gm)
+        expected = {user.pk: self._rollups(user) for user in (self.gm, self.player)}
+
+        UserStatsRollup.objects.all().delete()
+        output = StringIO()
+        call_command("rebuild_stats_rollups", stdout=output)
+
+        self.assertIn("rows=4", output.getvalue())
+        self.assertEqual({user.pk: self._rollups(user) for user in (self.gm, self.player)}, expected)
+        self.assertEqual(self._rollups(self.gm)[(2024, 12, "coc7")], (1, 0, 1, 180, 0))
@@ -77,3 +77,37 @@ class NotificationWebSocketTestCase(TransactionTestCase):
             await communicator.disconnect()
 
         async_to_sync(scenario)()
+
+    def test_client_can_request_unread_count(self):
+        client = Client()
+        client.force_login(self.user)
+        session_cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+        for message in ("first", "second"):
+            HandoutNotification.objects.create(
+                handout_id=0,
+                recipient=self.user,
+                sender=self.other,
+                notification_type="session_reminder",
+                message=message,
+            )
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                application,
+                "/ws/notifications/",
+                headers=[
+                    (
+                        b"cookie",
+                        f"{settings.SESSION_COOKIE_NAME}={session_cookie}".encode(),
+                    ),
+                ],
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            await communicator.send_json_to({"type": "notification.unread_count"})
+            payload = await communicator.receive_json_from(timeout=1)
+            self.assertEqual(payload, {"type": "notification.unread_count", "unread_count": 2})
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
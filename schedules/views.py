@@ -4,7 +4,18 @@ from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
 from django.db import transaction
-from django.db.models import Case, Count, DateTimeField, F, IntegerField, Prefetch, Q, Sum, Value, When
+from django.db.models import (
+    Case,
+    DateTimeField,
+    F,
+    IntegerField,
+    Prefetch,
+    Q,
+    Sum,
+    Value,
+    When,
+    prefetch_related_objects,
+)
 from django.db.models.deletion import ProtectedError
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
@@ -22,15 +33,15 @@ from accounts.models import (
     CharacterSkill6th,
     CharacterSkill7th,
     CustomUser,
-    Group,
     GroupLink,
     GroupLinkShare,
     GroupMembership,
 )
 from accounts.views.mixins import CharacterSheetAccessMixin
+from accounts.views.pagination import KeysetPagination
 from schedules.duration import effective_duration_expression
 
-from . import session_permissions
+from . import ical_feed, session_permissions, session_visibility
 from .models import (  # 高度なスケジューリング機能（ISSUE-017）
     DatePoll,
     DatePollComment,
@@ -52,8 +63,10 @@ from .models import (  # 高度なスケジューリング機能（ISSUE-017）
 )
 from .notifications import SessionNotificationService
 from .recommended_skill_comparison import build_recommended_skill_comparison
+from .response_cache import cache_schedule_response
 from .serializers import CalendarEventSerializer  # 高度なスケジューリング機能（ISSUE-017）
 from .serializers import (
+    SESSION_DETAIL_SELECT_RELATED,
     DatePollCommentSerializer,
     DatePollCreateSerializer,
     DatePollOptionSerializer,
@@ -70,35 +83,17 @@ from .serializers import (
     SessionSeriesSerializer,
     SessionYouTubeLinkSerializer,
     TRPGSessionSerializer,
+    annotate_session_list_counts,
     build_internal_character_url,
+    prefetch_session_detail,
+    session_detail_prefetches,
 )
 from .services import YouTubeService
 from .template_services import bind_slot_handouts_to_participant, clone_scenario_handouts_to_session
 
 
 def _visible_sessions_for(user):
-    group_ids = GroupMembership.objects.filter(user=user).values_list("group_id", flat=True)
-    owned_group_ids = Group.objects.filter(created_by=user).values_list("id", flat=True)
-    participant_session_ids = SessionParticipant.objects.filter(user=user).values_list("session_id", flat=True)
-    shared_session_ids = (
-        GroupLinkShare.objects.filter(
-            resource_type=GroupLinkShare.ResourceType.SESSION,
-            link__status=GroupLink.Status.ACCEPTED,
-        )
-        .filter(
-            Q(owner_group_id=F("link__source_group_id"), link__target_group_id__in=group_ids)
-            | Q(owner_group_id=F("link__target_group_id"), link__source_group_id__in=group_ids)
-        )
-        .values_list("object_id", flat=True)
-    )
-    return TRPGSession.objects.filter(
-        Q(created_by=user)
-        | Q(visibility="public")
-        | Q(group_id__in=group_ids)
-        | Q(group_id__in=owned_group_ids)
-        | Q(id__in=participant_session_ids)
-        | Q(id__in=shared_session_ids)
-    ).distinct()
+    return session_visibility.visible_sessions_for(user)
 
 
 def _tableno_character_from_url(character_sheet_url, user):
@@ -207,6 +202,15 @@ def _order_sessions_by_period(sessions, period, now=None):
     return sessions.order_by("date")
 
 
+def _keyset_ordering_for_period(period):
+    """_order_sessions_by_period と同じ並び順に id を加えたキーセット用の並び"""
+    if period in ("past", "past_all", "past7", "past30", "past90"):
+        return ("-date", "-id")
+    if period in ("", "all"):
+        return ("_period_sort_group", "_future_date", "-_past_date", "id")
+    return ("date", "id")
+
+
 def _is_assignable_session_user(session, user):
     if not user:
         return False
@@ -415,19 +419,17 @@ class SessionsListView(APIView):
     def get_json_response(self, request):
         user = request.user
         period = request.query_params.get("period", "future")
-        sessions = (
-            _visible_sessions_for(user)
-            .select_related("gm", "group")
-            .annotate(
-                guest_count=Count(
-                    "sessionparticipant",
-                    filter=Q(sessionparticipant__user__isnull=True),
-                )
-            )
-        )
+        sessions = annotate_session_list_counts(_visible_sessions_for(user).select_related("gm", "group"))
         sessions = _filter_sessions_by_period(sessions, period)
         sessions = _order_sessions_by_period(sessions, period)
 
+        # cursor 指定時はキーセット方式（深いページでも一定コスト、総件数は total 指定時のみ）
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination(ordering=_keyset_ordering_for_period(period), page_size_query_param="limit")
+            page = paginator.paginate_queryset(sessions, request)
+            data = paginator.get_paginated_data(SessionListSerializer(page, many=True).data)
+            return Response({**data, "limit": paginator.limit, "period": period})
+
         # ページネーション対応
         limit = int(request.query_params.get("limit", 20))
         offset = int(request.query_params.get("offset", 0))
@@ -452,16 +454,7 @@ class SessionsListView(APIView):
     def get_html_response(self, request):
         user = request.user
         period = request.GET.get("period", "future")
-        sessions = (
-            _visible_sessions_for(user)
-            .select_related("gm", "group")
-            .annotate(
-                guest_count=Count(
-                    "sessionparticipant",
-                    filter=Q(sessionparticipant__user__isnull=True),
-                )
-            )
-        )
+        sessions = annotate_session_list_counts(_visible_sessions_for(user).select_related("gm", "group"))
         sessions = _filter_sessions_by_period(sessions, period)
         sessions = _order_sessions_by_period(sessions, period)
 
@@ -489,12 +482,21 @@ class TRPGSessionViewSet(viewsets.ModelViewSet):
     queryset = TRPGSession.objects.none()
     serializer_class = TRPGSessionSerializer
     permission_classes = [IsAuthenticated]
+    # cursor パラメータがあるときだけページネーションする（無ければ従来どおり配列を返す）
+    pagination_class = KeysetPagination
+
+    def get_keyset_ordering(self):
+        return _keyset_ordering_for_period(self.request.query_params.get("period", "future"))
 
     def get_queryset(self):
         user = self.request.user
         # ユーザーが参加しているグループのセッション、または公開セッション
         sessions = _visible_sessions_for(user).select_related("scenario")
-        if getattr(self, "action", None) == "list":
+        action = getattr(self, "action", None)
+        if action in ("list", "retrieve"):
+            # TRPGSessionSerializer が参照する関連をまとめて読み込む
+            sessions = prefetch_session_detail(sessions)
+        if action == "list":
             period = self.request.query_params.get("period", "future")
             sessions = _filter_sessions_by_period(sessions, period)
             return _order_sessions_by_period(sessions, period)
@@ -1153,13 +1155,12 @@ class TRPGSessionViewSet(viewsets.ModelViewSet):
         from .serializers import UpcomingSessionSerializer
 
         now = timezone.now()
-        sessions = (
+        sessions = annotate_session_list_counts(
             self.get_queryset()
             .filter(date__gte=now, status="planned")
             .select_related("gm", "group")
-            .prefetch_related("sessionparticipant_set__user")
-            .order_by("date")[:5]
-        )
+            .prefetch_related("sessionparticipant_set__user", "sessionparticipant_set__participant_roles")
+        ).order_by("date")[:5]
 
         serializer = UpcomingSessionSerializer(sessions, many=True)
         return Response(serializer.data)
@@ -1186,11 +1187,8 @@ class TRPGSessionViewSet(viewsets.ModelViewSet):
         gm_role_session_ids = set(gm_role_session_ids) | set(legacy_gm_session_ids)
         gm_role_session_id_set = set(gm_role_session_ids)
 
-        sessions = (
-            TRPGSession.objects.filter(Q(created_by=user) | Q(id__in=participant_session_ids))
-            .select_related("gm", "group", "scenario")
-            .prefetch_related("sessionparticipant_set__user")
-            .distinct()
+        sessions = prefetch_session_detail(
+            TRPGSession.objects.filter(Q(created_by=user) | Q(id__in=participant_session_ids)).distinct()
         )
 
         # ロールフィルター
@@ -1905,6 +1903,7 @@ class HandoutInfoViewSet(viewsets.ModelViewSet):
 class CalendarView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_schedule_response("calendar")
     def get(self, request):
         start_raw = request.query_params.get("start")
         end_raw = request.query_params.get("end")
@@ -2085,6 +2084,7 @@ class MonthlyEventListView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    @cache_schedule_response("monthly-events")
     def get(self, request):
         # YYYY-MM形式の月指定を取得
         month_str = request.query_params.get("month")
@@ -2179,6 +2179,7 @@ class SessionAggregationView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    @cache_schedule_response("session-aggregation", max_timeout=60)
     def get(self, request):
         # 期間指定
         days = int(request.query_params.get("days", 30))
@@ -2295,10 +2296,6 @@ class ICalExportView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        import uuid
-
-        from django.http import HttpResponse
-
         # 期間指定
         days = int(request.query_params.get("days", 90))
         start_date = timezone.now()
@@ -2307,41 +2304,72 @@ class ICalExportView(APIView):
         # セッションを取得
         visible_session_ids = _visible_sessions_for(request.user).values_list("id", flat=True)
         gm_role_session_ids = _gm_role_session_ids_for(request.user)
-        occurrences = (
-            SessionOccurrence.objects.filter(
-                session_id__in=visible_session_ids,
-                start_at__range=[start_date, end_date],
-            )
-            .select_related("session", "session__gm", "session__group")
-            .order_by("start_at", "id")
+        occurrences = SessionOccurrence.objects.filter(
+            session_id__in=visible_session_ids,
+            start_at__range=[start_date, end_date],
+        ).order_by("start_at", "id")
+
+        # 本文を作る前に、対象日程の ID・更新日時と本文に出すGM名・グループ名だけで ETag を決める
+        calendar_name = request.user.nickname or request.user.username
+        etag = ical_feed.feed_validator(
+            occurrences.values_list(
+                "id",
+                "session_id",
+                "updated_at",
+                "session__updated_at",
+                "session__gm__nickname",
+                "session__gm__username",
+                "session__group__name",
+            ),
+            calendar_name,
+            sorted(gm_role_session_ids),
         )
 
-        # iCal形式の生成
-        lines = []
-        lines.append("BEGIN:VCALENDAR")
-        lines.append("VERSION:2.0")
-        lines.append("PRODID:-//タブレノ//TRPG Session Calendar//JP")
-        lines.append("CALSCALE:GREGORIAN")
-        lines.append("METHOD:PUBLISH")
-        lines.append(f"X-WR-CALNAME:タブレノ - {request.user.nickname or request.user.username}")
-        lines.append("X-WR-TIMEZONE:Asia/Tokyo")
+        lines = self._iter_lines(
+            request.user,
+            occurrences.select_related("session", "session__gm", "session__group"),
+            calendar_name,
+            gm_role_session_ids,
+        )
+        return ical_feed.conditional_ical_response(
+            request,
+            lines,
+            etag=etag,
+            headers={
+                "Content-Disposition": (
+                    f'attachment; filename="tableno_sessions_{timezone.now().strftime("%Y%m%d")}.ics"'
+                ),
+                "Cache-Control": "private, no-cache",
+            },
+        )
 
-        for occurrence in occurrences:
+    def _iter_lines(self, user, occurrences, calendar_name, gm_role_session_ids):
+        # iCal形式の生成（日程を順に読みながら1行ずつ返す）
+        yield "BEGIN:VCALENDAR"
+        yield "VERSION:2.0"
+        yield "PRODID:-//タブレノ//TRPG Session Calendar//JP"
+        yield "CALSCALE:GREGORIAN"
+        yield "METHOD:PUBLISH"
+        yield f"X-WR-CALNAME:タブレノ - {calendar_name}"
+        yield "X-WR-TIMEZONE:Asia/Tokyo"
+
+        for occurrence in occurrences.iterator(chunk_size=200):
             # イベントの開始・終了時刻
             session = occurrence.session
             dtstart = occurrence.start_at
             dtend = dtstart + timedelta(minutes=session.duration_minutes or 180)
 
             # ユーザーとの関係
-            is_gm = _is_session_gm_for_user(session, request.user, gm_role_session_ids)
+            is_gm = _is_session_gm_for_user(session, user, gm_role_session_ids)
             role = "GM" if is_gm else "Player"
 
-            lines.append("BEGIN:VEVENT")
-            lines.append(f"UID:{uuid.uuid4()}@tableno.jp")
-            lines.append(f'DTSTAMP:{timezone.now().strftime("%Y%m%dT%H%M%SZ")}')
-            lines.append(f'DTSTART:{dtstart.strftime("%Y%m%dT%H%M%S")}')
-            lines.append(f'DTEND:{dtend.strftime("%Y%m%dT%H%M%S")}')
-            lines.append(f"SUMMARY:[{role}] {session.title}")
+            yield "BEGIN:VEVENT"
+            # UID・DTSTAMP は日程ごとに固定し、内容が変わらなければ再取り込みさせない
+            yield f"UID:session-{session.id}-occurrence-{occurrence.id}@tableno.jp"
+            yield f"DTSTAMP:{ical_feed.ical_utc(max(occurrence.updated_at, session.updated_at))}"
+            yield f'DTSTART:{dtstart.strftime("%Y%m%dT%H%M%S")}'
+            yield f'DTEND:{dtend.strftime("%Y%m%dT%H%M%S")}'
+            yield f"SUMMARY:[{role}] {session.title}"
 
             # 詳細説明
             description_parts = []
@@ -2354,49 +2382,41 @@ class ICalExportView(APIView):
             if session.description:
                 description_parts.append(f"\\n{session.description}")
 
-            lines.append(f'DESCRIPTION:{" | ".join(description_parts)}')
+            yield f'DESCRIPTION:{" | ".join(description_parts)}'
 
             if session.location:
-                lines.append(f"LOCATION:{session.location}")
+                yield f"LOCATION:{session.location}"
 
             # ステータスに応じた設定
             if session.status == "cancelled":
-                lines.append("STATUS:CANCELLED")
+                yield "STATUS:CANCELLED"
             elif session.status == "completed":
-                lines.append("STATUS:CONFIRMED")
+                yield "STATUS:CONFIRMED"
             else:
-                lines.append("STATUS:TENTATIVE")
+                yield "STATUS:TENTATIVE"
 
             # カテゴリ
-            lines.append(f"CATEGORIES:TRPG,{role}")
+            yield f"CATEGORIES:TRPG,{role}"
 
             # アラーム設定（1日前と1時間前）
             if session.status == "planned":
                 # 1日前のリマインダー
-                lines.append("BEGIN:VALARM")
-                lines.append("TRIGGER:-P1D")
-                lines.append("ACTION:DISPLAY")
-                lines.append(f"DESCRIPTION:明日のTRPGセッション: {session.title}")
-                lines.append("END:VALARM")
+                yield "BEGIN:VALARM"
+                yield "TRIGGER:-P1D"
+                yield "ACTION:DISPLAY"
+                yield f"DESCRIPTION:明日のTRPGセッション: {session.title}"
+                yield "END:VALARM"
 
                 # 1時間前のリマインダー
-                lines.append("BEGIN:VALARM")
-                lines.append("TRIGGER:-PT1H")
-                lines.append("ACTION:DISPLAY")
-                lines.append(f"DESCRIPTION:1時間後のTRPGセッション: {session.title}")
-                lines.append("END:VALARM")
-
-            lines.append("END:VEVENT")
+                yield "BEGIN:VALARM"
+                yield "TRIGGER:-PT1H"
+                yield "ACTION:DISPLAY"
+                yield f"DESCRIPTION:1時間後のTRPGセッション: {session.title}"
+                yield "END:VALARM"
 
-        lines.append("END:VCALENDAR")
+            yield "END:VEVENT"
 
-        # レスポンス生成
-        response = HttpResponse("\r\n".join(lines), content_type="text/calendar; charset=utf-8")
-        response["Content-Disposition"] = (
-            f'attachment; filename="tableno_sessions_{timezone.now().strftime("%Y%m%d")}.ics"'
-        )
-
-        return response
+        yield "END:VCALENDAR"
 
 
 class CreateSessionView(APIView):
@@ -2475,6 +2495,7 @@ class JoinSessionView(APIView):
 class UpcomingSessionsView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @cache_schedule_response("upcoming-sessions", max_timeout=60)
     def get(self, request):
         user = request.user
         now = timezone.now()
@@ -2521,6 +2542,7 @@ class UpcomingSessionsView(APIView):
             )
             .prefetch_related(
                 "session__sessionparticipant_set__user",
+                "session__sessionparticipant_set__participant_roles",
             )
             .distinct()
             .order_by("start_at", "id")[:5]
@@ -2790,7 +2812,7 @@ class SessionDetailView(APIView):
     def get(self, request, pk):
         # セッション詳細取得
         try:
-            session = TRPGSession.objects.select_related("scenario").get(pk=pk)
+            session = TRPGSession.objects.select_related(*SESSION_DETAIL_SELECT_RELATED).get(pk=pk)
         except TRPGSession.DoesNotExist:
             if "application/json" in request.headers.get("Accept", ""):
                 return Response({"error": "Session not found"}, status=404)
@@ -2820,6 +2842,7 @@ class SessionDetailView(APIView):
     def get_json_response(self, request, session, user):
         from .serializers import TRPGSessionSerializer
 
+        prefetch_related_objects([session], *session_detail_prefetches())
         serializer = TRPGSessionSerializer(session, context={"request": request})
         return Response(serializer.data)
 
@@ -3571,7 +3594,7 @@ class SessionSeriesViewSet(viewsets.ModelViewSet):
     def sessions(self, request, pk=None):
         """シリーズに属するセッション一覧"""
         series = self.get_object()
-        sessions = series.sessions.order_by("date")
+        sessions = annotate_session_list_counts(series.sessions.select_related("gm", "group")).order_by("date")
         serializer = SessionListSerializer(sessions, many=True, context={"request": request})
         return Response(serializer.data)
 
@@ -168,6 +168,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "schedules.middleware.SessionPermissionContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
@@ -211,7 +212,8 @@ DATABASES = {
     }
 }
 
-if "test" in sys.argv or "PYTEST_CURRENT_TEST" in os.environ or "pytest" in Path(sys.argv[0]).name.lower():
+RUNNING_TESTS = "test" in sys.argv or "PYTEST_CURRENT_TEST" in os.environ or "pytest" in Path(sys.argv[0]).name.lower()
+if RUNNING_TESTS:
     DATABASES["default"].setdefault("TEST", {})
     DATABASES["default"]["TEST"]["NAME"] = BASE_DIR / "test_db.sqlite3"
 
@@ -447,9 +449,10 @@ CELERY_TASK_SOFT_TIME_LIMIT = int(os.environ.get("CELERY_TASK_SOFT_TIME_LIMIT",
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULE = {
+    # セッション状態・閲覧条件は変更時に即時評価される。日時条件と役割・PL番号の変更は定期実行で評価する
     "publish-scheduled-handouts": {
         "task": "schedules.tasks.publish_scheduled_handouts",
-        "schedule": 60.0,
+        "schedule": float(os.environ.get("HANDOUT_RELEASE_POLL_SECONDS", "60")),
     },
     "expire-async-jobs": {
         "task": "schedules.tasks.expire_async_jobs",
@@ -459,12 +462,22 @@ CELERY_BEAT_SCHEDULE = {
         "task": "schedules.tasks.expire_premium_access",
         "schedule": 3600.0,
     },
+    "build-ranking-snapshots": {
+        "task": "schedules.tasks.build_ranking_snapshots",
+        "schedule": 900.0,
+    },
     "sync-japanese-holidays-monthly": {
         "task": "schedules.tasks.sync_japanese_holidays",
         "schedule": crontab(minute=20, hour=3, day_of_month="1"),
     },
 }
 
+# カレンダー系APIのレスポンスキャッシュ秒数（0で無効）
+# テストDBはテストごとにロールバックされるため、テスト実行時は既定で無効にする
+SCHEDULE_RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get("SCHEDULE_RESPONSE_CACHE_TIMEOUT", "0" if RUNNING_TESTS else "300")
+)
+
 JAPANESE_HOLIDAY_CSV_URL = os.environ.get(
     "JAPANESE_HOLIDAY_CSV_URL",
     "https://www8.cao.go.jp/chosei/shukujitsu/syukujitsu.csv",
@@ -621,3 +634,6 @@ BACKGROUND_REMOVAL_SUBNETS = _split_env_list(os.environ.get("BACKGROUND_REMOVAL_
 BACKGROUND_REMOVAL_SECURITY_GROUPS = _split_env_list(os.environ.get("BACKGROUND_REMOVAL_SECURITY_GROUPS", ""))
 BACKGROUND_REMOVAL_ASSIGN_PUBLIC_IP = _get_bool("BACKGROUND_REMOVAL_ASSIGN_PUBLIC_IP", default=False)
 BACKGROUND_REMOVAL_JOB_TIMEOUT_SECONDS = int(os.environ.get("BACKGROUND_REMOVAL_JOB_TIMEOUT_SECONDS", "900"))
+# "fargate" launches one task per job; "worker" leaves jobs pending for run_background_removal_worker.
+BACKGROUND_REMOVAL_DISPATCH = os.environ.get("BACKGROUND_REMOVAL_DISPATCH", "fargate")
+BACKGROUND_REMOVAL_MODEL = os.environ.get("BACKGROUND_REMOVAL_MODEL", "u2net")